@@ -6,7 +6,8 @@ from google import genai
 from google.genai import types
 from dotenv import load_dotenv
 
-from mcp_server.tools import register_tools, GLOBAL_TOOL_REGISTRY, get_gemini_tools_schema
+from mcp_server.tools import register_tools, GLOBAL_TOOL_REGISTRY, get_gemini_tools_schema, get_registry_version
+from mcp_server.tool_runner import run_tool_calls
 from mcp_server.skills.development_orchestrator import get_orchestrator
 
 # Inicializa o registro de ferramentas (incluindo skills dinâmicas)
@@ -96,7 +97,36 @@ def _retry_tool_if_recoverable(function_name: str, function_args: dict, function
     except Exception:
         return function_response
 
+def _invoke_tool(function_name: str, function_args: dict, tool_function) -> str:
+    """Executa a ferramenta (com a auto-correção de erros recuperáveis) e devolve o texto."""
+    try:
+        function_response = tool_function(**function_args)
+    except Exception as e:
+        function_response = f"Erro na execução da ferramenta: {str(e)}"
+
+    # Se der erro recuperável, tenta corrigir e reexecutar
+    return str(_retry_tool_if_recoverable(
+        function_name=function_name,
+        function_args=function_args,
+        function_response=str(function_response),
+        tool_function=tool_function,
+    ))
+
+
+# Prompt do sistema em cache: só é remontado quando o registro de ferramentas muda
+_SYSTEM_PROMPT_CACHE = {"version": None, "prompt": None}
+
+
 def get_system_prompt():
+    """Retorna o prompt do sistema, remontando-o apenas quando as ferramentas mudam."""
+    version = get_registry_version()
+    if _SYSTEM_PROMPT_CACHE["version"] != version:
+        _SYSTEM_PROMPT_CACHE["prompt"] = _build_system_prompt()
+        _SYSTEM_PROMPT_CACHE["version"] = version
+    return _SYSTEM_PROMPT_CACHE["prompt"]
+
+
+def _build_system_prompt():
     """Gera o prompt do sistema enriquecido com knowledge base e protocolo de resiliência."""
     tools_list = "\n".join([f"- `{name}`: {func.__doc__.strip().split('\\n')[0] if func.__doc__ else 'Sem descrição'}" 
                              for name, func in GLOBAL_TOOL_REGISTRY.items()])
@@ -388,7 +418,7 @@ def run_conversation(messages):
 
     # Fluxo Gemini Real
     try:
-        # Hot-reload real: sempre reindexa ferramentas/skills antes de cada rodada.
+        # Hot-reload: recarrega apenas as skills cujos arquivos mudaram desde a última rodada.
         register_tools()
 
         # Detectar contexto: Sankhya runtime vs System development
@@ -456,14 +486,19 @@ Skills ativas: {', '.join(active_skills)}
             # Adiciona a resposta do modelo (com os function_calls) ao histórico
             contents.append(response.candidates[0].content)
 
-            # Processa cada chamada de ferramenta
+            # Processa as chamadas da rodada em paralelo (ordem das respostas preservada)
+            calls = [
+                (fc_part.function_call.name, dict(fc_part.function_call.args) if fc_part.function_call.args else {})
+                for fc_part in function_calls
+            ]
+            results = run_tool_calls(
+                calls, available_functions, invoke=_invoke_tool,
+                round_label=f"[{_round+1}/{MAX_TOOL_ROUNDS}]"
+            )
+
             function_response_parts = []
-            for fc_part in function_calls:
-                function_name = fc_part.function_call.name
-                function_args = dict(fc_part.function_call.args) if fc_part.function_call.args else {}
-                
-                tool_function = available_functions.get(function_name)
-                if not tool_function:
+            for function_name, function_args, function_response in results:
+                if function_response is None:
                     function_response_parts.append(
                         types.Part.from_function_response(
                             name=function_name,
@@ -471,29 +506,14 @@ Skills ativas: {', '.join(active_skills)}
                         )
                     )
                     continue
-                
-                print(f"🛠️ Executando [{_round+1}/{MAX_TOOL_ROUNDS}]: {function_name}({function_args})")
-                
-                try:
-                    function_response = tool_function(**function_args)
-                except Exception as e:
-                    function_response = f"Erro na execução da ferramenta: {str(e)}"
-
-                # Se der erro recuperável, tenta corrigir e reexecutar
-                function_response = _retry_tool_if_recoverable(
-                    function_name=function_name,
-                    function_args=function_args,
-                    function_response=str(function_response),
-                    tool_function=tool_function,
-                )
 
-                # Aprendizado automático pós-execução de ferramenta
-                _run_auto_learning(function_name, function_args, str(function_response), available_functions)
+                # Aprendizado automático pós-execução de ferramenta (sequencial: grava em arquivo)
+                _run_auto_learning(function_name, function_args, function_response, available_functions)
 
                 function_response_parts.append(
                     types.Part.from_function_response(
                         name=function_name,
-                        response={"result": str(function_response)},
+                        response={"result": function_response},
                     )
                 )
 
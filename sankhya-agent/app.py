@@ -49,11 +49,18 @@ with st.sidebar:
     st.header("🕵️ Monitoramento Ativo")
     
     # Exibição de Alertas Proativos do Background Worker
+    # O worker só regrava o arquivo quando algum vigia muda; o painel é relido
+    # apenas quando o mtime muda e fica em cache na sessão entre os reruns.
     ALERTS_PATH = "knowledge/active_alerts.json"
     if os.path.exists(ALERTS_PATH):
         try:
-            with open(ALERTS_PATH, "r", encoding="utf-8") as f:
-                alert_data = json.load(f)
+            mtime = os.path.getmtime(ALERTS_PATH)
+            cached = st.session_state.get("alerts_panel")
+            if cached is None or cached["mtime"] != mtime:
+                with open(ALERTS_PATH, "r", encoding="utf-8") as f:
+                    cached = {"mtime": mtime, "data": json.load(f)}
+                st.session_state.alerts_panel = cached
+            alert_data = cached["data"]
             st.success(f"Última varredura: {alert_data['last_run']}")
             st.markdown(alert_data['report'])
         except:
@@ -0,0 +1,398 @@
+"""
+Cliente assíncrono (asyncio) do Gateway Sankhya para o servidor MCP.
+
+O FastMCP roda num event loop, mas as ferramentas usavam `requests` (bloqueante):
+uma query lenta no Oracle travava todos os outros clientes MCP. Este cliente tem a
+mesma superfície do `SankhyaGatewayClient` (authenticate, execute_query,
+execute_bound, execute_query_result, iter_query_pages, execute_query_paged,
+call_service, invalidate_cache, get_pool_stats, get_token_stats), com:
+
+- o token num `TokenManager`, o mesmo do cliente síncrono na instância global
+  (refresh single-flight e proativo, TokenStore compartilhado); o /authenticate
+  roda numa thread, fora do event loop;
+- um pool httpx compartilhado (mesmos limites do PoolConfig do cliente síncrono);
+- limite de concorrência (semáforo) para não saturar o Gateway;
+- retry com backoff em 5xx/429 apenas para serviços somente leitura.
+
+`iter_query` (uma única resposta lida linha a linha) não tem versão assíncrona:
+o StreamingRowDecoder puxa os chunks de forma síncrona. Para resultados grandes
+use `iter_query_pages`/`execute_query_paged`, que também limitam a memória.
+"""
+import os
+import time
+import random
+import asyncio
+import logging
+from collections import deque
+from typing import Optional, List, Dict, Any, AsyncIterator, Awaitable, Callable, Tuple
+
+import httpx
+
+try:
+    from http_pool import PoolConfig, RETRYABLE_STATUS
+    from query_cache import QueryCache
+    from query_pager import PageCursor, Page, build_window_sql, build_keyset_sql, ROWNUM_COLUMN, PAGE_MODES
+    from row_decoder import QueryResult, decode_query_response
+    from sql_binder import get_template
+    from token_manager import TokenManager, TokenStore, TokenRefreshError
+    from utils import READ_ONLY_SERVICES, audit_logger, sankhya
+except ImportError:
+    from mcp_server.http_pool import PoolConfig, RETRYABLE_STATUS
+    from mcp_server.query_cache import QueryCache
+    from mcp_server.query_pager import PageCursor, Page, build_window_sql, build_keyset_sql, ROWNUM_COLUMN, PAGE_MODES
+    from mcp_server.row_decoder import QueryResult, decode_query_response
+    from mcp_server.sql_binder import get_template
+    from mcp_server.token_manager import TokenManager, TokenStore, TokenRefreshError
+    from mcp_server.utils import READ_ONLY_SERVICES, audit_logger, sankhya
+
+logger = logging.getLogger("sankhya-gateway-async")
+
+
+class AsyncSankhyaGatewayClient:
+    """Cliente assíncrono para o Gateway Sankhya com autenticação OAuth 2.0 + X-Token."""
+
+    def __init__(self, config: Optional[PoolConfig] = None, max_concurrency: Optional[int] = None,
+                 tokens: Optional[TokenManager] = None):
+        self.base_url = os.getenv("SANKHYA_API_URL", "https://api.sankhya.com.br")
+        self.client_id = os.getenv("SANKHYA_CLIENT_ID")
+        self.client_secret = os.getenv("SANKHYA_CLIENT_SECRET")
+        self.x_token = os.getenv("SANKHYA_X_TOKEN")
+
+        self.config = config or PoolConfig.from_env()
+        self.max_concurrency = max_concurrency or int(os.getenv("SANKHYA_ASYNC_MAX_CONCURRENCY", "8"))
+        self.query_timeout = float(os.getenv("SANKHYA_QUERY_TIMEOUT", "30"))
+        self.query_cache: Optional[QueryCache] = QueryCache.from_env()
+        self.supports_binds = os.getenv("SANKHYA_GATEWAY_BINDS", "0") == "1"
+
+        # Token OAuth: o TokenManager informado (o do cliente síncrono, na instância global)
+        # ou um próprio, com o mesmo SANKHYA_TOKEN_STORE
+        self._owns_tokens = tokens is None
+        self.tokens = tokens or TokenManager.from_env(
+            self._request_token,
+            store_key=lambda: TokenStore.key_for(self.base_url, self.client_id),
+        )
+
+        # Criados sob demanda dentro do event loop em uso
+        self._http: Optional[httpx.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._requests = 0
+        self._retries = 0
+
+    # ------------------------------------------------------------------
+    # Infraestrutura
+    # ------------------------------------------------------------------
+
+    async def _ensure_loop_resources(self):
+        """Pool e semáforo pertencem a um event loop; recria se o loop mudou."""
+        loop = asyncio.get_running_loop()
+        if self._loop is loop and self._http is not None:
+            return
+        stale, stale_loop = self._http, self._loop
+        self._loop = loop
+        self._http = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=self.config.pool_maxsize,
+                max_keepalive_connections=self.config.pool_maxsize,
+            ),
+            transport=httpx.AsyncHTTPTransport(retries=self.config.max_retries),
+        )
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        if stale is not None:
+            await self._close_stale(stale, stale_loop)
+
+    async def _close_stale(self, client: httpx.AsyncClient, loop: Optional[asyncio.AbstractEventLoop]):
+        """Fecha o pool do loop anterior (senão as conexões dele ficam abertas até o GC)."""
+        if loop is not None and loop.is_running():
+            # Loop anterior ainda vivo em outra thread: o fechamento roda nele
+            asyncio.run_coroutine_threadsafe(client.aclose(), loop)
+            return
+        try:
+            await client.aclose()
+        except RuntimeError as e:
+            # Loop anterior já fechado: o pool é esvaziado e os sockets saem com o transporte
+            logger.debug(f"Pool do event loop anterior descartado: {e}")
+
+    def _retry_delay(self, attempt: int, response: httpx.Response) -> float:
+        retry_after = response.headers.get("Retry-After")
+        if retry_after:
+            try:
+                return min(float(retry_after), self.config.backoff_max)
+            except ValueError:
+                pass
+        delay = self.config.backoff_factor * (2 ** attempt)
+        return min(delay + random.uniform(0, self.config.backoff_factor), self.config.backoff_max)
+
+    async def _post(self, url: str, idempotent: bool = True, **kwargs) -> httpx.Response:
+        """POST limitado pelo semáforo, repetindo 5xx/429 (não idempotente: só 429)."""
+        await self._ensure_loop_resources()
+        attempt = 0
+        async with self._semaphore:
+            while True:
+                self._requests += 1
+                response = await self._http.post(url, **kwargs)
+                retryable = response.status_code in RETRYABLE_STATUS
+                if retryable and not idempotent:
+                    retryable = response.status_code == 429
+                if not retryable or attempt >= self.config.max_retries:
+                    return response
+
+                delay = self._retry_delay(attempt, response)
+                logger.warning(
+                    f"Gateway respondeu {response.status_code}. "
+                    f"Nova tentativa {attempt + 1}/{self.config.max_retries} em {delay:.1f}s."
+                )
+                self._retries += 1
+                await asyncio.sleep(delay)
+                attempt += 1
+
+    # ------------------------------------------------------------------
+    # Autenticação
+    # ------------------------------------------------------------------
+
+    @property
+    def bearer_token(self) -> Optional[str]:
+        return self.tokens.token
+
+    @property
+    def token_expires_at(self) -> float:
+        return self.tokens.expires_at
+
+    def _request_token(self) -> Tuple[Optional[str], float]:
+        """POST /authenticate síncrono (chamado só pelo TokenManager, numa thread, um por vez)."""
+        response = httpx.post(
+            f"{self.base_url}/authenticate",
+            data={
+                "grant_type": "client_credentials",
+                "client_id": self.client_id,
+                "client_secret": self.client_secret
+            },
+            headers={
+                "Content-Type": "application/x-www-form-urlencoded",
+                "X-Token": self.x_token
+            },
+            timeout=15,
+        )
+        response.raise_for_status()
+        res_data = response.json()
+
+        # O Sankhya pode retornar 'access_token' ou 'bearerToken'
+        token = res_data.get("access_token") or res_data.get("bearerToken")
+        return token, float(res_data.get("expires_in", 3600))
+
+    async def authenticate(self) -> bool:
+        """Autentica no Gateway; chamadas simultâneas compartilham um único refresh."""
+        if self.tokens.token and time.time() < self.tokens.expires_at:
+            return True
+        try:
+            # O TokenManager bloqueia (single-flight entre threads): fora do event loop
+            await asyncio.to_thread(self.tokens.get_token)
+            return True
+        except TokenRefreshError as e:
+            logger.error(f"Erro na autenticação Gateway (async): {str(e)}")
+            return False
+
+    async def _authorized_post(self, service_name: str, request_body: Dict[str, Any],
+                               idempotent: bool, timeout: float) -> httpx.Response:
+        if not await self.authenticate():
+            raise Exception("Falha na autenticação com o Gateway Sankhya.")
+
+        url = f"{self.base_url}/gateway/v1/mge/service.sbr"
+        params = {"serviceName": service_name, "outputType": "json"}
+        payload = {"serviceName": service_name, "requestBody": request_body}
+
+        token = self.bearer_token
+        response = await self._post(
+            url, json=payload, params=params, timeout=timeout, idempotent=idempotent,
+            headers={"Authorization": f"Bearer {token}", "Content-Type": "application/json"},
+        )
+
+        # Re-autenticação automática se token expirou mid-request
+        if response.status_code == 401:
+            logger.info("Token expirado durante request (async). Re-autenticando...")
+            # Compare-and-invalidate (pode apagar o token do TokenStore em disco)
+            await asyncio.to_thread(self.tokens.invalidate, token)
+            if await self.authenticate():
+                response = await self._post(
+                    url, json=payload, params=params, timeout=timeout, idempotent=idempotent,
+                    headers={"Authorization": f"Bearer {self.bearer_token}", "Content-Type": "application/json"},
+                )
+
+        response.raise_for_status()
+        return response
+
+    # ------------------------------------------------------------------
+    # API pública (mesma superfície do cliente síncrono)
+    # ------------------------------------------------------------------
+
+    async def execute_query_result(self, sql: str, timeout: Optional[float] = None,
+                                   binds: Optional[Dict[str, Any]] = None) -> QueryResult:
+        """Executa a query e devolve o resultado compacto (colunas + tuplas)."""
+        audit_logger.info(f"SQL | {sql.strip()}" + (f" | BINDS {binds}" if binds else ""))
+        request_body: Dict[str, Any] = {"sql": sql.strip()}
+        if binds:
+            request_body["params"] = binds
+        try:
+            response = await self._authorized_post(
+                "DbExplorerSP.executeQuery", request_body,
+                idempotent=True, timeout=timeout or self.query_timeout,
+            )
+            return decode_query_response([response.content])
+        except Exception as e:
+            logger.error(f"Erro na chamada do DbExplorerSP (async): {str(e)}")
+            raise
+
+    async def _cached_rows(self, key_sql: str, load: Callable[[], Awaitable[QueryResult]],
+                           use_cache: bool) -> List[Dict[str, Any]]:
+        """Read-through no cache de queries, se ligado (o cache pode ir ao SQLite: fora do event loop)."""
+        if self.query_cache is None or not use_cache:
+            return (await load()).to_dicts()
+        cached = await asyncio.to_thread(self.query_cache.lookup, key_sql)
+        if cached is not None:
+            return cached
+        rows = (await load()).to_dicts()
+        await asyncio.to_thread(self.query_cache.store, key_sql, rows)
+        return rows
+
+    async def execute_query(self, sql: str, use_cache: bool = True) -> List[Dict[str, Any]]:
+        """Executa uma query SQL via DbExplorerSP (compartilha o cache de queries, se ligado)."""
+        return await self._cached_rows(sql, lambda: self.execute_query_result(sql), use_cache)
+
+    async def execute_bound(self, sql: str, params: Dict[str, Any], use_cache: bool = True) -> List[Dict[str, Any]]:
+        """Query com parâmetros :NOME, como `SankhyaGatewayClient.execute_bound` (chave do cache com literais)."""
+        template = get_template(sql)
+        literal_sql = template.render(params)
+        if not self.supports_binds or not template.names:
+            return await self.execute_query(literal_sql, use_cache=use_cache)
+        binds = template.bind_values(params)
+        return await self._cached_rows(
+            literal_sql, lambda: self.execute_query_result(template.sql, binds=binds), use_cache
+        )
+
+    async def _fetch_window(self, sql: str, order_by: Optional[str], offset: int, page_size: int,
+                            mode: str, timeout: Optional[float]) -> List[Dict[str, Any]]:
+        window_sql = build_window_sql(sql, order_by, offset, page_size, mode=mode)
+        rows = (await self.execute_query_result(window_sql, timeout=timeout)).to_dicts()
+        for row in rows:
+            row.pop(ROWNUM_COLUMN, None)
+        return rows
+
+    async def iter_query_pages(
+        self,
+        sql: str,
+        order_by: Optional[str] = None,
+        page_size: int = 5000,
+        mode: str = "rownum",
+        key_column: Optional[str] = None,
+        max_workers: int = 2,
+        cursor: Optional[PageCursor] = None,
+        timeout: Optional[float] = None,
+    ) -> AsyncIterator[Page]:
+        """
+        Páginas de uma query grande, em ordem (mesmos modos e cursor de
+        `SankhyaGatewayClient.iter_query_pages`); no modo rownum/offset até
+        `max_workers` páginas são buscadas à frente da que está sendo consumida.
+        """
+        cursor = cursor or PageCursor(mode=mode, page_size=page_size)
+        if cursor.mode not in PAGE_MODES:
+            raise ValueError(f"Modo de paginação inválido: {cursor.mode}")
+        if cursor.done:
+            return
+
+        if cursor.mode == "keyset":
+            if not key_column:
+                raise ValueError("mode='keyset' exige key_column.")
+            index = 0
+            while not cursor.done:
+                page_sql = build_keyset_sql(sql, key_column, cursor.last_key, cursor.page_size)
+                rows = (await self.execute_query_result(page_sql, timeout=timeout)).to_dicts()
+                cursor = cursor.advance(rows, key_column)
+                yield Page(index=index, rows=rows, cursor=cursor)
+                index += 1
+            return
+
+        if not order_by and "ORDER BY" not in sql.upper():
+            logger.warning("Query paginada sem ORDER BY: a ordem entre páginas não é garantida.")
+
+        workers = max(1, int(max_workers))
+        pending = deque()
+        next_offset = cursor.offset
+
+        def _submit():
+            nonlocal next_offset
+            pending.append(asyncio.ensure_future(
+                self._fetch_window(sql, order_by, next_offset, cursor.page_size, cursor.mode, timeout)
+            ))
+            next_offset += cursor.page_size
+
+        try:
+            for _ in range(workers):
+                _submit()
+            index = 0
+            while pending:
+                rows = await pending.popleft()
+                cursor = cursor.advance(rows)
+                yield Page(index=index, rows=rows, cursor=cursor)
+                index += 1
+                if cursor.done:
+                    break
+                _submit()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def execute_query_paged(self, sql: str, **kwargs) -> AsyncIterator[Dict[str, Any]]:
+        """Linhas de uma query grande buscada em páginas (ver iter_query_pages)."""
+        async for page in self.iter_query_pages(sql, **kwargs):
+            for row in page.rows:
+                yield row
+
+    async def call_service(self, service_name: str, request_body: Dict[str, Any]) -> Dict[str, Any]:
+        """Chamada genérica de serviço via Gateway (JSON)."""
+        audit_logger.info(f"SERVICE | {service_name}")
+        idempotent = service_name in READ_ONLY_SERVICES
+        response = await self._authorized_post(service_name, request_body, idempotent=idempotent, timeout=30)
+        data = response.json()
+
+        # O Sankhya retorna status "0" para erro e "1" para sucesso
+        if str(data.get("status", "1")) == "0":
+            error_msg = data.get("statusMessage", "Erro desconhecido na API Sankhya")
+            raise Exception(f"Erro Funcional Sankhya: {error_msg}")
+
+        # Gravação no ERP: resultados voláteis em cache deixam de ser confiáveis
+        if not idempotent and self.query_cache is not None:
+            await asyncio.to_thread(self.query_cache.invalidate_volatile)
+        return data
+
+    async def invalidate_cache(self, table: Optional[str] = None):
+        """Invalida o cache de queries (de uma tabela ou inteiro)."""
+        if self.query_cache is None:
+            return
+        if table:
+            await asyncio.to_thread(self.query_cache.invalidate, table=table)
+        else:
+            await asyncio.to_thread(self.query_cache.clear)
+
+    def get_pool_stats(self) -> Dict[str, Any]:
+        return {
+            "requests": self._requests,
+            "retries": self._retries,
+            "max_concurrency": self.max_concurrency,
+            "pool_maxsize": self.config.pool_maxsize,
+        }
+
+    def get_token_stats(self) -> Dict[str, Any]:
+        """Refreshes feitos, tokens reaproveitados do arquivo e tempo restante do token atual."""
+        return self.tokens.stats()
+
+    async def aclose(self):
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+        if self._owns_tokens:
+            self.tokens.close()
+
+
+# Instância global para as variantes assíncronas das ferramentas
+# (mesmo token do cliente síncrono: um refresh proativo e um TokenStore para os dois)
+sankhya_async = AsyncSankhyaGatewayClient(tokens=sankhya.tokens)
@@ -0,0 +1,40 @@
+-- Query: Snapshot da Matriz de Giro (TGFGIR) para o armazenamento local
+-- Uma linha por (CODEMP, CODPROD) do relatório, com os atributos de produto/grupo
+-- usados pelas análises e um hash da linha para a sincronização por diferença:
+-- a sincronização lê só (CODEMP, CODPROD, ROW_HASH) e busca de novo apenas os
+-- produtos cujo hash mudou.
+-- :CODREL -> código do relatório de giro
+
+SELECT
+    G.CODEMP,
+    G.CODPROD,
+    P.DESCRPROD,
+    P.CODGRUPOPROD,
+    P.MARCA,
+    GRU.AD_CATMACRO AS MACRO_GRUPO,
+    GRU.DESCRGRUPOPROD AS GRUPO,
+    G.SUGCOMPRA,
+    G.SUGCOMPRAGIR,
+    G.CUSTOGER,
+    G.ESTMIN,
+    G.ESTMAX,
+    G.GIRODIARIO,
+    G.ESTOQUE,
+    G.LEADTIME,
+    G.ULTVENDA,
+    G.CODVOL,
+    G.CODVOLCOMPRA,
+    G.DUREST,
+    G.DIASSEMVENDA,
+    ORA_HASH(
+        G.SUGCOMPRA || '|' || G.SUGCOMPRAGIR || '|' || G.CUSTOGER || '|' || G.ESTMIN || '|' ||
+        G.ESTMAX || '|' || G.GIRODIARIO || '|' || G.ESTOQUE || '|' || G.LEADTIME || '|' ||
+        TO_CHAR(G.ULTVENDA, 'YYYYMMDDHH24MISS') || '|' || G.CODVOL || '|' || G.CODVOLCOMPRA || '|' ||
+        G.DUREST || '|' || G.DIASSEMVENDA || '|' || P.DESCRPROD || '|' || P.CODGRUPOPROD || '|' ||
+        P.MARCA || '|' || GRU.AD_CATMACRO || '|' || GRU.DESCRGRUPOPROD
+    ) AS ROW_HASH
+FROM TGFGIR G
+JOIN TGFPRO P ON G.CODPROD = P.CODPROD
+LEFT JOIN TGFGRU GRU ON P.CODGRUPOPROD = GRU.CODGRUPOPROD
+WHERE G.CODREL = :CODREL
+  AND G.CODEMP IN (1, 5)
@@ -0,0 +1,149 @@
+-- Query: Effective Lead Time para TODOS os pares produto/fornecedor (uma execução)
+-- Mesmas fontes de queries_leadtime_effective_bulk.sql, sem listas de produtos/fornecedores.
+-- Os pares calculados são os de pedidos de compra liberados nos últimos 12 meses (mesma
+-- janela/regra do fornecedor principal do radar), devolvidos como FONTE = 'PAR'.
+-- Demais linhas (coluna FONTE):
+--   HISTORICO -> por (CODPARC, CODPROD)
+--   CATEGORIA -> por (CODPARC, CODGRUPOPROD)
+--   ESTATICO  -> por CODPROD (TGFGIR), só produtos dos pares
+--   GRUPO     -> CODGRUPOPROD de cada produto dos pares
+-- A cascata Histórico → Categoria → Estático → Default (30d) é aplicada em memória pelo adapter,
+-- e o resultado vai para o cache local (services/leadtime_cache.py).
+
+WITH PairList AS (
+    SELECT DISTINCT
+        CAB.CODPARC,
+        ITE.CODPROD
+    FROM TGFITE ITE
+    JOIN TGFCAB CAB ON ITE.NUNOTA = CAB.NUNOTA
+    WHERE CAB.TIPMOV = 'O'
+      AND CAB.STATUSNOTA = 'L'
+      AND CAB.DTNEG >= ADD_MONTHS(SYSDATE, -12)
+),
+PairProducts AS (
+    SELECT DISTINCT CODPROD FROM PairList
+),
+PurchaseOrderDates AS (
+    SELECT
+        CAB.NUNOTA AS NUNOTA_COMPRA,
+        CAB.CODPARC,
+        CAB.DTNEG AS DATA_PEDIDO,
+        ITE.CODPROD
+    FROM TGFCAB CAB
+    JOIN TGFITE ITE ON CAB.NUNOTA = ITE.NUNOTA
+    WHERE CAB.TIPMOV = 'O'
+      AND CAB.STATUSNOTA = 'L'
+      AND CAB.CODTIPOPER IN (200, 227)
+      AND CAB.DTNEG >= ADD_MONTHS(SYSDATE, -6)
+      AND (CAB.CODPARC, ITE.CODPROD) IN (SELECT CODPARC, CODPROD FROM PairList)
+),
+InvoiceReceipts AS (
+    SELECT
+        VAR.NUNOTAORIG AS NUNOTA_COMPRA,
+        VAR.CODPROD,
+        CAB_INV.DTENTSAI AS DATA_RECEBIMENTO
+    FROM TGFVAR VAR
+    JOIN TGFCAB CAB_INV ON VAR.NUNOTA = CAB_INV.NUNOTA
+    WHERE CAB_INV.TIPMOV = 'C'
+      AND CAB_INV.STATUSNOTA = 'L'
+      AND CAB_INV.DTENTSAI IS NOT NULL
+      AND VAR.NUNOTAORIG IS NOT NULL
+      AND CAB_INV.DTENTSAI >= ADD_MONTHS(SYSDATE, -6)
+),
+LeadTimeCalculations AS (
+    SELECT
+        PO.CODPARC,
+        PO.CODPROD,
+        (IR.DATA_RECEBIMENTO - PO.DATA_PEDIDO) AS LEADTIME_DIAS,
+        CASE
+            WHEN IR.DATA_RECEBIMENTO >= ADD_MONTHS(SYSDATE, -3) THEN 0.7
+            ELSE 0.3
+        END AS PESO_TEMPORAL
+    FROM PurchaseOrderDates PO
+    JOIN InvoiceReceipts IR
+        ON PO.NUNOTA_COMPRA = IR.NUNOTA_COMPRA
+        AND PO.CODPROD = IR.CODPROD
+    WHERE (IR.DATA_RECEBIMENTO - PO.DATA_PEDIDO) BETWEEN 0 AND 180
+),
+HistoricalLeadTime AS (
+    -- Priority 1: Lead time histórico produto-fornecedor (mínimo 2 entregas)
+    SELECT
+        CODPARC,
+        CODPROD,
+        ROUND(SUM(LEADTIME_DIAS * PESO_TEMPORAL) / SUM(PESO_TEMPORAL), 1) AS LEADTIME
+    FROM LeadTimeCalculations
+    GROUP BY CODPARC, CODPROD
+    HAVING COUNT(*) >= 2
+),
+CategoryPO AS (
+    SELECT
+        CAB.NUNOTA AS NUNOTA_COMPRA,
+        CAB.CODPARC,
+        CAB.DTNEG AS DATA_PEDIDO,
+        ITE.CODPROD
+    FROM TGFCAB CAB
+    JOIN TGFITE ITE ON CAB.NUNOTA = ITE.NUNOTA
+    WHERE CAB.TIPMOV = 'O'
+      AND CAB.STATUSNOTA = 'L'
+      AND CAB.DTNEG >= ADD_MONTHS(SYSDATE, -6)
+      AND CAB.CODPARC IN (SELECT CODPARC FROM PairList)
+),
+CategoryIR AS (
+    SELECT
+        VAR.NUNOTAORIG AS NUNOTA_COMPRA,
+        VAR.CODPROD,
+        CAB_INV.DTENTSAI AS DATA_RECEBIMENTO
+    FROM TGFVAR VAR
+    JOIN TGFCAB CAB_INV ON VAR.NUNOTA = CAB_INV.NUNOTA
+    WHERE CAB_INV.TIPMOV = 'C'
+      AND CAB_INV.STATUSNOTA = 'L'
+      AND CAB_INV.DTENTSAI IS NOT NULL
+      AND VAR.NUNOTAORIG IS NOT NULL
+),
+CategoryHistory AS (
+    SELECT
+        PO.CODPARC,
+        PO.CODPROD,
+        ROUND(AVG(IR.DATA_RECEBIMENTO - PO.DATA_PEDIDO), 1) AS LEADTIME_PONDERADO
+    FROM CategoryPO PO
+    JOIN CategoryIR IR ON PO.NUNOTA_COMPRA = IR.NUNOTA_COMPRA AND PO.CODPROD = IR.CODPROD
+    WHERE (IR.DATA_RECEBIMENTO - PO.DATA_PEDIDO) BETWEEN 0 AND 180
+    GROUP BY PO.CODPARC, PO.CODPROD
+    HAVING COUNT(*) >= 2
+),
+SupplierCategoryAvg AS (
+    -- Priority 2: Média da categoria de produtos do fornecedor (mínimo 3 produtos)
+    SELECT
+        H.CODPARC,
+        P.CODGRUPOPROD,
+        ROUND(AVG(H.LEADTIME_PONDERADO), 1) AS LEADTIME
+    FROM CategoryHistory H
+    JOIN TGFPRO P ON H.CODPROD = P.CODPROD
+    GROUP BY H.CODPARC, P.CODGRUPOPROD
+    HAVING COUNT(DISTINCT H.CODPROD) >= 3
+),
+StaticGIR AS (
+    -- Priority 3: Valor estático do TGFGIR
+    SELECT
+        G.CODPROD,
+        MAX(G.LEADTIME) AS LEADTIME
+    FROM TGFGIR G
+    WHERE G.CODPROD IN (SELECT CODPROD FROM PairProducts)
+      AND G.CODEMP IN (1, 5)
+    GROUP BY G.CODPROD
+)
+SELECT 'HISTORICO' AS FONTE, CODPARC, CODPROD, NULL AS CODGRUPOPROD, LEADTIME
+FROM HistoricalLeadTime
+UNION ALL
+SELECT 'CATEGORIA' AS FONTE, CODPARC, NULL AS CODPROD, CODGRUPOPROD, LEADTIME
+FROM SupplierCategoryAvg
+UNION ALL
+SELECT 'ESTATICO' AS FONTE, NULL AS CODPARC, CODPROD, NULL AS CODGRUPOPROD, LEADTIME
+FROM StaticGIR
+UNION ALL
+SELECT 'GRUPO' AS FONTE, NULL AS CODPARC, CODPROD, CODGRUPOPROD, NULL AS LEADTIME
+FROM TGFPRO
+WHERE CODPROD IN (SELECT CODPROD FROM PairProducts)
+UNION ALL
+SELECT 'PAR' AS FONTE, CODPARC, CODPROD, NULL AS CODGRUPOPROD, NULL AS LEADTIME
+FROM PairList
@@ -0,0 +1,13 @@
+-- Query: Gasto Acumulado no Mês por Fornecedor
+-- Versão agregada do gasto usado no HARD CAP de orçamento (validate_purchase_against_budget).
+-- Uma única execução retorna o gasto de todos os fornecedores com pedidos no mês corrente.
+
+SELECT
+    CAB.CODPARC,
+    SUM(ITE.VLRTOT) AS GASTO_ACUMULADO
+FROM TGFCAB CAB
+JOIN TGFITE ITE ON CAB.NUNOTA = ITE.NUNOTA
+WHERE CAB.TIPMOV = 'O'
+  AND CAB.STATUSNOTA = 'L'
+  AND CAB.DTNEG >= TRUNC(SYSDATE, 'MM')
+GROUP BY CAB.CODPARC
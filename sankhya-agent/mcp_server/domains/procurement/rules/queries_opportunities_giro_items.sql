@@ -0,0 +1,15 @@
+-- Query: Sugestões de Compra por Produto (base das oportunidades por fornecedor)
+-- Mesmos filtros de queries_opportunities_by_supplier.sql, sem o join com o histórico
+-- de compras: o fornecedor principal vem do índice local (services/supplier_index.py)
+-- e o agrupamento por fornecedor é feito em memória.
+-- :CODREL -> código do relatório de giro
+
+SELECT
+    G.CODPROD,
+    SUM(G.SUGCOMPRA * G.CUSTOGER) AS VLR_SUGESTAO,
+    MAX(CASE WHEN G.ESTOQUE = 0 THEN 1 ELSE 0 END) AS RUPTURA
+FROM TGFGIR G
+WHERE G.CODREL = :CODREL
+  AND G.CODEMP IN (1, 5)
+  AND G.SUGCOMPRA > 0
+GROUP BY G.CODPROD
@@ -0,0 +1,24 @@
+-- Query: Fornecedor Principal em Lote (set-based)
+-- Mesma regra de ProcurementRadar._get_primary_supplier (maior volume comprado na janela),
+-- porém para uma lista de produtos em uma única execução.
+-- :LISTA_CODPROD  -> lista de CODPROD (máx. 1000 itens por execução - limite Oracle)
+-- :MESES_HISTORICO -> janela de histórico em meses
+
+SELECT CODPROD, CODPARC, NOMEPARC
+FROM (
+    SELECT
+        ITE.CODPROD,
+        CAB.CODPARC,
+        PAR.NOMEPARC,
+        SUM(ITE.QTDNEG) AS VOLUME,
+        ROW_NUMBER() OVER (PARTITION BY ITE.CODPROD ORDER BY SUM(ITE.QTDNEG) DESC) AS RN
+    FROM TGFITE ITE
+    JOIN TGFCAB CAB ON ITE.NUNOTA = CAB.NUNOTA
+    JOIN TGFPAR PAR ON CAB.CODPARC = PAR.CODPARC
+    WHERE CAB.TIPMOV = 'O'
+      AND CAB.STATUSNOTA = 'L'
+      AND ITE.CODPROD IN (:LISTA_CODPROD)
+      AND CAB.DTNEG >= ADD_MONTHS(SYSDATE, -:MESES_HISTORICO)
+    GROUP BY CAB.CODPARC, PAR.NOMEPARC, ITE.CODPROD
+)
+WHERE RN = 1
@@ -0,0 +1,21 @@
+-- Query: Linhas do Histórico de Compras (fonte do índice local de fornecedor principal)
+-- Uma linha por pedido de compra (TIPMOV='O') e produto, com a data de alteração do
+-- cabeçalho como watermark da atualização incremental.
+-- Pedidos não liberados também vêm, para que o índice remova notas canceladas/estornadas.
+-- :DTALTER_DESDE -> watermark 'YYYY-MM-DD HH24:MI:SS' (NULL = histórico completo)
+
+SELECT
+    CAB.NUNOTA,
+    CAB.CODPARC,
+    PAR.NOMEPARC,
+    CAB.STATUSNOTA,
+    TO_CHAR(CAB.DTNEG, 'YYYY-MM-DD') AS DTNEG,
+    TO_CHAR(CAB.DTALTER, 'YYYY-MM-DD HH24:MI:SS') AS DTALTER,
+    ITE.CODPROD,
+    SUM(ITE.QTDNEG) AS QTDNEG
+FROM TGFCAB CAB
+JOIN TGFITE ITE ON ITE.NUNOTA = CAB.NUNOTA
+JOIN TGFPAR PAR ON CAB.CODPARC = PAR.CODPARC
+WHERE CAB.TIPMOV = 'O'
+  AND (:DTALTER_DESDE IS NULL OR CAB.DTALTER >= TO_DATE(:DTALTER_DESDE, 'YYYY-MM-DD HH24:MI:SS'))
+GROUP BY CAB.NUNOTA, CAB.CODPARC, PAR.NOMEPARC, CAB.STATUSNOTA, CAB.DTNEG, CAB.DTALTER, ITE.CODPROD
@@ -0,0 +1,26 @@
+-- Query: Giro Detalhado de uma Lista de Produtos (itens de um fornecedor)
+-- Mesmo agregado de get_supplier_items (estoque e sugestão somados das empresas 1 e 5),
+-- para os produtos cujo fornecedor principal já foi resolvido pelo índice local.
+-- :LISTA_CODPROD -> lista de CODPROD (máx. 1000 itens por execução - limite Oracle)
+-- :CODREL        -> código do relatório de giro
+
+SELECT
+    G.CODPROD,
+    MAX(P.DESCRPROD) AS DESCRPROD,
+    MAX(P.CODGRUPOPROD) AS CODGRUPOPROD,
+    MAX(P.MARCA) AS MARCA,
+    SUM(G.SUGCOMPRA) AS SUGCOMPRA,
+    MAX(G.CUSTOGER) AS CUSTOGER,
+    SUM(G.GIRODIARIO) AS GIRODIARIO,
+    SUM(G.ESTOQUE) AS ESTOQUE,
+    SUM(G.ESTMIN) AS ESTMIN,
+    MAX(G.LEADTIME) AS LEADTIME,
+    MAX(G.ULTVENDA) AS ULTVENDA
+FROM TGFGIR G
+JOIN TGFPRO P ON G.CODPROD = P.CODPROD
+WHERE G.CODREL = :CODREL
+  AND G.CODPROD IN (:LISTA_CODPROD)
+  AND G.CODEMP IN (1, 5)
+GROUP BY G.CODPROD
+HAVING SUM(G.SUGCOMPRA) > 0
+ORDER BY MAX(P.MARCA), MAX(P.DESCRPROD) ASC
@@ -0,0 +1,114 @@
+"""
+Snapshot do orçamento de compras (CMV Budget Control).
+
+O HARD CAP por fornecedor depende de três dados caros de buscar: o CMV do mês
+anterior, a alocação por fornecedor (queries_budget_allocation.sql) e o gasto
+acumulado no mês. O snapshot carrega tudo uma única vez (por execução ou por TTL)
+e passa a responder a validação em memória, somando ao gasto as compras aprovadas
+durante a mesma execução.
+"""
+import time
+import logging
+import threading
+from typing import Dict, Any, Iterable, Tuple
+
+logger = logging.getLogger("procurement-budget-snapshot")
+
+# TTL padrão do snapshot quando business_rules.yaml não define budget_control.snapshot_ttl_seconds
+DEFAULT_SNAPSHOT_TTL = 300
+
+
+def build_budget_check(orcamento_fornecedor: float, gasto_acumulado: float, valor_compra: float) -> Dict[str, Any]:
+    """Aplica o HARD CAP sobre valores já carregados (sem acesso ao Gateway)."""
+    disponivel = orcamento_fornecedor - gasto_acumulado
+    aprovado = (valor_compra <= disponivel)
+    percentual_utilizado = ((gasto_acumulado + valor_compra) / orcamento_fornecedor * 100) if orcamento_fornecedor > 0 else 0
+
+    return {
+        "aprovado": aprovado,
+        "orcamento_alocado": round(orcamento_fornecedor, 2),
+        "gasto_acumulado": round(gasto_acumulado, 2),
+        "orcamento_disponivel": round(disponivel, 2),
+        "valor_solicitado": round(valor_compra, 2),
+        "percentual_utilizado": round(percentual_utilizado, 1),
+        "mensagem": (
+            f"✅ APROVADO: R$ {valor_compra:,.2f} dentro do limite (disponível: R$ {disponivel:,.2f})"
+            if aprovado else
+            f"❌ BLOQUEADO: R$ {valor_compra:,.2f} excede orçamento de R$ {disponivel:,.2f}"
+        )
+    }
+
+
+class BudgetSnapshot:
+    """
+    Foto do orçamento do mês: alocação por fornecedor + gasto acumulado.
+
+    - `check()` valida uma compra sem ir ao Gateway.
+    - `register_purchase()` soma uma compra aprovada ao gasto, para que as
+      próximas validações da mesma execução enxerguem o saldo já comprometido.
+    """
+
+    def __init__(
+        self,
+        allocations: Dict[int, float],
+        spend: Dict[int, float],
+        reserva_exploracao: float,
+        orcamento_global: float = 0.0,
+        ttl_seconds: float = DEFAULT_SNAPSHOT_TTL,
+    ):
+        self.allocations = allocations
+        self.spend = dict(spend)
+        self.reserva_exploracao = reserva_exploracao
+        self.orcamento_global = orcamento_global
+        self.ttl_seconds = ttl_seconds
+        self.loaded_at = time.time()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, service, growth_factor: float = 0.20, ttl_seconds: float = DEFAULT_SNAPSHOT_TTL) -> "BudgetSnapshot":
+        """Carrega o snapshot com 3 queries: CMV, alocação por fornecedor e gasto do mês."""
+        budget_data = service.calculate_purchase_budget_allocation(growth_factor=growth_factor)
+        allocations = {
+            int(a["CODPARC"]): float(a["ORCAMENTO_ALOCADO"])
+            for a in budget_data["alocacao_fornecedores"]
+        }
+        snapshot = cls(
+            allocations=allocations,
+            spend=service.get_month_to_date_spend(),
+            reserva_exploracao=budget_data["reserva_exploracao"],
+            orcamento_global=budget_data["orcamento_global"],
+            ttl_seconds=ttl_seconds,
+        )
+        logger.info(
+            f"Snapshot de orçamento carregado: {len(allocations)} fornecedores, "
+            f"global R$ {snapshot.orcamento_global:,.2f}"
+        )
+        return snapshot
+
+    def is_expired(self) -> bool:
+        return self.ttl_seconds is not None and (time.time() - self.loaded_at) >= self.ttl_seconds
+
+    def allocation_for(self, codparc: int) -> float:
+        """Orçamento do fornecedor; sem alocação cai na reserva de exploração."""
+        return self.allocations.get(int(codparc), self.reserva_exploracao)
+
+    def spent(self, codparc: int) -> float:
+        with self._lock:
+            return self.spend.get(int(codparc), 0.0)
+
+    def check(self, codparc: int, valor_compra: float) -> Dict[str, Any]:
+        """HARD CAP em memória (mesmo retorno de validate_purchase_against_budget)."""
+        return build_budget_check(self.allocation_for(codparc), self.spent(codparc), valor_compra)
+
+    def register_purchase(self, codparc: int, valor_compra: float):
+        """Soma uma compra aprovada ao gasto acumulado do fornecedor."""
+        with self._lock:
+            codparc = int(codparc)
+            self.spend[codparc] = self.spend.get(codparc, 0.0) + float(valor_compra)
+
+    def register_purchases(self, purchases: Iterable[Tuple[int, float]]):
+        """Registra várias compras aprovadas (CODPARC, valor) na ordem em que foram aprovadas."""
+        with self._lock:
+            for codparc, valor_compra in purchases:
+                codparc = int(codparc)
+                self.spend[codparc] = self.spend.get(codparc, 0.0) + float(valor_compra)
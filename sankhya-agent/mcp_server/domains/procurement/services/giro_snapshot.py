@@ -0,0 +1,270 @@
+"""
+Snapshot local da Matriz de Giro (TGFGIR) por CODREL.
+
+get_giro_data, get_full_category_analysis, get_group_stock_summary,
+get_supplier_items e get_opportunities puxavam fatias grandes da TGFGIR do
+relatório 2535 a cada chamada, e cada script de relatório repetia isso.
+
+Aqui a TGFGIR (empresas 1 e 5, com atributos de produto e grupo) fica num
+arquivo Parquet (exige pyarrow) com o instante da geração. A sincronização é por diferença: lê do ERP só
+(CODEMP, CODPROD, ROW_HASH), compara com o snapshot e busca de novo apenas os
+produtos novos/alterados, descartando as chaves que sumiram. As agregações das
+análises (marca, macro grupo, grupo, fornecedor) rodam em pandas sobre o snapshot.
+"""
+import os
+import json
+import time
+import logging
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import pandas as pd
+
+logger = logging.getLogger("procurement-giro-snapshot")
+
+SNAPSHOT_FORMAT = "parquet"
+
+KEY_COLUMNS = ["CODEMP", "CODPROD"]
+
+# Colunas de queries_giro_direct.sql (formato de get_giro_data)
+GIRO_DIRECT_COLUMNS = [
+    "CODPROD", "DESCRPROD", "CODGRUPOPROD", "CODEMP", "SUGCOMPRA", "SUGCOMPRAGIR", "ESTMIN", "ESTMAX",
+    "GIRODIARIO", "ESTOQUE", "LEADTIME", "ULTVENDA", "CODVOL", "CODVOLCOMPRA", "DUREST", "DIASSEMVENDA",
+]
+
+
+def _records(df: pd.DataFrame) -> List[Dict[str, Any]]:
+    """DataFrame → List[Dict] com None no lugar de NaN (mesmo formato do execute_query)."""
+    if df.empty:
+        return []
+    return df.astype(object).where(df.notna(), None).to_dict("records")
+
+
+def _sum(series: pd.Series):
+    # SUM do Oracle: NULL se todos forem NULL
+    return series.sum(min_count=1)
+
+
+class GiroSnapshot:
+    """Um snapshot carregado da TGFGIR e as agregações que as análises precisavam do ERP."""
+
+    def __init__(self, codrel: int, frame: pd.DataFrame, generated_at: float):
+        self.codrel = codrel
+        self.frame = frame
+        self.generated_at = generated_at
+
+    @property
+    def age_seconds(self) -> float:
+        return time.time() - self.generated_at
+
+    def __len__(self) -> int:
+        return len(self.frame)
+
+    def giro_rows(self) -> List[Dict[str, Any]]:
+        """Linhas no formato de queries_giro_direct.sql, na ordem da leitura paginada."""
+        df = self.frame.sort_values(["SUGCOMPRA", "CODPROD", "CODEMP"], ascending=[False, True, True], kind="stable")
+        return _records(df[GIRO_DIRECT_COLUMNS])
+
+    def _per_product(self, df: pd.DataFrame, sums: List[str], maxes: List[str]) -> pd.DataFrame:
+        """GROUP BY CODPROD com SUM/MAX no estilo Oracle (nulos ignorados)."""
+        if df.empty:
+            return pd.DataFrame(columns=["CODPROD"] + maxes + sums)
+        grouped = df.groupby("CODPROD", sort=False)
+        result = pd.concat(
+            [grouped[maxes].max()] + [grouped[c].agg(_sum) for c in sums],
+            axis=1,
+        ).reset_index()
+        return result
+
+    def category_analysis(self, target_type: str, target_value: str) -> List[Dict[str, Any]]:
+        """Mesmo resultado de get_full_category_analysis (MARCA, MACRO_GRUPO ou GRUPO)."""
+        df = self.frame[self.frame["GRUPO"].notna()]   # JOIN TGFGRU da query original
+        if target_type == "MARCA":
+            df = df[df["MARCA"] == target_value]
+        elif target_type == "MACRO_GRUPO":
+            df = df[df["MACRO_GRUPO"] == target_value]
+        elif target_type == "GRUPO":
+            df = df[df["GRUPO"].astype(str).str.contains(str(target_value), regex=False)]
+
+        result = self._per_product(
+            df,
+            sums=["SUGCOMPRA", "GIRODIARIO", "ESTOQUE"],
+            maxes=["DESCRPROD", "MARCA", "MACRO_GRUPO", "GRUPO", "CUSTOGER", "LEADTIME"],
+        )
+        result = result.sort_values(["DESCRPROD", "CODPROD"], kind="stable")
+        columns = ["CODPROD", "DESCRPROD", "MARCA", "MACRO_GRUPO", "GRUPO", "SUGCOMPRA",
+                   "CUSTOGER", "GIRODIARIO", "ESTOQUE", "LEADTIME"]
+        return _records(result[columns])
+
+    def group_stock(self) -> Dict[int, float]:
+        """Estoque total por CODGRUPOPROD (get_group_stock_summary)."""
+        totals = self.frame.groupby("CODGRUPOPROD", dropna=False)["ESTOQUE"].agg(_sum)
+        return {
+            (int(group) if pd.notna(group) else None): float(total)
+            for group, total in totals.items() if pd.notna(total)
+        }
+
+    def supplier_items(self, codprods: Iterable[int]) -> List[Dict[str, Any]]:
+        """Itens com sugestão > 0 de uma lista de produtos (get_supplier_items)."""
+        df = self.frame[self.frame["CODPROD"].isin([int(c) for c in codprods])]
+        result = self._per_product(
+            df,
+            sums=["SUGCOMPRA", "GIRODIARIO", "ESTOQUE", "ESTMIN"],
+            maxes=["DESCRPROD", "CODGRUPOPROD", "MARCA", "CUSTOGER", "LEADTIME", "ULTVENDA"],
+        )
+        result = result[result["SUGCOMPRA"].fillna(0) > 0]
+        # ORDER BY MARCA, DESCRPROD (nulos por último, como no Oracle)
+        result = result.sort_values(["MARCA", "DESCRPROD"], na_position="last", kind="stable")
+        columns = ["CODPROD", "DESCRPROD", "CODGRUPOPROD", "MARCA", "SUGCOMPRA", "CUSTOGER",
+                   "GIRODIARIO", "ESTOQUE", "ESTMIN", "LEADTIME", "ULTVENDA"]
+        return _records(result[columns])
+
+    def opportunity_values(self) -> Dict[int, Dict[str, Any]]:
+        """Valor sugerido e ruptura por produto (queries_opportunities_giro_items.sql)."""
+        df = self.frame[self.frame["SUGCOMPRA"].fillna(0) > 0]
+        if df.empty:
+            return {}
+        values = (df["SUGCOMPRA"] * df["CUSTOGER"]).groupby(df["CODPROD"]).agg(_sum)
+        ruptura = (df["ESTOQUE"] == 0).groupby(df["CODPROD"]).max()
+        return {
+            int(codprod): {
+                "VLR_SUGESTAO": float(values[codprod]) if pd.notna(values[codprod]) else None,
+                "RUPTURA": int(ruptura[codprod]),
+            }
+            for codprod in values.index
+        }
+
+
+class GiroSnapshotStore:
+    """
+    Arquivos de snapshot por CODREL + sincronização por diferença.
+
+    `fetch_keys(codrel)` devolve (CODEMP, CODPROD, ROW_HASH) de todas as linhas;
+    `fetch_rows(codrel, codprods)` devolve as linhas completas (codprods=None = todas).
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        fetch_keys: Callable[[int], Iterable[Dict[str, Any]]],
+        fetch_rows: Callable[[int, Optional[List[int]]], Iterable[Dict[str, Any]]],
+    ):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError as e:
+            raise ImportError(
+                "giro_snapshot exige o pacote pyarrow (pip install -r requirements.txt) "
+                "ou giro_snapshot.enabled: false em business_rules.yaml"
+            ) from e
+        self.directory = directory
+        self._fetch_keys = fetch_keys
+        self._fetch_rows = fetch_rows
+        self._lock = threading.Lock()
+        self._loaded: Dict[int, GiroSnapshot] = {}
+        self.last_sync: Dict[str, Any] = {}
+
+    def _paths(self, codrel: int):
+        base = os.path.join(self.directory, f"giro_{int(codrel)}")
+        return f"{base}.parquet", f"{base}.json"
+
+    # ------------------------------------------------------------------
+    # Persistência
+    # ------------------------------------------------------------------
+
+    def load(self, codrel: int) -> Optional[GiroSnapshot]:
+        """Snapshot em memória ou do disco (None se nunca foi gerado)."""
+        data_path, meta_path = self._paths(codrel)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        cached = self._loaded.get(codrel)
+        if cached is not None and cached.generated_at == meta.get("generated_at"):
+            return cached
+        try:
+            frame = pd.read_parquet(data_path)
+        except Exception as e:
+            logger.warning(f"Snapshot da TGFGIR ilegível ({data_path}): {e}")
+            return None
+        snapshot = GiroSnapshot(codrel, frame, float(meta["generated_at"]))
+        self._loaded[codrel] = snapshot
+        return snapshot
+
+    def _save(self, snapshot: GiroSnapshot, stats: Dict[str, Any]):
+        os.makedirs(self.directory, exist_ok=True)
+        data_path, meta_path = self._paths(snapshot.codrel)
+        tmp_data = f"{data_path}.{os.getpid()}.tmp"
+        snapshot.frame.to_parquet(tmp_data, index=False)
+        os.replace(tmp_data, data_path)
+
+        tmp_meta = f"{meta_path}.{os.getpid()}.tmp"
+        with open(tmp_meta, "w", encoding="utf-8") as f:
+            json.dump({"codrel": snapshot.codrel, "generated_at": snapshot.generated_at,
+                       "rows": len(snapshot), "format": SNAPSHOT_FORMAT, "last_sync": stats}, f)
+        os.replace(tmp_meta, meta_path)
+        self._loaded[snapshot.codrel] = snapshot
+
+    # ------------------------------------------------------------------
+    # Sincronização
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _frame(rows: Iterable[Dict[str, Any]]) -> pd.DataFrame:
+        frame = pd.DataFrame(list(rows))
+        if frame.empty:
+            return frame
+        for column in KEY_COLUMNS:
+            frame[column] = frame[column].astype("int64")
+        return frame
+
+    def sync(self, codrel: int) -> GiroSnapshot:
+        """Atualiza o snapshot: carga completa na primeira vez, depois só a diferença."""
+        with self._lock:
+            started = time.time()
+            current = self.load(codrel)
+            if current is None or current.frame.empty:
+                frame = self._frame(self._fetch_rows(codrel, None))
+                stats = {"mode": "full", "rows": len(frame)}
+            else:
+                frame, stats = self._apply_delta(codrel, current.frame)
+
+            if not frame.empty:
+                frame = frame.sort_values(KEY_COLUMNS, kind="stable").reset_index(drop=True)
+            snapshot = GiroSnapshot(codrel, frame, generated_at=started)
+            stats["seconds"] = round(time.time() - started, 3)
+            self._save(snapshot, stats)
+            self.last_sync = stats
+            logger.info(f"Snapshot TGFGIR {codrel} sincronizado: {stats}")
+            return snapshot
+
+    def _apply_delta(self, codrel: int, local: pd.DataFrame):
+        remote = self._frame(self._fetch_keys(codrel))
+        if remote.empty:
+            return remote, {"mode": "delta", "added": 0, "changed": 0, "removed": len(local)}
+
+        local_hash = local.set_index(KEY_COLUMNS)["ROW_HASH"]
+        remote_hash = remote.set_index(KEY_COLUMNS)["ROW_HASH"]
+
+        added = remote_hash.index.difference(local_hash.index)
+        removed = local_hash.index.difference(remote_hash.index)
+        common = remote_hash.index.intersection(local_hash.index)
+        changed = common[remote_hash.loc[common].values != local_hash.loc[common].values]
+
+        affected = sorted({int(codprod) for _, codprod in added.union(changed).union(removed)})
+        stats = {"mode": "delta", "added": len(added), "changed": len(changed),
+                 "removed": len(removed), "refetched_products": len(affected)}
+        if not affected:
+            return local, stats
+
+        kept = local[~local["CODPROD"].isin(affected)]
+        refetched = self._frame(self._fetch_rows(codrel, affected))
+        return pd.concat([kept, refetched], ignore_index=True) if not refetched.empty else kept, stats
+
+    def get(self, codrel: int, max_age_seconds: float, refresh: bool = False) -> GiroSnapshot:
+        """Snapshot com no máximo `max_age_seconds` (sincroniza a diferença se estiver velho)."""
+        snapshot = self.load(codrel)
+        if refresh or snapshot is None or snapshot.age_seconds >= max_age_seconds:
+            snapshot = self.sync(codrel)
+        return snapshot
@@ -0,0 +1,151 @@
+"""
+Cache local de lead time efetivo por par (CODPROD, CODPARC).
+
+queries_leadtime_effective.sql (CTEs sobre TGFCAB/TGFITE/TGFVAR) era executada
+uma vez por par pelo radar sequencial, e os relatórios recalculavam tudo a cada
+execução. Aqui o resultado da cascata Histórico → Categoria → Estático → Default
+fica num SQLite do domínio, uma linha por par com o instante do cálculo:
+
+- `refresh_all` grava o resultado da variante "todos os pares" (uma execução de
+  queries_leadtime_effective_all.sql) e marca o cache como completo;
+- `get_many` devolve os pares ainda dentro da validade; os que faltam são
+  calculados pelo adapter (lote por listas ou unitário) e gravados com `put_many`.
+"""
+import os
+import time
+import sqlite3
+import logging
+import threading
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+logger = logging.getLogger("procurement-leadtime-cache")
+
+Pair = Tuple[int, int]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS leadtimes (
+    CODPROD    INTEGER NOT NULL,
+    CODPARC    INTEGER NOT NULL,
+    LEADTIME   REAL NOT NULL,
+    FONTE      TEXT NOT NULL,
+    UPDATED_AT REAL NOT NULL,
+    PRIMARY KEY (CODPROD, CODPARC)
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# Fontes que vêm de entregas reais (mesma regra de "confiavel" do adapter)
+RELIABLE_SOURCES = ("HISTORICO", "CATEGORIA")
+
+
+def _entry(leadtime: float, fonte: str) -> Dict[str, Any]:
+    return {"leadtime_dias": leadtime, "fonte": fonte, "confiavel": fonte in RELIABLE_SOURCES}
+
+
+class LeadtimeCache:
+    """Lead time efetivo por par com carimbo de atualização (SQLite)."""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connect()
+        try:
+            with conn:
+                conn.executescript(_SCHEMA)
+        finally:
+            conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @property
+    def full_refresh_at(self) -> float:
+        """Instante (epoch) da última carga de todos os pares (0 = nunca)."""
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT value FROM meta WHERE key = 'full_refresh_at'").fetchone()
+        finally:
+            conn.close()
+        return float(row[0]) if row else 0.0
+
+    def get_many(self, pairs: Iterable[Pair], max_age_seconds: float) -> Dict[Pair, Dict[str, Any]]:
+        """Pares em cache com idade <= max_age_seconds (os demais ficam de fora)."""
+        wanted = {(int(p), int(f)) for p, f in pairs}
+        if not wanted:
+            return {}
+        cutoff = time.time() - max_age_seconds
+        found: Dict[Pair, Dict[str, Any]] = {}
+        conn = self._connect()
+        try:
+            # Tabela temporária evita o limite de variáveis do SQLite em listas grandes
+            conn.execute("CREATE TEMP TABLE IF NOT EXISTS wanted (CODPROD INTEGER, CODPARC INTEGER)")
+            conn.execute("DELETE FROM wanted")
+            conn.executemany("INSERT INTO wanted VALUES (?, ?)", wanted)
+            rows = conn.execute(
+                "SELECT L.CODPROD, L.CODPARC, L.LEADTIME, L.FONTE FROM leadtimes L "
+                "JOIN wanted W ON L.CODPROD = W.CODPROD AND L.CODPARC = W.CODPARC "
+                "WHERE L.UPDATED_AT >= ?",
+                (cutoff,),
+            )
+            for codprod, codparc, leadtime, fonte in rows:
+                found[(codprod, codparc)] = _entry(leadtime, fonte)
+        finally:
+            conn.close()
+
+        with self._lock:
+            self.hits += len(found)
+            self.misses += len(wanted) - len(found)
+        return found
+
+    def get(self, codprod: int, codparc: int, max_age_seconds: float) -> Optional[Dict[str, Any]]:
+        return self.get_many([(codprod, codparc)], max_age_seconds).get((int(codprod), int(codparc)))
+
+    def put_many(self, results: Dict[Pair, Dict[str, Any]], full: bool = False) -> int:
+        """
+        Grava os pares calculados. `full=True` substitui o cache inteiro (resultado de
+        todos os pares) e registra o instante da carga completa.
+        """
+        now = time.time()
+        rows = [
+            (int(p), int(f), float(r["leadtime_dias"]), str(r["fonte"]), now)
+            for (p, f), r in results.items()
+        ]
+        conn = self._connect()
+        try:
+            with conn:
+                if full:
+                    conn.execute("DELETE FROM leadtimes")
+                conn.executemany(
+                    "INSERT OR REPLACE INTO leadtimes (CODPROD, CODPARC, LEADTIME, FONTE, UPDATED_AT) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    rows,
+                )
+                if full:
+                    conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('full_refresh_at', ?)", (str(now),))
+        finally:
+            conn.close()
+        return len(rows)
+
+    def stats(self) -> Dict[str, Any]:
+        conn = self._connect()
+        try:
+            pares, = conn.execute("SELECT COUNT(*) FROM leadtimes").fetchone()
+        finally:
+            conn.close()
+        return {
+            "pares": pares,
+            "carga_completa_em": self.full_refresh_at or None,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
@@ -1,11 +1,75 @@
 import os
+import time
 import yaml
 import logging
-from typing import List, Dict, Any, Optional
+from datetime import date, timedelta
+from typing import List, Dict, Any, Optional, Iterable, Tuple
 from mcp_server.utils import sankhya
+from mcp_server.query_group import QueryGroup, QueryGroupResult
+from mcp_server.sql_binder import get_template
+from mcp_server.sql_registry import SqlTemplateRegistry
+from mcp_server.domains.procurement.services.budget_snapshot import BudgetSnapshot, build_budget_check, DEFAULT_SNAPSHOT_TTL
+from mcp_server.domains.procurement.services.supplier_index import PrimarySupplierIndex
+from mcp_server.domains.procurement.services.giro_snapshot import GiroSnapshot, GiroSnapshotStore
+from mcp_server.domains.procurement.services.leadtime_cache import LeadtimeCache
 
 logger = logging.getLogger("procurement-sankhya-service")
 
+# Oracle limita listas IN (...) a 1000 expressões (ORA-01795)
+MAX_IN_LIST = 1000
+
+
+def _chunked(values: List[Any], size: int = MAX_IN_LIST) -> Iterable[List[Any]]:
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
+
+def _format_in_list(values: Iterable[int]) -> str:
+    """Formata uma lista de inteiros para uso em IN (...)."""
+    return ", ".join(str(int(v)) for v in values)
+
+def _leadtime_cascade(pairs: List[Tuple[int, int]], rows: Iterable[Dict[str, Any]]) -> Dict[Tuple[int, int], Dict[str, Any]]:
+    """
+    Cascata Histórico → Categoria → Estático → Default (30d) sobre as linhas por FONTE
+    das queries de lead time em lote/todos os pares, para cada par (CODPROD, CODPARC).
+    """
+    historico: Dict[Tuple[int, int], float] = {}
+    categoria: Dict[Tuple[int, int], float] = {}
+    estatico: Dict[int, Optional[float]] = {}
+    grupos: Dict[int, int] = {}
+
+    for row in rows:
+        fonte = row.get("FONTE")
+        if fonte == "HISTORICO":
+            historico[(int(row["CODPARC"]), int(row["CODPROD"]))] = float(row["LEADTIME"])
+        elif fonte == "CATEGORIA":
+            categoria[(int(row["CODPARC"]), int(row["CODGRUPOPROD"]))] = float(row["LEADTIME"])
+        elif fonte == "ESTATICO":
+            estatico[int(row["CODPROD"])] = row.get("LEADTIME")
+        elif fonte == "GRUPO" and row.get("CODGRUPOPROD") is not None:
+            grupos[int(row["CODPROD"])] = int(row["CODGRUPOPROD"])
+
+    result = {}
+    for codprod, codparc in pairs:
+        grupo = grupos.get(codprod)
+        if (codparc, codprod) in historico:
+            leadtime, fonte = historico[(codparc, codprod)], "HISTORICO"
+        elif grupo is not None and (codparc, grupo) in categoria:
+            leadtime, fonte = categoria[(codparc, grupo)], "CATEGORIA"
+        elif codprod in estatico:
+            # Igual ao COALESCE da query unitária: TGFGIR sem LEADTIME cai no default
+            static_value = estatico[codprod]
+            leadtime, fonte = (float(static_value) if static_value is not None else 30.0), "ESTATICO"
+        else:
+            leadtime, fonte = 30.0, "DEFAULT"
+        result[(codprod, codparc)] = {
+            "leadtime_dias": leadtime,
+            "fonte": fonte,
+            "confiavel": fonte in ["HISTORICO", "CATEGORIA"]
+        }
+    return result
+
+
 class SankhyaProcurementService:
     """
     Serviço especializado para extração de dados do domínio de Compras.
@@ -16,6 +80,12 @@ class SankhyaProcurementService:
         self.domain_path = domain_path
         self.rules_path = os.path.join(domain_path, "rules")
         self.config = self._load_config()
+        # rules/*.sql lidos e tokenizados uma vez; recarrega só o arquivo cujo mtime mudar
+        self.sql_templates = SqlTemplateRegistry(self.rules_path)
+        self._budget_snapshot: Optional[BudgetSnapshot] = None
+        self._supplier_index: Optional[PrimarySupplierIndex] = None
+        self._giro_store: Optional[GiroSnapshotStore] = None
+        self._leadtime_cache: Optional[LeadtimeCache] = None
 
     def _load_config(self) -> Dict[str, Any]:
         config_file = os.path.join(self.rules_path, "business_rules.yaml")
@@ -25,33 +95,60 @@ class SankhyaProcurementService:
         return {}
 
     def _read_sql(self, filename: str) -> str:
-        filepath = os.path.join(self.rules_path, filename)
-        if os.path.exists(filepath):
-            with open(filepath, "r", encoding="utf-8") as f:
-                return f.read()
-        return ""
+        """SQL de rules/ a partir do registro pré-carregado (sem ir ao disco a cada chamada)."""
+        return self.sql_templates.text(filename)
+
+    def _bind_params(self, sql: str, params: Dict[str, Any]) -> str:
+        """SQL com os parâmetros nominais :PARAM embutidos como literais (template em cache)."""
+        return get_template(sql).render(params)
 
     def _execute_with_params(self, sql: str, params: Dict[str, Any]) -> List[Dict[str, Any]]:
-        """Substitui parâmetros nominais :PARAM por valores reais e executa."""
-        processed_sql = sql
-        for key, value in params.items():
-            placeholder = f":{key}"
-            if value is None:
-                processed_sql = processed_sql.replace(placeholder, "NULL")
-            elif isinstance(value, str):
-                # SQL Oracle básico: escapa aspas
-                safe_value = value.replace("'", "''")
-                processed_sql = processed_sql.replace(placeholder, f"'{safe_value}'")
-            else:
-                processed_sql = processed_sql.replace(placeholder, str(value))
-        
+        """
+        Executa com parâmetros nominais :PARAM (binds no Gateway quando suportado).
+        Parâmetro faltando levanta SqlParameterError antes da chamada (não vira []).
+        """
+        get_template(sql).validate(params)
         try:
-            return sankhya.execute_query(processed_sql)
+            return sankhya.execute_bound(sql, params)
         except Exception as e:
             logger.error(f"Erro ao executar query com parâmetros: {e}")
+            logger.debug(f"SQL Processado: {self._bind_params(sql, params)}")
+            return []
+
+    def _execute_paged_with_params(self, sql: str, params: Dict[str, Any], order_by: str, page_size: int = 5000) -> List[Dict[str, Any]]:
+        """
+        Como _execute_with_params, mas busca o resultado em páginas (janelas ROWNUM em paralelo).
+        Para varreduras grandes (TGFGIR) que estouram o timeout ou o limite de linhas do Gateway.
+        """
+        get_template(sql).validate(params)
+        processed_sql = self._bind_params(sql, params)
+        try:
+            return list(sankhya.execute_query_paged(processed_sql, order_by=order_by, page_size=page_size))
+        except Exception as e:
+            logger.error(f"Erro ao executar query paginada: {e}")
             logger.debug(f"SQL Processado: {processed_sql}")
             return []
 
+    def _execute_with_lists(self, sql: str, lists: Dict[str, Iterable[int]], params: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Expande listas :LISTA_* em IN (...) antes de aplicar os parâmetros escalares."""
+        get_template(sql).validate(params or {}, raw=lists.keys())
+        expanded = get_template(sql).expand({key: _format_in_list(values) or "NULL" for key, values in lists.items()})
+        return self._execute_with_params(expanded.sql, params or {})
+
+    def _run_queries(self, queries: Dict[str, Tuple[str, Dict[str, Any]]]) -> QueryGroupResult:
+        """
+        Executa queries independentes {nome: (sql, params)} em paralelo, com o teto de
+        concorrência e o prazo de `query_group` no business_rules.yaml. Diferente de
+        _execute_with_params, a falha de uma query volta em `errors` sem afetar as outras.
+        """
+        cfg = self.config.get("query_group", {}) or {}
+        group = QueryGroup(max_concurrency=cfg.get("max_concurrency"), deadline_seconds=cfg.get("deadline_seconds"))
+        for sql, params in queries.values():
+            get_template(sql).validate(params)
+        for name, (sql, params) in queries.items():
+            group.add(name, sankhya.execute_bound, sql, params)
+        return group.run()
+
     def get_abc_giro_data(self) -> List[Dict[str, Any]]:
         """Busca dados da tabela de Giro / Curva ABC."""
         sql = self._read_sql("queries_abc.sql")
@@ -85,6 +182,12 @@ class SankhyaProcurementService:
         }
         return self._execute_with_params(sql, params)
 
+    def get_popularity_data(self, dias: int = 90) -> List[Dict[str, Any]]:
+        """Demanda reprimida da janela móvel recente (consumida pelo Radar de Compras)."""
+        fin = date.today()
+        ini = fin - timedelta(days=dias)
+        return self.get_popularity_analysis(ini=ini.strftime("%d/%m/%Y"), fin=fin.strftime("%d/%m/%Y"))
+
     # Skill 1: Popularidade e Demanda Reprimida (Drilldown)
     def get_popularity_drilldown(self, codprod: int, ini: str, fin: str, empresa: Optional[str] = None) -> List[Dict[str, Any]]:
         """
@@ -134,10 +237,14 @@ class SankhyaProcurementService:
             "EMPRESA": empresa
         }
         
-        return {
-            "grupos": self._execute_with_params(sql_groups, params),
-            "produtos": self._execute_with_params(sql_products, params)
-        }
+        result = self._run_queries({
+            "grupos": (sql_groups, params),
+            "produtos": (sql_products, params),
+        })
+        summary = {"grupos": result.rows("grupos"), "produtos": result.rows("produtos")}
+        if result.errors:
+            summary["erros_consulta"] = result.error_list()
+        return summary
 
     # Skill 3: Equilíbrio Financeiro e Saúde do Capital de Giro
     def get_financial_procurement_balance(self, dias_horizonte: int = 30) -> Dict[str, Any]:
@@ -152,10 +259,17 @@ class SankhyaProcurementService:
 
         params = {"DIAS_HORIZONTE": dias_horizonte}
 
-        cash_flows = sankhya.execute_query(sql_cash)
-        flow_comparison = self._execute_with_params(sql_flow_comp, params)
-        inventory_valuation = sankhya.execute_query(sql_inventory)
-        sales_averages = sankhya.execute_query(sql_sales_avg)
+        # As quatro leituras são independentes: rodam em paralelo com prazo único
+        result = self._run_queries({
+            "caixa": (sql_cash, {}),
+            "fluxo_pagar_receber": (sql_flow_comp, params),
+            "valorizacao_estoque": (sql_inventory, {}),
+            "media_vendas": (sql_sales_avg, {}),
+        })
+        cash_flows = result.rows("caixa")
+        flow_comparison = result.rows("fluxo_pagar_receber")
+        inventory_valuation = result.rows("valorizacao_estoque")
+        sales_averages = result.rows("media_vendas")
 
         # Processamento de Fluxo Pagar vs Receber
         total_receber_prazo = sum(item.get("TOTAL", 0) for item in flow_comparison if "RECEBER" in item.get("TIPO", "") and item.get("STATUS_VENCIMENTO") == "NO_PRAZO")
@@ -170,7 +284,7 @@ class SankhyaProcurementService:
         pressao_compras = (total_apagar_prazo / total_receber_prazo) if total_receber_prazo > 0 else 0
         cobertura_estoque_meses = (total_estoque / media_venda_total) if media_venda_total > 0 else 0
 
-        return {
+        balance = {
             "saude_financeira": {
                 "total_disponivel_caixa": total_caixa,
                 "indice_apagar_vs_receber": round(pressao_compras, 2), # > 1 significa que estamos pagando mais que recebendo
@@ -186,6 +300,10 @@ class SankhyaProcurementService:
                 "insight": "Cuidado: muito caixa transformado em estoque" if cobertura_estoque_meses > 3 else "Giro saudável"
             }
         }
+        if result.errors:
+            # Indicadores calculados sem alguma das bases: sinaliza em vez de falhar o relatório
+            balance["erros_consulta"] = result.error_list()
+        return balance
 
     # Skill 4: Análise de Giro Direto
     def get_giro_data(self, codrel: int = 2535) -> List[Dict[str, Any]]:
@@ -194,11 +312,16 @@ class SankhyaProcurementService:
         Recupera as sugestões já calculadas pelo Sankhya na tabela TGFGIR,
         focando nas empresas 1 e 5.
         """
+        snapshot = self.get_giro_snapshot(codrel)
+        if snapshot is not None:
+            return snapshot.giro_rows()
+
         sql_giro = self._read_sql("queries_giro_direct.sql")
         params = {"CODREL": codrel}
 
         try:
-            return self._execute_with_params(sql_giro, params)
+            # Varredura da TGFGIR inteira: paginada, com desempate por produto/empresa
+            return self._execute_paged_with_params(sql_giro, params, order_by="SUGCOMPRA DESC, CODPROD, CODEMP")
         except Exception as e:
             logger.error(f"Erro ao buscar dados de Giro Direto para CODREL {codrel}: {e}")
             return []
@@ -209,6 +332,17 @@ class SankhyaProcurementService:
         Skill: Inteligência de Pacotes de Compra.
         Agrupa sugestões por Fornecedor (CODPARCFORN).
         """
+        index = self.get_supplier_index()
+        if index is not None:
+            # Fornecedor principal (24 meses) do índice local; o ERP só agrega a TGFGIR
+            snapshot = self.get_giro_snapshot(codrel)
+            if snapshot is not None:
+                values = snapshot.opportunity_values()
+            else:
+                rows = self._execute_with_params(self._read_sql("queries_opportunities_giro_items.sql"), {"CODREL": codrel})
+                values = {int(r["CODPROD"]): r for r in rows}
+            return index.group_by_supplier(values, meses=24)
+
         sql_ops = self._read_sql("queries_opportunities_by_supplier.sql")
         params = {"CODREL": codrel}
 
@@ -224,6 +358,20 @@ class SankhyaProcurementService:
         Busca itens de um fornecedor, AGREGANDO estoque e sugestão de todas as empresas (1 e 5).
         Evita mostrar 'Estoque Zero' se houver saldo em outra filial.
         """
+        index = self.get_supplier_index()
+        if index is not None:
+            codprods = index.products_of(codparc, meses=None)
+            snapshot = self.get_giro_snapshot(codrel)
+            if snapshot is not None:
+                return snapshot.supplier_items(codprods)
+            sql = self._read_sql("queries_supplier_items_by_products.sql")
+            items: List[Dict[str, Any]] = []
+            for chunk in _chunked(codprods):
+                items.extend(self._execute_with_lists(sql, {"LISTA_CODPROD": chunk}, {"CODREL": codrel}))
+            # Mesmo ORDER BY da query (MARCA, DESCRPROD; nulos por último) entre os lotes
+            items.sort(key=lambda r: (r.get("MARCA") is None, r.get("MARCA") or "", r.get("DESCRPROD") is None, r.get("DESCRPROD") or ""))
+            return items
+
         sql = """
             SELECT 
                 G.CODPROD,
@@ -270,6 +418,10 @@ class SankhyaProcurementService:
         Calcula agregado de estoque e venda para análise Buy/Hold/Sell.
         target_type: 'MARCA' ou 'MACRO_GRUPO'
         """
+        snapshot = self.get_giro_snapshot(codrel)
+        if snapshot is not None:
+            return snapshot.category_analysis(target_type, target_value)
+
         filter_clause = ""
         if target_type == 'MARCA':
             filter_clause = "AND P.MARCA = :TARGET"
@@ -300,7 +452,8 @@ class SankhyaProcurementService:
             ORDER BY MAX(P.DESCRPROD) ASC
         """
         params = {"CODREL": codrel, "TARGET": target_value}
-        return self._execute_with_params(sql, params)
+        # Categorias grandes (ex: macro grupo inteiro) são buscadas em páginas
+        return self._execute_paged_with_params(sql, params, order_by="DESCRPROD, CODPROD")
 
     # Skill 6: Contexto de Família (Agrupamento)
     def get_group_stock_summary(self, codrel: int = 2535) -> Dict[int, float]:
@@ -308,6 +461,10 @@ class SankhyaProcurementService:
         Retorna o estoque total consolidado por Grupo de Produtos (CODGRUPOPROD).
         Usado para identificar se há 'vazamento' de estoque em produtos similares.
         """
+        snapshot = self.get_giro_snapshot(codrel)
+        if snapshot is not None:
+            return snapshot.group_stock()
+
         sql = """
             SELECT 
                 P.CODGRUPOPROD, 
@@ -339,7 +496,7 @@ class SankhyaProcurementService:
             """
         else:
             sql = self._read_sql(self.config.get("alternatives", {}).get("custom_sql_path", "queries_alternatives.sql"))
-            sql = sql.replace(":CODPROD", str(codprod))
+            sql = self._bind_params(sql, {"CODPROD": codprod})
 
         try:
             rows = sankhya.execute_query(sql)
@@ -364,18 +521,218 @@ class SankhyaProcurementService:
         Lead time efetivo com estratégia de fallback.
         Priority: Histórico → Categoria → Estático → Default (30d)
         """
+        cache, max_age = self._leadtime_cache_and_age()
+        if cache is not None:
+            cached = cache.get(codprod, codparc, max_age)
+            if cached is not None:
+                return cached
+
         sql = self._read_sql("queries_leadtime_effective.sql")
         params = {"CODPROD": codprod, "CODPARC": codparc}
         results = self._execute_with_params(sql, params)
 
         if results:
-            return {
+            leadtime = {
                 "leadtime_dias": float(results[0]["LEADTIME_EFETIVO"]),
                 "fonte": results[0]["FONTE_LEADTIME"],
                 "confiavel": results[0]["FONTE_LEADTIME"] in ["HISTORICO", "CATEGORIA"]
             }
+            if cache is not None:
+                cache.put_many({(int(codprod), int(codparc)): leadtime})
+            return leadtime
         return {"leadtime_dias": 30, "fonte": "DEFAULT", "confiavel": False}
 
+    def get_effective_leadtimes(self, pairs: List[Tuple[int, int]]) -> Dict[Tuple[int, int], Dict[str, Any]]:
+        """
+        Versão em lote de get_effective_leadtime para pares (CODPROD, CODPARC).
+        Com o cache local ligado (leadtime_cache), os pares válidos vêm do SQLite; se a
+        carga de todos os pares estiver vencida ela é refeita antes (uma execução), e só
+        os pares que ainda faltarem vão para queries_leadtime_effective_bulk.sql.
+        """
+        unique_pairs = list(dict.fromkeys((int(p), int(f)) for p, f in pairs))
+        cache, max_age = self._leadtime_cache_and_age()
+        if cache is None:
+            return self._compute_leadtimes(unique_pairs)
+
+        if time.time() - cache.full_refresh_at >= max_age:
+            try:
+                self.refresh_all_leadtimes()
+            except Exception as e:
+                logger.warning(f"Falha na carga de lead time de todos os pares (seguindo por lote): {e}")
+
+        result = cache.get_many(unique_pairs, max_age)
+        missing = [pair for pair in unique_pairs if pair not in result]
+        if missing:
+            computed = self._compute_leadtimes(missing)
+            cache.put_many(computed)
+            result.update(computed)
+        return {pair: result[pair] for pair in unique_pairs}
+
+    def get_product_leadtimes(self, codprods: Iterable[int], meses: int = 12) -> Dict[int, Dict[str, Any]]:
+        """
+        Lead time efetivo por produto, com o fornecedor principal da janela (o mesmo par
+        usado pelo radar). Produtos sem fornecedor principal ficam de fora.
+        """
+        suppliers = self.get_primary_suppliers([int(c) for c in codprods], meses=meses)
+        pairs = [(codprod, int(s["CODPARC"])) for codprod, s in suppliers.items()]
+        leadtimes = self.get_effective_leadtimes(pairs)
+        return {codprod: leadtimes[(codprod, codparc)] for codprod, codparc in pairs}
+
+    def refresh_all_leadtimes(self) -> int:
+        """
+        Calcula o lead time efetivo de todos os pares com pedido de compra nos últimos
+        12 meses numa única execução (queries_leadtime_effective_all.sql, paginada) e
+        substitui o cache local. Retorna o nº de pares gravados.
+        """
+        cache, _ = self._leadtime_cache_and_age()
+        if cache is None:
+            return 0
+        sql = self._read_sql("queries_leadtime_effective_all.sql")
+        get_template(sql).validate({})
+        rows = list(sankhya.execute_query_paged(sql, order_by="FONTE, CODPARC, CODPROD, CODGRUPOPROD"))
+        pairs = [(int(r["CODPROD"]), int(r["CODPARC"])) for r in rows if r.get("FONTE") == "PAR"]
+        result = _leadtime_cascade(list(dict.fromkeys(pairs)), rows)
+        saved = cache.put_many(result, full=True)
+        logger.info(f"Lead time de todos os pares recalculado: {saved} pares no cache local.")
+        return saved
+
+    def _compute_leadtimes(self, unique_pairs: List[Tuple[int, int]]) -> Dict[Tuple[int, int], Dict[str, Any]]:
+        """
+        Executa queries_leadtime_effective_bulk.sql uma vez a cada 1000 produtos e aplica
+        a mesma cascata Histórico → Categoria → Estático → Default em memória.
+        """
+        sql = self._read_sql("queries_leadtime_effective_bulk.sql")
+        codprods = list(dict.fromkeys(p for p, _ in unique_pairs))
+        rows: List[Dict[str, Any]] = []
+        for chunk in _chunked(codprods):
+            chunk_set = set(chunk)
+            codparcs = sorted({f for p, f in unique_pairs if p in chunk_set})
+            rows.extend(self._execute_with_lists(sql, {"LISTA_CODPROD": chunk, "LISTA_CODPARC": codparcs}))
+        return _leadtime_cascade(unique_pairs, rows)
+
+    def _leadtime_cache_and_age(self) -> Tuple[Optional[LeadtimeCache], float]:
+        """Cache local de lead time (leadtime_cache em business_rules.yaml) e validade em segundos."""
+        cache_cfg = self.config.get("leadtime_cache", {}) or {}
+        max_age = float(cache_cfg.get("max_age_hours", 24)) * 3600
+        if not cache_cfg.get("enabled", False):
+            return None, max_age
+        if self._leadtime_cache is None:
+            db_path = cache_cfg.get("path", "knowledge/leadtime_cache.db")
+            if not os.path.isabs(db_path):
+                db_path = os.path.join(self.domain_path, db_path)
+            try:
+                self._leadtime_cache = LeadtimeCache(db_path)
+            except Exception as e:
+                logger.warning(f"Cache local de lead time indisponível: {e}")
+                return None, max_age
+        return self._leadtime_cache, max_age
+
+    def _fetch_purchase_lines(self, since: Optional[str]) -> Iterable[Dict[str, Any]]:
+        """Histórico de compras para o índice local (paginado; erros propagam)."""
+        sql = self._bind_params(self._read_sql("queries_purchase_history_lines.sql"), {"DTALTER_DESDE": since})
+        return sankhya.execute_query_paged(sql, order_by="NUNOTA, CODPROD")
+
+    def get_supplier_index(self) -> Optional[PrimarySupplierIndex]:
+        """
+        Índice local de fornecedor principal (supplier_index em business_rules.yaml).
+        Atualiza incrementalmente a cada `refresh_minutes`; devolve None se desligado ou se
+        ainda não foi possível construí-lo (os chamadores voltam para a query no ERP).
+        """
+        index_cfg = self.config.get("supplier_index", {}) or {}
+        if not index_cfg.get("enabled", False):
+            return None
+
+        try:
+            if self._supplier_index is None:
+                db_path = index_cfg.get("path", "knowledge/primary_supplier_index.db")
+                if not os.path.isabs(db_path):
+                    db_path = os.path.join(self.domain_path, db_path)
+                self._supplier_index = PrimarySupplierIndex(db_path, self._fetch_purchase_lines)
+            return self._supplier_index.ensure_fresh(
+                refresh_seconds=float(index_cfg.get("refresh_minutes", 30)) * 60,
+                full_rebuild_seconds=float(index_cfg.get("full_rebuild_days", 7)) * 86400,
+            )
+        except Exception as e:
+            if self._supplier_index is not None and self._supplier_index.is_built:
+                logger.warning(f"Falha ao atualizar o índice de fornecedor principal (usando o atual): {e}")
+                return self._supplier_index
+            logger.warning(f"Índice de fornecedor principal indisponível, consultando o ERP: {e}")
+            return None
+
+    def _fetch_giro_snapshot_rows(self, codrel: int, codprods: Optional[List[int]]) -> Iterable[Dict[str, Any]]:
+        """Linhas completas do snapshot da TGFGIR (todas, paginadas, ou só dos produtos alterados)."""
+        sql = self._bind_params(self._read_sql("queries_giro_snapshot.sql"), {"CODREL": codrel})
+        if codprods is None:
+            return sankhya.execute_query_paged(sql, order_by="CODPROD, CODEMP")
+        rows: List[Dict[str, Any]] = []
+        for chunk in _chunked(codprods):
+            rows.extend(sankhya.execute_query(
+                f"SELECT * FROM (\n{sql}\n) WHERE CODPROD IN ({_format_in_list(chunk)})", use_cache=False
+            ))
+        return rows
+
+    def _fetch_giro_snapshot_keys(self, codrel: int) -> Iterable[Dict[str, Any]]:
+        """Só as chaves e o hash de cada linha (leitura estreita para a diferença)."""
+        sql = self._bind_params(self._read_sql("queries_giro_snapshot.sql"), {"CODREL": codrel})
+        return sankhya.execute_query_paged(
+            f"SELECT CODEMP, CODPROD, ROW_HASH FROM (\n{sql}\n)", order_by="CODPROD, CODEMP"
+        )
+
+    def get_giro_snapshot(self, codrel: int = 2535, refresh: bool = False) -> Optional[GiroSnapshot]:
+        """
+        Snapshot local da TGFGIR do relatório (giro_snapshot em business_rules.yaml).
+        Sincroniza a diferença quando passa de `max_age_minutes`; devolve None se desligado
+        ou se nunca foi possível gerá-lo (os chamadores voltam para as queries no ERP).
+        """
+        snapshot_cfg = self.config.get("giro_snapshot", {}) or {}
+        if not snapshot_cfg.get("enabled", False):
+            return None
+
+        if self._giro_store is None:
+            directory = snapshot_cfg.get("path", "knowledge/giro_snapshot")
+            if not os.path.isabs(directory):
+                directory = os.path.join(self.domain_path, directory)
+            self._giro_store = GiroSnapshotStore(directory, self._fetch_giro_snapshot_keys, self._fetch_giro_snapshot_rows)
+
+        try:
+            return self._giro_store.get(
+                int(codrel), max_age_seconds=float(snapshot_cfg.get("max_age_minutes", 60)) * 60, refresh=refresh
+            )
+        except Exception as e:
+            stale = self._giro_store.load(int(codrel))
+            if stale is not None:
+                logger.warning(f"Falha ao sincronizar o snapshot da TGFGIR (usando o de {stale.age_seconds / 60:.0f} min atrás): {e}")
+                return stale
+            logger.warning(f"Snapshot da TGFGIR indisponível, consultando o ERP: {e}")
+            return None
+
+    def get_primary_suppliers(self, codprods: List[int], meses: int = 12) -> Dict[int, Dict[str, Any]]:
+        """
+        Fornecedor principal (maior volume comprado nos últimos `meses`) para vários produtos.
+        Com o índice local ligado, responde em memória; senão, uma execução a cada 1000 produtos.
+        """
+        index = self.get_supplier_index()
+        if index is not None:
+            return {
+                codprod: {"CODPARC": s["CODPARC"], "NOMEPARC": s["NOMEPARC"]}
+                for codprod, s in index.primary_suppliers(codprods, meses=meses).items()
+            }
+
+        sql = self._read_sql("queries_primary_supplier_bulk.sql")
+        suppliers: Dict[int, Dict[str, Any]] = {}
+        unique = list(dict.fromkeys(int(c) for c in codprods))
+        for chunk in _chunked(unique):
+            rows = self._execute_with_lists(sql, {"LISTA_CODPROD": chunk}, {"MESES_HISTORICO": int(meses)})
+            for row in rows:
+                suppliers[int(row["CODPROD"])] = {"CODPARC": row["CODPARC"], "NOMEPARC": row.get("NOMEPARC")}
+        return suppliers
+
+    def get_month_to_date_spend(self) -> Dict[int, float]:
+        """Gasto acumulado no mês corrente (pedidos de compra liberados) por fornecedor."""
+        sql = self._read_sql("queries_month_to_date_spend.sql")
+        rows = self._execute_with_params(sql, {})
+        return {int(r["CODPARC"]): float(r.get("GASTO_ACUMULADO") or 0) for r in rows}
+
     # === NOVOS MÉTODOS: CMV Budget Control ===
 
     def get_cmv_previous_month(self, codemp: Optional[int] = None) -> Dict[str, Any]:
@@ -451,9 +808,24 @@ class SankhyaProcurementService:
             "reserva_exploracao": round(budget_total * 0.05, 2)
         }
 
+    def get_budget_snapshot(self, refresh: bool = False) -> BudgetSnapshot:
+        """
+        Snapshot memoizado do orçamento (alocações + gasto do mês).
+        Recarrega quando expira o TTL (budget_control.snapshot_ttl_seconds) ou com refresh=True.
+        """
+        if refresh or self._budget_snapshot is None or self._budget_snapshot.is_expired():
+            budget_cfg = self.config.get("budget_control", {}) or {}
+            self._budget_snapshot = BudgetSnapshot.load(
+                self,
+                growth_factor=budget_cfg.get("growth_factor_annual", 0.20),
+                ttl_seconds=budget_cfg.get("snapshot_ttl_seconds", DEFAULT_SNAPSHOT_TTL),
+            )
+        return self._budget_snapshot
+
     def validate_purchase_against_budget(self, codparc: int, valor_compra: float) -> Dict[str, Any]:
         """
         HARD CAP: Valida se compra pode ser realizada dentro do orçamento alocado.
+        Usa o snapshot memoizado: só vai ao Gateway na primeira chamada ou após o TTL.
 
         Returns:
             {
@@ -463,42 +835,9 @@ class SankhyaProcurementService:
                 "mensagem": str
             }
         """
-        # 1. Buscar orçamento alocado do fornecedor
-        budget_data = self.calculate_purchase_budget_allocation()
-        supplier_allocations = {
-            int(a["CODPARC"]): float(a["ORCAMENTO_ALOCADO"])
-            for a in budget_data["alocacao_fornecedores"]
-        }
-
-        # 2. Buscar gastos acumulados no mês atual
-        sql_spent = """
-            SELECT SUM(ITE.VLRTOT) AS GASTO_ACUMULADO
-            FROM TGFCAB CAB
-            JOIN TGFITE ITE ON CAB.NUNOTA = ITE.NUNOTA
-            WHERE CAB.CODPARC = :CODPARC
-              AND CAB.TIPMOV = 'O'
-              AND CAB.STATUSNOTA = 'L'
-              AND CAB.DTNEG >= TRUNC(SYSDATE, 'MM')
-        """
-        spent_results = self._execute_with_params(sql_spent, {"CODPARC": codparc})
-        gasto_acumulado = float(spent_results[0].get("GASTO_ACUMULADO", 0)) if spent_results else 0
-
-        # 3. Calcular disponível
-        orcamento_fornecedor = supplier_allocations.get(codparc, budget_data["reserva_exploracao"])
-        disponivel = orcamento_fornecedor - gasto_acumulado
-        aprovado = (valor_compra <= disponivel)
-        percentual_utilizado = ((gasto_acumulado + valor_compra) / orcamento_fornecedor * 100) if orcamento_fornecedor > 0 else 0
+        return self.get_budget_snapshot().check(codparc, valor_compra)
 
-        return {
-            "aprovado": aprovado,
-            "orcamento_alocado": round(orcamento_fornecedor, 2),
-            "gasto_acumulado": round(gasto_acumulado, 2),
-            "orcamento_disponivel": round(disponivel, 2),
-            "valor_solicitado": round(valor_compra, 2),
-            "percentual_utilizado": round(percentual_utilizado, 1),
-            "mensagem": (
-                f"✅ APROVADO: R$ {valor_compra:,.2f} dentro do limite (disponível: R$ {disponivel:,.2f})"
-                if aprovado else
-                f"❌ BLOQUEADO: R$ {valor_compra:,.2f} excede orçamento de R$ {disponivel:,.2f}"
-            )
-        }
+    @staticmethod
+    def build_budget_check(orcamento_fornecedor: float, gasto_acumulado: float, valor_compra: float) -> Dict[str, Any]:
+        """Aplica o HARD CAP sobre valores já carregados (sem acesso ao Gateway)."""
+        return build_budget_check(orcamento_fornecedor, gasto_acumulado, valor_compra)
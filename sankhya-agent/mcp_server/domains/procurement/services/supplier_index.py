@@ -0,0 +1,318 @@
+"""
+Índice local de fornecedor principal por produto.
+
+"Fornecedor principal" = parceiro com maior volume comprado (pedidos TIPMOV='O'
+liberados) numa janela de meses. A mesma window query sobre todo o histórico
+TGFITE/TGFCAB era recalculada no ERP pelo radar (por produto), por
+get_supplier_items e por queries_opportunities_by_supplier.sql.
+
+Aqui o histórico de compras é materializado num SQLite do domínio (uma linha por
+pedido e produto), construído uma vez e atualizado incrementalmente pelos pedidos
+alterados desde o último watermark (TGFCAB.DTALTER). As consultas são respondidas
+por um mapa em memória por janela, recalculado só quando o índice muda.
+"""
+import os
+import time
+import sqlite3
+import logging
+import threading
+from datetime import date
+from itertools import groupby
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+logger = logging.getLogger("procurement-supplier-index")
+
+# Parceiros excluídos das oportunidades (autopreenchimento Matriz/Filial)
+INTERNAL_PARTNERS = (1, 5)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS purchase_lines (
+    NUNOTA  INTEGER NOT NULL,
+    CODPROD INTEGER NOT NULL,
+    CODPARC INTEGER NOT NULL,
+    DTNEG   TEXT NOT NULL,
+    QTDNEG  REAL NOT NULL,
+    PRIMARY KEY (NUNOTA, CODPROD)
+);
+CREATE INDEX IF NOT EXISTS idx_purchase_lines_dtneg ON purchase_lines (DTNEG);
+CREATE TABLE IF NOT EXISTS partners (
+    CODPARC  INTEGER PRIMARY KEY,
+    NOMEPARC TEXT
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def months_ago(months: int, today: Optional[date] = None) -> str:
+    """Equivalente ao ADD_MONTHS(SYSDATE, -months) do Oracle, como 'YYYY-MM-DD'."""
+    today = today or date.today()
+    total = today.year * 12 + (today.month - 1) - int(months)
+    year, month = divmod(total, 12)
+    month += 1
+    # Último dia do mês de destino (ADD_MONTHS também "encosta" no fim do mês)
+    next_month = date(year + (month == 12), month % 12 + 1, 1)
+    last_day = (next_month - date.resolution).day
+    return date(year, month, min(today.day, last_day)).isoformat()
+
+
+class PrimarySupplierIndex:
+    """
+    Histórico de compras materializado + mapa produto → fornecedor principal.
+
+    `fetch_lines(since)` devolve as linhas de queries_purchase_history_lines.sql
+    (ordenadas por NUNOTA) alteradas a partir do watermark `since`
+    ('YYYY-MM-DD HH:MM:SS'; None = histórico completo). Falhas devem propagar:
+    um índice construído a partir de uma resposta vazia por erro seria pior
+    que nenhum índice.
+    """
+
+    def __init__(self, db_path: str, fetch_lines: Callable[[Optional[str]], Iterable[Dict[str, Any]]]):
+        self.db_path = db_path
+        self._fetch_lines = fetch_lines
+        self._lock = threading.RLock()
+        self._version = 0
+        self._maps: Dict[Optional[int], Dict[int, Dict[str, Any]]] = {}
+        self._maps_version = -1
+        self._fresh_until = 0.0
+        self._init_db()
+
+    # ------------------------------------------------------------------
+    # Armazenamento
+    # ------------------------------------------------------------------
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _init_db(self):
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+        conn.close()
+
+    def _get_meta(self, key: str) -> Optional[str]:
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+            return row[0] if row else None
+        finally:
+            conn.close()
+
+    @property
+    def watermark(self) -> Optional[str]:
+        """Maior DTALTER já aplicado ao índice."""
+        return self._get_meta("watermark")
+
+    def _meta_float(self, key: str) -> float:
+        value = self._get_meta(key)
+        return float(value) if value else 0.0
+
+    @property
+    def is_built(self) -> bool:
+        return self._get_meta("built_at") is not None
+
+    # ------------------------------------------------------------------
+    # Construção e atualização
+    # ------------------------------------------------------------------
+
+    def rebuild(self) -> int:
+        """Reconstrói o índice a partir do histórico completo. Retorna o nº de linhas."""
+        with self._lock:
+            logger.info("Construindo índice de fornecedor principal (histórico completo)...")
+            applied = self._apply(self._fetch_lines(None), full=True)
+            logger.info(f"Índice de fornecedor principal construído: {applied} linhas de compra.")
+            return applied
+
+    def refresh(self) -> int:
+        """Aplica os pedidos alterados desde o watermark (reconstrói se ainda não existe)."""
+        with self._lock:
+            if not self.is_built:
+                return self.rebuild()
+            since = self.watermark
+            applied = self._apply(self._fetch_lines(since), full=False)
+            if applied:
+                logger.info(f"Índice de fornecedor principal atualizado: {applied} linhas desde {since}.")
+            return applied
+
+    def ensure_fresh(self, refresh_seconds: float, full_rebuild_seconds: Optional[float] = None) -> "PrimarySupplierIndex":
+        """
+        Atualiza só se necessário: incremental depois de `refresh_seconds`, completo depois de
+        `full_rebuild_seconds` (pega notas excluídas do ERP, que o watermark não enxerga).
+        """
+        with self._lock:
+            now = time.time()
+            if now < self._fresh_until:
+                return self
+            if not self.is_built:
+                self.rebuild()
+            elif full_rebuild_seconds and now - self._meta_float("built_at") >= full_rebuild_seconds:
+                self.rebuild()
+            elif now - self._meta_float("refreshed_at") >= refresh_seconds:
+                self.refresh()
+            # Evita reler os metadados do SQLite a cada consulta até a próxima janela
+            self._fresh_until = self._meta_float("refreshed_at") + refresh_seconds
+            if full_rebuild_seconds:
+                self._fresh_until = min(self._fresh_until, self._meta_float("built_at") + full_rebuild_seconds)
+        return self
+
+    def _apply(self, lines: Iterable[Dict[str, Any]], full: bool) -> int:
+        """Substitui as linhas de cada pedido recebido (idempotente: watermark usa >=)."""
+        conn = self._connect()
+        applied = 0
+        watermark = None if full else self.watermark
+        try:
+            with conn:
+                if full:
+                    conn.execute("DELETE FROM purchase_lines")
+                for nunota, note_lines in groupby(lines, key=lambda r: int(r["NUNOTA"])):
+                    note_lines = list(note_lines)
+                    head = note_lines[0]
+                    if not full:
+                        conn.execute("DELETE FROM purchase_lines WHERE NUNOTA = ?", (nunota,))
+                    if head.get("DTALTER") and (watermark is None or head["DTALTER"] > watermark):
+                        watermark = head["DTALTER"]
+                    if str(head.get("STATUSNOTA") or "") != "L":
+                        continue
+                    conn.execute(
+                        "INSERT OR REPLACE INTO partners (CODPARC, NOMEPARC) VALUES (?, ?)",
+                        (int(head["CODPARC"]), head.get("NOMEPARC")),
+                    )
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO purchase_lines (NUNOTA, CODPROD, CODPARC, DTNEG, QTDNEG) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        [
+                            (nunota, int(r["CODPROD"]), int(r["CODPARC"]), str(r["DTNEG"])[:10], float(r.get("QTDNEG") or 0))
+                            for r in note_lines
+                        ],
+                    )
+                    applied += len(note_lines)
+
+                now = str(time.time())
+                meta = [("refreshed_at", now)]
+                if full:
+                    meta.append(("built_at", now))
+                if watermark:
+                    meta.append(("watermark", watermark))
+                conn.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", meta)
+        finally:
+            conn.close()
+
+        self._version += 1
+        return applied
+
+    # ------------------------------------------------------------------
+    # Consulta
+    # ------------------------------------------------------------------
+
+    def _primary_map(self, meses: Optional[int]) -> Dict[int, Dict[str, Any]]:
+        """Mapa produto → fornecedor principal da janela (cacheado até a próxima atualização)."""
+        with self._lock:
+            if self._maps_version != self._version:
+                self._maps = {}
+                self._maps_version = self._version
+            cached = self._maps.get(meses)
+            if cached is not None:
+                return cached
+
+            sql = "SELECT CODPROD, CODPARC, SUM(QTDNEG) FROM purchase_lines"
+            args: tuple = ()
+            if meses is not None:
+                # DTNEG é só data; SYSDATE tem hora: o dia exato do corte fica de fora no Oracle
+                sql += " WHERE DTNEG > ?"
+                args = (months_ago(meses),)
+            sql += " GROUP BY CODPROD, CODPARC"
+
+            conn = self._connect()
+            try:
+                names = dict(conn.execute("SELECT CODPARC, NOMEPARC FROM partners"))
+                best: Dict[int, tuple] = {}
+                for codprod, codparc, volume in conn.execute(sql, args):
+                    current = best.get(codprod)
+                    # Maior volume; empate resolvido pelo menor CODPARC (determinístico)
+                    if current is None or volume > current[1] or (volume == current[1] and codparc < current[0]):
+                        best[codprod] = (codparc, volume)
+            finally:
+                conn.close()
+
+            mapping = {
+                codprod: {"CODPARC": codparc, "NOMEPARC": names.get(codparc), "VOLUME": volume}
+                for codprod, (codparc, volume) in best.items()
+            }
+            self._maps[meses] = mapping
+            return mapping
+
+    def primary_supplier(self, codprod: int, meses: Optional[int] = 12) -> Optional[Dict[str, Any]]:
+        """Fornecedor principal de um produto (None se não houve compra na janela)."""
+        return self._primary_map(meses).get(int(codprod))
+
+    def primary_suppliers(self, codprods: Iterable[int], meses: Optional[int] = 12) -> Dict[int, Dict[str, Any]]:
+        """Fornecedor principal de vários produtos; produtos sem compra na janela ficam de fora."""
+        mapping = self._primary_map(meses)
+        result = {}
+        for codprod in codprods:
+            supplier = mapping.get(int(codprod))
+            if supplier is not None:
+                result[int(codprod)] = supplier
+        return result
+
+    def products_of(self, codparc: int, meses: Optional[int] = None) -> List[int]:
+        """Produtos cujo fornecedor principal é `codparc`."""
+        codparc = int(codparc)
+        return sorted(p for p, s in self._primary_map(meses).items() if s["CODPARC"] == codparc)
+
+    def partner_name(self, codparc: int) -> Optional[str]:
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT NOMEPARC FROM partners WHERE CODPARC = ?", (int(codparc),)).fetchone()
+            return row[0] if row else None
+        finally:
+            conn.close()
+
+    def group_by_supplier(self, values: Dict[int, Dict[str, float]], meses: Optional[int] = 24,
+                          exclude: Iterable[int] = INTERNAL_PARTNERS) -> List[Dict[str, Any]]:
+        """
+        Agrupa as sugestões por produto ({CODPROD: {"VLR_SUGESTAO", "RUPTURA"}}) pelo
+        fornecedor principal, no formato de queries_opportunities_by_supplier.sql.
+        """
+        mapping = self._primary_map(meses)
+        excluded = {int(c) for c in exclude}
+        groups: Dict[int, Dict[str, Any]] = {}
+        for codprod, item in values.items():
+            supplier = mapping.get(int(codprod))
+            if supplier is None or supplier["CODPARC"] in excluded:
+                continue
+            group = groups.setdefault(supplier["CODPARC"], {
+                "CODPARCFORN": supplier["CODPARC"],
+                "FORNECEDOR": supplier["NOMEPARC"],
+                "VLR_TOTAL_SUGESTAO": 0.0,
+                "MIX_PRODUTOS": 0,
+                "ITENS_RUPTURA": 0,
+            })
+            group["VLR_TOTAL_SUGESTAO"] += float(item.get("VLR_SUGESTAO") or 0)
+            group["MIX_PRODUTOS"] += 1
+            group["ITENS_RUPTURA"] += 1 if item.get("RUPTURA") else 0
+        return sorted(groups.values(), key=lambda g: g["VLR_TOTAL_SUGESTAO"], reverse=True)
+
+    def stats(self) -> Dict[str, Any]:
+        conn = self._connect()
+        try:
+            lines, products, suppliers = conn.execute(
+                "SELECT COUNT(*), COUNT(DISTINCT CODPROD), COUNT(DISTINCT CODPARC) FROM purchase_lines"
+            ).fetchone()
+        finally:
+            conn.close()
+        return {
+            "linhas": lines,
+            "produtos": products,
+            "fornecedores": suppliers,
+            "watermark": self.watermark,
+            "construido_em": self._meta_float("built_at") or None,
+            "atualizado_em": self._meta_float("refreshed_at") or None,
+        }
@@ -2,6 +2,7 @@ import os
 import logging
 from typing import List, Dict, Any, Optional
 from mcp_server.domains.procurement.services.sankhya_adapter import SankhyaProcurementService
+from mcp_server.domains.procurement.workflows.radar_scoring import score_opportunities
 
 logger = logging.getLogger("procurement-radar")
 
@@ -16,19 +17,25 @@ class ProcurementRadar:
         self.sankhya_service = SankhyaProcurementService(domain_path)
         self.rules = self.sankhya_service.config
 
-    def run_analysis(self) -> List[Dict[str, Any]]:
-        """Executa análise com lead time dinâmico e validação de budget."""
+    def run_analysis(self, batched: bool = True) -> List[Dict[str, Any]]:
+        """
+        Executa análise com lead time dinâmico e validação de budget.
+
+        batched=True carrega fornecedores principais e lead times para todos
+        os produtos em poucas queries set-based (O(1) round trips) e pontua o
+        catálogo inteiro de forma vetorizada (radar_scoring).
+        batched=False mantém o fluxo original, com queries por produto (O(N)).
+        Ambos retornam exatamente a mesma lista de oportunidades.
+        """
         logger.info("Iniciando Radar de Compras v2.0 (Lead Time + Budget Control)...")
 
-        # 1. NOVO: Busca orçamento do mês
+        # 1. NOVO: Snapshot do orçamento do mês (carregado uma vez por execução)
         budget_enabled = self.rules.get("budget_control", {}).get("enabled", False)
         if budget_enabled:
-            budget_data = self.sankhya_service.calculate_purchase_budget_allocation(
-                growth_factor=self.rules.get("budget_control", {}).get("growth_factor_annual", 0.20)
-            )
-            logger.info(f"Orçamento global: R$ {budget_data['orcamento_global']:,.2f}")
+            budget_snapshot = self.sankhya_service.get_budget_snapshot(refresh=True)
+            logger.info(f"Orçamento global: R$ {budget_snapshot.orcamento_global:,.2f}")
         else:
-            budget_data = None
+            budget_snapshot = None
 
         # 2. Busca dados
         abc_data = self.sankhya_service.get_abc_giro_data()
@@ -41,6 +48,19 @@ class ProcurementRadar:
         popularity_map = {int(p["CODPROD"]): p for p in pop_data if "CODPROD" in p}
         opportunities = []
 
+        if batched:
+            batch = self._load_batch_context(abc_data)
+            opportunities = score_opportunities(
+                abc_data,
+                popularity_map,
+                batch["suppliers"],
+                batch["leadtimes"],
+                demand_buffer=self.rules.get("analysis", {}).get("demand_buffer", 0.20),
+                budget=budget_snapshot,
+            )
+            logger.info(f"Análise concluída: {len(opportunities)} oportunidades encontradas")
+            return opportunities
+
         for item in abc_data:
             codprod = int(item.get("CODPROD", 0))
             if not codprod:
@@ -86,12 +106,14 @@ class ProcurementRadar:
                 custo_unitario = float(item.get("CUSTOGER", 0))
                 valor_compra = sugestao_qtd * custo_unitario
 
-                # Valida orçamento se habilitado
+                # Valida orçamento se habilitado (HARD CAP em memória). Valida e registra
+                # no mesmo snapshot da execução: um recarregamento por TTL no meio do
+                # loop esqueceria as compras já aprovadas.
                 if budget_enabled:
-                    budget_check = self.sankhya_service.validate_purchase_against_budget(
-                        codparc=codparc,
-                        valor_compra=valor_compra
-                    )
+                    budget_check = budget_snapshot.check(codparc, valor_compra)
+                    if budget_check["aprovado"]:
+                        # Compra aprovada consome o saldo das próximas validações desta execução
+                        budget_snapshot.register_purchase(codparc, valor_compra)
                 else:
                     budget_check = {
                         "aprovado": True,
@@ -139,8 +161,23 @@ class ProcurementRadar:
         logger.info(f"Análise concluída: {len(opportunities)} oportunidades encontradas")
         return opportunities
 
+    def _load_batch_context(self, abc_data: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Carrega em lote tudo o que o loop do radar consultaria produto a produto."""
+        codprods = [int(i.get("CODPROD", 0)) for i in abc_data if int(i.get("CODPROD", 0))]
+        suppliers = self.sankhya_service.get_primary_suppliers(codprods, meses=12)
+        pairs = [(codprod, int(s["CODPARC"])) for codprod, s in suppliers.items()]
+        return {
+            "suppliers": suppliers,
+            "leadtimes": self.sankhya_service.get_effective_leadtimes(pairs),
+        }
+
     def _get_primary_supplier(self, codprod: int) -> Optional[Dict[str, Any]]:
         """Busca fornecedor principal por volume de compras nos últimos 12 meses."""
+        index = self.sankhya_service.get_supplier_index()
+        if index is not None:
+            supplier = index.primary_supplier(codprod, meses=12)
+            return {"CODPARC": supplier["CODPARC"], "NOMEPARC": supplier["NOMEPARC"]} if supplier else None
+
         sql = """
             SELECT CODPARC, MAX(NOMEPARC) AS NOMEPARC
             FROM (
@@ -0,0 +1,248 @@
+"""
+Estágio de pontuação vetorizado do Radar de Compras.
+
+O loop original do radar calculava demanda ajustada, estoque de segurança,
+demanda reprimida, sugestão e valor um dict por vez e depois ordenava a lista.
+Aqui as entradas (ABC/giro, popularidade, fornecedor principal, lead time) são
+alinhadas num DataFrame e todas as colunas derivadas saem em operações NumPy,
+com a mesma ordem de operações do loop (os floats batem bit a bit).
+
+O HARD CAP do orçamento é sequencial por natureza (uma compra aprovada consome
+o saldo das seguintes do mesmo fornecedor). Ele é resolvido por fornecedor: o
+prefixo de compras que cabe no saldo sai de um cumsum; só depois da primeira
+compra bloqueada o restante daquele fornecedor passa por um laço escalar.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from mcp_server.domains.procurement.services.budget_snapshot import BudgetSnapshot
+
+BUDGET_DISABLED_MESSAGE = "Budget control desabilitado"
+
+
+def _column(frame: pd.DataFrame, name: str, default: float) -> np.ndarray:
+    if name not in frame:
+        return np.full(len(frame), default, dtype=float)
+    return pd.to_numeric(frame[name], errors="coerce").fillna(default).to_numpy(dtype=float)
+
+
+def build_scoring_frame(
+    abc_data: List[Dict[str, Any]],
+    popularity_map: Dict[int, Dict[str, Any]],
+    suppliers: Dict[int, Dict[str, Any]],
+    leadtimes: Dict[Tuple[int, int], Dict[str, Any]],
+) -> pd.DataFrame:
+    """Alinha ABC, popularidade, fornecedor e lead time numa linha por produto (na ordem do ABC)."""
+    frame = pd.DataFrame(abc_data)
+    if frame.empty or "CODPROD" not in frame:
+        return pd.DataFrame()
+
+    frame["CODPROD"] = pd.to_numeric(frame["CODPROD"], errors="coerce").fillna(0).astype("int64")
+    frame = frame[frame["CODPROD"] != 0]
+    # Produtos sem fornecedor principal ficam de fora (mesmo "Pulando" do loop)
+    frame = frame[frame["CODPROD"].isin(suppliers.keys())].reset_index(drop=True)
+    if frame.empty:
+        return frame
+
+    codprods = frame["CODPROD"].tolist()
+    supplier_rows = [suppliers[c] for c in codprods]
+    frame["CODPARC"] = [s["CODPARC"] for s in supplier_rows]
+    frame["FORNECEDOR"] = [s.get("NOMEPARC", "N/A") for s in supplier_rows]
+
+    lt_rows = [leadtimes[(c, int(s["CODPARC"]))] for c, s in zip(codprods, supplier_rows)]
+    # object: preserva int/float originais (aparecem formatados no MOTIVO)
+    frame["LEADTIME_DIAS"] = pd.Series([lt["leadtime_dias"] for lt in lt_rows], dtype=object)
+    frame["LEADTIME_FONTE"] = [lt["fonte"] for lt in lt_rows]
+    frame["LEADTIME_CONFIAVEL"] = [lt["confiavel"] for lt in lt_rows]
+
+    frame["QTD_ORCADA"] = [float(popularity_map.get(c, {}).get("QTD_ORCADA", 0)) for c in codprods]
+    return frame
+
+
+def _approve_budget(
+    codparcs: np.ndarray, valores: np.ndarray, budget: BudgetSnapshot
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    HARD CAP em ordem de item: devolve (aprovado, orçamento alocado, gasto antes da compra).
+    Mesma semântica de check() + register_purchase() chamados item a item.
+    """
+    n = len(valores)
+    aprovado = np.zeros(n, dtype=bool)
+    alocado = np.zeros(n, dtype=float)
+    gasto_antes = np.zeros(n, dtype=float)
+
+    order = np.argsort(codparcs, kind="stable")
+    boundaries = np.flatnonzero(np.diff(codparcs[order])) + 1
+    for positions in np.split(order, boundaries):
+        if positions.size == 0:
+            continue
+        codparc = int(codparcs[positions[0]])
+        allocation = budget.allocation_for(codparc)
+        values = valores[positions]
+        alocado[positions] = allocation
+
+        # Gasto acumulado antes de cada compra se todas fossem aprovadas (soma sequencial, como no loop)
+        running = np.add.accumulate(np.concatenate(([budget.spent(codparc)], values)))[:-1]
+        fits = values <= allocation - running
+        blocked = np.flatnonzero(~fits)
+        prefix = positions.size if blocked.size == 0 else int(blocked[0])
+        aprovado[positions[:prefix]] = True
+        gasto_antes[positions[:prefix]] = running[:prefix]
+
+        if prefix < positions.size:
+            spent = float(running[prefix])
+            for pos, value in zip(positions[prefix:], values[prefix:]):
+                gasto_antes[pos] = spent
+                if value <= allocation - spent:
+                    aprovado[pos] = True
+                    spent += value
+
+    return aprovado, alocado, gasto_antes
+
+
+def score_frame(frame: pd.DataFrame, demand_buffer: float, budget: Optional[BudgetSnapshot] = None) -> pd.DataFrame:
+    """
+    Calcula as colunas derivadas em lote e devolve só os itens com sugestão de compra,
+    já ordenados (aprovadas primeiro, depois curva, depois valor decrescente).
+    """
+    if frame.empty:
+        return frame
+
+    estoque = _column(frame, "ESTOQUE", 0.0)
+    venda_mensal = _column(frame, "VENDA_MENSAL", 0.0)
+    prazo = _column(frame, "PRAZO_PAG_MESES", 1.0)
+    custo = _column(frame, "CUSTOGER", 0.0)
+    leadtime = frame["LEADTIME_DIAS"].to_numpy(dtype=float)
+
+    buffer_multiplier = 1 + demand_buffer
+    venda_ajustada = venda_mensal * buffer_multiplier
+    quantidade_alvo = venda_ajustada * prazo
+    giro_diario = np.where(venda_mensal > 0, venda_mensal / 30, 0.0)
+    estoque_seguranca = giro_diario * leadtime
+    quantidade_alvo = quantidade_alvo + estoque_seguranca
+    quantidade_alvo = quantidade_alvo + frame["QTD_ORCADA"].to_numpy(dtype=float)
+
+    need = estoque < quantidade_alvo
+    scored = frame.loc[need].copy()
+    scored["ESTOQUE_ATUAL"] = estoque[need]
+    scored["PRAZO_PAG_MESES"] = prazo[need]
+    scored["DEMANDA_MENSAL_AJUSTADA"] = venda_ajustada[need]
+    scored["ESTOQUE_SEGURANCA"] = estoque_seguranca[need]
+    scored["SUGESTAO_COMPRA"] = quantidade_alvo[need] - estoque[need]
+    scored["VALOR_COMPRA"] = scored["SUGESTAO_COMPRA"].to_numpy() * custo[need]
+
+    if budget is not None:
+        aprovado, alocado, gasto = _approve_budget(
+            scored["CODPARC"].astype("int64").to_numpy(), scored["VALOR_COMPRA"].to_numpy(), budget
+        )
+        scored["COMPRA_APROVADA"] = aprovado
+        scored["ORCAMENTO_ALOCADO"] = alocado
+        scored["GASTO_ACUMULADO"] = gasto
+    else:
+        scored["COMPRA_APROVADA"] = True
+
+    # Chave de ordenação do loop original: valor já arredondado a 2 casas
+    scored["VALOR_ESTIMADO"] = [round(v, 2) for v in scored["VALOR_COMPRA"].tolist()]
+    curvas = scored["CURVA"].fillna("C").astype(str).str.strip() if "CURVA" in scored else pd.Series("C", index=scored.index)
+    scored["CURVA"] = curvas
+    _, curva_codes = np.unique(curvas.to_numpy(dtype=str), return_inverse=True)
+    order = np.lexsort((-scored["VALOR_ESTIMADO"].to_numpy(dtype=float), curva_codes, ~scored["COMPRA_APROVADA"].to_numpy()))
+    return scored.iloc[order]
+
+
+def _budget_fields(scored: pd.DataFrame) -> Tuple[List[float], List[float], List[str]]:
+    """
+    Campos de orçamento de todas as linhas (disponível, percentual, mensagem), com o
+    mesmo arredondamento e texto de build_budget_check() sem chamá-lo por linha.
+    """
+    alocado = scored["ORCAMENTO_ALOCADO"].to_numpy(dtype=float)
+    gasto = scored["GASTO_ACUMULADO"].to_numpy(dtype=float)
+    valor = scored["VALOR_COMPRA"].to_numpy(dtype=float)
+    disponivel = (alocado - gasto).tolist()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        percentual = np.where(alocado > 0, (gasto + valor) / alocado * 100, 0.0).tolist()
+    tem_alocacao = (alocado > 0).tolist()
+
+    mensagens = [
+        f"✅ APROVADO: R$ {v:,.2f} dentro do limite (disponível: R$ {d:,.2f})"
+        if ok else
+        f"❌ BLOQUEADO: R$ {v:,.2f} excede orçamento de R$ {d:,.2f}"
+        for v, d, ok in zip(valor.tolist(), disponivel, scored["COMPRA_APROVADA"].tolist())
+    ]
+    return (
+        [round(d, 2) for d in disponivel],
+        [round(p, 1) if tem else 0 for p, tem in zip(percentual, tem_alocacao)],
+        mensagens,
+    )
+
+
+def to_opportunities(scored: pd.DataFrame, budget_enabled: bool) -> List[Dict[str, Any]]:
+    """Converte o resultado pontuado no formato de oportunidade do radar."""
+    if scored.empty:
+        return []
+
+    n = len(scored)
+    if budget_enabled:
+        disponivel, percentual, status = _budget_fields(scored)
+    else:
+        disponivel, percentual, status = [0] * n, [0] * n, [BUDGET_DISABLED_MESSAGE] * n
+
+    descrs = scored["DESCRPROD"].tolist() if "DESCRPROD" in scored else [None] * n
+    columns = zip(
+        scored["CODPROD"].tolist(), descrs, scored["CURVA"].tolist(), scored["FORNECEDOR"].tolist(),
+        scored["CODPARC"].tolist(), scored["ESTOQUE_ATUAL"].tolist(), scored["SUGESTAO_COMPRA"].tolist(),
+        scored["VALOR_ESTIMADO"].tolist(), scored["DEMANDA_MENSAL_AJUSTADA"].tolist(),
+        scored["PRAZO_PAG_MESES"].tolist(), scored["LEADTIME_DIAS"].tolist(), scored["LEADTIME_FONTE"].tolist(),
+        scored["LEADTIME_CONFIAVEL"].tolist(), scored["ESTOQUE_SEGURANCA"].tolist(),
+        scored["COMPRA_APROVADA"].tolist(), disponivel, percentual, status,
+    )
+    return [
+        {
+            "CODPROD": codprod,
+            "PRODUTO": descr if isinstance(descr, str) else f"Produto {codprod}",
+            "CURVA": curva,
+            "FORNECEDOR": fornecedor,
+            "CODPARC": codparc,
+            "ESTOQUE_ATUAL": estoque,
+            "SUGESTAO_COMPRA": round(sugestao, 0),
+            "VALOR_ESTIMADO": valor,
+            "DEMANDA_MENSAL_AJUSTADA": round(demanda, 2),
+
+            "LEADTIME_DIAS": lt_dias,
+            "LEADTIME_FONTE": lt_fonte,
+            "LEADTIME_CONFIAVEL": lt_confiavel,
+            "ESTOQUE_SEGURANCA": round(seguranca, 2),
+
+            "ORCAMENTO_DISPONIVEL": disp,
+            "PERCENTUAL_ORCAMENTO": perc,
+            "COMPRA_APROVADA": bool(aprovada),
+            "STATUS_BUDGET": msg,
+
+            "MOTIVO": f"Estoque para {prazo}m + {lt_dias}d LT ({lt_fonte}) + demanda reprimida",
+        }
+        for (codprod, descr, curva, fornecedor, codparc, estoque, sugestao, valor, demanda, prazo,
+             lt_dias, lt_fonte, lt_confiavel, seguranca, aprovada, disp, perc, msg) in columns
+    ]
+
+
+def score_opportunities(
+    abc_data: List[Dict[str, Any]],
+    popularity_map: Dict[int, Dict[str, Any]],
+    suppliers: Dict[int, Dict[str, Any]],
+    leadtimes: Dict[Tuple[int, int], Dict[str, Any]],
+    demand_buffer: float,
+    budget: Optional[BudgetSnapshot] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Pontua o catálogo inteiro em lote. Com `budget`, as compras aprovadas são
+    registradas no snapshot (como o loop fazia item a item).
+    """
+    frame = build_scoring_frame(abc_data, popularity_map, suppliers, leadtimes)
+    scored = score_frame(frame, demand_buffer, budget)
+    if budget is not None and not scored.empty:
+        approved = scored.sort_index()
+        approved = approved[approved["COMPRA_APROVADA"]]
+        budget.register_purchases(zip(approved["CODPARC"].tolist(), approved["VALOR_COMPRA"].tolist()))
+    return to_opportunities(scored, budget_enabled=budget is not None)
@@ -0,0 +1,186 @@
+"""
+Camada HTTP com pool de conexões persistentes (keep-alive) para o Gateway Sankhya.
+
+Cada `requests.post` avulso abre uma nova conexão TCP+TLS. Em execuções com
+centenas de queries (ex: Radar de Compras) o handshake passa a dominar a latência.
+Este módulo mantém uma `requests.Session` única com pool configurável, retry com
+backoff para respostas 5xx/429 e estatísticas de reuso para auditoria.
+"""
+import os
+import time
+import random
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Optional, Dict, Any
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger("sankhya-http-pool")
+
+# Status que indicam falha transitória do Gateway (vale repetir com backoff)
+RETRYABLE_STATUS = (429, 500, 502, 503, 504)
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+@dataclass
+class PoolConfig:
+    """Parâmetros do pool HTTP (sobrescrevíveis via variáveis de ambiente)."""
+    pool_connections: int = 4      # Quantidade de hosts distintos mantidos em cache
+    pool_maxsize: int = 16         # Conexões simultâneas por host
+    pool_block: bool = False       # Se True, aguarda conexão livre em vez de abrir uma extra
+    max_retries: int = 3           # Tentativas extras em 5xx/429 e falhas de conexão
+    backoff_factor: float = 0.5    # Espera = backoff * 2^(tentativa-1) (+ jitter)
+    backoff_max: float = 30.0      # Teto de espera entre tentativas (inclui Retry-After)
+
+    @classmethod
+    def from_env(cls) -> "PoolConfig":
+        return cls(
+            pool_connections=_env_int("SANKHYA_HTTP_POOL_CONNECTIONS", cls.pool_connections),
+            pool_maxsize=_env_int("SANKHYA_HTTP_POOL_MAXSIZE", cls.pool_maxsize),
+            pool_block=(os.getenv("SANKHYA_HTTP_POOL_BLOCK", "0").strip().lower() in {"1", "true", "yes"}),
+            max_retries=_env_int("SANKHYA_HTTP_RETRIES", cls.max_retries),
+            backoff_factor=_env_float("SANKHYA_HTTP_BACKOFF", cls.backoff_factor),
+            backoff_max=_env_float("SANKHYA_HTTP_BACKOFF_MAX", cls.backoff_max),
+        )
+
+
+class PooledHTTPSession:
+    """
+    Sessão HTTP compartilhada com pool keep-alive e retry.
+
+    - Falhas de conexão são repetidas pelo próprio adapter (urllib3 `Retry`),
+      pois nesse caso a requisição nem chegou ao servidor.
+    - Respostas 5xx/429 são repetidas aqui, com backoff exponencial e respeito
+      ao header `Retry-After`. Chamadas marcadas como não idempotentes
+      (`idempotent=False`) só são repetidas em 429, já que nesse caso o Gateway
+      garante que nada foi processado.
+    """
+
+    def __init__(self, config: Optional[PoolConfig] = None):
+        self.config = config or PoolConfig.from_env()
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._retries = 0
+        self._disposed_connections = 0
+        self._disposed_requests = 0
+
+        self.session = requests.Session()
+        self.session.headers.update({"Connection": "keep-alive"})
+        self.adapter = HTTPAdapter(
+            pool_connections=self.config.pool_connections,
+            pool_maxsize=self.config.pool_maxsize,
+            pool_block=self.config.pool_block,
+            max_retries=Retry(
+                total=self.config.max_retries,
+                connect=self.config.max_retries,
+                read=0,
+                status=0,
+                backoff_factor=self.config.backoff_factor,
+                allowed_methods=None,
+                raise_on_status=False,
+            ),
+        )
+        self.session.mount("https://", self.adapter)
+        self.session.mount("http://", self.adapter)
+
+        # Preserva as estatísticas de pools descartados pelo LRU do urllib3
+        pools = self.adapter.poolmanager.pools
+        original_dispose = pools.dispose_func
+
+        def _dispose(pool):
+            with self._lock:
+                self._disposed_connections += getattr(pool, "num_connections", 0)
+                self._disposed_requests += getattr(pool, "num_requests", 0)
+            if original_dispose:
+                original_dispose(pool)
+
+        pools.dispose_func = _dispose
+
+    def _retry_delay(self, attempt: int, response: requests.Response) -> float:
+        retry_after = response.headers.get("Retry-After")
+        if retry_after:
+            try:
+                return min(float(retry_after), self.config.backoff_max)
+            except ValueError:
+                pass  # Formato HTTP-date: cai no backoff exponencial
+        delay = self.config.backoff_factor * (2 ** attempt)
+        return min(delay + random.uniform(0, self.config.backoff_factor), self.config.backoff_max)
+
+    def request(self, method: str, url: str, idempotent: bool = True, **kwargs) -> requests.Response:
+        """Executa uma requisição pelo pool, repetindo falhas transitórias."""
+        attempt = 0
+        while True:
+            with self._lock:
+                self._requests += 1
+            response = self.session.request(method, url, **kwargs)
+
+            retryable = response.status_code in RETRYABLE_STATUS
+            if retryable and not idempotent:
+                retryable = response.status_code == 429
+            if not retryable or attempt >= self.config.max_retries:
+                return response
+
+            delay = self._retry_delay(attempt, response)
+            logger.warning(
+                f"Gateway respondeu {response.status_code}. "
+                f"Nova tentativa {attempt + 1}/{self.config.max_retries} em {delay:.1f}s."
+            )
+            response.close()
+            with self._lock:
+                self._retries += 1
+            time.sleep(delay)
+            attempt += 1
+
+    def post(self, url: str, idempotent: bool = True, **kwargs) -> requests.Response:
+        return self.request("POST", url, idempotent=idempotent, **kwargs)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Estatísticas de reuso do pool.
+        `handshakes` = conexões novas abertas (TCP+TLS); `reuse_ratio` = fração de
+        requisições atendidas por uma conexão já aberta.
+        """
+        pools = self.adapter.poolmanager.pools
+        with self._lock:
+            connections = self._disposed_connections
+            pool_requests = self._disposed_requests
+            requests_sent = self._requests
+            retries = self._retries
+        active_pools = 0
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            active_pools += 1
+            connections += pool.num_connections
+            pool_requests += pool.num_requests
+
+        reuse_ratio = (1 - connections / pool_requests) if pool_requests else 0.0
+        return {
+            "requests": requests_sent,
+            "retries": retries,
+            "handshakes": connections,
+            "reused": max(pool_requests - connections, 0),
+            "reuse_ratio": round(max(reuse_ratio, 0.0), 4),
+            "active_pools": active_pools,
+            "pool_maxsize": self.config.pool_maxsize,
+        }
+
+    def close(self):
+        self.session.close()
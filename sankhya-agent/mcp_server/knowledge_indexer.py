@@ -1,66 +1,87 @@
+"""
+Indexador da Central de Ajuda Sankhya (Zendesk) para a knowledge.db local.
+
+A primeira execução faz a carga completa pela listagem paginada, baixando as
+páginas em paralelo. As seguintes usam a exportação incremental do Help Center
+(`incremental/articles?start_time=`), que traz só o que mudou desde o último
+`updated_at` visto. Assim a sincronização leva segundos, sem re-crawl.
+
+- Todas as requisições passam por um orçamento compartilhado (RateBudget):
+  intervalo mínimo entre chamadas e pausa global quando a API responde 429/503
+  com `Retry-After`.
+- Cada página vai direto para o SQLite num `executemany` (upsert). Nada fica
+  acumulado em memória.
+- O cursor é gravado na mesma transação da página (tabela sync_state). Se o
+  processo cair, a próxima execução retoma do ponto em que parou.
+"""
 import os
+import re
+import sys
+import json
+import time
+import logging
+import argparse
+import threading
 import requests
 import sqlite3
-import logging
-import re
-from datetime import datetime
-from typing import List, Dict, Any
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlencode
+
+try:
+    from knowledge_schema import ensure_schema, optimize
+except ImportError:
+    from mcp_server.knowledge_schema import ensure_schema, optimize
 
 # Configuração de Logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger("knowledge-indexer")
 
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
 # Configuração
-ZENDESK_API_URL = "https://ajuda.sankhya.com.br/api/v2/help_center/articles.json"
+ZENDESK_BASE_URL = "https://ajuda.sankhya.com.br/api/v2/help_center"
+ZENDESK_API_URL = f"{ZENDESK_BASE_URL}/articles.json"
+ZENDESK_INCREMENTAL_URL = f"{ZENDESK_BASE_URL}/incremental/articles.json"
 DB_PATH = os.path.join(os.path.dirname(__file__), "knowledge.db")
 
+LOCALE = "pt-br"
+PER_PAGE = 100
+REQUEST_TIMEOUT = 30
+MAX_ATTEMPTS = 5
+# A exportação incremental devolve até 1000 itens; página menor = fim do stream
+INCREMENTAL_PAGE_LIMIT = 1000
+
+ZENDESK_WORKERS = _env_int("SANKHYA_ZENDESK_WORKERS", 4)
+ZENDESK_RPM = _env_int("SANKHYA_ZENDESK_RPM", 200)
+
+# Chaves da tabela sync_state
+STATE_CURSOR = "cursor"                  # start_time (epoch) da próxima exportação incremental
+STATE_FULL_STARTED = "full_started_at"   # início da carga completa em andamento
+STATE_FULL_PAGES = "full_pages_done"     # páginas já gravadas da carga completa (JSON)
+
+_UPSERT = """
+    INSERT INTO articles (id, url, title, body, created_at, updated_at)
+    VALUES (:id, :url, :title, :body, :created_at, :updated_at)
+    ON CONFLICT(id) DO UPDATE SET
+        url = excluded.url, title = excluded.title, body = excluded.body, updated_at = excluded.updated_at
+    WHERE articles.updated_at IS NOT excluded.updated_at
+"""
+
+
+class SyncError(Exception):
+    """A API não respondeu uma página depois de todas as tentativas."""
+
+
 def create_database():
-    """Cria o banco de dados SQLite com suporte a FTS5 (Full-Text Search)."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    # Tabela principal de artigos
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS articles (
-        id INTEGER PRIMARY KEY,
-        url TEXT,
-        title TEXT,
-        body TEXT,
-        created_at TEXT,
-        updated_at TEXT
-    )
-    """)
-    
-    # Tabela virtual FTS5 para busca textual eficiente
-    cursor.execute("""
-    CREATE VIRTUAL TABLE IF NOT EXISTS articles_fts USING fts5(
-        title, 
-        body, 
-        content='articles', 
-        content_rowid='id'
-    )
-    """)
-    
-    # Triggers para manter o índice FTS sincronizado
-    cursor.execute("""
-    CREATE TRIGGER IF NOT EXISTS articles_ai AFTER INSERT ON articles BEGIN
-      INSERT INTO articles_fts(rowid, title, body) VALUES (new.id, new.title, new.body);
-    END;
-    """)
-    cursor.execute("""
-    CREATE TRIGGER IF NOT EXISTS articles_ad AFTER DELETE ON articles BEGIN
-      INSERT INTO articles_fts(articles_fts, rowid, title, body) VALUES('delete', old.id, old.title, old.body);
-    END;
-    """)
-    cursor.execute("""
-    CREATE TRIGGER IF NOT EXISTS articles_au AFTER UPDATE ON articles BEGIN
-      INSERT INTO articles_fts(articles_fts, rowid, title, body) VALUES('delete', old.id, old.title, old.body);
-      INSERT INTO articles_fts(rowid, title, body) VALUES (new.id, new.title, new.body);
-    END;
-    """)
-    
-    conn.commit()
-    conn.close()
+    """Cria (ou completa) a knowledge.db: artigos, cursor da sincronização e índices FTS5 com triggers."""
+    ensure_schema(DB_PATH)
     logger.info(f"Banco de dados inicializado em {DB_PATH}")
 
 def clean_html(raw_html: str) -> str:
@@ -72,88 +93,301 @@ def clean_html(raw_html: str) -> str:
     text = re.sub(r'\s+', ' ', text).strip()
     return text
 
-def fetch_articles() -> List[Dict[str, Any]]:
-    """Baixa todos os artigos da API do Zendesk (paginado)."""
-    articles = []
-    url = ZENDESK_API_URL
-    page = 1
-    
-    while url:
-        logger.info(f"Baixando página {page}...")
+
+def to_article(item: Dict[str, Any]) -> Dict[str, Any]:
+    """Converte um artigo da API no formato da tabela `articles` (HTML já limpo)."""
+    return {
+        "id": item["id"],
+        "url": item["html_url"],
+        "title": item["title"],
+        "body": clean_html(item.get("body")),
+        "created_at": item.get("created_at"),
+        "updated_at": item.get("updated_at"),
+    }
+
+
+def split_page(items: Iterable[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[int]]:
+    """Separa uma página da API em artigos publicados em `LOCALE` e ids que voltaram a rascunho."""
+    articles, drafts = [], []
+    for item in items:
+        if item.get("locale") != LOCALE:
+            continue
+        if item.get("draft"):
+            drafts.append(item["id"])
+        else:
+            articles.append(to_article(item))
+    return articles, drafts
+
+
+class RateBudget:
+    """
+    Orçamento de requisições compartilhado entre as threads de download.
+    Espaça as chamadas para caber em `per_minute` e, quando a API pede
+    (Retry-After), pausa todas as threads de uma vez, não só a que recebeu o 429.
+    """
+
+    def __init__(self, per_minute: int = ZENDESK_RPM,
+                 clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.interval = 60.0 / per_minute if per_minute > 0 else 0.0
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+        self._paused_until = 0.0
+
+    def acquire(self) -> None:
+        with self._lock:
+            now = self._clock()
+            slot = max(now, self._next_slot, self._paused_until)
+            self._next_slot = slot + self.interval
+        if slot > now:
+            self._sleep(slot - now)
+
+    def pause(self, seconds: float) -> None:
+        with self._lock:
+            self._paused_until = max(self._paused_until, self._clock() + seconds)
+
+
+def _retry_delay(headers, attempt: int) -> float:
+    retry_after = headers.get("Retry-After")
+    if retry_after:
         try:
-            response = requests.get(url, timeout=10)
-            if response.status_code == 429: # Rate limit
-                 logger.warning("Rate limit atingido. Aguardando...")
-                 import time
-                 time.sleep(10)
-                 continue
-            
-            response.raise_for_status()
-            data = response.json()
-            
-            for item in data.get("articles", []):
-                # Apenas artigos publicados e em português (assumindo que a URL base já filtra locale, mas garantindo)
-                if not item.get("draft") and item.get("locale") == "pt-br": 
-                    articles.append({
-                        "id": item["id"],
-                        "url": item["html_url"],
-                        "title": item["title"],
-                        "body": clean_html(item["body"]), # Limpa HTML antes de salvar
-                        "created_at": item["created_at"],
-                        "updated_at": item["updated_at"]
-                    })
-            
-            url = data.get("next_page")
-            page += 1
-            
-        except Exception as e:
-            logger.error(f"Erro ao baixar página {page}: {e}")
-            break
-            
-    return articles
+            return float(retry_after)
+        except ValueError:
+            pass  # Formato HTTP-date: cai no backoff exponencial
+    return min(2.0 ** attempt, 60.0)
+
+
+def _get_json(session, url: str, budget: RateBudget) -> Dict[str, Any]:
+    """GET com orçamento de taxa; repete 429/5xx e falhas de conexão."""
+    for attempt in range(MAX_ATTEMPTS):
+        budget.acquire()
+        try:
+            response = session.get(url, timeout=REQUEST_TIMEOUT)
+        except requests.RequestException as e:
+            logger.warning(f"Falha de conexão em {url}: {e}")
+            budget.pause(_retry_delay({}, attempt))
+            continue
+        if response.status_code == 429 or response.status_code >= 500:
+            delay = _retry_delay(response.headers, attempt)
+            logger.warning(f"Zendesk respondeu {response.status_code}. Aguardando {delay:.1f}s.")
+            budget.pause(delay)
+            continue
+        response.raise_for_status()
+        return response.json()
+    raise SyncError(f"Sem resposta da Zendesk após {MAX_ATTEMPTS} tentativas: {url}")
+
+
+def _new_session() -> requests.Session:
+    session = requests.Session()
+    # Credenciais opcionais: a exportação incremental exige usuário do Help Center
+    email, token = os.getenv("ZENDESK_EMAIL"), os.getenv("ZENDESK_API_TOKEN")
+    if email and token:
+        session.auth = (f"{email}/token", token)
+    return session
+
+
+class ArticleWriter:
+    """Grava páginas de artigos em lote (executemany) junto com o cursor da sincronização."""
+
+    def __init__(self, db_path: str):
+        self.conn = sqlite3.connect(db_path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.new = 0
+        self.updated = 0
+        self.removed = 0
+
+    def get_state(self, key: str) -> Optional[str]:
+        row = self.conn.execute("SELECT value FROM sync_state WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def write(self, articles: List[Dict[str, Any]], drafts: Iterable[int] = (),
+              state: Optional[Dict[str, Optional[str]]] = None) -> None:
+        """
+        Uma página numa transação: upsert de `articles`, remoção dos `drafts`
+        e o cursor `state` (valor None apaga a chave).
+        """
+        with self.conn:
+            self._upsert(articles)
+            for article_id in drafts:
+                self.removed += self.conn.execute("DELETE FROM articles WHERE id = ?", (article_id,)).rowcount
+            for key, value in (state or {}).items():
+                if value is None:
+                    self.conn.execute("DELETE FROM sync_state WHERE key = ?", (key,))
+                else:
+                    self.conn.execute(
+                        "INSERT INTO sync_state (key, value) VALUES (?, ?) "
+                        "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                        (key, value),
+                    )
+
+    def remember_query(self, query: str, article_ids: List[int], requested: int, fetched_at: float) -> None:
+        """Registra o resultado de uma busca remota (ids na ordem da Zendesk) para o cache por TTL."""
+        with self.conn:
+            self.conn.execute(
+                "INSERT INTO remote_queries (query, article_ids, requested, fetched_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(query) DO UPDATE SET article_ids = excluded.article_ids, "
+                "requested = excluded.requested, fetched_at = excluded.fetched_at",
+                (query, json.dumps(article_ids), requested, fetched_at),
+            )
+
+    def _upsert(self, articles: List[Dict[str, Any]]) -> None:
+        if not articles:
+            return
+        # Conta novos/alterados antes do upsert (o total_changes inclui o FTS dos triggers)
+        known: Dict[int, Optional[str]] = {}
+        ids = [a["id"] for a in articles]
+        for i in range(0, len(ids), 500):
+            chunk = ids[i:i + 500]
+            placeholders = ",".join("?" * len(chunk))
+            known.update(self.conn.execute(
+                f"SELECT id, updated_at FROM articles WHERE id IN ({placeholders})", chunk
+            ).fetchall())
+        for art in articles:
+            if art["id"] not in known:
+                self.new += 1
+            elif known[art["id"]] != art["updated_at"]:
+                self.updated += 1
+        self.conn.executemany(_UPSERT, articles)
+
+    def close(self) -> None:
+        self.conn.close()
+
 
 def index_articles(articles: List[Dict[str, Any]]):
     """Salva os artigos no banco de dados SQLite."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    count_new = 0
-    count_updated = 0
-    
-    for art in articles:
-        try:
-            # Verifica se já existe
-            cursor.execute("SELECT updated_at FROM articles WHERE id = ?", (art["id"],))
-            row = cursor.fetchone()
-            
-            if row:
-                if row[0] != art["updated_at"]:
-                    # Atualiza se mudou
-                    cursor.execute("""
-                        UPDATE articles 
-                        SET url=?, title=?, body=?, updated_at=? 
-                        WHERE id=?
-                    """, (art["url"], art["title"], art["body"], art["updated_at"], art["id"]))
-                    count_updated += 1
-            else:
-                # Insere novo
-                cursor.execute("""
-                    INSERT INTO articles (id, url, title, body, created_at, updated_at) 
-                    VALUES (?, ?, ?, ?, ?, ?)
-                """, (art["id"], art["url"], art["title"], art["body"], art["created_at"], art["updated_at"]))
-                count_new += 1
-                
-        except Exception as e:
-            logger.error(f"Erro ao indexar artigo {art['id']}: {e}")
-
-    conn.commit()
-    conn.close()
-    logger.info(f"Indexação concluída: {count_new} novos, {count_updated} atualizados.")
+    writer = ArticleWriter(DB_PATH)
+    try:
+        writer.write(articles)
+    finally:
+        writer.close()
+    logger.info(f"Indexação concluída: {writer.new} novos, {writer.updated} atualizados.")
+
+
+def _page_url(page: int, per_page: int) -> str:
+    # Ordem por criação: artigos novos entram no fim e não deslocam as páginas já baixadas
+    params = {"per_page": per_page, "page": page, "sort_by": "created_at", "sort_order": "asc"}
+    return f"{ZENDESK_API_URL}?{urlencode(params)}"
+
+
+def _full_sync(writer: ArticleWriter, session, budget: RateBudget, workers: int,
+               per_page: int, clock: Callable[[], float]) -> None:
+    """Carga completa com páginas em paralelo; retoma as páginas que faltaram na execução anterior."""
+    started = writer.get_state(STATE_FULL_STARTED)
+    if started is None:
+        started = str(int(clock()))
+        writer.write([], state={STATE_FULL_STARTED: started, STATE_FULL_PAGES: "[]"})
+    done = set(json.loads(writer.get_state(STATE_FULL_PAGES) or "[]"))
+
+    first = _get_json(session, _page_url(1, per_page), budget)
+    page_count = max(int(first.get("page_count") or 1), 1)
+    if 1 not in done:
+        done.add(1)
+        writer.write(*split_page(first.get("articles", [])), state={STATE_FULL_PAGES: json.dumps(sorted(done))})
+    pending = [p for p in range(2, page_count + 1) if p not in done]
+    logger.info(f"Carga completa: {page_count} páginas, {len(pending)} a baixar ({workers} em paralelo).")
+
+    # Janela limitada de downloads em andamento: a gravação consome na ordem em que chegam
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        queue = iter(pending)
+        running = {}
+        for page in queue:
+            running[pool.submit(_get_json, session, _page_url(page, per_page), budget)] = page
+            if len(running) >= workers * 2:
+                break
+        # Uma página com erro não descarta as que já chegaram: todas são gravadas
+        # (com o checkpoint) e o primeiro erro é relançado no fim
+        error: Optional[BaseException] = None
+        while running:
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                page = running.pop(future)
+                try:
+                    data = future.result()
+                except Exception as e:
+                    error = error or e
+                    continue
+                done.add(page)
+                writer.write(*split_page(data.get("articles", [])), state={STATE_FULL_PAGES: json.dumps(sorted(done))})
+                nxt = None if error else next(queue, None)
+                if nxt is not None:
+                    running[pool.submit(_get_json, session, _page_url(nxt, per_page), budget)] = nxt
+        if error is not None:
+            raise error
+
+    # O incremental segue do início da carga: o que mudou durante o download é relido
+    writer.write([], state={STATE_CURSOR: started, STATE_FULL_STARTED: None, STATE_FULL_PAGES: None})
+    # Depois de milhares de inserts via trigger, funde os segmentos do FTS
+    optimize(writer.conn)
+
+
+def _incremental_sync(writer: ArticleWriter, session, budget: RateBudget, cursor: int) -> None:
+    """
+    Exportação incremental a partir de `cursor`. As páginas são encadeadas
+    (cada uma aponta a próxima), então o paralelismo é baixar a seguinte
+    enquanto a atual é gravada.
+    """
+    url = f"{ZENDESK_INCREMENTAL_URL}?{urlencode({'start_time': cursor})}"
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        future = pool.submit(_get_json, session, url, budget)
+        while future is not None:
+            data = future.result()
+            items = data.get("articles", [])
+            end_time = int(data.get("end_time") or cursor)
+            next_page = data.get("next_page")
+            last = (data.get("end_of_stream") or not next_page
+                    or len(items) < INCREMENTAL_PAGE_LIMIT or end_time <= cursor)
+            future = None if last else pool.submit(_get_json, session, next_page, budget)
+            writer.write(*split_page(items), state={STATE_CURSOR: str(max(end_time, cursor))})
+            cursor = max(end_time, cursor)
+
+
+def sync(full: bool = False, session=None, budget: Optional[RateBudget] = None,
+         workers: int = ZENDESK_WORKERS, per_page: int = PER_PAGE,
+         clock: Callable[[], float] = time.time) -> Dict[str, int]:
+    """
+    Sincroniza a knowledge.db com a Central de Ajuda.
+    Sem cursor (ou com `full=True`) faz a carga completa; senão, só o incremental.
+    """
+    create_database()
+    session = session or _new_session()
+    budget = budget or RateBudget()
+    writer = ArticleWriter(DB_PATH)
+    t0 = time.perf_counter()
+    try:
+        if full and writer.get_state(STATE_FULL_STARTED) is None:
+            writer.write([], state={STATE_FULL_STARTED: str(int(clock())), STATE_FULL_PAGES: "[]"})
+        cursor = writer.get_state(STATE_CURSOR)
+        if cursor is None or writer.get_state(STATE_FULL_STARTED) is not None:
+            _full_sync(writer, session, budget, workers, per_page, clock)
+        else:
+            try:
+                _incremental_sync(writer, session, budget, int(cursor))
+            except requests.HTTPError as e:
+                if e.response is None or e.response.status_code not in (401, 403):
+                    raise
+                # Sem credenciais para a exportação: carga completa (o upsert só regrava o que mudou)
+                logger.warning("Exportação incremental sem permissão (defina ZENDESK_EMAIL/ZENDESK_API_TOKEN).")
+                _full_sync(writer, session, budget, workers, per_page, clock)
+        stats = {"novos": writer.new, "atualizados": writer.updated, "removidos": writer.removed}
+    finally:
+        writer.close()
+    logger.info(
+        f"Sincronização concluída em {time.perf_counter() - t0:.1f}s: {stats['novos']} novos, "
+        f"{stats['atualizados']} atualizados, {stats['removidos']} removidos."
+    )
+    return stats
+
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Indexador da Central de Ajuda Sankhya")
+    parser.add_argument("--full", action="store_true", help="Refaz a carga completa (ignora o cursor incremental)")
+    args = parser.parse_args()
     logger.info("Iniciando indexador de Knowledge Base Sankhya...")
-    create_database()
-    articles = fetch_articles()
-    logger.info(f"Total de {len(articles)} artigos baixados. Indexando...")
-    index_articles(articles)
+    try:
+        sync(full=args.full)
+    except (SyncError, requests.RequestException) as e:
+        logger.error(f"Sincronização interrompida (o cursor foi preservado): {e}")
+        sys.exit(1)
     logger.info("Processo finalizado com sucesso.")
@@ -0,0 +1,231 @@
+"""
+Schema da knowledge.db (artigos da Central de Ajuda + índices FTS5), único para
+os dois indexadores: mcp_server/knowledge_indexer.py (Zendesk) e
+scripts/knowledge_indexer.py (artigos seed).
+
+Os índices `articles_fts` (palavras) e `articles_trigram` (substring) são
+tabelas external-content sobre `articles`. Quem os mantém são os triggers de
+insert/update/delete, nunca o código dos indexadores. Antes, o script de seed
+fazia um INSERT manual no FTS que engolia erros, e um banco criado por ele
+ficava sem triggers: artigos atualizados sumiam da busca.
+
+Manutenção pela linha de comando:
+    python mcp_server/knowledge_schema.py check      # integridade FTS x articles
+    python mcp_server/knowledge_schema.py rebuild    # reconstrói os índices em lote
+    python mcp_server/knowledge_schema.py optimize   # funde os segmentos do FTS
+"""
+import os
+import sys
+import sqlite3
+import logging
+import argparse
+from typing import Any, Dict, List, Union
+
+logger = logging.getLogger("sankhya-knowledge-schema")
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "knowledge.db")
+
+FTS_TABLES = ("articles_fts", "articles_trigram")
+
+_ARTICLES_SCHEMA = """
+CREATE TABLE IF NOT EXISTS articles (
+    id INTEGER PRIMARY KEY,
+    url TEXT,
+    title TEXT,
+    body TEXT,
+    created_at TEXT,
+    updated_at TEXT
+);
+CREATE TABLE IF NOT EXISTS sync_state (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+-- Buscas feitas na Zendesk ao vivo (skills/zendesk_connector): ids na ordem de relevância
+CREATE TABLE IF NOT EXISTS remote_queries (
+    query TEXT PRIMARY KEY,
+    article_ids TEXT,
+    requested INTEGER,
+    fetched_at REAL
+);
+"""
+
+# Colunas que bancos criados pelo script de seed antigo não têm
+_ADDED_COLUMNS = {"url": "TEXT", "created_at": "TEXT", "updated_at": "TEXT"}
+
+_FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS articles_fts USING fts5(
+    title, body, content='articles', content_rowid='id'
+);
+CREATE TRIGGER IF NOT EXISTS articles_ai AFTER INSERT ON articles BEGIN
+  INSERT INTO articles_fts(rowid, title, body) VALUES (new.id, new.title, new.body);
+END;
+CREATE TRIGGER IF NOT EXISTS articles_ad AFTER DELETE ON articles BEGIN
+  INSERT INTO articles_fts(articles_fts, rowid, title, body) VALUES('delete', old.id, old.title, old.body);
+END;
+CREATE TRIGGER IF NOT EXISTS articles_au AFTER UPDATE ON articles BEGIN
+  INSERT INTO articles_fts(articles_fts, rowid, title, body) VALUES('delete', old.id, old.title, old.body);
+  INSERT INTO articles_fts(rowid, title, body) VALUES (new.id, new.title, new.body);
+END;
+"""
+
+_TRIGRAM_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS articles_trigram USING fts5(
+    title, body, content='articles', content_rowid='id', tokenize='trigram'
+);
+CREATE TRIGGER IF NOT EXISTS articles_trigram_ai AFTER INSERT ON articles BEGIN
+  INSERT INTO articles_trigram(rowid, title, body) VALUES (new.id, new.title, new.body);
+END;
+CREATE TRIGGER IF NOT EXISTS articles_trigram_ad AFTER DELETE ON articles BEGIN
+  INSERT INTO articles_trigram(articles_trigram, rowid, title, body) VALUES('delete', old.id, old.title, old.body);
+END;
+CREATE TRIGGER IF NOT EXISTS articles_trigram_au AFTER UPDATE ON articles BEGIN
+  INSERT INTO articles_trigram(articles_trigram, rowid, title, body) VALUES('delete', old.id, old.title, old.body);
+  INSERT INTO articles_trigram(rowid, title, body) VALUES (new.id, new.title, new.body);
+END;
+"""
+
+Target = Union[str, sqlite3.Connection]
+
+
+def _connect(target: Target) -> sqlite3.Connection:
+    return target if isinstance(target, sqlite3.Connection) else sqlite3.connect(target, timeout=30)
+
+
+def _close(target: Target, conn: sqlite3.Connection) -> None:
+    if conn is not target:
+        conn.close()
+
+
+def _existing_tables(conn: sqlite3.Connection) -> set:
+    return {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+
+
+def _triggers(conn: sqlite3.Connection) -> set:
+    return {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")}
+
+
+def ensure_schema(target: Target, trigram: bool = True) -> bool:
+    """
+    Cria (ou completa) articles, sync_state, remote_queries, articles_fts e, se `trigram`,
+    articles_trigram, com os triggers. Índices recém-criados sobre artigos já
+    existentes são populados com 'rebuild'. Retorna se o índice trigram está
+    disponível (o tokenizer exige SQLite >= 3.34).
+    """
+    conn = _connect(target)
+    try:
+        with conn:
+            conn.executescript(_ARTICLES_SCHEMA)
+            columns = {r[1] for r in conn.execute("PRAGMA table_info(articles)")}
+            for column, decl in _ADDED_COLUMNS.items():
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE articles ADD COLUMN {column} {decl}")
+
+            before = _existing_tables(conn)
+            had_triggers = _triggers(conn)
+            conn.executescript(_FTS_SCHEMA)
+            # Índice novo, ou antigo sem triggers (preenchido à mão): repopula de articles
+            if "articles_fts" not in before or "articles_au" not in had_triggers:
+                conn.execute("INSERT INTO articles_fts(articles_fts) VALUES('rebuild')")
+
+        if not trigram:
+            return "articles_trigram" in before
+        try:
+            with conn:
+                conn.executescript(_TRIGRAM_SCHEMA)
+                if "articles_trigram" not in before:
+                    conn.execute("INSERT INTO articles_trigram(articles_trigram) VALUES('rebuild')")
+                    logger.info("Índice trigram da base de conhecimento criado (articles_trigram)")
+            return True
+        except sqlite3.OperationalError as e:
+            logger.warning(f"FTS5 trigram indisponível, fallback por LIKE: {e}")
+            return False
+    finally:
+        _close(target, conn)
+
+
+def _fts_tables(conn: sqlite3.Connection) -> List[str]:
+    existing = _existing_tables(conn)
+    return [t for t in FTS_TABLES if t in existing]
+
+
+def rebuild(target: Target) -> List[str]:
+    """
+    Reconstrói os índices FTS a partir de `articles` em uma passada e os compacta.
+    Para cargas grandes é mais rápido que o trigger linha a linha. Também
+    corrige um índice divergente apontado por `integrity_check`.
+    """
+    conn = _connect(target)
+    try:
+        tables = _fts_tables(conn)
+        with conn:
+            for table in tables:
+                conn.execute(f"INSERT INTO {table}({table}) VALUES('rebuild')")
+                conn.execute(f"INSERT INTO {table}({table}) VALUES('optimize')")
+        logger.info(f"Índices reconstruídos: {', '.join(tables) or 'nenhum'}")
+        return tables
+    finally:
+        _close(target, conn)
+
+
+def optimize(target: Target) -> List[str]:
+    """Funde os segmentos dos índices FTS (consulta mais rápida após muitas sincronizações)."""
+    conn = _connect(target)
+    try:
+        tables = _fts_tables(conn)
+        with conn:
+            for table in tables:
+                conn.execute(f"INSERT INTO {table}({table}) VALUES('optimize')")
+        return tables
+    finally:
+        _close(target, conn)
+
+
+def integrity_check(target: Target) -> Dict[str, Any]:
+    """
+    Confere cada índice FTS contra `articles` ('integrity-check' com rank=1
+    compara com a tabela de conteúdo). Retorna {"ok": bool, "artigos": n,
+    "problemas": [...]}. Um índice com problema se corrige com `rebuild`.
+    """
+    conn = _connect(target)
+    try:
+        existing = _existing_tables(conn)
+        if "articles" not in existing:
+            return {"ok": False, "artigos": 0, "problemas": ["tabela articles ausente"]}
+        problems = []
+        if "articles_fts" not in existing:
+            problems.append("articles_fts ausente")
+        triggers = _triggers(conn)
+        for table in _fts_tables(conn):
+            prefix = "articles" if table == "articles_fts" else table
+            missing = [f"{prefix}_{op}" for op in ("ai", "ad", "au") if f"{prefix}_{op}" not in triggers]
+            if missing:
+                problems.append(f"{table}: triggers ausentes ({', '.join(missing)})")
+            try:
+                conn.execute(f"INSERT INTO {table}({table}, rank) VALUES('integrity-check', 1)")
+            except sqlite3.DatabaseError as e:
+                problems.append(f"{table}: {e}")
+        count = conn.execute("SELECT COUNT(*) FROM articles").fetchone()[0]
+        return {"ok": not problems, "artigos": count, "problemas": problems}
+    finally:
+        _close(target, conn)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Manutenção dos índices da knowledge.db")
+    parser.add_argument("command", choices=["check", "rebuild", "optimize"])
+    parser.add_argument("--db", default=DEFAULT_DB_PATH, help="Caminho da knowledge.db")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        print(f"knowledge.db não encontrada: {args.db}")
+        sys.exit(1)
+    if args.command == "rebuild":
+        # Completa colunas/triggers que faltarem antes de reconstruir
+        ensure_schema(args.db)
+        print(f"Reconstruídos: {', '.join(rebuild(args.db))}")
+    elif args.command == "optimize":
+        print(f"Otimizados: {', '.join(optimize(args.db))}")
+    result = integrity_check(args.db)
+    print(f"{result['artigos']} artigos - " + ("índices íntegros" if result["ok"] else "; ".join(result["problemas"])))
+    sys.exit(0 if result["ok"] else 1)
@@ -0,0 +1,202 @@
+"""
+Busca na base de artigos local (mcp_server/knowledge.db) usada por `search_solutions`.
+
+A versão anterior abria um `sqlite3.connect` a cada chamada e, sem resultado no
+FTS, caía num `LIKE '%kw%'` em title/body (varredura da tabela inteira). O LLM
+chama a ferramenta em todo ciclo de recuperação de erro, então aqui:
+
+- cada thread mantém uma conexão somente leitura (`mode=ro`, `query_only`) com
+  mmap e cache de páginas, reaberta apenas se o arquivo for substituído;
+- os SQLs são constantes com parâmetros `?`, então o cache de statements do
+  sqlite3 reaproveita o prepare entre chamadas;
+- o fallback por palavra-chave usa um índice FTS5 `tokenize='trigram'`
+  (articles_trigram), que responde busca por substring como o LIKE, só que
+  indexado. Schema e triggers ficam em knowledge_schema; um banco antigo é
+  completado na primeira abertura.
+"""
+import os
+import json
+import sqlite3
+import logging
+import threading
+from typing import Dict, List, Optional, Tuple
+
+try:
+    from knowledge_schema import ensure_schema
+except ImportError:
+    from mcp_server.knowledge_schema import ensure_schema
+
+logger = logging.getLogger("sankhya-knowledge-search")
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "knowledge.db")
+
+MMAP_SIZE = 256 * 1024 * 1024
+CACHE_KIB = 16 * 1024
+
+Article = Tuple[str, str, str]     # (title, body, url)
+
+_FTS_SEARCH = """
+    SELECT a.title, a.body, a.url
+    FROM articles_fts f
+    JOIN articles a ON a.id = f.rowid
+    WHERE articles_fts MATCH ?
+    ORDER BY f.rank
+    LIMIT ?
+"""
+
+_TRIGRAM_SEARCH = """
+    SELECT a.title, a.body, a.url
+    FROM articles_trigram t
+    JOIN articles a ON a.id = t.rowid
+    WHERE articles_trigram MATCH ?
+    ORDER BY t.rank
+    LIMIT ?
+"""
+
+# Só para SQLite sem o tokenizer trigram (< 3.34): mesmo LIKE de antes, com parâmetros
+_LIKE_SEARCH = """
+    SELECT title, body, url
+    FROM articles
+    WHERE title LIKE ?1 OR body LIKE ?1 OR title LIKE ?2 OR body LIKE ?2 OR title LIKE ?3 OR body LIKE ?3
+    LIMIT ?4
+"""
+
+def clean_query(query: str) -> str:
+    """Extrai a mensagem "core" do erro (sem prefixos do Gateway e caracteres de sintaxe FTS)."""
+    return (
+        query.replace("Erro Funcional Sankhya:", "").replace("HttpServiceBroker:", "")
+        .replace(":", " ").replace("*", " ").replace('"', " ").strip()
+    )
+
+
+def _phrase(term: str) -> str:
+    # Termo entre aspas: hífens, pontos e palavras reservadas (AND/OR/NOT) viram texto
+    return '"' + term.replace('"', '""') + '"'
+
+
+class KnowledgeSearch:
+    """Leitor da knowledge.db com conexão somente leitura por thread."""
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._trigram: Optional[bool] = None
+        self._file_id: Optional[Tuple[int, int]] = None
+
+    def exists(self) -> bool:
+        return os.path.exists(self.db_path)
+
+    def _current_file_id(self) -> Tuple[int, int]:
+        st = os.stat(self.db_path)
+        return st.st_dev, st.st_ino
+
+    def _prepare(self) -> None:
+        """Verificação única por arquivo (o indexador pode recriar a knowledge.db)."""
+        file_id = self._current_file_id()
+        if file_id == self._file_id:
+            return
+        with self._lock:
+            if file_id != self._file_id:
+                self._trigram = ensure_schema(self.db_path)
+                self._file_id = file_id
+
+    def _connection(self) -> sqlite3.Connection:
+        self._prepare()
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.file_id == self._file_id:
+            return conn
+        if conn is not None:
+            conn.close()
+        uri = "file:" + os.path.abspath(self.db_path).replace("?", "%3f") + "?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False, cached_statements=32)
+        conn.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
+        conn.execute(f"PRAGMA cache_size=-{CACHE_KIB}")
+        conn.execute("PRAGMA query_only=ON")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        self._local.conn = conn
+        self._local.file_id = self._file_id
+        return conn
+
+    def _run(self, sql: str, params: tuple) -> List[Article]:
+        try:
+            return self._connection().execute(sql, params).fetchall()
+        except sqlite3.OperationalError as e:
+            # Sintaxe FTS inválida ou tabela ausente: a estratégia seguinte tenta
+            logger.debug(f"Busca na knowledge base falhou: {e}")
+            return []
+
+    def search(self, query: str, limit: int = 3, substring: bool = True) -> List[Article]:
+        """
+        Estratégias em ordem, todas indexadas:
+        1. frase exata no FTS; 2. todas as palavras (> 4 letras) no FTS;
+        3. qualquer palavra-chave (> 3 letras) como substring no índice trigram
+           (desligada com `substring=False`, quando só acertos precisos servem).
+        """
+        cleaned = clean_query(query)
+        if not cleaned:
+            return []
+
+        rows = self._run(_FTS_SEARCH, (_phrase(cleaned), limit))
+        if rows:
+            return rows
+
+        words = [w for w in cleaned.split() if len(w) > 4]
+        if words:
+            rows = self._run(_FTS_SEARCH, (" AND ".join(_phrase(w) for w in words[:5]), limit))
+            if rows:
+                return rows
+
+        keywords = [w for w in cleaned.split() if len(w) > 3][:3]
+        if not keywords or not substring:
+            return []
+        if self._trigram:
+            return self._run(_TRIGRAM_SEARCH, (" OR ".join(_phrase(k) for k in keywords), limit))
+        patterns = [f"%{k}%" for k in keywords] + [None] * (3 - len(keywords))
+        return self._run(_LIKE_SEARCH, (*patterns, limit))
+
+    def all_articles(self) -> List[Tuple[int, str, str, str]]:
+        """(id, title, body, url) de todos os artigos (carga do índice unificado, ver search_index)."""
+        return self._connection().execute("SELECT id, title, body, url FROM articles").fetchall()
+
+    def articles_by_id(self, ids: List[int]) -> List[Article]:
+        """Artigos na ordem de `ids` (os ausentes da base são ignorados)."""
+        if not ids:
+            return []
+        placeholders = ",".join("?" * len(ids))
+        rows = self._connection().execute(
+            f"SELECT id, title, body, url FROM articles WHERE id IN ({placeholders})", list(ids)
+        ).fetchall()
+        by_id = {r[0]: r[1:] for r in rows}
+        return [by_id[i] for i in ids if i in by_id]
+
+    def remote_query(self, query: str) -> Optional[Tuple[List[int], int, float]]:
+        """(ids, quantidade pedida, fetched_at) de uma busca remota já feita, ou None."""
+        try:
+            row = self._connection().execute(
+                "SELECT article_ids, requested, fetched_at FROM remote_queries WHERE query = ?", (query,)
+            ).fetchone()
+        except sqlite3.OperationalError:
+            return None
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1], row[2]
+
+    def close(self) -> None:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+_SEARCHERS: Dict[str, KnowledgeSearch] = {}
+_SEARCHERS_LOCK = threading.Lock()
+
+
+def get_knowledge_search(db_path: str = DEFAULT_DB_PATH) -> KnowledgeSearch:
+    """Instância compartilhada por caminho (as conexões ficam por thread dentro dela)."""
+    with _SEARCHERS_LOCK:
+        searcher = _SEARCHERS.get(db_path)
+        if searcher is None:
+            searcher = _SEARCHERS[db_path] = KnowledgeSearch(db_path)
+        return searcher
@@ -0,0 +1,365 @@
+"""
+Cache read-through para `SankhyaGatewayClient.execute_query`.
+
+O mesmo SQL é enviado ao Gateway várias vezes: consultas ao dicionário (TDICAM)
+que o LLM repete dentro de um mesmo ciclo OODA, resumos de estoque por grupo,
+queries dos watchers... Este módulo guarda o resultado por SQL normalizado, com:
+
+- TTL por classe de query (dicionário de dados por horas, estoque por segundos);
+- LRU em memória limitado por bytes;
+- backend SQLite opcional, compartilhado entre Streamlit, servidor MCP e worker;
+- invalidação por tabela ou total.
+
+É opt-in: só fica ativo com `SANKHYA_QUERY_CACHE=1` (ou passando um `QueryCache`
+explícito ao cliente).
+"""
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Optional, List, Dict, Any, Callable, Iterator, Tuple
+
+logger = logging.getLogger("sankhya-query-cache")
+
+
+@dataclass(frozen=True)
+class TTLClass:
+    """Classe de query: tabelas que a identificam e por quanto tempo o resultado vale."""
+    name: str
+    tables: Tuple[str, ...]
+    ttl_seconds: float
+
+
+# A classe mais volátil entre as tabelas citadas define o TTL do resultado.
+DEFAULT_TTL_CLASSES = (
+    TTLClass("estoque", ("TGFEST", "TGFGIR", "TGFRES"), 15),
+    TTLClass("movimento", ("TGFCAB", "TGFITE", "TGFFIN", "TGFVAR"), 120),
+    TTLClass("cadastro", ("TGFPRO", "TGFPAR", "TGFGRU", "TSIEMP", "TGFTOP", "TSIUSU"), 1800),
+    TTLClass("dicionario", ("TDICAM", "TDDCAM", "TDDINS", "TDDTAB", "ALL_TAB_COLUMNS", "ALL_TABLES", "ALL_VIEWS"), 6 * 3600),
+)
+DEFAULT_TTL = 60
+
+_TABLE_TOKEN = re.compile(r"[A-Z_][A-Z0-9_$#]*")
+_FROM_JOIN = re.compile(r"\b(?:FROM|JOIN)\s+([A-Z_][A-Z0-9_$#.]*)")
+_KNOWN_TABLES = {t for c in DEFAULT_TTL_CLASSES for t in c.tables}
+# Literais '...' e identificadores "..." (com a aspa dobrada como escape) ficam intactos, como em sql_binder._scan
+_STRING_OR_SPACE = re.compile(r"""('(?:[^']|'')*'|"(?:[^"]|"")*")|(\s+)""")
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def normalize_sql(sql: str) -> str:
+    """
+    Normaliza o SQL para uso como chave: colapsa espaços fora de literais,
+    remove `;` final e padroniza maiúsculas fora das strings e dos
+    identificadores entre aspas duplas (no Oracle, "Total" e "TOTAL" diferem).
+    """
+    parts = []
+    last = 0
+    text = sql.strip().rstrip(";").strip()
+    for match in _STRING_OR_SPACE.finditer(text):
+        parts.append(text[last:match.start()].upper())
+        parts.append(match.group(1) if match.group(1) else " ")
+        last = match.end()
+    parts.append(text[last:].upper())
+    return "".join(parts)
+
+
+def referenced_tables(normalized_sql: str) -> List[str]:
+    """
+    Tabelas citadas no SQL (ignorando literais): tudo que vem após FROM/JOIN,
+    mais qualquer tabela das classes de TTL (cobre joins com vírgula).
+    """
+    without_literals = re.sub(r"'(?:[^']|'')*'", "''", normalized_sql)
+    tables = {name.split(".")[-1] for name in _FROM_JOIN.findall(without_literals)}
+    tables.update(t for t in _TABLE_TOKEN.findall(without_literals) if t in _KNOWN_TABLES)
+    return sorted(tables)
+
+
+class QueryCache:
+    """
+    Cache de resultados de SELECT com TTL por classe e LRU por bytes.
+
+    Os resultados são guardados serializados em JSON: o tamanho em bytes é exato
+    e cada acerto devolve uma cópia nova (quem chama pode alterar as linhas sem
+    corromper o cache).
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = 32 * 1024 * 1024,
+        ttl_classes: Tuple[TTLClass, ...] = DEFAULT_TTL_CLASSES,
+        default_ttl: float = DEFAULT_TTL,
+        db_path: Optional[str] = None,
+    ):
+        self.max_bytes = max_bytes
+        self.ttl_classes = ttl_classes
+        self.default_ttl = default_ttl
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        # chave -> (expira_em, tabelas, payload JSON em UTF-8); o orçamento conta bytes, não caracteres
+        self._entries: "OrderedDict[str, Tuple[float, Tuple[str, ...], bytes]]" = OrderedDict()
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._shared_hits = 0
+        if db_path:
+            self._init_db()
+
+    @classmethod
+    def from_env(cls) -> Optional["QueryCache"]:
+        """Cria o cache se `SANKHYA_QUERY_CACHE` estiver ligado; senão retorna None."""
+        enabled = (os.getenv("SANKHYA_QUERY_CACHE") or "").strip().lower()
+        if enabled not in {"1", "true", "yes", "y", "on"}:
+            return None
+        return cls(
+            max_bytes=_env_int("SANKHYA_QUERY_CACHE_MAX_BYTES", 32 * 1024 * 1024),
+            default_ttl=_env_int("SANKHYA_QUERY_CACHE_DEFAULT_TTL", DEFAULT_TTL),
+            db_path=os.getenv("SANKHYA_QUERY_CACHE_DB") or None,
+        )
+
+    # ------------------------------------------------------------------
+    # Classificação
+    # ------------------------------------------------------------------
+
+    def ttl_for(self, tables: List[str]) -> float:
+        """Menor TTL entre as classes das tabelas citadas (a mais volátil vence)."""
+        ttls = [c.ttl_seconds for c in self.ttl_classes if any(t in c.tables for t in tables)]
+        return min(ttls) if ttls else self.default_ttl
+
+    @staticmethod
+    def make_key(normalized_sql: str) -> str:
+        return hashlib.sha256(normalized_sql.encode("utf-8")).hexdigest()
+
+    # ------------------------------------------------------------------
+    # Leitura / escrita
+    # ------------------------------------------------------------------
+
+    def get_or_load(self, sql: str, loader: Callable[[], List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """Read-through: devolve o resultado em cache ou executa `loader` e guarda."""
+        cached = self.lookup(sql)
+        if cached is not None:
+            return cached
+
+        rows = loader()
+        self.store(sql, rows)
+        return rows
+
+    def lookup(self, sql: str) -> Optional[List[Dict[str, Any]]]:
+        """Resultado em cache para o SQL (None se ausente ou expirado)."""
+        return self._get(self.make_key(normalize_sql(sql)))
+
+    def store(self, sql: str, rows: List[Dict[str, Any]]):
+        """Guarda o resultado do SQL com o TTL da sua classe."""
+        normalized = normalize_sql(sql)
+        tables = referenced_tables(normalized)
+        self._put(self.make_key(normalized), normalized, tuple(tables), rows, self.ttl_for(tables))
+
+    def _get(self, key: str) -> Optional[List[Dict[str, Any]]]:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self._hits += 1
+                    return json.loads(entry[2])
+                self._drop(key)
+
+        if self.db_path:
+            row = self._db_get(key, now)
+            if row is not None:
+                expires_at, tables, payload = row
+                with self._lock:
+                    self._hits += 1
+                    self._shared_hits += 1
+                    self._store(key, expires_at, tables, payload)
+                return json.loads(payload)
+
+        with self._lock:
+            self._misses += 1
+        return None
+
+    def _put(self, key: str, normalized: str, tables: Tuple[str, ...], rows: List[Dict[str, Any]], ttl: float):
+        if ttl <= 0:
+            return
+        payload = json.dumps(rows, default=str, ensure_ascii=False).encode("utf-8")
+        if len(payload) > self.max_bytes:
+            logger.debug(f"Resultado de {len(payload)} bytes excede o orçamento do cache; não será guardado.")
+            return
+        expires_at = time.time() + ttl
+        with self._lock:
+            self._store(key, expires_at, tables, payload)
+        if self.db_path:
+            self._db_put(key, normalized, tables, payload, expires_at)
+
+    def _store(self, key: str, expires_at: float, tables: Tuple[str, ...], payload: bytes):
+        """Insere no LRU e despeja os menos usados até caber no orçamento (chamar com lock)."""
+        if key in self._entries:
+            self._drop(key)
+        self._entries[key] = (expires_at, tables, payload)
+        self._bytes += len(payload)
+        while self._bytes > self.max_bytes and self._entries:
+            oldest = next(iter(self._entries))
+            self._drop(oldest)
+
+    def _drop(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= len(entry[2])
+
+    # ------------------------------------------------------------------
+    # Invalidação
+    # ------------------------------------------------------------------
+
+    def invalidate(self, table: Optional[str] = None, sql: Optional[str] = None) -> int:
+        """Remove entradas de uma tabela ou de um SQL específico. Retorna quantas saíram da memória."""
+        removed = 0
+        with self._lock:
+            if sql is not None:
+                key = self.make_key(normalize_sql(sql))
+                if key in self._entries:
+                    self._drop(key)
+                    removed += 1
+            if table is not None:
+                table = table.upper()
+                for key in [k for k, e in self._entries.items() if table in e[1]]:
+                    self._drop(key)
+                    removed += 1
+        if self.db_path:
+            self._db_invalidate(table, sql)
+        return removed
+
+    def invalidate_volatile(self):
+        """Descarta tudo que não é dicionário de dados (usado após gravações no ERP)."""
+        stable = {t for c in self.ttl_classes if c.name == "dicionario" for t in c.tables}
+        with self._lock:
+            for key in [k for k, e in self._entries.items() if not e[1] or not set(e[1]) <= stable]:
+                self._drop(key)
+        if self.db_path:
+            # Roda depois de uma gravação já confirmada no ERP: falha aqui não pode virar erro da gravação
+            try:
+                with self._connect() as conn:
+                    rows = conn.execute("SELECT key, tables FROM query_cache").fetchall()
+                    doomed = [(k,) for k, t in rows if not t or not set(t.strip(",").split(",")) <= stable]
+                    conn.executemany("DELETE FROM query_cache WHERE key = ?", doomed)
+            except sqlite3.Error as e:
+                logger.warning(f"Cache compartilhado indisponível (invalidação): {e}")
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+        if self.db_path:
+            with self._connect() as conn:
+                conn.execute("DELETE FROM query_cache")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self._hits,
+                "shared_hits": self._shared_hits,
+                "misses": self._misses,
+                "hit_ratio": round(self._hits / total, 4) if total else 0.0,
+                "shared_backend": self.db_path,
+            }
+
+    # ------------------------------------------------------------------
+    # Backend SQLite compartilhado
+    # ------------------------------------------------------------------
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """Conexão com o banco compartilhado numa transação, fechada ao sair do bloco."""
+        conn = sqlite3.connect(self.db_path, timeout=5)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _init_db(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS query_cache (
+                    key TEXT PRIMARY KEY,
+                    sql TEXT,
+                    tables TEXT,
+                    payload TEXT,
+                    size INTEGER,
+                    expires_at REAL,
+                    accessed_at REAL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_query_cache_accessed ON query_cache(accessed_at)")
+
+    def _db_get(self, key: str, now: float) -> Optional[Tuple[float, Tuple[str, ...], bytes]]:
+        try:
+            with self._connect() as conn:
+                row = conn.execute(
+                    "SELECT expires_at, tables, payload FROM query_cache WHERE key = ? AND expires_at > ?",
+                    (key, now)
+                ).fetchone()
+                if row is None:
+                    return None
+                conn.execute("UPDATE query_cache SET accessed_at = ? WHERE key = ?", (now, key))
+            tables = tuple(t for t in row[1].strip(",").split(",") if t)
+            # Bancos gravados antes guardam o payload como texto
+            payload = row[2].encode("utf-8") if isinstance(row[2], str) else row[2]
+            return row[0], tables, payload
+        except sqlite3.Error as e:
+            logger.warning(f"Cache compartilhado indisponível (leitura): {e}")
+            return None
+
+    def _db_put(self, key: str, normalized: str, tables: Tuple[str, ...], payload: bytes, expires_at: float):
+        now = time.time()
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO query_cache (key, sql, tables, payload, size, expires_at, accessed_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (key, normalized, f",{','.join(tables)},", payload, len(payload), expires_at, now)
+                )
+                conn.execute("DELETE FROM query_cache WHERE expires_at <= ?", (now,))
+                total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM query_cache").fetchone()[0]
+                if total > self.max_bytes:
+                    # LRU por último acesso até voltar ao orçamento
+                    excess = total - self.max_bytes
+                    for old_key, size in conn.execute(
+                        "SELECT key, size FROM query_cache ORDER BY accessed_at ASC"
+                    ).fetchall():
+                        if excess <= 0:
+                            break
+                        conn.execute("DELETE FROM query_cache WHERE key = ?", (old_key,))
+                        excess -= size
+        except sqlite3.Error as e:
+            logger.warning(f"Cache compartilhado indisponível (escrita): {e}")
+
+    def _db_invalidate(self, table: Optional[str], sql: Optional[str]):
+        try:
+            with self._connect() as conn:
+                if sql is not None:
+                    conn.execute("DELETE FROM query_cache WHERE key = ?", (self.make_key(normalize_sql(sql)),))
+                if table is not None:
+                    conn.execute("DELETE FROM query_cache WHERE tables LIKE ?", (f"%,{table.upper()},%",))
+        except sqlite3.Error as e:
+            logger.warning(f"Cache compartilhado indisponível (invalidação): {e}")
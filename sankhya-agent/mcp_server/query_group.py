@@ -0,0 +1,111 @@
+"""
+Grupo de queries independentes executadas em paralelo.
+
+Relatórios como o Equilíbrio Financeiro disparavam 3–4 SELECTs que não dependem
+um do outro, um após o outro: a latência era a soma de todos. Aqui cada query
+recebe um nome e o grupo roda tudo num pool limitado (teto de concorrência), com
+um único prazo compartilhado. O resultado é sempre parcial-tolerante: o que
+terminou a tempo volta com as linhas; o que falhou ou estourou o prazo volta
+como erro por nome, sem derrubar as demais.
+
+Uso:
+    group = QueryGroup()
+    group.add("caixa", sankhya.execute_query, sql_caixa)
+    group.add("estoque", sankhya.execute_query, sql_estoque)
+    result = group.run()
+    result.rows("caixa")      # [] quando a query falhou
+    result.errors             # {"estoque": "tempo limite de 60s excedido"}
+"""
+import os
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger("sankhya-query-group")
+
+QUERY_GROUP_MAX_CONCURRENCY = int(os.getenv("SANKHYA_QUERY_GROUP_CONCURRENCY", "4"))
+QUERY_GROUP_DEADLINE_SECONDS = float(os.getenv("SANKHYA_QUERY_GROUP_DEADLINE", "60"))
+
+
+@dataclass
+class QueryGroupResult:
+    """Linhas por nome de query, erros por nome e tempo de cada uma (s)."""
+    results: Dict[str, List[Dict[str, Any]]] = field(default_factory=dict)
+    errors: Dict[str, str] = field(default_factory=dict)
+    elapsed: Dict[str, float] = field(default_factory=dict)
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+    def rows(self, name: str) -> List[Dict[str, Any]]:
+        """Linhas da query `name` ([] quando falhou, estourou o prazo ou não existe)."""
+        return self.results.get(name) or []
+
+    def error_list(self) -> List[Dict[str, str]]:
+        """Erros no formato usado nas respostas das skills: [{"consulta", "erro"}]."""
+        return [{"consulta": name, "erro": message} for name, message in self.errors.items()]
+
+
+class QueryGroup:
+    """
+    Conjunto de chamadas nomeadas (função + argumentos) que não dependem entre si.
+
+    - `max_concurrency`: quantas rodam ao mesmo tempo (o Gateway limita conexões).
+    - `deadline_seconds`: prazo único para o grupo inteiro, contado a partir de run().
+    """
+
+    def __init__(self, max_concurrency: Optional[int] = None, deadline_seconds: Optional[float] = None):
+        self.max_concurrency = max(1, int(max_concurrency or QUERY_GROUP_MAX_CONCURRENCY))
+        self.deadline_seconds = float(deadline_seconds if deadline_seconds is not None else QUERY_GROUP_DEADLINE_SECONDS)
+        self._calls: Dict[str, Tuple[Callable[..., Any], tuple, dict]] = {}
+
+    def add(self, name: str, fn: Callable[..., Any], *args, **kwargs) -> "QueryGroup":
+        if name in self._calls:
+            raise ValueError(f"Query duplicada no grupo: {name}")
+        self._calls[name] = (fn, args, kwargs)
+        return self
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    def run(self) -> QueryGroupResult:
+        result = QueryGroupResult()
+        if not self._calls:
+            return result
+
+        started = time.monotonic()
+        deadline = started + self.deadline_seconds
+
+        def _timed(fn, args, kwargs):
+            t0 = time.monotonic()
+            rows = fn(*args, **kwargs)
+            return rows, time.monotonic() - t0
+
+        workers = min(self.max_concurrency, len(self._calls))
+        executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="sankhya-qgroup")
+        try:
+            futures = {name: executor.submit(_timed, *call) for name, call in self._calls.items()}
+            for name, future in futures.items():
+                try:
+                    rows, took = future.result(timeout=max(deadline - time.monotonic(), 0))
+                    result.results[name] = rows if rows is not None else []
+                    result.elapsed[name] = took
+                except FutureTimeoutError:
+                    future.cancel()
+                    result.errors[name] = f"tempo limite de {self.deadline_seconds:.0f}s excedido"
+                except Exception as e:
+                    result.errors[name] = str(e)
+        finally:
+            # Não espera queries abandonadas pelo prazo (a thread não pode ser interrompida)
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        total = time.monotonic() - started
+        if result.errors:
+            logger.warning(f"Grupo de queries com falhas parciais ({total:.2f}s): {result.errors}")
+        else:
+            logger.debug(f"Grupo de {len(self._calls)} queries concluído em {total:.2f}s")
+        return result
+
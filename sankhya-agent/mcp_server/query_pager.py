@@ -0,0 +1,102 @@
+"""
+Paginação de queries grandes no DbExplorerSP.
+
+Varreduras como a TGFGIR inteira (get_giro_data) ou agregações da TGFITE estouram
+o timeout de 30s do Gateway ou batem no limite de linhas por resposta. Aqui a query
+original é embrulhada em janelas e buscada página a página:
+
+- `rownum`: janelas ROWNUM (compatível com Oracle 11g), páginas independentes que
+  podem ser buscadas em paralelo;
+- `offset`: OFFSET/FETCH (Oracle 12c+), mesma semântica do modo rownum;
+- `keyset`: faixas por uma coluna-chave única e crescente (`WHERE KEY > :ultimo`),
+  sequencial, mas estável mesmo com a tabela mudando durante a leitura.
+
+Toda página carrega um `PageCursor` que permite retomar a leitura de onde parou.
+"""
+import json
+import base64
+from dataclasses import dataclass, asdict, replace
+from typing import Any, Dict, List, Optional
+
+PAGE_MODES = ("rownum", "offset", "keyset")
+
+# Coluna técnica adicionada pelo modo rownum (removida antes de devolver as linhas)
+ROWNUM_COLUMN = "SSA_RN"
+
+
+@dataclass(frozen=True)
+class PageCursor:
+    """Posição de leitura de uma query paginada (serializável para retomar depois)."""
+    mode: str = "rownum"
+    page_size: int = 5000
+    offset: int = 0                  # rownum/offset: linhas já entregues
+    last_key: Optional[Any] = None   # keyset: última chave entregue
+    done: bool = False
+
+    def advance(self, rows: List[Dict[str, Any]], key_column: Optional[str] = None) -> "PageCursor":
+        """Cursor após entregar `rows` (página curta = fim da query)."""
+        done = len(rows) < self.page_size
+        if self.mode == "keyset":
+            last_key = rows[-1][key_column] if rows else self.last_key
+            return replace(self, last_key=last_key, done=done)
+        return replace(self, offset=self.offset + len(rows), done=done)
+
+    def to_token(self) -> str:
+        return base64.urlsafe_b64encode(json.dumps(asdict(self), default=str).encode("utf-8")).decode("ascii")
+
+    @classmethod
+    def from_token(cls, token: str) -> "PageCursor":
+        return cls(**json.loads(base64.urlsafe_b64decode(token.encode("ascii"))))
+
+
+@dataclass
+class Page:
+    """Uma página de resultados e o cursor para continuar a partir dela."""
+    index: int
+    rows: List[Dict[str, Any]]
+    cursor: PageCursor
+
+
+def _strip_sql(sql: str) -> str:
+    cleaned = sql.strip()
+    while cleaned.endswith(";"):
+        cleaned = cleaned[:-1].rstrip()
+    return cleaned
+
+
+def _sql_literal(value: Any) -> str:
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def build_window_sql(sql: str, order_by: Optional[str], offset: int, page_size: int, mode: str = "rownum") -> str:
+    """
+    Embrulha a query numa janela [offset, offset + page_size).
+    A ordenação precisa ser total (inclua uma chave única no ORDER BY) para que
+    as páginas não se sobreponham nem pulem linhas.
+    """
+    base = _strip_sql(sql)
+    ordered = f"SELECT * FROM (\n{base}\n) SSA_BASE ORDER BY {order_by}" if order_by else base
+
+    if mode == "offset":
+        return f"{ordered}\nOFFSET {int(offset)} ROWS FETCH NEXT {int(page_size)} ROWS ONLY"
+
+    return (
+        f"SELECT * FROM (\n"
+        f"  SELECT SSA_PAGE.*, ROWNUM AS {ROWNUM_COLUMN} FROM (\n{ordered}\n  ) SSA_PAGE\n"
+        f"  WHERE ROWNUM <= {int(offset) + int(page_size)}\n"
+        f") WHERE {ROWNUM_COLUMN} > {int(offset)}"
+    )
+
+
+def build_keyset_sql(sql: str, key_column: str, last_key: Optional[Any], page_size: int) -> str:
+    """Próxima faixa por chave: linhas com KEY > última chave, em ordem crescente de KEY."""
+    base = _strip_sql(sql)
+    where = f"WHERE SSA_BASE.{key_column} > {_sql_literal(last_key)}" if last_key is not None else ""
+    return (
+        f"SELECT * FROM (\n"
+        f"  SELECT * FROM (\n{base}\n  ) SSA_BASE {where}\n"
+        f"  ORDER BY SSA_BASE.{key_column}\n"
+        f") WHERE ROWNUM <= {int(page_size)}"
+    )
@@ -0,0 +1,229 @@
+"""
+Decodificador incremental das respostas do DbExplorerSP.executeQuery.
+
+A resposta tem o formato:
+
+    {"serviceName": "...", "status": "1",
+     "responseBody": {"fieldsMetadata": [{"name": "CODPROD", ...}, ...],
+                      "rows": [[1, "X"], [2, "Y"], ...]}}
+
+Carregar o corpo inteiro com `response.json()` e depois montar um dict por linha
+dobra o pico de memória em consultas grandes (ex: 50 mil linhas da TGFGIR).
+Aqui o JSON é lido em pedaços: cada linha de `rows` é decodificada e entregue assim
+que chega, e o resultado pode ficar compacto (colunas compartilhadas + tuplas) ou
+colunar/DataFrame. `QueryResult.to_dicts()` mantém o formato List[Dict] antigo.
+"""
+import json
+import codecs
+from typing import Iterable, Iterator, List, Dict, Any, Optional, Tuple
+
+_WHITESPACE = " \t\n\r"
+# Tamanho mínimo do trecho já consumido antes de compactar o buffer
+_COMPACT_THRESHOLD = 64 * 1024
+
+
+class RowStreamError(Exception):
+    """JSON malformado ou truncado na resposta do Gateway."""
+
+
+class StreamingRowDecoder:
+    """
+    Parser pull sobre um iterável de chunks (bytes ou str).
+
+    Iterar sobre o decoder produz cada linha de `responseBody.rows` (como tupla)
+    à medida que é lida. Os demais campos ficam disponíveis em `fields`, `status`,
+    `status_message` e `header` — `fields` já está preenchido antes da primeira
+    linha sempre que o Gateway envia `fieldsMetadata` antes de `rows` (o usual).
+    """
+
+    def __init__(self, chunks: Iterable[Any], encoding: str = "utf-8"):
+        self._chunks = iter(chunks)
+        self._decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+        self._json = json.JSONDecoder()
+        self._buf = ""
+        self._pos = 0
+        self._eof = False
+        self.fields: Optional[List[str]] = None
+        self.header: Dict[str, Any] = {}
+        self.body: Dict[str, Any] = {}
+
+    # ------------------------------------------------------------------
+    # Metadados
+    # ------------------------------------------------------------------
+
+    @property
+    def status(self) -> Optional[str]:
+        status = self.header.get("status")
+        return str(status) if status is not None else None
+
+    @property
+    def status_message(self) -> str:
+        return self.header.get("statusMessage") or "Erro na execução da query"
+
+    # ------------------------------------------------------------------
+    # Buffer
+    # ------------------------------------------------------------------
+
+    def _fill(self) -> bool:
+        """Lê mais um chunk para o buffer. Retorna False no fim do stream."""
+        if self._eof:
+            return False
+        if self._pos > _COMPACT_THRESHOLD:
+            self._buf = self._buf[self._pos:]
+            self._pos = 0
+        for chunk in self._chunks:
+            if not chunk:
+                continue
+            text = self._decoder.decode(chunk) if isinstance(chunk, (bytes, bytearray)) else chunk
+            if text:
+                self._buf += text
+                return True
+        self._buf += self._decoder.decode(b"", final=True)
+        self._eof = True
+        return False
+
+    def _peek(self) -> str:
+        """Próximo caractere não branco (sem consumir). '' no fim do stream."""
+        while True:
+            while self._pos < len(self._buf) and self._buf[self._pos] in _WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._fill():
+                return ""
+
+    def _expect(self, char: str):
+        found = self._peek()
+        if found != char:
+            raise RowStreamError(f"Esperado '{char}' na resposta do Gateway, encontrado '{found or 'EOF'}'")
+        self._pos += 1
+
+    def _value(self) -> Any:
+        """Decodifica o próximo valor JSON completo, lendo mais chunks se necessário."""
+        self._peek()
+        while True:
+            try:
+                value, end = self._json.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError:
+                if self._fill():
+                    continue
+                raise RowStreamError("Resposta do Gateway truncada ou inválida")
+            # Número no fim do buffer pode estar cortado ("12" de "123"): confirma com mais dados
+            if end == len(self._buf) and not self._eof and self._fill():
+                continue
+            self._pos = end
+            return value
+
+    def _object_items(self) -> Iterator[str]:
+        """Itera as chaves de um objeto; o chamador consome o valor de cada uma."""
+        self._expect("{")
+        if self._peek() == "}":
+            self._pos += 1
+            return
+        while True:
+            key = self._value()
+            self._expect(":")
+            yield key
+            separator = self._peek()
+            self._pos += 1
+            if separator == "}":
+                return
+            if separator != ",":
+                raise RowStreamError(f"Separador inesperado '{separator or 'EOF'}' na resposta do Gateway")
+
+    # ------------------------------------------------------------------
+    # Iteração
+    # ------------------------------------------------------------------
+
+    def __iter__(self) -> Iterator[Tuple[Any, ...]]:
+        for key in self._object_items():
+            if key == "responseBody" and self._peek() == "{":
+                yield from self._body_rows()
+            else:
+                self.header[key] = self._value()
+
+    def _body_rows(self) -> Iterator[Tuple[Any, ...]]:
+        for key in self._object_items():
+            if key == "rows" and self._peek() == "[":
+                yield from self._array_rows()
+            elif key == "fieldsMetadata":
+                metadata = self._value() or []
+                self.body[key] = metadata
+                self.fields = [f["name"] for f in metadata]
+            else:
+                self.body[key] = self._value()
+
+    def _array_rows(self) -> Iterator[Tuple[Any, ...]]:
+        self._expect("[")
+        if self._peek() == "]":
+            self._pos += 1
+            return
+        while True:
+            yield tuple(self._value())
+            separator = self._peek()
+            self._pos += 1
+            if separator == "]":
+                return
+            if separator != ",":
+                raise RowStreamError(f"Separador inesperado '{separator or 'EOF'}' nas linhas do Gateway")
+
+
+class QueryResult:
+    """
+    Resultado compacto: nomes de colunas compartilhados + linhas em tuplas.
+
+    Ocupa bem menos memória que uma lista de dicts (as chaves não se repetem por
+    linha) e converte sob demanda para dicts, formato colunar ou DataFrame.
+    """
+
+    __slots__ = ("columns", "rows", "_index")
+
+    def __init__(self, columns: List[str], rows: List[Tuple[Any, ...]]):
+        self.columns = columns
+        self.rows = rows
+        self._index = {name: i for i, name in enumerate(columns)}
+
+    @classmethod
+    def from_decoder(cls, decoder: StreamingRowDecoder) -> "QueryResult":
+        rows = list(decoder)
+        return cls(decoder.fields or [], rows)
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __bool__(self) -> bool:
+        return bool(self.rows)
+
+    def column_index(self, name: str) -> int:
+        return self._index[name]
+
+    def value(self, row: int, column: str) -> Any:
+        return self.rows[row][self._index[column]]
+
+    def iter_dicts(self) -> Iterator[Dict[str, Any]]:
+        columns = self.columns
+        for row in self.rows:
+            yield dict(zip(columns, row))
+
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        """Formato histórico de execute_query: uma lista de dicts por linha."""
+        return list(self.iter_dicts())
+
+    def columnar(self) -> Dict[str, List[Any]]:
+        """{coluna: [valores]} — útil para agregações e para montar DataFrames."""
+        if not self.rows:
+            return {name: [] for name in self.columns}
+        return {name: list(values) for name, values in zip(self.columns, zip(*self.rows))}
+
+    def to_dataframe(self):
+        import pandas as pd
+        return pd.DataFrame.from_records(self.rows, columns=self.columns)
+
+
+def decode_query_response(chunks: Iterable[Any]) -> QueryResult:
+    """Decodifica uma resposta completa do DbExplorerSP, validando o status."""
+    decoder = StreamingRowDecoder(chunks)
+    result = QueryResult.from_decoder(decoder)
+    if decoder.status != "1":
+        raise Exception(decoder.status_message)
+    return result
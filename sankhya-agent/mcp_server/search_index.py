@@ -0,0 +1,370 @@
+"""
+Índice de busca unificado (BM25 em memória) da base de conhecimento local.
+
+`search_docs` relia e passava para minúsculas cada arquivo de knowledge/ a cada
+chamada (busca linear por substring) e `search_solutions` consultava outra
+tabela FTS. Aqui um único índice invertido cobre:
+
+- knowledge/*.md (um documento por seção de título) e demais arquivos texto;
+- regras de negócio (business_rules.*) e o mapa de tabelas (schema_map.json,
+  um documento por tabela);
+- os artigos da knowledge.db (lidos pela conexão somente leitura de
+  knowledge_search).
+
+O índice é montado uma vez e atualizado por fonte: arquivos cujo mtime mudou
+são reindexados e os artigos são comparados por assinatura, então só os
+alterados entram de novo. A consulta pontua só os documentos que têm algum
+termo (listas invertidas), com BM25 (mesma forma da classe BM25 de
+.agent/.shared/ui-ux-pro-max/scripts/core.py), bônus para a frase exata e
+trecho (snippet) em torno das linhas com mais termos.
+"""
+import os
+import re
+import json
+import math
+import time
+import heapq
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+try:
+    from knowledge_search import KnowledgeSearch, get_knowledge_search, DEFAULT_DB_PATH
+except ImportError:
+    from mcp_server.knowledge_search import KnowledgeSearch, get_knowledge_search, DEFAULT_DB_PATH
+
+logger = logging.getLogger("sankhya-search-index")
+
+KNOWLEDGE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "knowledge")
+
+# Intervalo mínimo entre duas conferências de mtime das fontes
+REFRESH_CHECK_SECONDS = 2.0
+# Candidatos (por BM25) conferidos quanto à frase exata da consulta
+PHRASE_CANDIDATES = 50
+
+KIND_DOC = "doc"
+KIND_RULES = "regras"
+KIND_SCHEMA = "schema"
+KIND_ARTICLE = "artigo"
+
+ARTICLES_SOURCE = "knowledge.db"
+
+# Arquivos de knowledge/ que entram no índice (os .db e o painel do worker ficam de fora)
+INDEXED_EXTENSIONS = (".md", ".txt", ".json")
+IGNORED_FILES = {"active_alerts.json"}
+
+# Troca acentos por letra simples sem mudar o tamanho do texto (posições do snippet valem no original)
+_FOLD = str.maketrans(
+    "áàâãäéèêëíìîïóòôõöúùûüçñÁÀÂÃÄÉÈÊËÍÌÎÏÓÒÔÕÖÚÙÛÜÇÑ",
+    "aaaaaeeeeiiiiooooouuuucnaaaaaeeeeiiiiooooouuuucn",
+)
+_TOKEN = re.compile(r"\w+")
+_HEADING = re.compile(r"^#{1,6}\s+(.*)$")
+
+
+def fold(text: str) -> str:
+    return text.lower().translate(_FOLD)
+
+
+def tokenize(text: str) -> List[str]:
+    """Minúsculas, sem acento, sem pontuação; descarta termos com menos de 3 caracteres."""
+    return [t for t in _TOKEN.findall(fold(text)) if len(t) > 2]
+
+
+@dataclass
+class SearchHit:
+    doc_id: str
+    kind: str
+    source: str          # arquivo de knowledge/ ou knowledge.db
+    title: str
+    location: str        # URL do artigo ou nome do arquivo
+    score: float
+    snippet: str
+
+
+@dataclass
+class _Doc:
+    kind: str
+    source: str
+    title: str
+    location: str
+    text: str
+    folded: str
+    length: int
+    terms: Dict[str, int]
+    signature: Any = None
+
+
+def _split_markdown(filename: str, content: str) -> List[Tuple[str, str]]:
+    """Seções (título, texto) de um markdown; o preâmbulo sem título vira a seção do arquivo."""
+    sections: List[Tuple[str, List[str]]] = [(filename, [])]
+    for line in content.split("\n"):
+        m = _HEADING.match(line)
+        if m:
+            sections.append((f"{filename} › {m.group(1).strip()}", [line]))
+        else:
+            sections[-1][1].append(line)
+    return [(title, "\n".join(lines).strip()) for title, lines in sections if "\n".join(lines).strip()]
+
+
+def _split_json(filename: str, content: str) -> List[Tuple[str, str]]:
+    """Um documento por chave de primeiro nível (no schema_map.json: uma tabela por documento)."""
+    data = json.loads(content)
+    if not isinstance(data, dict):
+        return [(filename, content)]
+    docs = []
+    for key, value in data.items():
+        text = value if isinstance(value, str) else json.dumps(value, ensure_ascii=False, indent=1)
+        docs.append((f"{filename} › {key}", f"{key}: {text}"))
+    return docs
+
+
+def _file_kind(filename: str) -> str:
+    if filename.startswith("schema_map"):
+        return KIND_SCHEMA
+    if filename.startswith("business_rules"):
+        return KIND_RULES
+    return KIND_DOC
+
+
+class SearchIndex:
+    """Índice invertido BM25 sobre knowledge/ e knowledge.db, com atualização incremental."""
+
+    def __init__(
+        self,
+        knowledge_dir: str = KNOWLEDGE_DIR,
+        articles: Optional[KnowledgeSearch] = None,
+        check_interval: float = REFRESH_CHECK_SECONDS,
+        k1: float = 1.5,
+        b: float = 0.75,
+    ):
+        self.knowledge_dir = knowledge_dir
+        self.articles = articles
+        self.check_interval = check_interval
+        self.k1 = k1
+        self.b = b
+        self._docs: Dict[str, _Doc] = {}
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._total_length = 0
+        self._sources: Dict[str, Any] = {}       # fonte -> mtime/assinatura da última carga
+        self._checked_at = float("-inf")
+        self._lock = threading.RLock()
+        self.builds = 0
+        self.reindexed = 0
+
+    # ------------------------------------------------------------------
+    # Manutenção do índice
+    # ------------------------------------------------------------------
+    def _add(self, doc_id: str, doc: _Doc) -> None:
+        self._docs[doc_id] = doc
+        self._total_length += doc.length
+        for term, tf in doc.terms.items():
+            self._postings.setdefault(term, {})[doc_id] = tf
+        self.reindexed += 1
+
+    def _remove(self, doc_id: str) -> None:
+        doc = self._docs.pop(doc_id, None)
+        if doc is None:
+            return
+        self._total_length -= doc.length
+        for term in doc.terms:
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(doc_id, None)
+                if not postings:
+                    del self._postings[term]
+
+    def _make_doc(self, kind: str, source: str, title: str, location: str, text: str, signature: Any = None) -> _Doc:
+        # Título conta em dobro (peso de campo simples)
+        tokens = tokenize(title) * 2 + tokenize(text)
+        terms: Dict[str, int] = {}
+        for t in tokens:
+            terms[t] = terms.get(t, 0) + 1
+        return _Doc(kind, source, title, location, text, fold(text), len(tokens), terms, signature)
+
+    def _drop_source(self, source: str) -> None:
+        for doc_id in [d for d, doc in self._docs.items() if doc.source == source]:
+            self._remove(doc_id)
+        self._sources.pop(source, None)
+
+    def _index_file(self, filename: str, mtime: float) -> None:
+        path = os.path.join(self.knowledge_dir, filename)
+        self._drop_source(filename)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                content = f.read()
+            if filename.endswith(".md"):
+                sections = _split_markdown(filename, content)
+            elif filename.endswith(".json"):
+                sections = _split_json(filename, content)
+            else:
+                sections = [(filename, content)]
+        except (UnicodeDecodeError, ValueError, OSError) as e:
+            logger.debug(f"Arquivo ignorado no índice: {filename} ({e})")
+            sections = []
+        kind = _file_kind(filename)
+        for n, (title, text) in enumerate(sections):
+            self._add(f"{filename}#{n}", self._make_doc(kind, filename, title, filename, text))
+        self._sources[filename] = mtime
+
+    def _index_articles(self) -> None:
+        """Reindexa só os artigos novos/alterados (assinatura) e remove os excluídos."""
+        rows = self.articles.all_articles()
+        seen = set()
+        for art_id, title, body, url in rows:
+            doc_id = f"artigo:{art_id}"
+            seen.add(doc_id)
+            signature = hash((title, body, url))
+            current = self._docs.get(doc_id)
+            if current is not None and current.signature == signature:
+                continue
+            self._remove(doc_id)
+            self._add(doc_id, self._make_doc(
+                KIND_ARTICLE, ARTICLES_SOURCE, title or "", url or "", body or "", signature,
+            ))
+        for doc_id in [d for d, doc in self._docs.items() if doc.source == ARTICLES_SOURCE and d not in seen]:
+            self._remove(doc_id)
+
+    def _articles_mtime(self) -> Optional[Tuple[float, ...]]:
+        if self.articles is None or not self.articles.exists():
+            return None
+        # O WAL recebe as escritas antes do checkpoint no arquivo principal
+        paths = (self.articles.db_path, self.articles.db_path + "-wal")
+        return tuple(os.path.getmtime(p) if os.path.exists(p) else 0.0 for p in paths)
+
+    def refresh(self, force: bool = False) -> bool:
+        """Confere as fontes (no máximo a cada check_interval) e reindexa as que mudaram."""
+        now = time.monotonic()
+        if not force and now - self._checked_at < self.check_interval:
+            return False
+        with self._lock:
+            if not force and now - self._checked_at < self.check_interval:
+                return False
+            self._checked_at = now
+            changed = False
+
+            files = {}
+            if os.path.isdir(self.knowledge_dir):
+                for filename in os.listdir(self.knowledge_dir):
+                    if not filename.endswith(INDEXED_EXTENSIONS) or filename in IGNORED_FILES:
+                        continue
+                    path = os.path.join(self.knowledge_dir, filename)
+                    if os.path.isfile(path):
+                        files[filename] = os.path.getmtime(path)
+            for filename, mtime in files.items():
+                if self._sources.get(filename) != mtime:
+                    self._index_file(filename, mtime)
+                    changed = True
+            for source in [s for s in self._sources if s != ARTICLES_SOURCE and s not in files]:
+                self._drop_source(source)
+                changed = True
+
+            articles_mtime = self._articles_mtime()
+            if articles_mtime is None:
+                if ARTICLES_SOURCE in self._sources:
+                    self._drop_source(ARTICLES_SOURCE)
+                    changed = True
+            elif self._sources.get(ARTICLES_SOURCE) != articles_mtime:
+                try:
+                    self._index_articles()
+                    self._sources[ARTICLES_SOURCE] = articles_mtime
+                    changed = True
+                except Exception as e:
+                    logger.warning(f"Artigos da knowledge.db fora do índice: {e}")
+
+            if changed:
+                self.builds += 1
+                logger.debug(f"Índice de busca atualizado: {len(self._docs)} documentos")
+            return changed
+
+    # ------------------------------------------------------------------
+    # Consulta
+    # ------------------------------------------------------------------
+    def _snippet(self, doc: _Doc, terms: Sequence[str], max_chars: int = 300) -> str:
+        lines = doc.text.split("\n")
+        if len(lines) > 1:
+            folded_lines = doc.folded.split("\n")
+            best, best_hits = 0, -1
+            for i, line in enumerate(folded_lines):
+                hits = sum(1 for t in terms if t in line)
+                if hits > best_hits:
+                    best, best_hits = i, hits
+            start = max(0, best - 1)
+            snippet = "\n".join(lines[start:best + 3]).strip()
+        else:
+            positions = [doc.folded.find(t) for t in terms]
+            first = min((p for p in positions if p >= 0), default=0)
+            start = max(0, first - max_chars // 3)
+            snippet = ("..." if start else "") + doc.text[start:start + max_chars].strip()
+        return snippet if len(snippet) <= max_chars else snippet[:max_chars] + "..."
+
+    def search(self, query: str, limit: int = 5, kinds: Optional[Iterable[str]] = None) -> List[SearchHit]:
+        """Documentos mais relevantes (BM25) para a consulta; `kinds` restringe o tipo de fonte."""
+        self.refresh()
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+        allowed = set(kinds) if kinds else None
+        phrase = " ".join(_TOKEN.findall(fold(query)))
+
+        with self._lock:
+            n_docs = len(self._docs)
+            if not n_docs:
+                return []
+            avgdl = self._total_length / n_docs
+            scores: Dict[str, float] = {}
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log((n_docs - len(postings) + 0.5) / (len(postings) + 0.5) + 1)
+                for doc_id, tf in postings.items():
+                    doc = self._docs[doc_id]
+                    if allowed is not None and doc.kind not in allowed:
+                        continue
+                    denom = tf + self.k1 * (1 - self.b + self.b * doc.length / avgdl)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / denom
+            if not scores:
+                return []
+
+            # Frase exata (várias palavras) passa à frente dos documentos com termos soltos.
+            # Só os melhores candidatos são conferidos: quem tem a frase tem todos os termos.
+            if len(terms) > 1 and phrase:
+                bonus = max(scores.values())
+                for doc_id, _ in heapq.nlargest(PHRASE_CANDIDATES, scores.items(), key=lambda item: item[1]):
+                    doc = self._docs[doc_id]
+                    if phrase in " ".join(_TOKEN.findall(fold(doc.title) + "\n" + doc.folded)):
+                        scores[doc_id] += bonus
+
+            top = heapq.nlargest(limit, scores.items(), key=lambda item: (item[1], item[0]))
+            hits = []
+            for doc_id, score in top:
+                doc = self._docs[doc_id]
+                hits.append(SearchHit(
+                    doc_id, doc.kind, doc.source, doc.title, doc.location, score, self._snippet(doc, terms),
+                ))
+            return hits
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            kinds: Dict[str, int] = {}
+            for doc in self._docs.values():
+                kinds[doc.kind] = kinds.get(doc.kind, 0) + 1
+            return {
+                "documentos": len(self._docs), "termos": len(self._postings), "por_tipo": kinds,
+                "atualizacoes": self.builds, "reindexados": self.reindexed,
+            }
+
+
+_INDEX: Optional[SearchIndex] = None
+_INDEX_LOCK = threading.Lock()
+
+
+def get_search_index() -> SearchIndex:
+    """Índice compartilhado do processo (knowledge/ + mcp_server/knowledge.db)."""
+    global _INDEX
+    with _INDEX_LOCK:
+        if _INDEX is None:
+            _INDEX = SearchIndex(KNOWLEDGE_DIR, get_knowledge_search(DEFAULT_DB_PATH))
+        return _INDEX
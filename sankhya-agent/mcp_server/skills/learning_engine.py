@@ -73,3 +73,7 @@ def approve_rule(rule_id: str) -> str:
         
     except Exception as e:
         return f"Erro ao aprovar regra: {str(e)}"
+
+# Gravam em business_rules.json: o agent_client não executa em paralelo
+propose_new_rule.concurrent_safe = False
+approve_rule.concurrent_safe = False
@@ -9,8 +9,10 @@ from typing import List, Dict, Any, Optional
 
 try:
     from utils import sankhya, format_as_markdown_table
+    from query_group import QueryGroup
 except ImportError:
     from mcp_server.utils import sankhya, format_as_markdown_table
+    from mcp_server.query_group import QueryGroup
 
 logger = logging.getLogger("skill-lenses")
 
@@ -91,19 +93,30 @@ def get_finance_hotspot_lens() -> str:
     sql_unbound = "SELECT COUNT(*) as QTD, SUM(VLRDESDOB) as TOTAL FROM TGFFIN WHERE CODNAT = 0 AND DTNEG > SYSDATE - 60 AND CODTIPOPER <> 900"
     
     try:
-        noise = sankhya.execute_query(sql_noise)[0]
-        unbound = sankhya.execute_query(sql_unbound)[0]
+        # As duas contagens são independentes: rodam em paralelo
+        result = (QueryGroup()
+                  .add("ruido", sankhya.execute_query, sql_noise)
+                  .add("sem_natureza", sankhya.execute_query, sql_unbound)
+                  .run())
+        if len(result.errors) == 2:
+            return f"Erro ao processar lente financeira: {result.errors['ruido']}"
+
+        noise = (result.rows("ruido") or [{}])[0]
+        unbound = (result.rows("sem_natureza") or [{}])[0]
         
         report = ["### ⚡ Lente de Saúde Financeira (Alertas de Qualidade)\n"]
         
-        if noise['QTD'] > 0:
+        if noise.get('QTD', 0) > 0:
             report.append(f"⚠️ **Ruído na Receita:** {noise['QTD']} lançamentos (R$ {noise['TOTAL']:,.2f}) detectados como saída na conta de venda. Isso distorce seu lucro bruto.")
             
-        if unbound['QTD'] > 0:
+        if unbound.get('QTD', 0) > 0:
             report.append(f"🔴 **Pontos Cegos:** R$ {unbound['TOTAL']:,.2f} em {unbound['QTD']} lançamentos estão sem classificação (Natureza 0).")
             
-        if noise['QTD'] == 0 and unbound['QTD'] == 0:
+        if result.ok and noise.get('QTD', 0) == 0 and unbound.get('QTD', 0) == 0:
             report.append("✅ **Qualidade de Dados:** Nenhuma inconsistência grave detectada nos últimos 60 dias.")
+
+        for name, error in result.errors.items():
+            report.append(f"⚠️ Verificação '{name}' indisponível: {error}")
             
         return "\n\n".join(report)
     except Exception as e:
@@ -387,3 +387,8 @@ def create_agent_skill(description: str) -> str:
     proposal_id = match.group(1)
     published = publish_tool_proposal(proposal_id)
     return proposed + "\n\n" + published
+
+
+# Escrevem/publicam arquivos de skill: o agent_client não executa em paralelo
+for _tool in (propose_tool, review_tool_proposal, publish_tool_proposal, rollback_tool, create_agent_skill):
+    _tool.concurrent_safe = False
@@ -1,26 +1,83 @@
 """
 Módulo de Monitoramento Proativo (Watchers) do SSA.
 Define alertas e verificações automáticas no Sankhya.
+
+Os vigias vêm de domains/procurement/rules/watchers.yaml (ao lado do
+business_rules.yaml). Na carga cada definição é expandida (`for_each`),
+recebe seus parâmetros como literais, passa por `validate_sql_safety` e vira
+um `Watcher` pronto; o resultado fica em cache até o arquivo mudar.
 """
+import os
 import logging
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Sequence, Tuple
+
+import yaml
+
 try:
-    from utils import sankhya, format_as_markdown_table
+    from utils import sankhya
+    from sql_binder import get_template
+    from watcher_scheduler import render_alerts_markdown, public_row, WATERMARK_COLUMN
 except ImportError:
-    from mcp_server.utils import sankhya, format_as_markdown_table
+    from mcp_server.utils import sankhya
+    from mcp_server.sql_binder import get_template
+    from mcp_server.watcher_scheduler import render_alerts_markdown, public_row, WATERMARK_COLUMN
 
 logger = logging.getLogger("skill-watchers")
 
+# Marca d'água da varredura completa: relógio do ERP no formato dos delta_query de watchers.yaml
+DEFAULT_WATERMARK_QUERY = "SELECT TO_CHAR(SYSDATE, 'YYYYMMDDHH24MISS') AS WATERMARK FROM DUAL"
+
 class Watcher:
-    def __init__(self, name: str, query: str, description: str, severity: str = "INFO"):
+    def __init__(
+        self,
+        name: str,
+        query: str,
+        description: str,
+        severity: str = "INFO",
+        interval_seconds: int = 3600,
+        timeout_seconds: int = 60,
+        key_columns: Optional[Sequence[str]] = None,
+        delta_query: Optional[str] = None,
+        full_refresh_seconds: int = 6 * 3600,
+        watermark_query: Optional[str] = None,
+    ):
         self.name = name
         self.query = query
         self.description = description
         self.severity = severity
+        # Cadência e limite de execução usados pelo agendador (watcher_scheduler.py)
+        self.interval_seconds = interval_seconds
+        self.timeout_seconds = timeout_seconds
+        # Modo incremental: `delta_query` recebe :WATERMARK e devolve as linhas
+        # alteradas desde então, com as colunas WATERMARK e DISPARADO ('S'/'N').
+        # `query` continua sendo a varredura completa (com a coluna WATERMARK);
+        # `watermark_query` dá a marca d'água do início dela.
+        self.key_columns = tuple(key_columns or ())
+        self.delta_query = delta_query
+        self.full_refresh_seconds = full_refresh_seconds
+        self.watermark_query = watermark_query or DEFAULT_WATERMARK_QUERY
+
+    @property
+    def incremental(self) -> bool:
+        return bool(self.delta_query and self.key_columns)
+
+    def evaluate(self) -> List[Dict[str, Any]]:
+        # Linhas disparadas; erros sobem para o agendador registrar no histórico.
+        # Sem cache: o vigia precisa do estado atual do ERP.
+        return sankhya.execute_query(self.query, use_cache=False)
+
+    def scan_watermark(self) -> Any:
+        # Lida antes da varredura completa: alterações feitas durante ela caem no próximo delta
+        rows = sankhya.execute_query(self.watermark_query, use_cache=False)
+        return rows[0].get(WATERMARK_COLUMN) if rows else None
+
+    def evaluate_delta(self, watermark: Any) -> List[Dict[str, Any]]:
+        # Só as linhas alteradas desde a marca d'água (>=: a sobreposição é idempotente)
+        return sankhya.execute_bound(self.delta_query, {"WATERMARK": watermark}, use_cache=False)
 
     def run(self) -> Optional[Dict]:
         try:
-            result = sankhya.execute_query(self.query)
+            result = [public_row(r) for r in self.evaluate()]
             if result:
                 return {
                     "name": self.name,
@@ -33,41 +90,111 @@ class Watcher:
             logger.error(f"Erro ao rodar watcher {self.name}: {str(e)}")
         return None
 
-# Definição dos Watchers Padrão
-SYSTEM_WATCHERS = [
-    Watcher(
-        "Notas Pendentes",
-        "SELECT NUNOTA, CODPARC, VLRNOTA FROM TGFCAB WHERE STATUSNOTA = 'P' AND DTNEG > SYSDATE - 7",
-        "Notas que foram digitadas mas não confirmadas nos últimos 7 dias.",
-        "WARNING"
-    ),
-    Watcher(
-        "Estoque Crítico",
-        "SELECT CODPROD, ESTOQUE FROM TGFEST WHERE ESTOQUE < 5 AND CODPROD IN (SELECT CODPROD FROM TGFPRO WHERE ATIVO = 'S')",
-        "Produtos ativos com menos de 5 unidades em estoque.",
-        "DANGER"
-    ),
-    Watcher(
-        "Novos Parceiros sem CPF/CNPJ",
-        "SELECT CODPARC, NOMEPARC FROM TGFPAR WHERE (CGC_CPF IS NULL OR CGC_CPF = '') AND DTALTER > SYSDATE - 1",
-        "Parceiros criados ou alterados hoje sem documento fiscal.",
-        "INFO"
+WATCHERS_FILE = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "domains", "procurement", "rules", "watchers.yaml"
+)
+SEVERITIES = ("INFO", "WARNING", "DANGER")
+
+# Vigias compilados por arquivo: caminho -> (mtime, vigias)
+_COMPILED: Dict[str, Tuple[float, List[Watcher]]] = {}
+
+
+def _compile_watcher(spec: Dict[str, Any], params: Dict[str, Any], defaults: Dict[str, Any]) -> Watcher:
+    # Late import para evitar circularidade (tools carrega as skills)
+    try:
+        from tools import validate_sql_safety
+    except ImportError:
+        from mcp_server.tools import validate_sql_safety
+
+    opts = {**defaults, **spec}
+    name = str(opts["name"]).format_map(params)
+    severity = str(opts.get("severity", "INFO")).upper()
+    if severity not in SEVERITIES:
+        raise ValueError(f"severidade inválida '{severity}' (use {', '.join(SEVERITIES)})")
+
+    queries = {
+        field_name: (opts.get(field_name) or "").strip() for field_name in ("query", "delta_query", "watermark_query")
+    }
+    if not queries["query"]:
+        raise ValueError("campo 'query' obrigatório")
+    key_columns = [str(c).upper() for c in opts.get("key_columns") or []]
+    if queries["delta_query"] and not key_columns:
+        raise ValueError("'delta_query' exige 'key_columns'")
+
+    compiled = {}
+    for field_name, sql in queries.items():
+        if not sql:
+            continue
+        template = get_template(sql)
+        raw = (WATERMARK_COLUMN,) if field_name == "delta_query" else ()
+        template.validate(params, raw=raw, label=field_name)
+        if field_name == "delta_query" and WATERMARK_COLUMN not in template.names:
+            raise ValueError("'delta_query' precisa filtrar por :WATERMARK")
+        rendered = template.render(params)
+        blocked = validate_sql_safety(rendered)
+        if blocked:
+            raise ValueError(f"{field_name}: {blocked}")
+        compiled[field_name] = rendered
+
+    return Watcher(
+        name,
+        compiled["query"],
+        str(opts.get("description", "")).format_map(params),
+        severity,
+        interval_seconds=int(float(opts.get("interval_minutes", 60)) * 60),
+        timeout_seconds=int(opts.get("timeout_seconds", 60)),
+        key_columns=key_columns,
+        delta_query=compiled.get("delta_query"),
+        full_refresh_seconds=int(float(opts.get("full_refresh_minutes", 360)) * 60),
+        watermark_query=compiled.get("watermark_query"),
     )
-]
+
+
+def _load_watchers(path: str = WATCHERS_FILE) -> List[Watcher]:
+    """
+    Vigias definidos no YAML, validados e compilados. Definições inválidas são
+    descartadas com log de erro (as demais continuam valendo). Em cache por mtime.
+    """
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        logger.warning(f"Arquivo de vigias não encontrado: {path}")
+        return []
+    cached = _COMPILED.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+
+    with open(path, "r", encoding="utf-8") as f:
+        config = yaml.safe_load(f) or {}
+    defaults = config.get("defaults") or {}
+
+    watchers: List[Watcher] = []
+    names = set()
+    for index, spec in enumerate(config.get("watchers") or []):
+        if not spec.get("enabled", True):
+            continue
+        base = {str(k).upper(): v for k, v in (spec.get("params") or {}).items()}
+        for item in spec.get("for_each") or [{}]:
+            params = {**base, **{str(k).upper(): v for k, v in item.items()}}
+            try:
+                watcher = _compile_watcher(spec, params, defaults)
+                if watcher.name in names:
+                    raise ValueError("nome duplicado")
+            except (KeyError, ValueError) as e:
+                logger.error(f"❌ Vigia #{index + 1} ({spec.get('name')}) ignorado: {e}")
+                continue
+            names.add(watcher.name)
+            watchers.append(watcher)
+
+    logger.info(f"{len(watchers)} vigia(s) carregado(s) de {os.path.basename(path)}")
+    _COMPILED[path] = (mtime, watchers)
+    return watchers
+
+
+# Definição dos Watchers Padrão (rules/watchers.yaml)
+SYSTEM_WATCHERS = _load_watchers()
 
 def run_all_watchers() -> str:
     """Executa todos os vigias proativos e retorna um painel de alertas."""
-    alerts = []
-    for watcher in SYSTEM_WATCHERS:
-        res = watcher.run()
-        if res:
-            color = "🔴" if res['severity'] == "DANGER" else "🟡" if res['severity'] == "WARNING" else "🔵"
-            alerts.append(f"{color} **{res['name']}**: {res['count']} ocorrência(s)\n_{res['description']}_")
-            # Adiciona tabela resumida se for importante
-            if res['count'] > 0:
-                alerts.append(format_as_markdown_table(res['data'][:5])) # Mostra só os 5 primeiros
-    
-    if not alerts:
-        return "✅ **Tudo limpo!** Nenhum alerta proativo detectado nos vigias do sistema."
-    
-    return "### 🚨 Painel de Alertas Proativos\n\n" + "\n\n".join(alerts)
+    alerts = [res for res in (watcher.run() for watcher in _load_watchers()) if res]
+    return render_alerts_markdown(alerts)
@@ -1,47 +1,153 @@
+"""
+Busca na Central de Ajuda Sankhya (Zendesk) em camadas:
+
+1. FTS local (knowledge.db): frase exata ou todas as palavras;
+2. cache das buscas remotas já feitas (tabela remote_queries, válido por
+   SANKHYA_ZENDESK_CACHE_TTL segundos), lido da knowledge.db;
+3. API da Zendesk ao vivo. Os artigos retornados são gravados na knowledge.db
+   (upsert, FTS via trigger), então a base local cresce com o uso real.
+
+Sem rede, uma entrada vencida do cache ou os acertos parciais locais ainda respondem.
+"""
+import os
+import time
+import logging
 import requests
 import urllib.parse
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
+
+try:
+    from knowledge_search import get_knowledge_search
+    from knowledge_indexer import ArticleWriter, split_page
+    from knowledge_schema import ensure_schema
+except ImportError:
+    from mcp_server.knowledge_search import get_knowledge_search
+    from mcp_server.knowledge_indexer import ArticleWriter, split_page
+    from mcp_server.knowledge_schema import ensure_schema
+
+logger = logging.getLogger("skill-zendesk")
 
 ZENDESK_BASE_URL = "https://ajuda.sankhya.com.br/api/v2/help_center"
 
+try:
+    REMOTE_CACHE_TTL = int(os.getenv("SANKHYA_ZENDESK_CACHE_TTL", 24 * 3600))
+except ValueError:
+    REMOTE_CACHE_TTL = 24 * 3600
+
+SNIPPET_CHARS = 300
+
+# (title, body, url), como em knowledge_search
+Article = Tuple[str, str, str]
+
+
+def _query_key(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+def _format(query: str, results: List[Tuple[str, str, str]], origin: str) -> str:
+    formatted_results = []
+    for title, snippet, html_url in results:
+        formatted_results.append(f"### 🌐 [{title}]({html_url})\n{snippet}\n\n[Ler artigo completo]({html_url})")
+    return (
+        f"**Resultados da Central de Ajuda Sankhya para '{query}' ({origin}):**\n\n"
+        + "\n\n---\n\n".join(formatted_results)
+    )
+
+
+def _local(articles: List[Article]) -> List[Tuple[str, str, str]]:
+    return [
+        (title, body[:SNIPPET_CHARS] + ("..." if len(body) > SNIPPET_CHARS else ""), url)
+        for title, body, url in articles
+    ]
+
+
+def _fetch_remote(query: str, limit: int) -> List[Dict[str, Any]]:
+    # Endpoint de busca da Zendesk API V2
+    # Documentação: https://developer.zendesk.com/api-reference/help_center/help-center-api/search/
+    encoded_query = urllib.parse.quote(query)
+    url = f"{ZENDESK_BASE_URL}/articles/search.json?query={encoded_query}&per_page={limit}&locale=pt-br"
+    response = requests.get(url, timeout=10)
+    if response.status_code != 200:
+        raise RuntimeError(f"{response.status_code} - {response.text}")
+    return response.json().get("results", [])
+
+
+def _store_remote(db_path: str, key: str, items: List[Dict[str, Any]], limit: int) -> None:
+    """Grava os artigos e o resultado da busca na knowledge.db (falha aqui não derruba a resposta)."""
+    try:
+        ensure_schema(db_path)
+        articles, _ = split_page(items)
+        writer = ArticleWriter(db_path)
+        try:
+            writer.write(articles)
+            writer.remember_query(key, [a["id"] for a in articles], limit, time.time())
+        finally:
+            writer.close()
+    except Exception as e:
+        logger.warning(f"Não foi possível gravar o resultado da Zendesk na knowledge.db: {e}")
+
+
+def _cached(searcher, key: str, limit: int) -> Tuple[Optional[List[Article]], bool]:
+    """Artigos da última busca remota igual a esta e se ainda estão no TTL."""
+    if not searcher.exists():
+        return None, False
+    entry = searcher.remote_query(key)
+    if entry is None:
+        return None, False
+    ids, requested, fetched_at = entry
+    if requested < limit:
+        return None, False
+    fresh = time.time() - fetched_at < REMOTE_CACHE_TTL
+    return searcher.articles_by_id(ids[:limit]), fresh
+
+
 def search_zendesk_help_center(query: str, limit: int = 5) -> str:
     """
-    Pesquisa em tempo real na Central de Ajuda Sankhya (Zendesk).
+    Pesquisa na Central de Ajuda Sankhya (Zendesk): primeiro na base local, depois no cache
+    de buscas anteriores e só então online. O que vem da internet fica salvo na base local.
     Use esta ferramenta quando a busca local (search_solutions) não retornar resultados satisfatórios
     ou para buscar informações muito recentes.
-    
+
     Args:
         query: Termos de pesquisa (ex: "erro nota fiscal 123", "como cadastrar parceiro").
         limit: Número máximo de resultados (padrão 5).
     """
-    try:
-        # Endpoint de busca da Zendesk API V2
-        # Documentação: https://developer.zendesk.com/api-reference/help_center/help-center-api/search/
-        encoded_query = urllib.parse.quote(query)
-        url = f"{ZENDESK_BASE_URL}/articles/search.json?query={encoded_query}&per_page={limit}&locale=pt-br"
-        
-        response = requests.get(url, timeout=10)
-        
-        if response.status_code != 200:
-            return f"❌ Erro na API Zendesk: {response.status_code} - {response.text}"
-            
-        data = response.json()
-        results = data.get("results", [])
-        
-        if not results:
+    searcher = get_knowledge_search()
+    key = _query_key(query)
+
+    # 1. FTS local, só acertos precisos (frase ou todas as palavras)
+    local = searcher.search(query, limit=limit, substring=False) if searcher.exists() else []
+    if len(local) >= limit:
+        return _format(query, _local(local), "base local")
+
+    # 2. Mesma busca já feita online dentro do TTL
+    cached, fresh = _cached(searcher, key, limit)
+    if fresh:
+        if not cached:
             return f"Nenhum resultado encontrado na Central de Ajuda online para: '{query}'"
-            
-        formatted_results = []
-        for item in results:
-            title = item.get("title", "Sem título")
-            html_url = item.get("html_url", "#")
-            snippet = item.get("snippet", "Sem descrição")
-            # Remove tags HTML básicas do snippet se houver
-            snippet = snippet.replace("<em>", "**").replace("</em>", "**")
-            
-            formatted_results.append(f"### 🌐 [{title}]({html_url})\n{snippet}\n\n[Ler artigo completo]({html_url})")
-            
-        return f"**Resultados online na Central de Ajuda Sankhya para '{query}':**\n\n" + "\n\n---\n\n".join(formatted_results)
+        return _format(query, _local(cached), "cache local")
 
+    # 3. Zendesk ao vivo
+    try:
+        results = _fetch_remote(query, limit)
     except Exception as e:
+        logger.warning(f"Busca na Zendesk falhou: {e}")
+        fallback = cached or local or (searcher.search(query, limit=limit) if searcher.exists() else [])
+        if fallback:
+            return _format(query, _local(fallback), "offline, base local") + f"\n\n⚠️ Zendesk indisponível: {e}"
         return f"❌ Erro ao conectar na Zendesk: {str(e)}"
+
+    _store_remote(searcher.db_path, key, results, limit)
+
+    if not results:
+        return f"Nenhum resultado encontrado na Central de Ajuda online para: '{query}'"
+
+    formatted = []
+    for item in results:
+        title = item.get("title", "Sem título")
+        html_url = item.get("html_url", "#")
+        snippet = item.get("snippet", "Sem descrição")
+        # Remove tags HTML básicas do snippet se houver
+        snippet = snippet.replace("<em>", "**").replace("</em>", "**")
+        formatted.append((title, snippet, html_url))
+    return _format(query, formatted, "online")
@@ -0,0 +1,174 @@
+"""
+Parâmetros nominais (:NOME) nas queries SQL.
+
+A substituição antiga (`str.replace(":CODPROD", ...)`) tinha dois problemas:
+- trocava prefixos (`:CODPROD` dentro de `:CODPRODX`) e também o que estivesse em
+  literais/comentários (`'HH24:MI:SS'`, `-- :INI`);
+- cada CODPROD/data gerava um texto de SQL diferente, sem reaproveitamento de
+  cursor no shared pool do Oracle (hard parse a cada chamada).
+
+Aqui o SQL é tokenizado uma única vez (literais, identificadores entre aspas e
+comentários são pulados) e vira um `SqlTemplate` em cache. O template entrega:
+- `bind_values(params)`: o texto original + dict de binds, para Gateways que
+  aceitam bind variables (ver SANKHYA_GATEWAY_BINDS em utils.py);
+- `render(params)`: SQL com os valores embutidos como literais seguros, para o
+  DbExplorerSP padrão (que só recebe texto).
+"""
+from datetime import date, datetime
+from decimal import Decimal
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+# Caracteres válidos em nomes de parâmetro (mesma regra de identificadores Oracle)
+_NAME_START = set("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz_")
+_NAME_CHARS = _NAME_START | set("0123456789$#")
+
+# Segmento do template: texto literal (str) ou parâmetro (("param", NOME))
+Segment = Union[str, Tuple[str, str]]
+
+
+class SqlParameterError(ValueError):
+    """Parâmetro :NOME do SQL sem valor informado (erro de programação, não do ERP)."""
+
+
+def _scan(sql: str) -> List[Segment]:
+    """Quebra o SQL em trechos de texto e marcadores :NOME fora de literais/comentários."""
+    segments: List[Segment] = []
+    n = len(sql)
+    i = 0
+    start = 0
+    while i < n:
+        ch = sql[i]
+        if ch == "'" or ch == '"':
+            # Literal ('...' com '' escapado) ou identificador entre aspas
+            i += 1
+            while i < n:
+                if sql[i] == ch:
+                    if i + 1 < n and sql[i + 1] == ch:
+                        i += 2
+                        continue
+                    break
+                i += 1
+            i += 1
+        elif ch == "-" and sql.startswith("--", i):
+            end = sql.find("\n", i)
+            i = n if end < 0 else end + 1
+        elif ch == "/" and sql.startswith("/*", i):
+            end = sql.find("*/", i + 2)
+            i = n if end < 0 else end + 2
+        elif ch == ":" and i + 1 < n and sql[i + 1] in _NAME_START and (i == 0 or sql[i - 1] != ":"):
+            j = i + 1
+            while j < n and sql[j] in _NAME_CHARS:
+                j += 1
+            if i > start:
+                segments.append(sql[start:i])
+            segments.append(("param", sql[i + 1:j].upper()))
+            i = start = j
+        else:
+            i += 1
+    if start < n:
+        segments.append(sql[start:])
+    return segments
+
+
+def sql_literal(value: Any) -> str:
+    """Valor Python -> literal SQL Oracle (strings com aspas escapadas, datas via TO_DATE)."""
+    if value is None:
+        return "NULL"
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, (int, float, Decimal)):
+        return str(value)
+    if isinstance(value, datetime):
+        return f"TO_DATE('{value:%d/%m/%Y %H:%M:%S}', 'DD/MM/YYYY HH24:MI:SS')"
+    if isinstance(value, date):
+        return f"TO_DATE('{value:%d/%m/%Y}', 'DD/MM/YYYY')"
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def _bind_value(value: Any) -> Any:
+    """Valor Python -> valor serializável em JSON para o corpo da requisição com binds."""
+    if isinstance(value, bool):
+        return 1 if value else 0
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, datetime):
+        return value.strftime("%d/%m/%Y %H:%M:%S")
+    if isinstance(value, date):
+        return value.strftime("%d/%m/%Y")
+    return value
+
+
+class SqlTemplate:
+    """SQL pré-processado: trechos de texto intercalados com parâmetros :NOME."""
+
+    __slots__ = ("sql", "segments", "names")
+
+    def __init__(self, sql: str):
+        self.sql = sql
+        self.segments = _scan(sql)
+        names: List[str] = []
+        for seg in self.segments:
+            if isinstance(seg, tuple) and seg[1] not in names:
+                names.append(seg[1])
+        self.names = tuple(names)
+
+    def _lookup(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        return {str(k).upper(): v for k, v in params.items()}
+
+    def render(self, params: Dict[str, Any], raw: Optional[Dict[str, str]] = None) -> str:
+        """
+        SQL com os parâmetros embutidos como literais. `raw` insere trechos sem aspas
+        (ex.: listas de IN já formatadas). Parâmetros não informados ficam como :NOME.
+        """
+        values = self._lookup(params)
+        fragments = {str(k).upper(): v for k, v in (raw or {}).items()}
+        out = []
+        for seg in self.segments:
+            if isinstance(seg, str):
+                out.append(seg)
+            elif seg[1] in fragments:
+                out.append(fragments[seg[1]])
+            elif seg[1] in values:
+                out.append(sql_literal(values[seg[1]]))
+            else:
+                out.append(":" + seg[1])
+        return "".join(out)
+
+    def expand(self, raw: Dict[str, str]) -> "SqlTemplate":
+        """Novo template com os trechos `raw` já embutidos (os demais :NOME continuam parâmetros)."""
+        fragments = {str(k).upper() for k in raw}
+        if not fragments.intersection(self.names):
+            return self
+        return get_template(self.render({}, raw=raw))
+
+    def missing(self, params: Dict[str, Any], raw: Iterable[str] = ()) -> List[str]:
+        """Parâmetros do SQL sem valor em `params` nem em `raw` (None conta como informado)."""
+        given = set(self._lookup(params)) | {str(k).upper() for k in raw}
+        return [name for name in self.names if name not in given]
+
+    def validate(self, params: Dict[str, Any], raw: Iterable[str] = (), label: str = "") -> None:
+        """Levanta SqlParameterError antes de ir ao Gateway quando falta algum :NOME."""
+        missing = self.missing(params, raw)
+        if missing:
+            where = f" em {label}" if label else ""
+            raise SqlParameterError(
+                f"Parâmetros sem valor{where}: {', '.join(':' + m for m in missing)} "
+                f"(esperados: {', '.join(self.names)})"
+            )
+
+    def bind_values(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Binds presentes no SQL (os parâmetros extras são ignorados, como o Oracle exige)."""
+        values = self._lookup(params)
+        return {name: _bind_value(values[name]) for name in self.names if name in values}
+
+
+@lru_cache(maxsize=512)
+def get_template(sql: str) -> SqlTemplate:
+    """Template em cache por texto: cada arquivo .sql é tokenizado uma vez por processo."""
+    return SqlTemplate(sql)
+
+
+def bind_params(sql: str, params: Dict[str, Any]) -> str:
+    """Atalho: SQL com os parâmetros embutidos como literais (template em cache)."""
+    return get_template(sql).render(params)
@@ -0,0 +1,113 @@
+"""
+Registro de templates SQL de uma pasta de regras (ex.: domains/procurement/rules).
+
+`_read_sql` fazia `os.path.exists` + leitura do arquivo a cada chamada, e o radar
+sequencial chama `get_effective_leadtime` uma vez por produto. Aqui todos os
+`*.sql` são lidos e tokenizados na construção (ver sql_binder.SqlTemplate), com
+os parâmetros de cada um já conhecidos. Depois disso:
+- `get(nome)` responde da memória; o mtime do arquivo só é conferido a cada
+  `check_interval` segundos, e o arquivo só é relido quando o mtime muda;
+- `validate(nome, params)` acusa parâmetro faltando antes de ir ao Gateway.
+"""
+import os
+import glob
+import time
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional
+
+try:
+    from sql_binder import SqlTemplate, get_template
+except ImportError:
+    from mcp_server.sql_binder import SqlTemplate, get_template
+
+logger = logging.getLogger("sankhya-sql-registry")
+
+# Intervalo mínimo entre duas conferências de mtime do mesmo arquivo
+RELOAD_CHECK_SECONDS = 2.0
+
+
+@dataclass
+class _Entry:
+    template: Optional[SqlTemplate]     # None = arquivo inexistente
+    mtime: float
+    checked_at: float
+
+
+class SqlTemplateRegistry:
+    """Templates `*.sql` de um diretório, pré-carregados e recarregados só quando mudam."""
+
+    def __init__(self, directory: str, pattern: str = "*.sql", check_interval: float = RELOAD_CHECK_SECONDS):
+        self.directory = directory
+        self.check_interval = check_interval
+        self._entries: Dict[str, _Entry] = {}
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.reloads = 0
+
+        for path in sorted(glob.glob(os.path.join(directory, pattern))):
+            self._load(os.path.basename(path))
+        logger.debug(f"{len(self._entries)} templates SQL carregados de {directory}")
+
+    def _load(self, name: str) -> _Entry:
+        path = os.path.join(self.directory, name)
+        now = time.monotonic()
+        try:
+            mtime = os.stat(path).st_mtime
+            with open(path, "r", encoding="utf-8") as f:
+                template = get_template(f.read())
+            self.loads += 1
+        except FileNotFoundError:
+            template, mtime = None, 0.0
+        entry = _Entry(template, mtime, now)
+        self._entries[name] = entry
+        return entry
+
+    def get(self, name: str) -> Optional[SqlTemplate]:
+        """Template do arquivo `name` (None se não existir)."""
+        now = time.monotonic()
+        entry = self._entries.get(name)
+        if entry is not None and now - entry.checked_at < self.check_interval:
+            return entry.template
+
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None:
+                return self._load(name).template
+            if now - entry.checked_at < self.check_interval:
+                return entry.template
+            try:
+                mtime = os.stat(os.path.join(self.directory, name)).st_mtime
+            except FileNotFoundError:
+                mtime = 0.0
+            if mtime != entry.mtime:
+                logger.info(f"Template SQL alterado em disco, recarregando: {name}")
+                self.reloads += 1
+                return self._load(name).template
+            entry.checked_at = now
+            return entry.template
+
+    def text(self, name: str) -> str:
+        """SQL do arquivo (\"\" se não existir, como o antigo _read_sql)."""
+        template = self.get(name)
+        return template.sql if template is not None else ""
+
+    def parameters(self, name: str) -> List[str]:
+        """Parâmetros :NOME exigidos pelo arquivo, na ordem em que aparecem."""
+        template = self.get(name)
+        return list(template.names) if template is not None else []
+
+    def validate(self, name: str, params: Dict[str, Any], raw: Iterable[str] = ()) -> SqlTemplate:
+        """Template validado contra `params` (SqlParameterError se faltar algum :NOME)."""
+        template = self.get(name)
+        if template is None:
+            raise FileNotFoundError(f"Template SQL não encontrado: {os.path.join(self.directory, name)}")
+        template.validate(params, raw, label=name)
+        return template
+
+    def names(self) -> List[str]:
+        return sorted(n for n, e in self._entries.items() if e.template is not None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"templates": len(self.names()), "loads": self.loads, "reloads": self.reloads}
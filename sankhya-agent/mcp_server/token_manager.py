@@ -0,0 +1,297 @@
+"""
+Gerenciamento do token OAuth do Gateway Sankhya.
+
+O `authenticate` original checava `token_expires_at` sem lock: sob concorrência
+(radar em paralelo, ferramentas simultâneas) várias threads viam o token vencido e
+batiam juntas no /authenticate, e o caminho de 401 zerava o token de todo mundo.
+Aqui o token fica num `TokenManager` que:
+
+- faz refresh single-flight: só um /authenticate por vez, e as threads que chegam
+  durante o refresh esperam e compartilham o resultado (inclusive a falha);
+- renova proativamente numa thread de fundo antes de vencer, para que nenhuma
+  chamada pague a latência do refresh;
+- invalida por comparação: um 401 só descarta o token se ainda for o mesmo que
+  recebeu o 401 (outra thread pode já ter renovado);
+- persiste opcionalmente o token em arquivo (SANKHYA_TOKEN_STORE), para que o
+  Streamlit e o worker não re-autentiquem a cada cold start.
+"""
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from concurrent.futures import Future
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Optional, Tuple
+
+logger = logging.getLogger("sankhya-token-manager")
+
+# Margem (s) descontada do expires_in do Gateway: o token é tratado como vencido antes
+DEFAULT_EXPIRY_MARGIN = 60.0
+
+# Antecedência (s) do refresh proativo em relação ao vencimento (já com a margem)
+DEFAULT_REFRESH_AHEAD = 300.0
+
+
+class TokenRefreshError(Exception):
+    """Falha ao obter um token novo do Gateway."""
+
+
+@dataclass(frozen=True)
+class Token:
+    """Um bearer token e o instante (epoch) a partir do qual deixa de ser usado."""
+    value: str
+    expires_at: float
+
+    def is_valid(self, now: Optional[float] = None) -> bool:
+        return bool(self.value) and (now if now is not None else time.time()) < self.expires_at
+
+
+class TokenStore:
+    """
+    Persistência do token em arquivo JSON compartilhado entre processos.
+    Cada credencial tem sua chave (hash de URL + client_id; o segredo nunca é gravado).
+    A escrita é atômica (arquivo temporário + rename) e o arquivo fica com permissão 600.
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key_for(base_url: str, client_id: Optional[str]) -> str:
+        return hashlib.sha256(f"{base_url}|{client_id or ''}".encode("utf-8")).hexdigest()[:16]
+
+    def _read_all(self) -> dict:
+        try:
+            return json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+
+    def load(self, key: str) -> Optional[Token]:
+        entry = self._read_all().get(key)
+        if not isinstance(entry, dict):
+            return None
+        try:
+            token = Token(str(entry["token"]), float(entry["expires_at"]))
+        except (KeyError, TypeError, ValueError):
+            return None
+        return token if token.is_valid() else None
+
+    def _write_all(self, data: dict):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(f".{self.path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp, self.path)
+
+    def save(self, key: str, token: Token):
+        with self._lock:
+            # Aproveita para descartar entradas vencidas
+            now = time.time()
+            data = {k: v for k, v in self._read_all().items() if isinstance(v, dict) and v.get("expires_at", 0) > now}
+            data[key] = {"token": token.value, "expires_at": token.expires_at}
+            try:
+                self._write_all(data)
+            except OSError as e:
+                logger.warning(f"Não foi possível persistir o token em {self.path}: {e}")
+
+    def delete(self, key: str, value: str):
+        """Remove a entrada se ainda for o token informado (compare-and-delete)."""
+        with self._lock:
+            data = self._read_all()
+            entry = data.get(key)
+            if isinstance(entry, dict) and entry.get("token") == value:
+                data.pop(key)
+                try:
+                    self._write_all(data)
+                except OSError:
+                    pass
+
+
+class TokenManager:
+    """
+    Token compartilhado por todas as threads de um cliente do Gateway.
+
+    `fetch` faz o /authenticate e devolve (token, expires_in em segundos), levantando
+    exceção em caso de falha. `store_key` é chamado sob demanda (a URL/credencial do
+    cliente pode mudar depois da construção, como nos testes).
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[], Tuple[str, float]],
+        store: Optional[TokenStore] = None,
+        store_key: Optional[Callable[[], str]] = None,
+        expiry_margin: float = DEFAULT_EXPIRY_MARGIN,
+        refresh_ahead: float = DEFAULT_REFRESH_AHEAD,
+        proactive: bool = True,
+    ):
+        self._fetch = fetch
+        self.store = store
+        self._store_key = store_key or (lambda: "default")
+        self.expiry_margin = expiry_margin
+        self.refresh_ahead = refresh_ahead
+        self.proactive = proactive
+
+        self._lock = threading.Lock()
+        self._token: Optional[Token] = None
+        self._inflight: Optional[Future] = None
+        self._timer: Optional[threading.Timer] = None
+        self._refreshes = 0
+        self._store_hits = 0
+
+    @classmethod
+    def from_env(cls, fetch: Callable[[], Tuple[str, float]],
+                 store_key: Optional[Callable[[], str]] = None) -> "TokenManager":
+        """
+        Configuração via ambiente:
+        SANKHYA_TOKEN_STORE (arquivo de persistência; vazio = desligado),
+        SANKHYA_TOKEN_PROACTIVE (1/0) e SANKHYA_TOKEN_REFRESH_AHEAD (segundos).
+        """
+        path = os.getenv("SANKHYA_TOKEN_STORE", "").strip()
+        try:
+            refresh_ahead = float(os.getenv("SANKHYA_TOKEN_REFRESH_AHEAD", DEFAULT_REFRESH_AHEAD))
+        except ValueError:
+            refresh_ahead = DEFAULT_REFRESH_AHEAD
+        return cls(
+            fetch,
+            store=TokenStore(path) if path else None,
+            store_key=store_key,
+            refresh_ahead=refresh_ahead,
+            proactive=os.getenv("SANKHYA_TOKEN_PROACTIVE", "1").strip().lower() in {"1", "true", "yes"},
+        )
+
+    # ------------------------------------------------------------------
+    # Leitura
+    # ------------------------------------------------------------------
+
+    @property
+    def token(self) -> Optional[str]:
+        """Token corrente (pode estar vencido); use get_token() para garantir validade."""
+        current = self._token
+        return current.value if current else None
+
+    @property
+    def expires_at(self) -> float:
+        current = self._token
+        return current.expires_at if current else 0.0
+
+    def get_token(self) -> str:
+        """Devolve um token válido, renovando (single-flight) se necessário."""
+        current = self._token
+        if current is not None and current.is_valid():
+            return current.value
+        return self._refresh(reason="vencido").value
+
+    # ------------------------------------------------------------------
+    # Refresh
+    # ------------------------------------------------------------------
+
+    def _refresh(self, reason: str, force: bool = False) -> Token:
+        with self._lock:
+            current = self._token
+            if not force and current is not None and current.is_valid():
+                return current
+            future = self._inflight
+            leader = future is None
+            if leader:
+                future = self._inflight = Future()
+
+        if not leader:
+            # Outra thread já está no /authenticate: espera e compartilha o resultado
+            return future.result()
+
+        try:
+            token = self._load_from_store()
+            if token is None:
+                logger.info(f"Renovando token do Gateway ({reason})...")
+                value, expires_in = self._fetch()
+                if not value:
+                    raise TokenRefreshError("Gateway não devolveu token.")
+                token = Token(value, time.time() + float(expires_in) - self.expiry_margin)
+                self._refreshes += 1
+                if self.store is not None:
+                    self.store.save(self._store_key(), token)
+            with self._lock:
+                self._token = token
+                self._inflight = None
+            future.set_result(token)
+            self._schedule_proactive(token)
+            return token
+        except Exception as e:
+            error = e if isinstance(e, TokenRefreshError) else TokenRefreshError(str(e))
+            with self._lock:
+                self._inflight = None
+            future.set_exception(error)
+            raise error
+
+    def _load_from_store(self) -> Optional[Token]:
+        """Outro processo pode ter renovado: usa o token persistido se for válido e mais novo."""
+        if self.store is None:
+            return None
+        token = self.store.load(self._store_key())
+        current = self._token
+        if token is not None and (current is None or token.expires_at > current.expires_at):
+            self._store_hits += 1
+            return token
+        return None
+
+    def _schedule_proactive(self, token: Token):
+        if not self.proactive:
+            return
+        delay = token.expires_at - time.time() - self.refresh_ahead
+        # Tokens muito curtos: renova na metade da vida útil restante
+        delay = max(delay, (token.expires_at - time.time()) / 2, 1.0)
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = threading.Timer(delay, self._proactive_refresh, args=(token.value,))
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _proactive_refresh(self, expected: str):
+        # Se o token já foi trocado (401, outro refresh), o novo agendou seu próprio timer
+        if self.token != expected:
+            return
+        try:
+            self._refresh(reason="proativo", force=True)
+        except TokenRefreshError as e:
+            logger.warning(f"Refresh proativo do token falhou (nova tentativa sob demanda): {e}")
+
+    # ------------------------------------------------------------------
+    # Invalidação
+    # ------------------------------------------------------------------
+
+    def invalidate(self, used_token: Optional[str]) -> bool:
+        """
+        Descarta o token só se ainda for o que recebeu 401. Devolve True se descartou;
+        False significa que outra thread já renovou e basta repetir com o token atual.
+        """
+        with self._lock:
+            current = self._token
+            if current is None or current.value != used_token:
+                return False
+            self._token = None
+        if self.store is not None and used_token:
+            self.store.delete(self._store_key(), used_token)
+        return True
+
+    def close(self):
+        """Cancela o refresh proativo agendado."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+    def stats(self):
+        return {
+            "refreshes": self._refreshes,
+            "store_hits": self._store_hits,
+            "expires_in": max(0.0, self.expires_at - time.time()),
+            "proactive": self.proactive,
+            "persisted": self.store is not None,
+        }
@@ -0,0 +1,107 @@
+"""
+Execução concorrente das chamadas de ferramenta de uma rodada do loop Gemini.
+
+Quando o modelo pede, na mesma rodada, `get_invoice_header` + `get_invoice_items`
+ou vários `get_table_columns`, as latências do Gateway se somavam. Aqui as chamadas
+rodam num pool limitado de threads, com timeout por ferramenta e respostas sempre
+na mesma ordem dos pedidos.
+
+Ferramentas com `concurrent_safe = False` (ver `tools.sequential_tool`) funcionam
+como barreira: tudo o que foi pedido antes termina, elas rodam sozinhas e só então
+as seguintes são disparadas. Elas não têm timeout: uma gravação abandonada seguiria
+rodando no pool e o modelo, vendo um erro, repetiria a gravação.
+"""
+import os
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger("ssa-tool-runner")
+
+TOOL_MAX_WORKERS = int(os.getenv("SSA_TOOL_MAX_WORKERS", "4"))
+TOOL_TIMEOUT_SECONDS = float(os.getenv("SSA_TOOL_TIMEOUT", "60"))
+
+# Timeouts específicos (o atributo `tool_timeout` da função tem precedência)
+TOOL_TIMEOUTS = {
+    "generate_chart_report": 120,
+    "get_daily_sales_report": 120,
+    "run_all_watchers": 180,
+}
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=TOOL_MAX_WORKERS, thread_name_prefix="ssa-tool")
+        return _executor
+
+
+def tool_timeout(function_name: str, tool_function: Optional[Callable]) -> float:
+    """Timeout da ferramenta: atributo `tool_timeout` > TOOL_TIMEOUTS > padrão global."""
+    default = TOOL_TIMEOUTS.get(function_name, TOOL_TIMEOUT_SECONDS)
+    return float(getattr(tool_function, "tool_timeout", default))
+
+
+def _default_invoke(function_name: str, function_args: dict, tool_function: Callable) -> str:
+    try:
+        return str(tool_function(**function_args))
+    except Exception as e:
+        return f"Erro na execução da ferramenta: {str(e)}"
+
+
+def run_tool_calls(
+    calls: List[Tuple[str, dict]],
+    available_functions: Dict[str, Callable],
+    invoke: Callable[[str, dict, Callable], str] = _default_invoke,
+    round_label: str = "",
+) -> List[Tuple[str, dict, Optional[str]]]:
+    """
+    Executa as chamadas (nome, args) e devolve (nome, args, resposta) na mesma ordem.
+
+    A resposta é None quando a ferramenta não existe no registro. Ao estourar o
+    timeout, a resposta vira uma mensagem de erro para o modelo; a thread não é
+    interrompida (Python não permite), mas a rodada segue sem esperar por ela.
+    Ferramentas não concorrentes (gravações) são sempre aguardadas até o fim.
+    """
+    results: List[Optional[Tuple[str, dict, Optional[str]]]] = [None] * len(calls)
+    pending = []  # (índice, future, deadline; None = sem timeout)
+
+    def _collect():
+        for idx, future, deadline in pending:
+            name, args = calls[idx]
+            try:
+                response = future.result(timeout=None if deadline is None else max(deadline - time.monotonic(), 0))
+            except FutureTimeoutError:
+                limit = tool_timeout(name, available_functions.get(name))
+                logger.warning(f"Ferramenta {name} excedeu o timeout de {limit:.0f}s e foi abandonada nesta rodada.")
+                response = f"Erro na execução da ferramenta: tempo limite de {limit:.0f}s excedido."
+            results[idx] = (name, args, response)
+        pending.clear()
+
+    executor = _get_executor()
+    for idx, (name, args) in enumerate(calls):
+        tool_function = available_functions.get(name)
+        if not tool_function:
+            results[idx] = (name, args, None)
+            continue
+
+        print(f"🛠️ Executando {round_label}: {name}({args})")
+        concurrent_safe = getattr(tool_function, "concurrent_safe", True)
+        if not concurrent_safe:
+            _collect()
+
+        future = executor.submit(invoke, name, args, tool_function)
+        deadline = time.monotonic() + tool_timeout(name, tool_function) if concurrent_safe else None
+        pending.append((idx, future, deadline))
+
+        if not concurrent_safe:
+            _collect()
+
+    _collect()
+    return results
@@ -5,9 +5,11 @@ As funções são definidas no escopo global para permitir testes unitários e i
 import os
 import re
 import json
+import asyncio
+import hashlib
+import functools
 import logging
-import sqlite3
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
 import sys
 import importlib
 import pkgutil
@@ -23,8 +25,14 @@ if current_dir not in sys.path:
 
 try:
     from utils import sankhya, format_as_markdown_table
+    from async_client import sankhya_async
+    from knowledge_search import get_knowledge_search, clean_query as clean_knowledge_query
+    from search_index import get_search_index, KIND_ARTICLE, KIND_DOC, KIND_RULES, KIND_SCHEMA
 except ImportError:
     from mcp_server.utils import sankhya, format_as_markdown_table
+    from mcp_server.async_client import sankhya_async
+    from mcp_server.knowledge_search import get_knowledge_search, clean_query as clean_knowledge_query
+    from mcp_server.search_index import get_search_index, KIND_ARTICLE, KIND_DOC, KIND_RULES, KIND_SCHEMA
 
 logger = logging.getLogger("ssa-tools")
 
@@ -41,6 +49,14 @@ def _parse_csv_env(name: str) -> List[str]:
     items = [x.strip() for x in raw.split(",")]
     return [x for x in items if x]
 
+def sequential_tool(func):
+    """
+    Marca a ferramenta como não segura para execução concorrente.
+    O agent_client executa essas chamadas sozinhas, na ordem pedida pelo modelo.
+    """
+    func.concurrent_safe = False
+    return func
+
 def _write_guard_blocked_message(action: str, hint: str = "") -> str:
     extra = f"\n\n{hint}" if hint else ""
     return (
@@ -118,6 +134,15 @@ def validate_sql_safety(sql: str) -> Optional[str]:
 # IMPLEMENTAÇÃO DAS FERRAMENTAS (ESCOPO GLOBAL)
 # =============================================================================
 
+# Cada ferramenta de consulta é dividida em "montar SQL" + "formatar resultado",
+# compartilhados pela versão síncrona (Gemini/Streamlit) e pela assíncrona (servidor MCP).
+
+def _format_sql_select(result: List[Dict[str, Any]]) -> str:
+    if not result:
+        return "A consulta não retornou registros."
+    return f"**{len(result)} registro(s) encontrado(s):**\n\n{format_as_markdown_table(result)}"
+
+
 def run_sql_select(sql: str) -> str:
     """Executa SELECT com validação de segurança."""
     sql_to_run = _normalize_sql_for_gateway(sql)
@@ -126,19 +151,13 @@ def run_sql_select(sql: str) -> str:
         return error
 
     try:
-        result = sankhya.execute_query(sql_to_run)
-        if not result:
-            return "A consulta não retornou registros."
-        return f"**{len(result)} registro(s) encontrado(s):**\n\n{format_as_markdown_table(result)}"
+        return _format_sql_select(sankhya.execute_query(sql_to_run))
     except Exception as e:
         return f"❌ Erro ao executar SQL: {str(e)}"
 
 
-def get_table_columns(table_name: str) -> str:
-    """Consulta dicionário de dados (TDICAM ou ALL_TAB_COLUMNS)."""
-    clean_name = re.sub(r"[^A-Za-z0-9_]", "", table_name).upper()
-
-    # 1. Tenta TDICAM (Nativo Sankhya)
+def _table_columns_sql(clean_name: str) -> Tuple[str, str]:
+    """SQLs do dicionário: TDICAM (nativo Sankhya) e fallback ALL_TAB_COLUMNS (Oracle)."""
     sql_tdicam = f"""
     SELECT 
         CAMPO AS "Coluna", 
@@ -149,14 +168,6 @@ def get_table_columns(table_name: str) -> str:
     WHERE NOMETAB = '{clean_name}'
     ORDER BY ORDEM
     """
-    try:
-        result = sankhya.execute_query(sql_tdicam)
-        if result:
-            return f"**Colunas da tabela `{clean_name}` (TDICAM):**\n\n{format_as_markdown_table(result)}"
-    except Exception:
-        pass
-
-    # 2. Fallback Oracle
     sql_oracle = f"""
     SELECT 
         COLUMN_NAME AS "Coluna",
@@ -167,6 +178,23 @@ def get_table_columns(table_name: str) -> str:
     WHERE TABLE_NAME = '{clean_name}'
     ORDER BY COLUMN_ID
     """
+    return sql_tdicam, sql_oracle
+
+
+def get_table_columns(table_name: str) -> str:
+    """Consulta dicionário de dados (TDICAM ou ALL_TAB_COLUMNS)."""
+    clean_name = re.sub(r"[^A-Za-z0-9_]", "", table_name).upper()
+    sql_tdicam, sql_oracle = _table_columns_sql(clean_name)
+
+    # 1. Tenta TDICAM (Nativo Sankhya)
+    try:
+        result = sankhya.execute_query(sql_tdicam)
+        if result:
+            return f"**Colunas da tabela `{clean_name}` (TDICAM):**\n\n{format_as_markdown_table(result)}"
+    except Exception:
+        pass
+
+    # 2. Fallback Oracle
     try:
         result = sankhya.execute_query(sql_oracle)
         if result:
@@ -176,9 +204,8 @@ def get_table_columns(table_name: str) -> str:
         return f"❌ Erro ao consultar dicionário: {str(e)}"
 
 
-def get_stock_info(codprod: int, codlocal: int = 10010000) -> str:
-    """Consulta estoque atual de um produto."""
-    sql = f"""
+def _stock_info_sql(codprod: int, codlocal: int) -> str:
+    return f"""
     SELECT
         P.CODPROD,
         P.DESCRPROD AS "Descricao",
@@ -202,18 +229,24 @@ def get_stock_info(codprod: int, codlocal: int = 10010000) -> str:
     ) C ON P.CODPROD = C.CODPROD
     WHERE P.CODPROD = {int(codprod)}
     """
+
+
+def _format_stock_info(codprod: int, result: List[Dict[str, Any]]) -> str:
+    if not result:
+        return f"Produto {codprod} não encontrado."
+    return f"**Estoque do Produto {codprod}:**\n\n{format_as_markdown_table(result)}"
+
+
+def get_stock_info(codprod: int, codlocal: int = 10010000) -> str:
+    """Consulta estoque atual de um produto."""
     try:
-        result = sankhya.execute_query(sql)
-        if not result:
-            return f"Produto {codprod} não encontrado."
-        return f"**Estoque do Produto {codprod}:**\n\n{format_as_markdown_table(result)}"
+        return _format_stock_info(codprod, sankhya.execute_query(_stock_info_sql(codprod, codlocal)))
     except Exception as e:
         return f"❌ Erro ao consultar estoque: {str(e)}"
 
 
-def get_partner_info(codparc: int) -> str:
-    """Busca dados de um parceiro."""
-    sql = f"""
+def _partner_info_sql(codparc: int) -> str:
+    return f"""
     SELECT
         P.CODPARC,
         P.RAZAOSOCIAL AS "RazaoSocial",
@@ -228,18 +261,24 @@ def get_partner_info(codparc: int) -> str:
     LEFT JOIN TSICID C ON P.CODCID = C.CODCID
     WHERE P.CODPARC = {int(codparc)}
     """
+
+
+def _format_partner_info(codparc: int, result: List[Dict[str, Any]]) -> str:
+    if not result:
+        return f"Parceiro {codparc} não encontrado."
+    return f"**Parceiro {codparc}:**\n\n{format_as_markdown_table(result)}"
+
+
+def get_partner_info(codparc: int) -> str:
+    """Busca dados de um parceiro."""
     try:
-        result = sankhya.execute_query(sql)
-        if not result:
-            return f"Parceiro {codparc} não encontrado."
-        return f"**Parceiro {codparc}:**\n\n{format_as_markdown_table(result)}"
+        return _format_partner_info(codparc, sankhya.execute_query(_partner_info_sql(codparc)))
     except Exception as e:
         return f"❌ Erro ao consultar parceiro: {str(e)}"
 
 
-def get_invoice_header(nunota: int) -> str:
-    """Busca cabeçalho de nota."""
-    sql = f"""
+def _invoice_header_sql(nunota: int) -> str:
+    return f"""
     SELECT
         C.NUNOTA,
         C.NUMNOTA AS "NumNota",
@@ -256,18 +295,24 @@ def get_invoice_header(nunota: int) -> str:
     LEFT JOIN TSIUSU U ON C.CODUSU = U.CODUSU
     WHERE C.NUNOTA = {int(nunota)}
     """
+
+
+def _format_invoice_header(nunota: int, result: List[Dict[str, Any]]) -> str:
+    if not result:
+        return f"Nota {nunota} não encontrada."
+    return f"**Nota {nunota}:**\n\n{format_as_markdown_table(result)}"
+
+
+def get_invoice_header(nunota: int) -> str:
+    """Busca cabeçalho de nota."""
     try:
-        result = sankhya.execute_query(sql)
-        if not result:
-            return f"Nota {nunota} não encontrada."
-        return f"**Nota {nunota}:**\n\n{format_as_markdown_table(result)}"
+        return _format_invoice_header(nunota, sankhya.execute_query(_invoice_header_sql(nunota)))
     except Exception as e:
         return f"❌ Erro ao consultar nota: {str(e)}"
 
 
-def get_invoice_items(nunota: int) -> str:
-    """Lista itens de uma nota."""
-    sql = f"""
+def _invoice_items_sql(nunota: int) -> str:
+    return f"""
     SELECT
         I.SEQUENCIA AS "Seq",
         I.CODPROD,
@@ -281,46 +326,28 @@ def get_invoice_items(nunota: int) -> str:
     WHERE I.NUNOTA = {int(nunota)}
     ORDER BY I.SEQUENCIA
     """
+
+
+def _format_invoice_items(nunota: int, result: List[Dict[str, Any]]) -> str:
+    if not result:
+        return f"Nenhum item encontrado para a nota {nunota}."
+    return f"**Itens da Nota {nunota} ({len(result)} itens):**\n\n{format_as_markdown_table(result)}"
+
+
+def get_invoice_items(nunota: int) -> str:
+    """Lista itens de uma nota."""
     try:
-        result = sankhya.execute_query(sql)
-        if not result:
-            return f"Nenhum item encontrado para a nota {nunota}."
-        return f"**Itens da Nota {nunota} ({len(result)} itens):**\n\n{format_as_markdown_table(result)}"
+        return _format_invoice_items(nunota, sankhya.execute_query(_invoice_items_sql(nunota)))
     except Exception as e:
         return f"❌ Erro ao consultar itens: {str(e)}"
 
 
 def search_docs(query: str) -> str:
     """Pesquisa na knowledge base."""
-    results = []
-    query_lower = query.lower()
-
-    for filename in os.listdir(KNOWLEDGE_DIR):
-        filepath = os.path.join(KNOWLEDGE_DIR, filename)
-        if not os.path.isfile(filepath):
-            continue
-
-        try:
-            with open(filepath, "r", encoding="utf-8") as f:
-                content = f.read()
-
-            if query_lower in content.lower():
-                lines = content.split("\n")
-                snippets = []
-                for i, line in enumerate(lines):
-                    if query_lower in line.lower():
-                        start = max(0, i - 1)
-                        end = min(len(lines), i + 3)
-                        snippet = "\n".join(lines[start:end])
-                        snippets.append(snippet)
-                        if len(snippets) >= 3:
-                            break
-                results.append(f"### 📄 {filename}\n\n" + "\n\n---\n\n".join(snippets))
-        except Exception:
-            continue
-
-    if not results:
+    hits = get_search_index().search(query, limit=6, kinds=(KIND_DOC, KIND_RULES, KIND_SCHEMA))
+    if not hits:
         return f"Nenhum resultado encontrado para '{query}' na base de conhecimento."
+    results = [f"### 📄 {hit.title}\n\n{hit.snippet}" for hit in hits]
     return f"**Resultados para '{query}':**\n\n" + "\n\n".join(results)
 
 
@@ -336,13 +363,19 @@ def list_tables() -> str:
         return f"❌ Erro ao ler schema_map.json: {str(e)}"
 
 
+_TEST_CONNECTION_SQL = "SELECT 1 AS TESTE FROM DUAL"
+
+
+def _format_test_connection(result: List[Dict[str, Any]]) -> str:
+    if result:
+        return "✅ Conexão com o Gateway Sankhya estabelecida com sucesso!"
+    return "⚠️ Conexão estabelecida, mas o resultado foi vazio."
+
+
 def test_connection() -> str:
     """Testa conexão."""
     try:
-        result = sankhya.execute_query("SELECT 1 AS TESTE FROM DUAL")
-        if result:
-            return "✅ Conexão com o Gateway Sankhya estabelecida com sucesso!"
-        return "⚠️ Conexão estabelecida, mas o resultado foi vazio."
+        return _format_test_connection(sankhya.execute_query(_TEST_CONNECTION_SQL, use_cache=False))
     except Exception as e:
         return f"❌ Falha na conexão: {str(e)}"
 
@@ -409,6 +442,7 @@ def get_daily_sales_report(days: int = 7, codemp_csv: str = "") -> str:
     except Exception as e:
         return f"❌ Erro ao gerar relatório diário: {str(e)}"
 
+@sequential_tool
 def call_sankhya_service(service_name: str, request_body: dict) -> str:
     """
     Executa qualquer serviço (Service Name) da API do Sankhya.
@@ -497,6 +531,7 @@ def load_records(entity_name: str, criteria: str = "", fields: List[str] = None)
         return f"❌ Erro ao consultar `{entity_name}`: {str(e)}"
 
 
+@sequential_tool
 def save_record(entity_name: str, values: dict, primary_key: dict = None) -> str:
     """
     Insere (INSERT) ou Atualiza (UPDATE) um registro em qualquer entidade.
@@ -564,82 +599,28 @@ def search_solutions(query: str) -> str:
     Busca soluções na Base de Conhecimento Sankhya (artigos oficiais indexados).
     Use isso quando encontrar erros (ex: ORA-xxxxx) ou tiver dúvidas de processo.
     """
-    db_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "mcp_server", "knowledge.db")
-    if not os.path.exists(db_path):
-        return "⚠️ Base de conhecimento ainda não indexada. Execute o script `knowledge_indexer.py` primeiro."
-        
+    searcher = get_knowledge_search()
     try:
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        
-        # Tenta extrair a mensagem "core" do erro
-        clean_query = query.replace("Erro Funcional Sankhya:", "").replace("HttpServiceBroker:", "").replace(":", " ").replace("*", " ").replace('"', " ").strip()
-        
-        # Estratégia 1: Busca FTS "NEAR" (Palavras próximas) ou Phrase Match
-        # Tenta buscar a frase exata primeiro (mais preciso)
-        try:
-            cursor.execute("""
-                SELECT a.title, a.body, a.url 
-                FROM articles_fts f 
-                JOIN articles a ON a.id = f.rowid 
-                WHERE articles_fts MATCH ? 
-                ORDER BY f.rank 
-                LIMIT 3
-            """, (f'"{clean_query}"',))
-            rows = cursor.fetchall()
-        except:
-            rows = []
-
-        # Estratégia 2: Busca FTS "AND" (Todas as palavras presentes, qualquer ordem)
-        if not rows:
-            # Pega as 5 maiores palavras para montar a query
-            words = [w for w in clean_query.split() if len(w) > 4]
-            if words:
-                fts_query = " AND ".join(words[:5])
-                try:
-                    cursor.execute("""
-                        SELECT a.title, a.body, a.url 
-                        FROM articles_fts f 
-                        JOIN articles a ON a.id = f.rowid 
-                        WHERE articles_fts MATCH ? 
-                        ORDER BY f.rank 
-                        LIMIT 3
-                    """, (fts_query,))
-                    rows = cursor.fetchall()
-                except:
-                    pass
-
-        # Estratégia 3: Fallback LIKE (Palavras-chave isoladas - OR)
-        if not rows:
-            # Pega palavras com mais de 3 letras (aceita 'Erro', 'Nota', 'Série')
-            keywords = [w for w in clean_query.split() if len(w) > 3]
-            if keywords:
-                # Tenta match com qualquer palavra-chave no título OU corpo (limitado a 3 termos para performance)
-                like_clauses = []
-                for kw in keywords[:3]:
-                    like_clauses.append(f"title LIKE '%{kw}%'")
-                    like_clauses.append(f"body LIKE '%{kw}%'") # Também busca no corpo para aumentar recall
-                
-                like_query = " OR ".join(like_clauses)
-                
-                cursor.execute(f"""
-                    SELECT title, body, url 
-                    FROM articles 
-                    WHERE {like_query}
-                    LIMIT 3
-                """)
-                rows = cursor.fetchall()
-
-        conn.close()
-        
-        if not rows:
-            return f"Nenhuma solução encontrada na base de conhecimento para: '{clean_query}'"
-            
+        clean_query = clean_knowledge_query(query)
+        # Índice unificado (BM25 sobre artigos, regras, docs e schema); sem resultado,
+        # o FTS da knowledge.db ainda acha palavras parciais pelo índice trigram.
         results = []
-        for title, body, url in rows:
-            # Resume o corpo (primeiros 300 chars)
-            snippet = body[:300] + "..." if len(body) > 300 else body
-            results.append(f"### 📄 [{title}]({url})\n{snippet}\n\n[Ler artigo completo]({url})")
+        for hit in get_search_index().search(clean_query, limit=3):
+            if hit.kind == KIND_ARTICLE:
+                results.append(f"### 📄 [{hit.title}]({hit.location})\n{hit.snippet}\n\n[Ler artigo completo]({hit.location})")
+            else:
+                results.append(f"### 📄 {hit.title}\n{hit.snippet}")
+
+        if not results and searcher.exists():
+            for title, body, url in searcher.search(query, limit=3):
+                # Resume o corpo (primeiros 300 chars)
+                snippet = body[:300] + "..." if len(body) > 300 else body
+                results.append(f"### 📄 [{title}]({url})\n{snippet}\n\n[Ler artigo completo]({url})")
+
+        if not results:
+            if not searcher.exists():
+                return "⚠️ Base de conhecimento ainda não indexada. Execute o script `knowledge_indexer.py` primeiro."
+            return f"Nenhuma solução encontrada na base de conhecimento para: '{clean_query}'"
             
         return f"**Soluções Encontradas para '{clean_query}':**\n\n" + "\n\n---\n\n".join(results)
         
@@ -652,6 +633,121 @@ def describe_entity(entity_name: str) -> str:
     return get_table_columns(entity_name) # Reutiliza a função existente que já consulta TDICAM
 
 
+# =============================================================================
+# VARIANTES ASSÍNCRONAS (SERVIDOR MCP)
+# =============================================================================
+# Mesmos SQLs e formatação das versões síncronas, mas sobre o AsyncSankhyaGatewayClient:
+# uma query lenta não bloqueia o event loop do FastMCP para os demais clientes.
+
+async def run_sql_select_async(sql: str) -> str:
+    """Executa SELECT com validação de segurança."""
+    sql_to_run = _normalize_sql_for_gateway(sql)
+    error = validate_sql_safety(sql_to_run)
+    if error:
+        return error
+
+    try:
+        return _format_sql_select(await sankhya_async.execute_query(sql_to_run))
+    except Exception as e:
+        return f"❌ Erro ao executar SQL: {str(e)}"
+
+
+async def get_table_columns_async(table_name: str) -> str:
+    """Consulta dicionário de dados (TDICAM ou ALL_TAB_COLUMNS)."""
+    clean_name = re.sub(r"[^A-Za-z0-9_]", "", table_name).upper()
+    sql_tdicam, sql_oracle = _table_columns_sql(clean_name)
+
+    try:
+        result = await sankhya_async.execute_query(sql_tdicam)
+        if result:
+            return f"**Colunas da tabela `{clean_name}` (TDICAM):**\n\n{format_as_markdown_table(result)}"
+    except Exception:
+        pass
+
+    try:
+        result = await sankhya_async.execute_query(sql_oracle)
+        if result:
+            return f"**Colunas da tabela `{clean_name}` (Oracle):**\n\n{format_as_markdown_table(result)}"
+        return f"Tabela `{clean_name}` não encontrada no dicionário de dados."
+    except Exception as e:
+        return f"❌ Erro ao consultar dicionário: {str(e)}"
+
+
+async def get_stock_info_async(codprod: int, codlocal: int = 10010000) -> str:
+    """Consulta estoque atual de um produto."""
+    try:
+        return _format_stock_info(codprod, await sankhya_async.execute_query(_stock_info_sql(codprod, codlocal)))
+    except Exception as e:
+        return f"❌ Erro ao consultar estoque: {str(e)}"
+
+
+async def get_partner_info_async(codparc: int) -> str:
+    """Busca dados de um parceiro."""
+    try:
+        return _format_partner_info(codparc, await sankhya_async.execute_query(_partner_info_sql(codparc)))
+    except Exception as e:
+        return f"❌ Erro ao consultar parceiro: {str(e)}"
+
+
+async def get_invoice_header_async(nunota: int) -> str:
+    """Busca cabeçalho de nota."""
+    try:
+        return _format_invoice_header(nunota, await sankhya_async.execute_query(_invoice_header_sql(nunota)))
+    except Exception as e:
+        return f"❌ Erro ao consultar nota: {str(e)}"
+
+
+async def get_invoice_items_async(nunota: int) -> str:
+    """Lista itens de uma nota."""
+    try:
+        return _format_invoice_items(nunota, await sankhya_async.execute_query(_invoice_items_sql(nunota)))
+    except Exception as e:
+        return f"❌ Erro ao consultar itens: {str(e)}"
+
+
+async def test_connection_async() -> str:
+    """Testa conexão."""
+    try:
+        return _format_test_connection(await sankhya_async.execute_query(_TEST_CONNECTION_SQL, use_cache=False))
+    except Exception as e:
+        return f"❌ Falha na conexão: {str(e)}"
+
+
+async def describe_entity_async(entity_name: str) -> str:
+    """Lista os campos disponíveis em uma entidade (Dicionário de Dados)."""
+    return await get_table_columns_async(entity_name)
+
+
+# Nome da ferramenta -> variante assíncrona registrada no servidor MCP
+ASYNC_TOOL_VARIANTS = {
+    "run_sql_select": run_sql_select_async,
+    "get_table_columns": get_table_columns_async,
+    "describe_entity": describe_entity_async,
+    "get_stock_info": get_stock_info_async,
+    "get_partner_info": get_partner_info_async,
+    "get_invoice_header": get_invoice_header_async,
+    "get_invoice_items": get_invoice_items_async,
+    "test_connection": test_connection_async,
+}
+
+
+def _as_mcp_tool(name: str, func):
+    """
+    Função a registrar no FastMCP: a variante assíncrona, se existir; senão a
+    síncrona executada numa thread (asyncio.to_thread) para não bloquear o loop.
+    """
+    async_variant = ASYNC_TOOL_VARIANTS.get(name)
+    if async_variant is not None:
+        return async_variant
+    if inspect.iscoroutinefunction(func):
+        return func
+
+    @functools.wraps(func)
+    async def _threaded(*args, **kwargs):
+        return await asyncio.to_thread(func, *args, **kwargs)
+    return _threaded
+
+
 # =============================================================================
 # REGISTRO NO FAST MCP
 # =============================================================================
@@ -696,14 +792,57 @@ def generate_chart_report(sql: str, chart_type: str = "bar", title: str = "Relat
     except Exception as e:
         return f"Erro ao gerar gráfico: {str(e)}"
 
-def register_tools(mcp=None):
+SKILLS_PATH = os.path.join(os.path.dirname(__file__), "skills")
+
+# Estado do hot-reload: só módulos de skill alterados são recarregados
+_SKILL_FINGERPRINTS: Dict[str, tuple] = {}   # módulo -> (mtime_ns, tamanho, sha1)
+_SKILL_TOOLS: Dict[str, Dict[str, Any]] = {}  # módulo -> {nome: função}
+_REGISTRY_VERSION = 0
+_SCHEMA_CACHE: Dict[str, Any] = {"version": None, "declarations": None}
+
+
+def _skill_fingerprint(path: str, previous: Optional[tuple]) -> tuple:
+    """(mtime, tamanho, hash). O hash só é recalculado quando mtime/tamanho mudam."""
+    stat = os.stat(path)
+    if previous and previous[0] == stat.st_mtime_ns and previous[1] == stat.st_size:
+        return previous
+    with open(path, "rb") as f:
+        digest = hashlib.sha1(f.read()).hexdigest()
+    return (stat.st_mtime_ns, stat.st_size, digest)
+
+
+def _load_skill_tools(module_name: str) -> Dict[str, Any]:
+    """Importa (ou recarrega) o módulo da skill e devolve suas funções públicas documentadas."""
+    if module_name in sys.modules:
+        module = importlib.reload(sys.modules[module_name])
+    else:
+        module = importlib.import_module(module_name)
+
+    tools = {}
+    for name, func in inspect.getmembers(module, inspect.isfunction):
+        # Só expõe funções definidas no próprio módulo da skill.
+        if func.__module__ != module.__name__:
+            continue
+        if not name.startswith("_") and func.__doc__:
+            tools[name] = func
+    return tools
+
+
+def get_registry_version() -> int:
+    """Versão do GLOBAL_TOOL_REGISTRY: muda sempre que alguma ferramenta muda."""
+    return _REGISTRY_VERSION
+
+
+def register_tools(mcp=None, force: bool = False) -> bool:
     """
     Registra as ferramentas globais e skills dinâmicas.
     Se mcp for fornecido, registra no servidor FastMCP.
     Popula o GLOBAL_TOOL_REGISTRY.
+
+    Hot-reload incremental: só recarrega arquivos de skill cujo conteúdo mudou
+    (mtime/tamanho e, se mudarem, hash). Retorna True se o registro mudou.
     """
-    global GLOBAL_TOOL_REGISTRY
-    GLOBAL_TOOL_REGISTRY.clear() # Limpa o dicionário mantendo a mesma referência de objeto
+    global _REGISTRY_VERSION
 
     # 1. Ferramentas Core (Estáticas)
     core_tools = [
@@ -713,38 +852,61 @@ def register_tools(mcp=None):
         search_solutions, describe_entity, generate_chart_report,
         get_daily_sales_report
     ]
-    for tool_func in core_tools:
-        GLOBAL_TOOL_REGISTRY[tool_func.__name__] = tool_func
-        if mcp:
-            mcp.tool()(tool_func)
 
     # 2. Carregamento Dinâmico de Skills
-    skills_path = os.path.join(os.path.dirname(__file__), "skills")
-    if not os.path.exists(skills_path):
-        return
-
-    if skills_path not in sys.path:
-        sys.path.insert(0, skills_path)
-
-    for loader, module_name, is_pkg in pkgutil.iter_modules([skills_path]):
-        try:
-            module = importlib.import_module(module_name)
-            importlib.reload(module)
-            
-            for name, func in inspect.getmembers(module, inspect.isfunction):
-                # Só expõe funções definidas no próprio módulo da skill.
-                if func.__module__ != module.__name__:
+    changed = force or not GLOBAL_TOOL_REGISTRY
+    skills_path = SKILLS_PATH
+    current_modules = set()
+    if os.path.exists(skills_path):
+        if skills_path not in sys.path:
+            sys.path.insert(0, skills_path)
+
+        for loader, module_name, is_pkg in pkgutil.iter_modules([skills_path]):
+            if is_pkg:
+                continue
+            current_modules.add(module_name)
+            path = os.path.join(skills_path, f"{module_name}.py")
+            try:
+                previous = _SKILL_FINGERPRINTS.get(module_name)
+                fingerprint = _skill_fingerprint(path, previous)
+                if not force and previous is not None and previous[2] == fingerprint[2]:
+                    _SKILL_FINGERPRINTS[module_name] = fingerprint
                     continue
-                if not name.startswith("_") and func.__doc__:
-                    #print(f"DEBUG: Registrando {name} de {module_name}")
-                    GLOBAL_TOOL_REGISTRY[name] = func
-                    if mcp:
-                        mcp.tool()(func)
-        except Exception as e:
-            logger.error(f"Erro ao carregar skill {module_name}: {str(e)}")
+
+                # Registra a tentativa antes de carregar: skill quebrada só é retentada quando o arquivo mudar
+                _SKILL_FINGERPRINTS[module_name] = fingerprint
+                _SKILL_TOOLS[module_name] = _load_skill_tools(module_name)
+                changed = True
+                logger.info(f"Skill {module_name} (re)carregada: {len(_SKILL_TOOLS[module_name])} ferramenta(s)")
+            except Exception as e:
+                logger.error(f"Erro ao carregar skill {module_name}: {str(e)}")
+
+    for removed in set(_SKILL_TOOLS) - current_modules:
+        _SKILL_TOOLS.pop(removed, None)
+        _SKILL_FINGERPRINTS.pop(removed, None)
+        changed = True
+
+    if changed:
+        GLOBAL_TOOL_REGISTRY.clear() # Limpa o dicionário mantendo a mesma referência de objeto
+        for tool_func in core_tools:
+            GLOBAL_TOOL_REGISTRY[tool_func.__name__] = tool_func
+        for module_name in sorted(_SKILL_TOOLS):
+            GLOBAL_TOOL_REGISTRY.update(_SKILL_TOOLS[module_name])
+        _REGISTRY_VERSION += 1
+
+    if mcp:
+        for name, func in GLOBAL_TOOL_REGISTRY.items():
+            mcp.tool(name=name, description=func.__doc__)(_as_mcp_tool(name, func))
+    return changed
 
 def get_gemini_tools_schema() -> List[Dict]:
-    """Gera declarações de função no formato Gemini baseado nas ferramentas registradas."""
+    """
+    Gera declarações de função no formato Gemini baseado nas ferramentas registradas.
+    O resultado fica em cache até a versão do registro mudar.
+    """
+    if _SCHEMA_CACHE["version"] == _REGISTRY_VERSION and _SCHEMA_CACHE["declarations"] is not None:
+        return _SCHEMA_CACHE["declarations"]
+
     declarations = []
     for name, func in GLOBAL_TOOL_REGISTRY.items():
         # Gera schema baseado na assinatura e docstring
@@ -780,4 +942,7 @@ def get_gemini_tools_schema() -> List[Dict]:
             "description": (func.__doc__ or "Sem descrição").strip().split("\n")[0],
             "parameters": params
         })
+
+    _SCHEMA_CACHE["version"] = _REGISTRY_VERSION
+    _SCHEMA_CACHE["declarations"] = declarations
     return declarations
@@ -1,22 +1,39 @@
 import os
-import requests
 import time
 import logging
-from typing import Optional, List, Dict, Any
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, List, Dict, Any, Iterator
 from datetime import datetime
 from dotenv import load_dotenv
 
+try:
+    from http_pool import PooledHTTPSession
+    from token_manager import TokenManager, TokenStore, TokenRefreshError
+    from query_cache import QueryCache
+    from row_decoder import StreamingRowDecoder, QueryResult, decode_query_response
+    from query_pager import PageCursor, Page, build_window_sql, build_keyset_sql, ROWNUM_COLUMN, PAGE_MODES
+    from sql_binder import get_template
+except ImportError:
+    from mcp_server.http_pool import PooledHTTPSession
+    from mcp_server.token_manager import TokenManager, TokenStore, TokenRefreshError
+    from mcp_server.query_cache import QueryCache
+    from mcp_server.row_decoder import StreamingRowDecoder, QueryResult, decode_query_response
+    from mcp_server.query_pager import PageCursor, Page, build_window_sql, build_keyset_sql, ROWNUM_COLUMN, PAGE_MODES
+    from mcp_server.sql_binder import get_template
+
 load_dotenv(override=True)
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("sankhya-gateway")
 
 # Logger de auditoria dedicado para rastrear todas as queries SQL executadas
+# (SANKHYA_AUDIT_LOG troca o arquivo; os testes o apontam para um diretório temporário)
 audit_logger = logging.getLogger("sankhya-audit")
-_audit_handler = logging.FileHandler(
-    os.path.join(os.path.dirname(os.path.dirname(__file__)), "logs", "activity.log"),
-    encoding="utf-8"
-)
+_logs_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "logs")
+_audit_path = os.getenv("SANKHYA_AUDIT_LOG") or os.path.join(_logs_dir, "activity.log")
+os.makedirs(os.path.dirname(os.path.abspath(_audit_path)), exist_ok=True)
+_audit_handler = logging.FileHandler(_audit_path, encoding="utf-8")
 _audit_handler.setFormatter(logging.Formatter("%(asctime)s | %(message)s"))
 audit_logger.addHandler(_audit_handler)
 audit_logger.setLevel(logging.INFO)
@@ -38,6 +55,13 @@ def format_as_markdown_table(data: List[Dict[str, Any]]) -> str:
     return "\n".join([header_row, separator] + body_rows)
 
 
+# Tamanho dos pedaços lidos da resposta do DbExplorerSP (decodificação incremental)
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Serviços somente leitura: podem ser repetidos com segurança em respostas 5xx
+READ_ONLY_SERVICES = {"DbExplorerSP.executeQuery", "CRUDServiceProvider.loadRecords"}
+
+
 class SankhyaGatewayClient:
     """Cliente para o Gateway Sankhya com autenticação OAuth 2.0 + X-Token."""
 
@@ -47,16 +71,35 @@ class SankhyaGatewayClient:
         self.client_secret = os.getenv("SANKHYA_CLIENT_SECRET")
         self.x_token = os.getenv("SANKHYA_X_TOKEN")
 
-        self.bearer_token: Optional[str] = None
-        self.token_expires_at: float = 0
+        # Pool keep-alive compartilhado por todas as chamadas deste cliente
+        self.http = PooledHTTPSession()
 
-    def authenticate(self) -> bool:
-        """Autentica no Gateway Sankhya via OAuth 2.0 + X-Token."""
-        if self.bearer_token and time.time() < self.token_expires_at:
-            return True
+        # Token OAuth compartilhado entre threads (refresh single-flight + proativo)
+        self.tokens = TokenManager.from_env(
+            self._request_token,
+            store_key=lambda: TokenStore.key_for(self.base_url, self.client_id),
+        )
+
+        # Timeout padrão das queries (execute_query_result/paged aceitam override por chamada)
+        self.query_timeout = float(os.getenv("SANKHYA_QUERY_TIMEOUT", "30"))
+
+        # Cache read-through de SELECTs (opt-in via SANKHYA_QUERY_CACHE=1)
+        self.query_cache: Optional[QueryCache] = QueryCache.from_env()
+
+        # Bind variables no corpo do DbExplorerSP (só em Gateways que aceitam "params";
+        # desligado = valores embutidos como literais a partir do template em cache)
+        self.supports_binds = os.getenv("SANKHYA_GATEWAY_BINDS", "0") == "1"
+
+    @property
+    def bearer_token(self) -> Optional[str]:
+        return self.tokens.token
 
-        logger.info("Autenticando no Gateway Sankhya...")
+    @property
+    def token_expires_at(self) -> float:
+        return self.tokens.expires_at
 
+    def _request_token(self):
+        """POST /authenticate (chamado só pelo TokenManager, uma thread por vez)."""
         url = f"{self.base_url}/authenticate"
         headers = {
             "Content-Type": "application/x-www-form-urlencoded",
@@ -68,38 +111,88 @@ class SankhyaGatewayClient:
             "client_secret": self.client_secret
         }
 
-        try:
-            response = requests.post(url, data=data, headers=headers, timeout=15)
-            response.raise_for_status()
-            res_data = response.json()
+        response = self.http.post(url, data=data, headers=headers, timeout=15)
+        response.raise_for_status()
+        res_data = response.json()
 
-            # O Sankhya pode retornar 'access_token' ou 'bearerToken'
-            self.bearer_token = res_data.get("access_token") or res_data.get("bearerToken")
-            expires_in = res_data.get("expires_in", 3600)
-            self.token_expires_at = time.time() + float(expires_in) - 60  # margem de 1 min
+        # O Sankhya pode retornar 'access_token' ou 'bearerToken'
+        token = res_data.get("access_token") or res_data.get("bearerToken")
+        if token:
+            logger.info("Autenticação via Gateway realizada com sucesso.")
+        return token, float(res_data.get("expires_in", 3600))
 
-            if self.bearer_token:
-                logger.info("Autenticação via Gateway realizada com sucesso.")
-                return True
-            return False
-        except Exception as e:
+    def authenticate(self) -> bool:
+        """Autentica no Gateway Sankhya via OAuth 2.0 + X-Token (reaproveita o token válido)."""
+        try:
+            self.tokens.get_token()
+            return True
+        except TokenRefreshError as e:
             logger.error(f"Erro na autenticação Gateway: {str(e)}")
             return False
 
-    def _get_auth_headers(self) -> Dict[str, str]:
-        """Retorna os headers com o Bearer token corrente."""
+    def _get_auth_headers(self, token: Optional[str] = None) -> Dict[str, str]:
+        """Retorna os headers com o Bearer token informado (ou o corrente)."""
         return {
-            "Authorization": f"Bearer {self.bearer_token}",
+            "Authorization": f"Bearer {token or self.bearer_token}",
             "Content-Type": "application/json"
         }
 
-    def execute_query(self, sql: str) -> List[Dict[str, Any]]:
-        """Executa uma query SQL via DbExplorerSP no Gateway."""
+    def _post_authorized(self, url: str, **kwargs):
+        """
+        POST autenticado; num 401 invalida só o token usado (compare-and-invalidate)
+        e repete uma vez com o token renovado, possivelmente por outra thread.
+        """
         if not self.authenticate():
             raise Exception("Falha na autenticação com o Gateway Sankhya.")
 
+        token = self.bearer_token
+        response = self.http.post(url, headers=self._get_auth_headers(token), **kwargs)
+
+        # Re-autenticação automática se token expirou mid-request
+        if response.status_code == 401:
+            logger.info("Token expirado durante request. Re-autenticando...")
+            response.close()
+            self.tokens.invalidate(token)
+            if self.authenticate():
+                response = self.http.post(url, headers=self._get_auth_headers(), **kwargs)
+        return response
+
+    def execute_query(self, sql: str, use_cache: bool = True) -> List[Dict[str, Any]]:
+        """
+        Executa uma query SQL via DbExplorerSP no Gateway.
+        Com o cache ligado, SQLs idênticos (normalizados) são servidos da memória/SQLite
+        até o TTL da classe da query; use_cache=False força a ida ao Gateway.
+        """
+        if self.query_cache is not None and use_cache:
+            return self.query_cache.get_or_load(sql, lambda: self._run_query(sql))
+        return self._run_query(sql)
+
+    def execute_bound(self, sql: str, params: Dict[str, Any], use_cache: bool = True) -> List[Dict[str, Any]]:
+        """
+        Executa uma query com parâmetros nominais :NOME (ver sql_binder).
+        Com SANKHYA_GATEWAY_BINDS=1 o texto segue intacto e os valores vão como binds
+        (cursor reaproveitado no Oracle); sem isso, os valores entram como literais.
+        O cache usa sempre o SQL com literais como chave.
+        """
+        template = get_template(sql)
+        literal_sql = template.render(params)
+        if not self.supports_binds or not template.names:
+            return self.execute_query(literal_sql, use_cache=use_cache)
+
+        binds = template.bind_values(params)
+        loader = lambda: self.execute_query_result(template.sql, binds=binds).to_dicts()
+        if self.query_cache is not None and use_cache:
+            return self.query_cache.get_or_load(literal_sql, loader)
+        return loader()
+
+    def _run_query(self, sql: str) -> List[Dict[str, Any]]:
+        """Envia a query ao DbExplorerSP (sem cache) e devolve o formato List[Dict]."""
+        return self.execute_query_result(sql).to_dicts()
+
+    def _post_query(self, sql: str, timeout: Optional[float] = None, binds: Optional[Dict[str, Any]] = None):
+        """POST do DbExplorerSP com resposta em streaming (o corpo é lido sob demanda)."""
         # Registra no log de auditoria
-        audit_logger.info(f"SQL | {sql.strip()}")
+        audit_logger.info(f"SQL | {sql.strip()}" + (f" | BINDS {binds}" if binds else ""))
 
         url = f"{self.base_url}/gateway/v1/mge/service.sbr"
         params = {
@@ -112,56 +205,147 @@ class SankhyaGatewayClient:
                 "sql": sql.strip()
             }
         }
+        if binds:
+            payload["requestBody"]["params"] = binds
 
-        try:
-            response = requests.post(
-                url, json=payload, headers=self._get_auth_headers(),
-                params=params, timeout=30
-            )
-
-            # Re-autenticação automática se token expirou mid-request
-            if response.status_code == 401:
-                logger.info("Token expirado durante request. Re-autenticando...")
-                self.bearer_token = None
-                if self.authenticate():
-                    response = requests.post(
-                        url, json=payload, headers=self._get_auth_headers(),
-                        params=params, timeout=30
-                    )
+        response = self._post_authorized(
+            url, json=payload, params=params, timeout=timeout or self.query_timeout, stream=True
+        )
 
+        try:
             response.raise_for_status()
-            res_data = response.json()
-
-            if res_data.get("status") == "1":
-                body = res_data.get("responseBody", {})
-                fields = body.get("fieldsMetadata", [])
-                rows = body.get("rows", [])
-
-                if not rows:
-                    return []
-
-                # Mapeia linhas (arrays) para dicionários usando metadados das colunas
-                result = []
-                for row in rows:
-                    item = {}
-                    for i, field in enumerate(fields):
-                        item[field["name"]] = row[i]
-                    result.append(item)
-                return result
-            else:
-                error_msg = res_data.get("statusMessage", "Erro na execução da query")
-                logger.error(f"Erro SQL Sankhya: {error_msg}")
-                raise Exception(error_msg)
-
+        except Exception:
+            response.close()
+            raise
+        return response
+
+    def execute_query_result(self, sql: str, timeout: Optional[float] = None,
+                             binds: Optional[Dict[str, Any]] = None) -> QueryResult:
+        """
+        Executa a query e devolve um QueryResult compacto (colunas + tuplas),
+        decodificando o JSON em streaming. Ideal para consultas grandes (TGFGIR):
+        use .columnar() ou .to_dataframe() sem materializar um dict por linha.
+        """
+        try:
+            response = self._post_query(sql, timeout=timeout, binds=binds)
+            with response:
+                return decode_query_response(response.iter_content(chunk_size=STREAM_CHUNK_SIZE))
         except Exception as e:
             logger.error(f"Erro na chamada do DbExplorerSP: {str(e)}")
             raise
 
+    def iter_query(self, sql: str) -> Iterator[Dict[str, Any]]:
+        """
+        Executa a query e entrega as linhas (dicts) à medida que chegam do Gateway,
+        sem manter o resultado inteiro em memória. Não passa pelo cache.
+        """
+        response = self._post_query(sql)
+        with response:
+            decoder = StreamingRowDecoder(response.iter_content(chunk_size=STREAM_CHUNK_SIZE))
+            pending = []  # linhas recebidas antes de fieldsMetadata (ordem incomum)
+            for row in decoder:
+                if decoder.fields is None:
+                    pending.append(row)
+                    continue
+                for early in pending:
+                    yield dict(zip(decoder.fields, early))
+                pending.clear()
+                yield dict(zip(decoder.fields, row))
+
+            if decoder.status != "1":
+                logger.error(f"Erro SQL Sankhya: {decoder.status_message}")
+                raise Exception(decoder.status_message)
+            for early in pending:
+                yield dict(zip(decoder.fields or [], early))
+
+    def _fetch_window(self, sql: str, order_by: Optional[str], offset: int, page_size: int,
+                      mode: str, timeout: Optional[float]) -> List[Dict[str, Any]]:
+        window_sql = build_window_sql(sql, order_by, offset, page_size, mode=mode)
+        rows = self.execute_query_result(window_sql, timeout=timeout).to_dicts()
+        for row in rows:
+            row.pop(ROWNUM_COLUMN, None)
+        return rows
+
+    def iter_query_pages(
+        self,
+        sql: str,
+        order_by: Optional[str] = None,
+        page_size: int = 5000,
+        mode: str = "rownum",
+        key_column: Optional[str] = None,
+        max_workers: int = 2,
+        cursor: Optional[PageCursor] = None,
+        timeout: Optional[float] = None,
+    ) -> Iterator[Page]:
+        """
+        Executa uma query grande em páginas, entregando-as em ordem.
+
+        - mode="rownum"/"offset": janelas independentes; até `max_workers` páginas são
+          buscadas em paralelo à frente da que está sendo consumida. `order_by` (ou um
+          ORDER BY na própria query) deve definir ordem total, com chave única no fim.
+        - mode="keyset": faixas por `key_column` (única e crescente), sequencial.
+        - cursor: retoma de um `Page.cursor` anterior (ou `PageCursor.from_token`).
+        """
+        cursor = cursor or PageCursor(mode=mode, page_size=page_size)
+        if cursor.mode not in PAGE_MODES:
+            raise ValueError(f"Modo de paginação inválido: {cursor.mode}")
+        if cursor.done:
+            return
+
+        if cursor.mode == "keyset":
+            if not key_column:
+                raise ValueError("mode='keyset' exige key_column.")
+            index = 0
+            while not cursor.done:
+                page_sql = build_keyset_sql(sql, key_column, cursor.last_key, cursor.page_size)
+                rows = self.execute_query_result(page_sql, timeout=timeout).to_dicts()
+                cursor = cursor.advance(rows, key_column)
+                yield Page(index=index, rows=rows, cursor=cursor)
+                index += 1
+            return
+
+        if not order_by and "ORDER BY" not in sql.upper():
+            logger.warning("Query paginada sem ORDER BY: a ordem entre páginas não é garantida.")
+
+        workers = max(1, int(max_workers))
+        executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="sankhya-page")
+        pending = deque()
+        next_offset = cursor.offset
+
+        def _submit():
+            nonlocal next_offset
+            pending.append(executor.submit(
+                self._fetch_window, sql, order_by, next_offset, cursor.page_size, cursor.mode, timeout
+            ))
+            next_offset += cursor.page_size
+
+        try:
+            for _ in range(workers):
+                _submit()
+            index = 0
+            while pending:
+                rows = pending.popleft().result()
+                cursor = cursor.advance(rows)
+                yield Page(index=index, rows=rows, cursor=cursor)
+                index += 1
+                if cursor.done:
+                    break
+                _submit()
+        finally:
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=False)
+
+    def execute_query_paged(self, sql: str, **kwargs) -> Iterator[Dict[str, Any]]:
+        """
+        Itera as linhas de uma query grande buscando-a em páginas (ver iter_query_pages).
+        Para materializar: list(sankhya.execute_query_paged(sql, order_by="CODPROD")).
+        """
+        for page in self.iter_query_pages(sql, **kwargs):
+            yield from page.rows
+
     def call_service(self, service_name: str, request_body: Dict[str, Any]) -> Dict[str, Any]:
         """Chamada genérica de serviço via Gateway (JSON)."""
-        if not self.authenticate():
-            raise Exception("Falha na autenticação com o Gateway Sankhya.")
-
         audit_logger.info(f"SERVICE | {service_name}")
 
         url = f"{self.base_url}/gateway/v1/mge/service.sbr"
@@ -174,21 +358,13 @@ class SankhyaGatewayClient:
             "requestBody": request_body
         }
 
+        idempotent = service_name in READ_ONLY_SERVICES
+
         try:
-            response = requests.post(
-                url, json=payload, headers=self._get_auth_headers(),
-                params=params, timeout=30
+            response = self._post_authorized(
+                url, json=payload, params=params, timeout=30, idempotent=idempotent
             )
 
-            # Re-autenticação automática
-            if response.status_code == 401:
-                self.bearer_token = None
-                if self.authenticate():
-                    response = requests.post(
-                        url, json=payload, headers=self._get_auth_headers(),
-                        params=params, timeout=30
-                    )
-
             response.raise_for_status()
             data = response.json()
             
@@ -197,10 +373,32 @@ class SankhyaGatewayClient:
                 error_msg = data.get("statusMessage", "Erro desconhecido na API Sankhya")
                 # Decodifica escapes se necessário (em alguns casos vem em base64, mas o texto plano é comum)
                 raise Exception(f"Erro Funcional Sankhya: {error_msg}")
-                
+
+            # Gravação no ERP: resultados voláteis em cache deixam de ser confiáveis
+            if not idempotent and self.query_cache is not None:
+                self.query_cache.invalidate_volatile()
+
             return data
         except Exception as e:
             # logger.error(f"Erro no serviço {service_name}: {str(e)}") # Já será logado pelo chamador ou audit
             raise
+
+    def invalidate_cache(self, table: Optional[str] = None):
+        """Invalida o cache de queries (de uma tabela ou inteiro)."""
+        if self.query_cache is None:
+            return
+        if table:
+            self.query_cache.invalidate(table=table)
+        else:
+            self.query_cache.clear()
+
+    def get_pool_stats(self) -> Dict[str, Any]:
+        """Estatísticas do pool HTTP (handshakes, reuso) para confirmar keep-alive sob carga."""
+        return self.http.stats()
+
+    def get_token_stats(self) -> Dict[str, Any]:
+        """Refreshes feitos, tokens reaproveitados do arquivo e tempo restante do token atual."""
+        return self.tokens.stats()
+
 # Instância global para ser usada pelas ferramentas e skills
 sankhya = SankhyaGatewayClient()
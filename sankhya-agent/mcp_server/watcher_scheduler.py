@@ -0,0 +1,641 @@
+"""
+Agendador dos vigias proativos (watchers) com resultado persistido.
+
+O worker antigo rodava `run_all_watchers()` inteiro a cada intervalo: os vigias
+em série, todos na mesma cadência, e o markdown completo regravado em
+knowledge/active_alerts.json mesmo quando nada mudou. Aqui:
+
+- cada `Watcher` declara `interval_seconds` e `timeout_seconds`;
+- `WatcherScheduler.run_due()` dispara só os vigias vencidos, em paralelo num
+  pool de threads, e reagenda cada um para `agora + intervalo + jitter` (o
+  jitter espalha vigias de mesma cadência para não baterem juntos no Gateway);
+- `AlertStore` guarda o estado atual de cada vigia (linhas disparadas, status,
+  impressão digital) e o histórico de execuções num SQLite. A versão do painel
+  só sobe quando o resultado de algum vigia muda de fato.
+
+Vigias incrementais (com `key_columns` e `delta_query`) não varrem a tabela a
+cada ciclo: guardam uma marca d'água (coluna WATERMARK, ex.: DTALTER formatado
+ou NUNOTA) e pedem ao Gateway só as linhas alteradas desde ela. A coluna
+DISPARADO ('S'/'N') diz se a linha alterada entrou ou saiu da condição. O
+conjunto de linhas disparadas fica materializado localmente (watcher_rows) e
+cada execução registra o diff novas/resolvidas. Uma varredura completa a cada
+`full_refresh_seconds` reconcilia o que o delta não enxerga (linhas excluídas
+ou que saíram de janelas como `DTNEG > SYSDATE - 7` sem serem alteradas). A
+marca d'água da varredura completa é o relógio do ERP lido antes dela
+(`scan_watermark()`), não o maior WATERMARK das linhas disparadas: uma varredura
+sem nenhuma linha disparada também passa o vigia para o modo delta.
+"""
+import os
+import json
+import time
+import random
+import sqlite3
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future, TimeoutError as FutureTimeout
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+try:
+    from utils import format_as_markdown_table
+except ImportError:
+    from mcp_server.utils import format_as_markdown_table
+
+logger = logging.getLogger("sankhya-watcher-scheduler")
+
+DEFAULT_MAX_WORKERS = int(os.getenv("SANKHYA_WATCHER_WORKERS", "4"))
+DEFAULT_JITTER_SECONDS = float(os.getenv("SANKHYA_WATCHER_JITTER", "30"))
+# Execuções guardadas por vigia no histórico
+HISTORY_PER_WATCHER = 200
+
+STATUS_OK = "ok"
+STATUS_ERROR = "erro"
+STATUS_TIMEOUT = "timeout"
+
+MODE_FULL = "completo"
+MODE_DELTA = "delta"
+
+# Colunas de controle dos vigias incrementais (não entram no painel)
+WATERMARK_COLUMN = "WATERMARK"
+FIRING_COLUMN = "DISPARADO"
+CONTROL_COLUMNS = (WATERMARK_COLUMN, FIRING_COLUMN)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS watcher_state (
+    name        TEXT PRIMARY KEY,
+    severity    TEXT,
+    description TEXT,
+    next_run    REAL NOT NULL DEFAULT 0,
+    last_run    REAL,
+    status      TEXT,
+    count       INTEGER NOT NULL DEFAULT 0,
+    fingerprint TEXT,
+    rows_json   TEXT,
+    last_change REAL,
+    error       TEXT,
+    watermark   TEXT,
+    last_full   REAL,
+    added       INTEGER NOT NULL DEFAULT 0,
+    resolved    INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS watcher_runs (
+    id         INTEGER PRIMARY KEY AUTOINCREMENT,
+    name       TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    elapsed    REAL NOT NULL,
+    status     TEXT NOT NULL,
+    count      INTEGER NOT NULL,
+    changed    INTEGER NOT NULL,
+    error      TEXT,
+    mode       TEXT,
+    fetched    INTEGER NOT NULL DEFAULT 0,
+    added      INTEGER NOT NULL DEFAULT 0,
+    resolved   INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_watcher_runs_name ON watcher_runs (name, id);
+CREATE TABLE IF NOT EXISTS watcher_rows (
+    name     TEXT NOT NULL,
+    row_key  TEXT NOT NULL,
+    row_json TEXT NOT NULL,
+    since    REAL NOT NULL,
+    PRIMARY KEY (name, row_key)
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# Colunas acrescentadas depois da primeira versão do banco (ALTER TABLE na abertura)
+_ADDED_COLUMNS = {
+    "watcher_state": {
+        "watermark": "TEXT", "last_full": "REAL",
+        "added": "INTEGER NOT NULL DEFAULT 0", "resolved": "INTEGER NOT NULL DEFAULT 0",
+    },
+    "watcher_runs": {
+        "mode": "TEXT", "fetched": "INTEGER NOT NULL DEFAULT 0",
+        "added": "INTEGER NOT NULL DEFAULT 0", "resolved": "INTEGER NOT NULL DEFAULT 0",
+    },
+}
+
+
+@dataclass
+class WatcherResult:
+    """Resultado de uma execução de vigia."""
+    name: str
+    severity: str
+    description: str
+    status: str
+    rows: List[Dict[str, Any]] = field(default_factory=list)
+    error: Optional[str] = None
+    started_at: float = 0.0
+    elapsed: float = 0.0
+    changed: bool = False
+    mode: str = MODE_FULL
+    fetched: int = 0                                   # linhas vindas do Gateway nesta execução
+    added: List[Dict[str, Any]] = field(default_factory=list)
+    resolved: List[Dict[str, Any]] = field(default_factory=list)
+
+    @property
+    def count(self) -> int:
+        return len(self.rows)
+
+
+def fingerprint(rows: Sequence[Dict[str, Any]]) -> str:
+    """Impressão digital das linhas (independe da ordem das colunas)."""
+    payload = json.dumps(list(rows), sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def public_row(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Linha sem as colunas de controle (WATERMARK/DISPARADO)."""
+    return {k: v for k, v in row.items() if k not in CONTROL_COLUMNS}
+
+
+def _is_firing(row: Dict[str, Any]) -> bool:
+    # Sem a coluna DISPARADO a linha conta como disparada (varredura completa comum)
+    return str(row.get(FIRING_COLUMN, "S")).upper() in ("S", "1", "TRUE")
+
+
+def _row_key(row: Dict[str, Any], key_columns: Sequence[str]) -> str:
+    return json.dumps([row.get(c) for c in key_columns], default=str, ensure_ascii=False)
+
+
+def _max_watermark(current: Any, rows: Sequence[Dict[str, Any]]) -> Any:
+    marks = [r[WATERMARK_COLUMN] for r in rows if r.get(WATERMARK_COLUMN) is not None]
+    if current is not None:
+        marks.append(current)
+    return max(marks) if marks else None
+
+
+class AlertStore:
+    """Estado atual e histórico dos vigias (SQLite compartilhado entre worker e Streamlit)."""
+
+    def __init__(self, db_path: str, history_per_watcher: int = HISTORY_PER_WATCHER):
+        self.db_path = db_path
+        self.history_per_watcher = history_per_watcher
+        self._lock = threading.Lock()
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connect()
+        try:
+            with conn:
+                conn.executescript(_SCHEMA)
+                for table, columns in _ADDED_COLUMNS.items():
+                    existing = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+                    for column, decl in columns.items():
+                        if column not in existing:
+                            conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+        finally:
+            conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @property
+    def version(self) -> int:
+        """Contador que sobe a cada mudança no resultado de algum vigia."""
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        finally:
+            conn.close()
+        return int(row[0]) if row else 0
+
+    def next_runs(self) -> Dict[str, float]:
+        conn = self._connect()
+        try:
+            return dict(conn.execute("SELECT name, next_run FROM watcher_state"))
+        finally:
+            conn.close()
+
+    def schedule(self, name: str, next_run: float) -> None:
+        with self._lock:
+            conn = self._connect()
+            try:
+                with conn:
+                    conn.execute(
+                        "INSERT INTO watcher_state (name, next_run) VALUES (?, ?) "
+                        "ON CONFLICT(name) DO UPDATE SET next_run = excluded.next_run",
+                        (name, next_run),
+                    )
+            finally:
+                conn.close()
+
+    def incremental_state(self, name: str) -> Tuple[Any, float]:
+        """(marca d'água, instante da última varredura completa) do vigia."""
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT watermark, last_full FROM watcher_state WHERE name = ?", (name,)).fetchone()
+        finally:
+            conn.close()
+        if not row:
+            return None, 0.0
+        watermark, last_full = row
+        return (json.loads(watermark) if watermark is not None else None), (last_full or 0.0)
+
+    def apply_rows(
+        self,
+        name: str,
+        rows: Sequence[Dict[str, Any]],
+        key_columns: Sequence[str],
+        full: bool,
+        now: float,
+        scan_watermark: Any = None,
+    ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """
+        Aplica ao conjunto materializado do vigia as linhas vindas do Gateway.
+        `full=True` substitui o conjunto (varredura completa); senão cada linha
+        entra (DISPARADO='S') ou sai (DISPARADO='N') pela chave. Avança a marca
+        d'água (na varredura completa, para `scan_watermark` se informada) e
+        devolve (novas, resolvidas, conjunto atual ordenado pela chave).
+        """
+        firing: Dict[str, Dict[str, Any]] = {}
+        leaving = set()
+        for row in rows:
+            key = _row_key(row, key_columns)
+            if _is_firing(row):
+                firing[key] = public_row(row)
+                leaving.discard(key)
+            else:
+                leaving.add(key)
+                firing.pop(key, None)
+
+        added: List[Dict[str, Any]] = []
+        resolved: List[Dict[str, Any]] = []
+        with self._lock:
+            conn = self._connect()
+            try:
+                with conn:
+                    prev_wm = conn.execute(
+                        "SELECT watermark FROM watcher_state WHERE name = ?", (name,)
+                    ).fetchone()
+                    prev_wm = json.loads(prev_wm[0]) if prev_wm and prev_wm[0] is not None else None
+                    stored = dict(conn.execute(
+                        "SELECT row_key, row_json FROM watcher_rows WHERE name = ?", (name,)
+                    ))
+
+                    gone = set(stored) - set(firing) if full else leaving & set(stored)
+                    for key in gone:
+                        resolved.append(json.loads(stored[key]))
+                    conn.executemany(
+                        "DELETE FROM watcher_rows WHERE name = ? AND row_key = ?", [(name, k) for k in gone]
+                    )
+
+                    upserts = []
+                    for key, row in firing.items():
+                        row_json = json.dumps(row, sort_keys=True, default=str, ensure_ascii=False)
+                        if key not in stored:
+                            added.append(row)
+                            upserts.append((name, key, row_json, now))
+                        elif stored[key] != row_json:
+                            upserts.append((name, key, row_json, now))
+                    conn.executemany(
+                        "INSERT INTO watcher_rows (name, row_key, row_json, since) VALUES (?, ?, ?, ?) "
+                        "ON CONFLICT(name, row_key) DO UPDATE SET row_json = excluded.row_json",
+                        upserts,
+                    )
+
+                    if full and scan_watermark is not None:
+                        # Marca do início da varredura: vale mesmo sem linhas disparadas e não
+                        # pula alterações feitas durante ela (o delta usa >=)
+                        watermark = _max_watermark(prev_wm, [{WATERMARK_COLUMN: scan_watermark}])
+                    else:
+                        watermark = _max_watermark(prev_wm, rows)
+                    conn.execute(
+                        "INSERT INTO watcher_state (name, watermark, last_full) VALUES (?, ?, ?) "
+                        "ON CONFLICT(name) DO UPDATE SET watermark = excluded.watermark, "
+                        "last_full = COALESCE(excluded.last_full, watcher_state.last_full)",
+                        (
+                            name,
+                            json.dumps(watermark, default=str) if watermark is not None else None,
+                            now if full else None,
+                        ),
+                    )
+                    current = [
+                        json.loads(r) for r, in conn.execute(
+                            "SELECT row_json FROM watcher_rows WHERE name = ? ORDER BY row_key", (name,)
+                        )
+                    ]
+            finally:
+                conn.close()
+        return added, resolved, current
+
+    def record(self, result: WatcherResult) -> bool:
+        """
+        Grava a execução no histórico e atualiza o estado do vigia. Retorna True
+        (e sobe a versão) se as linhas ou o status mudaram desde a última execução.
+        Em erro/timeout as últimas linhas conhecidas são mantidas.
+        """
+        with self._lock:
+            conn = self._connect()
+            try:
+                with conn:
+                    prev = conn.execute(
+                        "SELECT status, fingerprint, error FROM watcher_state WHERE name = ?", (result.name,)
+                    ).fetchone()
+                    prev_status, prev_fp, prev_error = prev if prev else (None, None, None)
+
+                    if result.status == STATUS_OK:
+                        fp = fingerprint(result.rows)
+                        changed = prev_status != STATUS_OK or fp != prev_fp
+                        conn.execute(
+                            "INSERT INTO watcher_state (name, severity, description, last_run, status, count, "
+                            "fingerprint, rows_json, last_change, error, added, resolved) "
+                            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, NULL, ?, ?) "
+                            "ON CONFLICT(name) DO UPDATE SET severity = excluded.severity, "
+                            "description = excluded.description, last_run = excluded.last_run, "
+                            "status = excluded.status, count = excluded.count, fingerprint = excluded.fingerprint, "
+                            "rows_json = excluded.rows_json, error = NULL, "
+                            "added = excluded.added, resolved = excluded.resolved, "
+                            "last_change = CASE WHEN ? THEN excluded.last_change ELSE watcher_state.last_change END",
+                            (
+                                result.name, result.severity, result.description, result.started_at,
+                                result.status, result.count, fp,
+                                json.dumps(result.rows, default=str, ensure_ascii=False),
+                                result.started_at, len(result.added), len(result.resolved), int(changed),
+                            ),
+                        )
+                    else:
+                        changed = prev_status != result.status or prev_error != result.error
+                        conn.execute(
+                            "INSERT INTO watcher_state (name, severity, description, last_run, status, error, "
+                            "last_change) VALUES (?, ?, ?, ?, ?, ?, ?) "
+                            "ON CONFLICT(name) DO UPDATE SET severity = excluded.severity, "
+                            "description = excluded.description, last_run = excluded.last_run, "
+                            "status = excluded.status, error = excluded.error, "
+                            "last_change = CASE WHEN ? THEN excluded.last_change ELSE watcher_state.last_change END",
+                            (
+                                result.name, result.severity, result.description, result.started_at,
+                                result.status, result.error, result.started_at, int(changed),
+                            ),
+                        )
+
+                    conn.execute(
+                        "INSERT INTO watcher_runs (name, started_at, elapsed, status, count, changed, error, "
+                        "mode, fetched, added, resolved) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        (result.name, result.started_at, result.elapsed, result.status,
+                         result.count, int(changed), result.error, result.mode, result.fetched,
+                         len(result.added), len(result.resolved)),
+                    )
+                    conn.execute(
+                        "DELETE FROM watcher_runs WHERE name = ? AND id NOT IN "
+                        "(SELECT id FROM watcher_runs WHERE name = ? ORDER BY id DESC LIMIT ?)",
+                        (result.name, result.name, self.history_per_watcher),
+                    )
+                    if changed:
+                        conn.execute(
+                            "INSERT INTO meta (key, value) VALUES ('version', '1') "
+                            "ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1"
+                        )
+            finally:
+                conn.close()
+        result.changed = changed
+        return changed
+
+    def active_alerts(self) -> List[Dict[str, Any]]:
+        """Vigias com ocorrências ou falha na última execução, na ordem do nome."""
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT name, severity, description, status, count, rows_json, last_run, last_change, error, "
+                "added, resolved FROM watcher_state "
+                "WHERE status IS NOT NULL AND (count > 0 OR resolved > 0 OR status != ?) ORDER BY name",
+                (STATUS_OK,),
+            ).fetchall()
+        finally:
+            conn.close()
+        return [
+            {
+                "name": name, "severity": severity, "description": description, "status": status,
+                "count": count, "data": json.loads(rows_json) if rows_json else [],
+                "last_run": last_run, "last_change": last_change, "error": error,
+                "added": added, "resolved": resolved,
+            }
+            for name, severity, description, status, count, rows_json, last_run, last_change, error, added, resolved
+            in rows
+        ]
+
+    def history(self, name: str, limit: int = 20) -> List[Dict[str, Any]]:
+        """Últimas execuções do vigia (mais recente primeiro)."""
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT started_at, elapsed, status, count, changed, error, mode, fetched, added, resolved "
+                "FROM watcher_runs WHERE name = ? ORDER BY id DESC LIMIT ?",
+                (name, limit),
+            ).fetchall()
+        finally:
+            conn.close()
+        return [
+            {
+                "started_at": s, "elapsed": e, "status": st, "count": c, "changed": bool(ch), "error": err,
+                "mode": mode, "fetched": fetched, "added": added, "resolved": resolved,
+            }
+            for s, e, st, c, ch, err, mode, fetched, added, resolved in rows
+        ]
+
+
+class _RunStart:
+    """Instante (monotonic) em que a execução do vigia saiu da fila do pool."""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.at = 0.0
+
+    def mark(self) -> None:
+        self.at = time.monotonic()
+        self.event.set()
+
+
+class WatcherScheduler:
+    """
+    Dispara os vigias vencidos em paralelo. Cada vigia precisa de `name`,
+    `severity`, `description`, `interval_seconds`, `timeout_seconds` e de um
+    método `evaluate()` que devolve as linhas disparadas (ou levanta exceção).
+    Vigias com `incremental=True` também expõem `key_columns`,
+    `full_refresh_seconds`, `evaluate_delta(watermark)` e, opcionalmente,
+    `scan_watermark()` (marca d'água lida antes da varredura completa).
+    """
+
+    def __init__(
+        self,
+        watchers: Sequence[Any],
+        store: AlertStore,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        jitter_seconds: float = DEFAULT_JITTER_SECONDS,
+        clock: Callable[[], float] = time.time,
+        rng: Optional[random.Random] = None,
+    ):
+        self.watchers = {w.name: w for w in watchers}
+        self.store = store
+        self.max_workers = max(1, max_workers)
+        self.jitter_seconds = max(0.0, jitter_seconds)
+        self.clock = clock
+        self.rng = rng or random.Random()
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="watcher")
+        # Execuções que estouraram o timeout e ainda ocupam uma thread do pool
+        self._running: Dict[str, Future] = {}
+
+        # Primeira execução espalhada dentro da janela de jitter
+        known = store.next_runs()
+        now = self.clock()
+        for name in self.watchers:
+            if name not in known:
+                store.schedule(name, now + self.rng.uniform(0, self.jitter_seconds))
+
+    def _jitter(self) -> float:
+        return self.rng.uniform(0, self.jitter_seconds)
+
+    def due(self, now: Optional[float] = None) -> List[Any]:
+        """Vigias com próxima execução vencida (e que não estão presos numa execução anterior)."""
+        now = self.clock() if now is None else now
+        next_runs = self.store.next_runs()
+        due = []
+        for name, watcher in self.watchers.items():
+            stuck = self._running.get(name)
+            if stuck is not None:
+                if not stuck.done():
+                    continue
+                del self._running[name]
+            if next_runs.get(name, 0.0) <= now:
+                due.append(watcher)
+        return due
+
+    def _mode_for(self, watcher: Any, now: float) -> Tuple[str, Any]:
+        """Delta só com marca d'água conhecida e varredura completa ainda dentro da validade."""
+        if not getattr(watcher, "incremental", False):
+            return MODE_FULL, None
+        watermark, last_full = self.store.incremental_state(watcher.name)
+        if watermark is None or now - last_full >= watcher.full_refresh_seconds:
+            return MODE_FULL, None
+        return MODE_DELTA, watermark
+
+    def _evaluate(self, watcher: Any, mode: str, watermark: Any, start: _RunStart) -> Tuple[List[Dict[str, Any]], Any]:
+        """Linhas do vigia e, na varredura completa de um incremental, a marca d'água do início dela."""
+        # O timeout conta daqui: a espera na fila do pool não é culpa do vigia
+        start.mark()
+        if mode == MODE_DELTA:
+            return list(watcher.evaluate_delta(watermark) or []), None
+        scan_watermark = None
+        if getattr(watcher, "incremental", False) and hasattr(watcher, "scan_watermark"):
+            scan_watermark = watcher.scan_watermark()
+        return list(watcher.evaluate() or []), scan_watermark
+
+    def _stuck_workers(self) -> int:
+        return sum(1 for f in self._running.values() if not f.done())
+
+    def _wait_start(self, start: _RunStart, future: Future) -> bool:
+        """
+        Espera a execução sair da fila. Se todas as threads estão presas em execuções
+        abandonadas (timeout), ela não sairia: é cancelada e o método devolve False.
+        """
+        while not start.event.wait(0.05):
+            if self._stuck_workers() >= self.max_workers and future.cancel():
+                return False
+        return True
+
+    def run_due(self, now: Optional[float] = None) -> List[WatcherResult]:
+        """Executa os vigias vencidos em paralelo, grava os resultados e reagenda cada um."""
+        due = self.due(now)
+        if not due:
+            return []
+
+        started = self.clock()
+        submitted = []
+        for watcher in due:
+            self.store.schedule(watcher.name, started + watcher.interval_seconds + self._jitter())
+            mode, watermark = self._mode_for(watcher, started)
+            start = _RunStart()
+            future = self._pool.submit(self._evaluate, watcher, mode, watermark, start)
+            submitted.append((watcher, mode, start, future))
+
+        results = []
+        for watcher, mode, start, future in submitted:
+            if not self._wait_start(start, future):
+                # Não rodou: nada a registrar, volta para o próximo ciclo
+                self.store.schedule(watcher.name, started)
+                logger.warning(f"Vigia '{watcher.name}' não saiu da fila (pool ocupado por execuções presas)")
+                continue
+            remaining = max(0.0, start.at + watcher.timeout_seconds - time.monotonic())
+            result = WatcherResult(
+                name=watcher.name, severity=watcher.severity, description=watcher.description,
+                status=STATUS_OK, started_at=started, mode=mode,
+            )
+            try:
+                rows, scan_watermark = future.result(timeout=remaining)
+                result.fetched = len(rows)
+                if getattr(watcher, "incremental", False):
+                    result.added, result.resolved, result.rows = self.store.apply_rows(
+                        watcher.name, rows, watcher.key_columns, full=(mode == MODE_FULL), now=started,
+                        scan_watermark=scan_watermark,
+                    )
+                else:
+                    result.rows = rows
+            except FutureTimeout:
+                result.status = STATUS_TIMEOUT
+                result.error = f"Vigia excedeu {watcher.timeout_seconds}s"
+                self._running[watcher.name] = future
+                logger.warning(f"⏱️ Vigia '{watcher.name}' excedeu o timeout de {watcher.timeout_seconds}s")
+            except Exception as e:
+                result.status = STATUS_ERROR
+                result.error = str(e)
+                logger.error(f"Erro ao rodar watcher {watcher.name}: {e}")
+            result.elapsed = time.monotonic() - start.at
+            self.store.record(result)
+            results.append(result)
+        return results
+
+    def seconds_until_next(self, now: Optional[float] = None) -> float:
+        now = self.clock() if now is None else now
+        pending = [t for name, t in self.store.next_runs().items() if name in self.watchers]
+        return max(0.0, min(pending) - now) if pending else 0.0
+
+    def run_forever(
+        self,
+        stop_event: Optional[threading.Event] = None,
+        on_change: Optional[Callable[[List[WatcherResult]], None]] = None,
+        max_sleep: float = 30.0,
+    ) -> None:
+        """Laço do worker: dorme até o próximo vigia vencer; `on_change` recebe os resultados quando algo mudou."""
+        stop_event = stop_event or threading.Event()
+        while not stop_event.is_set():
+            try:
+                results = self.run_due()
+                if on_change is not None and any(r.changed for r in results):
+                    on_change(results)
+            except Exception as e:
+                logger.error(f"Erro no agendador de vigias: {e}")
+            stop_event.wait(min(max_sleep, max(1.0, self.seconds_until_next())))
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+def render_alerts_markdown(alerts: Sequence[Dict[str, Any]], sample_rows: int = 5) -> str:
+    """Painel markdown dos alertas (mesmo formato do antigo run_all_watchers)."""
+    blocks = []
+    for alert in alerts:
+        if alert.get("status", STATUS_OK) != STATUS_OK:
+            blocks.append(f"⚠️ **{alert['name']}**: falha na última execução ({alert.get('error')})")
+            continue
+        if not alert.get("count"):
+            continue
+        color = "🔴" if alert["severity"] == "DANGER" else "🟡" if alert["severity"] == "WARNING" else "🔵"
+        diff = []
+        if alert.get("added"):
+            diff.append(f"+{alert['added']} nova(s)")
+        if alert.get("resolved"):
+            diff.append(f"{alert['resolved']} resolvida(s)")
+        suffix = f" ({', '.join(diff)})" if diff else ""
+        blocks.append(f"{color} **{alert['name']}**: {alert['count']} ocorrência(s){suffix}\n_{alert['description']}_")
+        blocks.append(format_as_markdown_table(alert["data"][:sample_rows]))
+
+    if not blocks:
+        return "✅ **Tudo limpo!** Nenhum alerta proativo detectado nos vigias do sistema."
+    return "### 🚨 Painel de Alertas Proativos\n\n" + "\n\n".join(blocks)
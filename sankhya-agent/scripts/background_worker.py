@@ -1,43 +1,75 @@
 """
 Motor Proativo do SSA - Roda os watchers em background e armazena os alertas.
+
+Cada vigia tem sua cadência (ver Watcher.interval_seconds); o agendador dispara
+os vencidos em paralelo e guarda linhas/histórico em knowledge/watchers.db.
+O active_alerts.json lido pela sidebar do Streamlit só é regravado quando o
+resultado de algum vigia muda (campo "version").
 """
-import time
 import json
 import os
 import logging
+import threading
 from datetime import datetime
+from typing import Optional
 
 import sys
 # Adiciona o diretório raiz ao path para encontrar mcp_server
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from mcp_server.skills.watchers import run_all_watchers
+from mcp_server.skills.watchers import SYSTEM_WATCHERS
+from mcp_server.watcher_scheduler import AlertStore, WatcherScheduler, render_alerts_markdown
 
 logger = logging.getLogger("ssa-bg-worker")
 
-ALERTS_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "knowledge", "active_alerts.json")
-
-def start_background_monitoring(interval_seconds: int = 3600):
-    """Roda os vigias periodicamente e salva o resultado."""
-    logger.info(f"🚀 Motor Proativo iniciado. Intervalo: {interval_seconds}s")
-    
-    while True:
-        try:
-            report = run_all_watchers()
-            data = {
-                "last_run": datetime.now().strftime("%d/%m/%Y %H:%M:%S"),
-                "report": report
-            }
-            
-            with open(ALERTS_PATH, "w", encoding="utf-8") as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
-                
-            logger.info("✅ Alertas proativos atualizados com sucesso.")
-        except Exception as e:
-            logger.error(f"Erro no Motor Proativo: {e}")
-            
-        time.sleep(interval_seconds)
+KNOWLEDGE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "knowledge")
+ALERTS_PATH = os.path.join(KNOWLEDGE_DIR, "active_alerts.json")
+STORE_PATH = os.path.join(KNOWLEDGE_DIR, "watchers.db")
+
+
+def publish_alerts(store: AlertStore, path: str = ALERTS_PATH) -> None:
+    """Regrava o painel (markdown + alertas estruturados) de forma atômica."""
+    alerts = store.active_alerts()
+    data = {
+        "last_run": datetime.now().strftime("%d/%m/%Y %H:%M:%S"),
+        "version": store.version,
+        "alerts": alerts,
+        "report": render_alerts_markdown(alerts),
+    }
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2, default=str)
+    os.replace(tmp_path, path)
+
+
+def start_background_monitoring(
+    max_workers: Optional[int] = None,
+    stop_event: Optional[threading.Event] = None,
+    store_path: str = STORE_PATH,
+    alerts_path: str = ALERTS_PATH,
+):
+    """Roda os vigias conforme a cadência de cada um e publica o painel quando algo muda."""
+    store = AlertStore(store_path)
+    kwargs = {"max_workers": max_workers} if max_workers else {}
+    scheduler = WatcherScheduler(SYSTEM_WATCHERS, store, **kwargs)
+    logger.info(
+        f"🚀 Motor Proativo iniciado: {len(SYSTEM_WATCHERS)} vigia(s), "
+        f"{scheduler.max_workers} em paralelo"
+    )
+
+    def _on_change(results):
+        publish_alerts(store, alerts_path)
+        changed = ", ".join(r.name for r in results if r.changed)
+        logger.info(f"✅ Alertas proativos atualizados ({changed}).")
+
+    # Painel publicado já na partida (estado persistido da execução anterior)
+    publish_alerts(store, alerts_path)
+    try:
+        scheduler.run_forever(stop_event=stop_event, on_change=_on_change)
+    finally:
+        scheduler.close()
+
 
 if __name__ == "__main__":
-    # Quando rodado diretamente, executa uma vez e sai (para teste ou cron)
-    start_background_monitoring(60) 
+    logging.basicConfig(level=logging.INFO)
+    start_background_monitoring()
@@ -0,0 +1,62 @@
+"""
+Benchmark do Radar de Compras: modo por produto (N+1) vs modo em lote.
+
+Roda o ProcurementRadar contra o Gateway sintético em memória de
+tests/synthetic_gateway.py (sem rede) e mede
+a quantidade de queries enviadas e o tempo de cada modo para catálogos de tamanhos
+diferentes. O modo em lote deve manter a contagem de queries praticamente constante.
+
+Uso:
+    python scripts/benchmark_radar.py 100 1000 3000
+"""
+import os
+import sys
+import time
+from typing import Dict, Any, Optional
+
+# Adiciona o diretório raiz ao path para encontrar mcp_server e o Gateway sintético dos testes
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mcp_server.domains.procurement.services import sankhya_adapter
+from tests.synthetic_gateway import SyntheticGateway, build_radar
+
+
+def run_benchmark(num_products: int, batched: bool, index_path: Optional[str] = None,
+                  leadtime_cache_path: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Executa o radar contra o Gateway sintético e retorna contagem de queries e resultado
+    (`index_path`/`leadtime_cache_path` como em `build_radar`).
+    """
+    gateway = SyntheticGateway(num_products)
+    original = sankhya_adapter.sankhya
+    sankhya_adapter.sankhya = gateway
+    try:
+        radar = build_radar(gateway, index_path, leadtime_cache_path)
+        start = time.perf_counter()
+        opportunities = radar.run_analysis(batched=batched)
+        elapsed = time.perf_counter() - start
+    finally:
+        sankhya_adapter.sankhya = original
+    return {"queries": gateway.queries, "seconds": elapsed, "opportunities": opportunities}
+
+
+if __name__ == "__main__":
+    import tempfile
+
+    sizes = [int(x) for x in sys.argv[1:]] or [100, 1000, 3000]
+    print(f"{'Produtos':>10} | {'Queries (N+1)':>14} | {'Queries (lote)':>14} | {'Queries (índice)':>16} | "
+          f"{'Queries (cache LT)':>18} | {'Tempo N+1':>10} | {'Tempo lote':>10} | {'Tempo índice':>12} | "
+          f"{'Tempo cache LT':>14} | Iguais")
+    for n in sizes:
+        seq = run_benchmark(n, batched=False)
+        bat = run_benchmark(n, batched=True)
+        with tempfile.TemporaryDirectory() as tmp:
+            idx_path, lt_path = os.path.join(tmp, "fornecedor.db"), os.path.join(tmp, "leadtime.db")
+            idx = run_benchmark(n, batched=False, index_path=idx_path)
+            # Segunda execução com o cache de lead time já carregado (todos os pares)
+            run_benchmark(n, batched=True, index_path=idx_path, leadtime_cache_path=lt_path)
+            cached = run_benchmark(n, batched=True, index_path=idx_path, leadtime_cache_path=lt_path)
+        same = seq["opportunities"] == bat["opportunities"] == idx["opportunities"] == cached["opportunities"]
+        print(f"{n:>10} | {seq['queries']:>14} | {bat['queries']:>14} | {idx['queries']:>16} | {cached['queries']:>18} | "
+              f"{seq['seconds']:>9.3f}s | {bat['seconds']:>9.3f}s | {idx['seconds']:>11.3f}s | "
+              f"{cached['seconds']:>13.3f}s | {'✅' if same else '❌'}")
@@ -48,6 +48,13 @@ def generate_procurement_excel(output_dir: str = "outputs"):
 
     logger.info(f"Processando {len(giro_data)} registros de Giro Direct.")
 
+    # Lead time efetivo (fornecedor principal) do cache local; TGFGIR.LEADTIME fica como fallback
+    try:
+        effective_leadtimes = service.get_product_leadtimes({int(i["CODPROD"]) for i in giro_data if i.get("CODPROD")})
+    except Exception as e:
+        logger.warning(f"Lead time efetivo indisponível, usando o da TGFGIR: {e}")
+        effective_leadtimes = {}
+
     for item in giro_data:
         codprod = item.get("CODPROD")
         descricao = item.get("DESCRPROD")
@@ -56,6 +63,9 @@ def generate_procurement_excel(output_dir: str = "outputs"):
         sugestao_sistema = float(item.get("SUGCOMPRA", 0) or 0)
         est_min = float(item.get("ESTMIN", 0) or 0)
         lead_time = float(item.get("LEADTIME", 0) or 0)
+        effective = effective_leadtimes.get(int(codprod or 0))
+        if effective is not None:
+            lead_time = float(effective["leadtime_dias"])
         
         # Filtro Estratégico do Usuário:
         # "Focar naqueles que tiveram venda (giro) e estao com estoque baixo"
@@ -66,7 +66,8 @@ def generate_strategic_report(output_dir: str = "outputs"):
 
     try:
         # A. Buscar Oportunidades Agrupadas (usando histórico real)
-        # Atenção: queries_opportunities_by_supplier.sql deve estar usando a lógica de histórico (TIPMOV='O')
+        # Fornecedor principal vem do índice local de histórico de compras (TIPMOV='O');
+        # sem o índice, cai em queries_opportunities_by_supplier.sql no ERP
         opportunities = service.get_opportunities(codrel=2535)
     except Exception as e:
         logger.error(f"Erro ao buscar oportunidades: {e}")
@@ -124,6 +125,15 @@ def generate_strategic_report(output_dir: str = "outputs"):
             # Busca itens detalhados deste fornecedor (já vem ordenado por nome do SQL)
             raw_details = service.get_supplier_items(codparc=cod_parc)
             processed_details = []
+
+            # Lead time efetivo do par produto/fornecedor (cache local); TGFGIR.LEADTIME como fallback
+            try:
+                effective_leadtimes = service.get_effective_leadtimes(
+                    [(int(i["CODPROD"]), int(cod_parc)) for i in raw_details if i.get("CODPROD")]
+                )
+            except Exception as e:
+                logger.warning(f"Lead time efetivo indisponível para {cod_parc}: {e}")
+                effective_leadtimes = {}
             
             for item in raw_details:
                 giro_dia = float(item.get("GIRODIARIO", 0) or 0)
@@ -132,6 +142,9 @@ def generate_strategic_report(output_dir: str = "outputs"):
                 sugestao = float(item.get("SUGCOMPRA", 0) or 0)
                 custo = float(item.get("CUSTOGER", 0) or 0)
                 lead_time = float(item.get("LEADTIME", 0) or 0)
+                effective = effective_leadtimes.get((int(item.get("CODPROD") or 0), int(cod_parc)))
+                if effective is not None:
+                    lead_time = float(effective["leadtime_dias"])
                 cod_grupo = item.get("CODGRUPOPROD")
                 
                 # Regra de Exclusão: Cobertura > 90 dias
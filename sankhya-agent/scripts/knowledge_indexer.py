@@ -1,8 +1,13 @@
 import sqlite3
 import os
+import sys
 import logging
 from typing import List, Dict
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mcp_server.knowledge_schema import ensure_schema
+
 # Configuração de Logs
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("knowledge-indexer")
@@ -100,65 +105,29 @@ def init_db():
     dir_path = os.path.dirname(DB_PATH)
     if not os.path.exists(dir_path):
         os.makedirs(dir_path)
-        
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    
-    # Cria tabela principal de artigos
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS articles (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            title TEXT NOT NULL,
-            body TEXT NOT NULL,
-            url TEXT,
-            tags TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    # Cria tabela virtual FTS5 para busca textual full-text eficiente
-    # Se der erro (versão antiga do SQLite), faremos fallback para LIKE
-    try:
-        c.execute('''
-            CREATE VIRTUAL TABLE IF NOT EXISTS articles_fts 
-            USING fts5(title, body, content='articles', content_rowid='id')
-        ''')
-        logger.info("✅ Tabela FTS5 criada com sucesso.")
-    except Exception as e:
-        logger.warning(f"⚠️ FTS5 não suportado, busca será lenta: {e}")
 
-    conn.commit()
-    conn.close()
+    # Mesmo schema do indexador da Zendesk: o FTS é mantido pelos triggers
+    ensure_schema(DB_PATH)
+    logger.info("✅ Schema da Knowledge Base pronto (articles + FTS5).")
 
 def index_article(article: Dict):
     conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    
-    # Verifica duplicidade por título
-    c.execute("SELECT id FROM articles WHERE title = ?", (article["title"],))
-    if c.fetchone():
-        logger.info(f"Artigo já existe: {article['title']}")
-        conn.close()
-        return
-
-    # Insere no banco principal
-    c.execute("""
-        INSERT INTO articles (title, body, url) VALUES (?, ?, ?)
-    """, (article["title"], article["body"], article["url"]))
-    
-    # Pega o ID inserido
-    row_id = c.lastrowid
-    
-    # Insere no índice FTS
     try:
-        c.execute("""
-            INSERT INTO articles_fts (rowid, title, body) VALUES (?, ?, ?)
-        """, (row_id, article["title"], article["body"]))
-    except:
-        pass
-        
-    conn.commit()
-    conn.close()
+        c = conn.cursor()
+
+        # Verifica duplicidade por título
+        c.execute("SELECT id FROM articles WHERE title = ?", (article["title"],))
+        if c.fetchone():
+            logger.info(f"Artigo já existe: {article['title']}")
+            return
+
+        # Insere no banco principal (articles_fts/articles_trigram via trigger)
+        with conn:
+            c.execute("""
+                INSERT INTO articles (title, body, url) VALUES (?, ?, ?)
+            """, (article["title"], article["body"], article["url"]))
+    finally:
+        conn.close()
     logger.info(f"➕ Artigo indexado: {article['title']}")
 
 def populate_kb():
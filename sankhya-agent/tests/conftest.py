@@ -0,0 +1,38 @@
+"""
+Configuração comum dos testes.
+
+mcp_server/utils.py abre o log de auditoria na importação; sem isto, cada
+execução da suíte gravaria as queries dos testes em logs/activity.log.
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+os.environ["SANKHYA_AUDIT_LOG"] = os.path.join(tempfile.mkdtemp(prefix="ssa-audit-"), "activity.log")
+
+# Adicionar path do projeto
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+
+@pytest.fixture
+def run_radar(monkeypatch):
+    """
+    Roda o radar contra um SyntheticGateway novo de `num_products` produtos e
+    devolve {"queries", "opportunities"}; `sankhya_adapter.sankhya` volta ao
+    original no fim do teste.
+    """
+    from mcp_server.domains.procurement.services import sankhya_adapter
+    from tests.synthetic_gateway import SyntheticGateway, build_radar
+
+    def run(num_products, batched, index_path=None, leadtime_cache_path=None):
+        gateway = SyntheticGateway(num_products)
+        monkeypatch.setattr(sankhya_adapter, "sankhya", gateway)
+        radar = build_radar(gateway, index_path, leadtime_cache_path)
+        opportunities = radar.run_analysis(batched=batched)
+        return {"queries": gateway.queries, "opportunities": opportunities}
+    return run
@@ -0,0 +1,154 @@
+"""
+Gateway sintético do Radar de Compras, compartilhado pelos testes e por
+scripts/benchmark_radar.py.
+
+Responde às queries do radar (unitárias e em lote) a partir de um modelo
+determinístico em memória, sem rede, e conta quantas recebeu. Nos testes, use a
+fixture `run_radar` (tests/conftest.py), que troca `sankhya_adapter.sankhya`
+com monkeypatch.
+"""
+import re
+from datetime import date, timedelta
+from typing import List, Dict, Any, Iterator, Optional
+
+from mcp_server.domains.procurement.workflows.radar import ProcurementRadar
+from mcp_server.sql_binder import bind_params
+
+
+class SyntheticGateway:
+    """
+    Gateway falso que responde às queries do radar a partir de um modelo determinístico
+    e conta quantas queries recebeu. Responde tanto às versões unitárias quanto às em lote,
+    garantindo que ambos os modos enxerguem os mesmos dados.
+    """
+
+    def __init__(self, num_products: int):
+        self.queries = 0
+        self.products = list(range(1, num_products + 1))
+        self.supplier = {p: 1000 + (p % 40) for p in self.products if p % 11 != 0}  # alguns sem fornecedor
+        self.group = {p: p % 7 for p in self.products}
+        self.historico = {(self.supplier[p], p): 10.0 + p % 9 for p in self.supplier if p % 3 == 0}
+        self.categoria = {(s, g): 20.0 + g for s in set(self.supplier.values()) for g in range(7) if (s + g) % 4 == 0}
+        self.estatico = {p: (None if p % 13 == 0 else 15.0 + p % 5) for p in self.products if p % 2 == 0}
+        self.allocations = {s: 800.0 + (s % 10) * 250 for s in set(self.supplier.values()) if s % 5 != 0}
+        self.spend = {s: 200.0 + (s % 3) * 150 for s in set(self.supplier.values()) if s % 2 == 0}
+
+    def abc_rows(self) -> List[Dict[str, Any]]:
+        return [
+            {
+                "CODPROD": p,
+                "DESCRPROD": f"PRODUTO {p}",
+                "CURVA": "ABC"[p % 3],
+                "ESTOQUE": float(p % 17),
+                "VENDA_MENSAL": float(5 + p % 23),
+                "PRAZO_PAG_MESES": 1,
+                "CUSTOGER": 10.0 + p % 50,
+            }
+            for p in self.products
+        ]
+
+    @staticmethod
+    def _ints(pattern: str, sql: str) -> List[int]:
+        match = re.search(pattern, sql)
+        return [int(x) for x in match.group(1).split(",") if x.strip()] if match else []
+
+    def _leadtime_single(self, codprod: int, codparc: int) -> Dict[str, Any]:
+        if (codparc, codprod) in self.historico:
+            return {"LEADTIME_EFETIVO": self.historico[(codparc, codprod)], "FONTE_LEADTIME": "HISTORICO"}
+        if (codparc, self.group[codprod]) in self.categoria:
+            return {"LEADTIME_EFETIVO": self.categoria[(codparc, self.group[codprod])], "FONTE_LEADTIME": "CATEGORIA"}
+        if codprod in self.estatico:
+            return {"LEADTIME_EFETIVO": self.estatico[codprod] or 30, "FONTE_LEADTIME": "ESTATICO"}
+        return {"LEADTIME_EFETIVO": 30, "FONTE_LEADTIME": "DEFAULT"}
+
+    def purchase_lines(self) -> List[Dict[str, Any]]:
+        """Histórico de compras coerente com `supplier` (base do índice local de fornecedor)."""
+        recent = (date.today() - timedelta(days=30)).isoformat()
+        old = (date.today() - timedelta(days=900)).isoformat()
+        lines = []
+        for p, s in self.supplier.items():
+            nunota = p * 10
+            # Fornecedor principal, um secundário e uma compra antiga grande (fora da janela de 12 meses)
+            for offset, (codparc, qtd, dtneg) in enumerate([(s, 10.0, recent), (s + 1, 3.0, recent), (s + 2, 100.0, old)]):
+                lines.append({
+                    "NUNOTA": nunota + offset, "CODPARC": codparc, "NOMEPARC": f"FORNECEDOR {codparc}",
+                    "STATUSNOTA": "L", "DTNEG": dtneg, "DTALTER": f"{dtneg} 10:00:00",
+                    "CODPROD": p, "QTDNEG": qtd,
+                })
+        return lines
+
+    def execute_query_paged(self, sql: str, **kwargs) -> Iterator[Dict[str, Any]]:
+        return iter(self.execute_query(sql))
+
+    def execute_bound(self, sql: str, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        # Gateway sem binds: mesmo caminho do cliente real com SANKHYA_GATEWAY_BINDS=0
+        return self.execute_query(bind_params(sql, params))
+
+    def execute_query(self, sql: str) -> List[Dict[str, Any]]:
+        self.queries += 1
+
+        if "TO_CHAR(CAB.DTALTER" in sql:
+            return self.purchase_lines()
+        if "BASE_ORCAMENTO" in sql:
+            return []
+        if "ORCAMENTO_ALOCADO" in sql:
+            return [{"CODPARC": s, "ORCAMENTO_ALOCADO": v} for s, v in self.allocations.items()]
+        if "CMV_TOTAL" in sql:
+            return [{"CODEMP": 1, "CMV_TOTAL": 40000.0, "ITENS_VENDIDOS": 500}]
+        if "GASTO_ACUMULADO" in sql:
+            return [{"CODPARC": s, "GASTO_ACUMULADO": v} for s, v in self.spend.items()]
+        if "'PAR' AS FONTE" in sql:
+            # Todos os pares: pedidos de compra do fornecedor principal de cada produto
+            rows = [{"FONTE": "PAR", "CODPARC": s, "CODPROD": p, "CODGRUPOPROD": None, "LEADTIME": None}
+                    for p, s in self.supplier.items()]
+            rows += [{"FONTE": "HISTORICO", "CODPARC": s, "CODPROD": p, "CODGRUPOPROD": None, "LEADTIME": v}
+                     for (s, p), v in self.historico.items()]
+            rows += [{"FONTE": "CATEGORIA", "CODPARC": s, "CODPROD": None, "CODGRUPOPROD": g, "LEADTIME": v}
+                     for (s, g), v in self.categoria.items()]
+            rows += [{"FONTE": "ESTATICO", "CODPARC": None, "CODPROD": p, "CODGRUPOPROD": None, "LEADTIME": v}
+                     for p, v in self.estatico.items() if p in self.supplier]
+            rows += [{"FONTE": "GRUPO", "CODPARC": None, "CODPROD": p, "CODGRUPOPROD": self.group[p], "LEADTIME": None}
+                     for p in self.supplier]
+            return rows
+        if "FONTE" in sql and "UNION ALL" in sql:
+            codprods = set(self._ints(r"ITE\.CODPROD IN \(([\d, ]+)\)", sql))
+            codparcs = set(self._ints(r"CAB\.CODPARC IN \(([\d, ]+)\)", sql))
+            rows = [{"FONTE": "HISTORICO", "CODPARC": s, "CODPROD": p, "CODGRUPOPROD": None, "LEADTIME": v}
+                    for (s, p), v in self.historico.items() if s in codparcs and p in codprods]
+            rows += [{"FONTE": "CATEGORIA", "CODPARC": s, "CODPROD": None, "CODGRUPOPROD": g, "LEADTIME": v}
+                     for (s, g), v in self.categoria.items() if s in codparcs]
+            rows += [{"FONTE": "ESTATICO", "CODPARC": None, "CODPROD": p, "CODGRUPOPROD": None, "LEADTIME": v}
+                     for p, v in self.estatico.items() if p in codprods]
+            rows += [{"FONTE": "GRUPO", "CODPARC": None, "CODPROD": p, "CODGRUPOPROD": self.group[p], "LEADTIME": None}
+                     for p in codprods if p in self.group]
+            return rows
+        if "LEADTIME_EFETIVO" in sql:
+            codprod = int(re.search(r"SELECT\s+(\d+) AS CODPROD", sql).group(1))
+            codparc = int(re.search(r"(\d+) AS CODPARC", sql).group(1))
+            return [self._leadtime_single(codprod, codparc)]
+        if "PARTITION BY ITE.CODPROD" in sql:
+            if "ITE.CODPROD IN" in sql:
+                codprods = self._ints(r"ITE\.CODPROD IN \(([\d, ]+)\)", sql)
+                return [{"CODPROD": p, "CODPARC": self.supplier[p], "NOMEPARC": f"FORNECEDOR {self.supplier[p]}"}
+                        for p in codprods if p in self.supplier]
+            codprod = int(re.search(r"ITE\.CODPROD = (\d+)", sql).group(1))
+            if codprod not in self.supplier:
+                return []
+            return [{"CODPARC": self.supplier[codprod], "NOMEPARC": f"FORNECEDOR {self.supplier[codprod]}"}]
+        return []
+
+
+def build_radar(gateway: SyntheticGateway, index_path: Optional[str] = None,
+                leadtime_cache_path: Optional[str] = None) -> ProcurementRadar:
+    """
+    Radar configurado para o Gateway sintético (quem chama troca `sankhya_adapter.sankhya`).
+    Com `index_path`, o fornecedor principal vem do índice local (construído nesse arquivo);
+    sem ele, o índice fica desligado e a regra roda no "ERP". Idem para
+    `leadtime_cache_path` e o cache local de lead time.
+    """
+    radar = ProcurementRadar()
+    radar.sankhya_service.config["supplier_index"] = {"enabled": bool(index_path), "path": index_path}
+    radar.sankhya_service.config["leadtime_cache"] = {"enabled": bool(leadtime_cache_path), "path": leadtime_cache_path}
+    # queries_abc.sql ainda é um placeholder: o catálogo vem do modelo sintético
+    radar.sankhya_service.get_abc_giro_data = gateway.abc_rows
+    return radar
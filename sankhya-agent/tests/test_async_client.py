@@ -0,0 +1,284 @@
+"""
+Testes do cliente assíncrono do Gateway (mcp_server/async_client.py).
+
+Sobe um Gateway falso local com latência para verificar que muitas chamadas
+simultâneas compartilham um único /authenticate, respeitam o limite de
+concorrência e que as variantes assíncronas das ferramentas usam os mesmos SQLs.
+"""
+
+import re
+import sys
+import json
+import time
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+# Adicionar path do projeto
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from mcp_server import async_client, tools
+from mcp_server.async_client import AsyncSankhyaGatewayClient
+from mcp_server.http_pool import PoolConfig
+from mcp_server.query_cache import QueryCache
+from mcp_server.row_decoder import QueryResult
+from mcp_server.utils import SankhyaGatewayClient
+
+
+class _SlowGateway(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    auth_calls = 0
+    in_flight = 0
+    max_in_flight = 0
+    expire_next = False
+    sqls = []
+    lock = threading.Lock()
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        cls = type(self)
+        payload = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.path.startswith("/authenticate"):
+            with cls.lock:
+                cls.auth_calls += 1
+            time.sleep(0.05)
+            return self._reply(200, {"access_token": f"tok{cls.auth_calls}", "expires_in": 3600})
+
+        with cls.lock:
+            if cls.expire_next:
+                cls.expire_next = False
+                return self._reply(401, {})
+            cls.in_flight += 1
+            cls.max_in_flight = max(cls.max_in_flight, cls.in_flight)
+            cls.sqls.append(json.loads(payload)["requestBody"].get("sql"))
+        time.sleep(0.05)
+        with cls.lock:
+            cls.in_flight -= 1
+        return self._reply(200, {
+            "status": "1",
+            "responseBody": {"fieldsMetadata": [{"name": "TESTE"}], "rows": [[1]]},
+        })
+
+
+def _start_gateway():
+    _SlowGateway.auth_calls = 0
+    _SlowGateway.max_in_flight = 0
+    _SlowGateway.sqls = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _SlowGateway)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _make_client(server, max_concurrency=4):
+    client = AsyncSankhyaGatewayClient(PoolConfig(max_retries=0, backoff_factor=0.0), max_concurrency=max_concurrency)
+    client.base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    client.client_id, client.client_secret, client.x_token = "id", "secret", "xtoken"
+    client.query_cache = None
+    return client
+
+
+def test_concurrent_queries_share_one_authentication():
+    """20 queries simultâneas: um único /authenticate e no máximo 4 em voo."""
+    server = _start_gateway()
+    try:
+        client = _make_client(server, max_concurrency=4)
+
+        async def scenario():
+            start = time.perf_counter()
+            results = await asyncio.gather(*[client.execute_query("SELECT 1 AS TESTE FROM DUAL") for _ in range(20)])
+            elapsed = time.perf_counter() - start
+            await client.aclose()
+            return results, elapsed
+
+        results, elapsed = asyncio.run(scenario())
+        assert results == [[{"TESTE": 1}]] * 20
+        assert _SlowGateway.auth_calls == 1
+        assert _SlowGateway.max_in_flight <= 4
+        # 20 chamadas de 50ms em lotes de 4 ≈ 0.25s (sequencial seria 1s)
+        assert elapsed < 0.8
+    finally:
+        server.shutdown()
+
+
+def test_401_refreshes_token_once():
+    server = _start_gateway()
+    try:
+        client = _make_client(server)
+
+        async def scenario():
+            await client.execute_query("SELECT 1 AS TESTE FROM DUAL")
+            _SlowGateway.expire_next = True
+            rows = await client.execute_query("SELECT 1 AS TESTE FROM DUAL")
+            await client.aclose()
+            return rows
+
+        assert asyncio.run(scenario()) == [{"TESTE": 1}]
+        assert _SlowGateway.auth_calls == 2
+        assert client.bearer_token == "tok2"
+    finally:
+        server.shutdown()
+
+
+def test_pool_of_previous_loop_is_closed():
+    """Cada asyncio.run tem seu pool; o do loop anterior é fechado ao trocar de loop."""
+    server = _start_gateway()
+    try:
+        client = _make_client(server)
+        asyncio.run(client.execute_query("SELECT 1 AS TESTE FROM DUAL"))
+        first = client._http
+        assert not first.is_closed
+
+        async def scenario():
+            rows = await client.execute_query("SELECT 1 AS TESTE FROM DUAL")
+            await client.aclose()
+            return rows
+
+        assert asyncio.run(scenario()) == [{"TESTE": 1}]
+        assert first.is_closed
+    finally:
+        server.shutdown()
+
+
+def test_query_cache_runs_off_the_event_loop(tmp_path):
+    """lookup/store/invalidate_volatile (SQLite compartilhado) não rodam na thread do event loop."""
+    server = _start_gateway()
+    try:
+        client = _make_client(server)
+        cache = QueryCache(db_path=str(tmp_path / "query_cache.db"))
+        client.query_cache = cache
+        threads = []
+        for name in ("lookup", "store", "invalidate_volatile"):
+            method = getattr(cache, name)
+
+            def traced(*args, _method=method, _name=name):
+                threads.append((_name, threading.get_ident()))
+                return _method(*args)
+            setattr(cache, name, traced)
+
+        async def scenario():
+            loop_thread = threading.get_ident()
+            first = await client.execute_query("SELECT 1 AS TESTE FROM DUAL")
+            second = await client.execute_query("SELECT 1 AS TESTE FROM DUAL")
+            await client.call_service("CRUDServiceProvider.saveRecord", {})
+            await client.aclose()
+            return loop_thread, first, second
+
+        loop_thread, first, second = asyncio.run(scenario())
+        assert first == second == [{"TESTE": 1}]
+        # Ao Gateway: a primeira query e o save; a segunda query veio do cache
+        assert _SlowGateway.sqls == ["SELECT 1 AS TESTE FROM DUAL", None]
+        assert [n for n, _ in threads] == ["lookup", "store", "lookup", "invalidate_volatile"]
+        assert all(ident != loop_thread for _, ident in threads)
+    finally:
+        server.shutdown()
+
+
+def test_same_surface_as_sync_client():
+    """Tudo que o cliente síncrono expõe, menos iter_query (decoder pull síncrono: use as páginas)."""
+    public = lambda cls: {n for n in vars(cls) if not n.startswith("_")}
+    assert public(SankhyaGatewayClient) - public(AsyncSankhyaGatewayClient) == {"iter_query"}
+    # A instância global usa o mesmo TokenManager do cliente síncrono
+    assert async_client.sankhya_async.tokens is async_client.sankhya.tokens
+
+
+def test_token_store_is_shared_between_clients(tmp_path, monkeypatch):
+    """Com SANKHYA_TOKEN_STORE, um segundo cliente reaproveita o token gravado pelo primeiro."""
+    monkeypatch.setenv("SANKHYA_TOKEN_STORE", str(tmp_path / "token.json"))
+    server = _start_gateway()
+    try:
+        first, second = _make_client(server), _make_client(server)
+
+        async def scenario(client):
+            rows = await client.execute_query("SELECT 1 AS TESTE FROM DUAL")
+            await client.aclose()
+            return rows
+
+        assert asyncio.run(scenario(first)) == asyncio.run(scenario(second)) == [{"TESTE": 1}]
+        assert _SlowGateway.auth_calls == 1
+        assert second.get_token_stats()["store_hits"] == 1 and second.bearer_token == "tok1"
+    finally:
+        server.shutdown()
+
+
+def test_bound_and_paged_queries(monkeypatch):
+    """execute_bound e a paginação seguem o cliente síncrono (binds opcionais, páginas em ordem)."""
+    client = AsyncSankhyaGatewayClient(PoolConfig(max_retries=0), max_concurrency=2)
+    client.query_cache = None
+    sent = []
+    table = [(i,) for i in range(1, 26)]
+
+    async def fake_result(sql, timeout=None, binds=None):
+        sent.append((sql, binds))
+        window = re.search(r"ROWNUM <= (\d+)\n\) WHERE SSA_RN > (\d+)", sql)
+        if window:
+            end, start = int(window.group(1)), int(window.group(2))
+            return QueryResult(["CODPROD", "SSA_RN"], [(r[0], r[0]) for r in table[start:end]])
+        return QueryResult(["CODPROD"], [(7,)])
+
+    monkeypatch.setattr(client, "execute_query_result", fake_result)
+
+    async def scenario():
+        bound = await client.execute_bound("SELECT CODPROD FROM TGFPRO WHERE CODPROD = :COD", {"COD": 7})
+        client.supports_binds = True
+        await client.execute_bound("SELECT CODPROD FROM TGFPRO WHERE CODPROD = :COD", {"COD": 7})
+        pages = [p async for p in client.iter_query_pages("SELECT CODPROD FROM TGFPRO", order_by="CODPROD",
+                                                          page_size=10, max_workers=3)]
+        rows = [r async for r in client.execute_query_paged("SELECT CODPROD FROM TGFPRO", order_by="CODPROD",
+                                                             page_size=10)]
+        return bound, pages, rows
+
+    bound, pages, rows = asyncio.run(scenario())
+    assert bound == [{"CODPROD": 7}]
+    assert sent[0] == ("SELECT CODPROD FROM TGFPRO WHERE CODPROD = 7", None)
+    assert ":COD" in sent[1][0] and sent[1][1]
+    assert [len(p.rows) for p in pages] == [10, 10, 5] and pages[-1].cursor.done
+    assert [r["CODPROD"] for r in rows] == list(range(1, 26)) and "SSA_RN" not in rows[0]
+
+
+def test_async_tool_variants_reuse_sync_sql():
+    """As variantes assíncronas mandam o mesmo SQL e formatam igual às síncronas."""
+    server = _start_gateway()
+    original = tools.sankhya_async
+    try:
+        tools.sankhya_async = _make_client(server)
+        variant = tools.ASYNC_TOOL_VARIANTS["get_stock_info"]
+        output = asyncio.run(variant(codprod=123))
+        assert output.startswith("**Estoque do Produto 123:**")
+        assert _SlowGateway.sqls[-1] == tools._stock_info_sql(123, 10010000).strip()
+        assert all(callable(getattr(tools, name, None)) for name in tools.ASYNC_TOOL_VARIANTS)
+    finally:
+        tools.sankhya_async = original
+        server.shutdown()
+
+
+def test_sync_tools_are_wrapped_for_the_event_loop():
+    """Ferramentas sem variante assíncrona rodam numa thread (mesma assinatura)."""
+    def slow_skill(codprod: int) -> str:
+        """Skill lenta."""
+        time.sleep(0.1)
+        return f"ok {codprod}"
+
+    wrapped = tools._as_mcp_tool("slow_skill", slow_skill)
+    assert asyncio.iscoroutinefunction(wrapped)
+    assert list(tools.inspect.signature(wrapped).parameters) == ["codprod"]
+
+    async def scenario():
+        start = time.perf_counter()
+        results = await asyncio.gather(*[wrapped(codprod=i) for i in range(5)])
+        return results, time.perf_counter() - start
+
+    results, elapsed = asyncio.run(scenario())
+    assert results == [f"ok {i}" for i in range(5)]
+    assert elapsed < 0.4
@@ -0,0 +1,78 @@
+"""
+Testes do snapshot de orçamento (CMV Budget Control).
+
+Verifica que o HARD CAP passa a ser validado em memória: as queries de orçamento
+rodam uma única vez por TTL e as compras aprovadas consomem o saldo do fornecedor.
+"""
+
+import sys
+from pathlib import Path
+
+# Adicionar path do projeto
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from mcp_server.domains.procurement.services import sankhya_adapter
+from mcp_server.domains.procurement.workflows.radar import ProcurementRadar
+from tests.synthetic_gateway import SyntheticGateway, build_radar
+
+
+def _service(monkeypatch, gateway, ttl=300):
+    monkeypatch.setattr(sankhya_adapter, "sankhya", gateway)
+    service = ProcurementRadar().sankhya_service
+    service.config.setdefault("budget_control", {})["snapshot_ttl_seconds"] = ttl
+    return service
+
+
+def test_validation_hits_gateway_once_per_ttl(monkeypatch):
+    """Validar várias compras não deve repetir CMV/alocação/gasto a cada chamada."""
+    gateway = SyntheticGateway(50)
+    service = _service(monkeypatch, gateway)
+    for codparc in range(1000, 1040):
+        service.validate_purchase_against_budget(codparc, 100.0)
+    assert gateway.queries == 3
+
+    service.get_budget_snapshot(refresh=True)
+    assert gateway.queries == 6
+
+
+def test_expired_snapshot_is_reloaded(monkeypatch):
+    """Com TTL zerado, cada validação recarrega o snapshot."""
+    gateway = SyntheticGateway(10)
+    service = _service(monkeypatch, gateway, ttl=0)
+    service.validate_purchase_against_budget(1001, 10.0)
+    service.validate_purchase_against_budget(1001, 10.0)
+    assert gateway.queries == 6
+
+
+def test_registered_purchases_consume_budget(monkeypatch):
+    """Compras aprovadas na mesma execução reduzem o saldo das próximas validações."""
+    gateway = SyntheticGateway(10)
+    service = _service(monkeypatch, gateway)
+    snapshot = service.get_budget_snapshot()
+    codparc = 1001  # alocação 1050, sem gasto no mês
+    first = snapshot.check(codparc, 800.0)
+    assert first["aprovado"] and first["orcamento_disponivel"] == 1050.0
+
+    snapshot.register_purchase(codparc, 800.0)
+    second = snapshot.check(codparc, 800.0)
+    assert not second["aprovado"]
+    assert second["gasto_acumulado"] == 800.0
+    assert second["orcamento_disponivel"] == 250.0
+
+
+def test_radar_validates_and_registers_on_one_snapshot(monkeypatch):
+    """Com o TTL vencendo no meio da execução, o radar não perde as compras já aprovadas."""
+    def run(ttl):
+        gateway = SyntheticGateway(300)
+        monkeypatch.setattr(sankhya_adapter, "sankhya", gateway)
+        radar = build_radar(gateway)
+        radar.sankhya_service.config["budget_control"]["snapshot_ttl_seconds"] = ttl
+        return radar.run_analysis(batched=False), gateway
+
+    expiring, expiring_gateway = run(ttl=0)
+    stable, stable_gateway = run(ttl=300)
+    assert {o["COMPRA_APROVADA"] for o in stable} == {True, False}
+    assert expiring == stable
+    # Orçamento carregado uma vez por execução, não a cada item
+    assert expiring_gateway.queries == stable_gateway.queries
@@ -0,0 +1,114 @@
+"""
+Testes do pool HTTP keep-alive do SankhyaGatewayClient.
+
+Sobe um Gateway falso local (HTTP/1.1) para verificar reuso de conexões,
+retry com backoff em 5xx/429 e a não repetição de serviços de escrita.
+"""
+
+import sys
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+# Adicionar path do projeto
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from mcp_server.utils import SankhyaGatewayClient
+from mcp_server.http_pool import PooledHTTPSession, PoolConfig
+
+
+class _FakeGateway(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Fila de status a devolver antes do sucesso (controlada pelos testes)
+    failures = []
+    calls = 0
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if status == 429:
+            self.send_header("Retry-After", "0")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        self.rfile.read(length)
+        if self.path.startswith("/authenticate"):
+            return self._reply(200, {"access_token": "tok", "expires_in": 3600})
+
+        type(self).calls += 1
+        if type(self).failures:
+            return self._reply(type(self).failures.pop(0), {"status": "0"})
+        return self._reply(200, {
+            "status": "1",
+            "responseBody": {"fieldsMetadata": [{"name": "TESTE"}], "rows": [[1]]},
+        })
+
+
+def _start_gateway():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _FakeGateway)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _make_client(server):
+    client = SankhyaGatewayClient()
+    client.base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    client.http = PooledHTTPSession(PoolConfig(max_retries=2, backoff_factor=0.0))
+    return client
+
+
+def test_connections_are_reused():
+    """Várias queries seguidas devem reaproveitar a mesma conexão TCP."""
+    server = _start_gateway()
+    try:
+        client = _make_client(server)
+        for _ in range(20):
+            assert client.execute_query("SELECT 1 AS TESTE FROM DUAL") == [{"TESTE": 1}]
+
+        stats = client.get_pool_stats()
+        assert stats["handshakes"] == 1
+        assert stats["reuse_ratio"] > 0.9
+    finally:
+        server.shutdown()
+
+
+def test_retry_on_transient_status():
+    """Respostas 503/429 são repetidas com backoff até o sucesso."""
+    server = _start_gateway()
+    try:
+        client = _make_client(server)
+        _FakeGateway.calls = 0
+        _FakeGateway.failures = [503, 429]
+        assert client.execute_query("SELECT 1 AS TESTE FROM DUAL") == [{"TESTE": 1}]
+        assert _FakeGateway.calls == 3
+        assert client.get_pool_stats()["retries"] == 2
+    finally:
+        _FakeGateway.failures = []
+        server.shutdown()
+
+
+def test_write_services_are_not_retried_on_5xx():
+    """Serviços de escrita não podem ser repetidos em 5xx (risco de gravação duplicada)."""
+    server = _start_gateway()
+    try:
+        client = _make_client(server)
+        _FakeGateway.calls = 0
+        _FakeGateway.failures = [500]
+        try:
+            client.call_service("DatasetSP.save", {})
+            raise AssertionError("Esperava erro HTTP 500")
+        except Exception as e:
+            assert "500" in str(e)
+        assert _FakeGateway.calls == 1
+    finally:
+        _FakeGateway.failures = []
+        server.shutdown()
@@ -0,0 +1,160 @@
+"""
+Testes do snapshot local da TGFGIR (services/giro_snapshot.py).
+
+Um ERP falso em memória responde às leituras de chaves/hash e de linhas completas,
+para verificar a carga inicial, a sincronização por diferença (só os produtos
+alterados são buscados de novo) e as agregações que substituem as queries no ERP.
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+# Adicionar path do projeto
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from mcp_server.domains.procurement.services import sankhya_adapter
+from mcp_server.sql_binder import bind_params
+from mcp_server.domains.procurement.services.giro_snapshot import GiroSnapshotStore
+
+
+def _row(codemp, codprod, estoque, sugcompra=0.0, custoger=10.0, marca="ACME", grupo="TUBOS",
+         macro="HIDRAULICA", codgrupo=7, descr=None):
+    return {
+        "CODEMP": codemp, "CODPROD": codprod, "DESCRPROD": descr or f"PRODUTO {codprod:03d}",
+        "CODGRUPOPROD": codgrupo, "MARCA": marca, "MACRO_GRUPO": macro, "GRUPO": grupo,
+        "SUGCOMPRA": sugcompra, "SUGCOMPRAGIR": sugcompra, "CUSTOGER": custoger, "ESTMIN": 1.0,
+        "ESTMAX": 10.0, "GIRODIARIO": 0.5, "ESTOQUE": estoque, "LEADTIME": 15, "ULTVENDA": "01/02/2026",
+        "CODVOL": "UN", "CODVOLCOMPRA": "UN", "DUREST": 30, "DIASSEMVENDA": 2,
+    }
+
+
+class _FakeGiro:
+    """TGFGIR em memória; ROW_HASH = hash dos valores, como o ORA_HASH da query."""
+
+    def __init__(self, rows):
+        self.rows = {(r["CODEMP"], r["CODPROD"]): r for r in rows}
+        self.fetched_products = []
+        self.full_loads = 0
+
+    def _with_hash(self, row):
+        return {**row, "ROW_HASH": hash(tuple(sorted(row.items()))) & 0xFFFFFFFF}
+
+    def keys(self, codrel):
+        return [{"CODEMP": e, "CODPROD": p, "ROW_HASH": self._with_hash(r)["ROW_HASH"]}
+                for (e, p), r in sorted(self.rows.items())]
+
+    def full_rows(self, codrel, codprods):
+        if codprods is None:
+            self.full_loads += 1
+            return [self._with_hash(r) for _, r in sorted(self.rows.items())]
+        self.fetched_products.extend(codprods)
+        return [self._with_hash(r) for (e, p), r in sorted(self.rows.items()) if p in set(codprods)]
+
+
+def _table():
+    return [
+        _row(1, 1, 5.0, sugcompra=2.0), _row(5, 1, 0.0, sugcompra=1.0),
+        _row(1, 2, 8.0, marca="OUTRA", grupo="CONEXOES", codgrupo=8),
+        _row(1, 3, 0.0, sugcompra=4.0, custoger=2.5, macro="ELETRICA", grupo="CABOS", codgrupo=9),
+        _row(1, 4, 3.0, marca=None, grupo=None, macro=None, codgrupo=None),
+    ]
+
+
+def test_delta_sync_refetches_only_changed_products(tmp_path):
+    erp = _FakeGiro(_table())
+    store = GiroSnapshotStore(str(tmp_path), erp.keys, erp.full_rows)
+
+    first = store.get(2535, max_age_seconds=3600)
+    assert len(first) == 5 and erp.full_loads == 1
+    assert store.get(2535, max_age_seconds=3600) is first     # fresco: nem vai ao ERP
+
+    erp.rows[(1, 2)] = _row(1, 2, 1.0, marca="OUTRA", grupo="CONEXOES", codgrupo=8)   # alterado
+    erp.rows[(1, 9)] = _row(1, 9, 2.0)                                                   # novo
+    del erp.rows[(1, 4)]                                                                 # removido
+    synced = store.get(2535, max_age_seconds=0)
+
+    assert erp.full_loads == 1
+    assert sorted(erp.fetched_products) == [2, 4, 9]
+    assert store.last_sync["changed"] == 1 and store.last_sync["added"] == 1 and store.last_sync["removed"] == 1
+    assert sorted(zip(synced.frame["CODEMP"], synced.frame["CODPROD"])) == sorted(erp.rows)
+    assert synced.frame.set_index("CODPROD").loc[2, "ESTOQUE"] == 1.0
+
+    # Outro processo lê o arquivo gerado sem sincronizar
+    other = GiroSnapshotStore(str(tmp_path), erp.keys, erp.full_rows).get(2535, max_age_seconds=3600)
+    assert other.generated_at == synced.generated_at and len(other) == len(synced)
+
+
+def test_aggregations_match_erp_queries(tmp_path):
+    erp = _FakeGiro(_table())
+    snapshot = GiroSnapshotStore(str(tmp_path), erp.keys, erp.full_rows).get(2535, max_age_seconds=3600)
+
+    assert snapshot.group_stock() == {7: 5.0, 8: 8.0, 9: 0.0, None: 3.0}
+
+    acme = snapshot.category_analysis("MARCA", "ACME")
+    assert [r["CODPROD"] for r in acme] == [1, 3]
+    assert acme[0]["ESTOQUE"] == 5.0 and acme[0]["SUGCOMPRA"] == 3.0
+    assert [r["CODPROD"] for r in snapshot.category_analysis("GRUPO", "CONEX")] == [2]
+    assert [r["CODPROD"] for r in snapshot.category_analysis("MACRO_GRUPO", "ELETRICA")] == [3]
+
+    items = snapshot.supplier_items([1, 2, 3])
+    assert [i["CODPROD"] for i in items] == [1, 3]      # só com sugestão > 0
+    assert items[0]["ESTMIN"] == 2.0
+
+    assert snapshot.opportunity_values() == {
+        1: {"VLR_SUGESTAO": 30.0, "RUPTURA": 1},
+        3: {"VLR_SUGESTAO": 10.0, "RUPTURA": 1},
+    }
+
+    giro = snapshot.giro_rows()
+    assert [(r["CODPROD"], r["CODEMP"]) for r in giro][:3] == [(3, 1), (1, 1), (1, 5)]
+    assert "ROW_HASH" not in giro[0] and giro[-1]["ULTVENDA"] == "01/02/2026"
+
+
+class _SnapshotGateway:
+    """Gateway falso para o adapter: responde à query de chaves, à carga paginada e aos lotes."""
+
+    def __init__(self, erp):
+        self.erp = erp
+        self.queries = []
+
+    def execute_query_paged(self, sql, **kwargs):
+        self.queries.append(sql)
+        if sql.startswith("SELECT CODEMP, CODPROD, ROW_HASH"):
+            return iter(self.erp.keys(2535))
+        return iter(self.erp.full_rows(2535, None))
+
+    def execute_bound(self, sql, params):
+        return self.execute_query(bind_params(sql, params))
+
+    def execute_query(self, sql, use_cache=True):
+        self.queries.append(sql)
+        codprods = [int(x) for x in sql.rsplit("IN (", 1)[1].rstrip(")").split(",")]
+        return self.erp.full_rows(2535, codprods)
+
+
+def test_adapter_answers_from_snapshot(tmp_path, monkeypatch):
+    gateway = _SnapshotGateway(_FakeGiro(_table()))
+    monkeypatch.setattr(sankhya_adapter, "sankhya", gateway)
+
+    service = sankhya_adapter.SankhyaProcurementService(str(project_root / "mcp_server/domains/procurement"))
+    service.config["giro_snapshot"] = {"enabled": True, "path": str(tmp_path), "max_age_minutes": 60}
+
+    assert service.get_group_stock_summary() == {7: 5.0, 8: 8.0, 9: 0.0, None: 3.0}
+    assert [r["CODPROD"] for r in service.get_full_category_analysis("MARCA", "OUTRA")] == [2]
+    assert len(service.get_giro_data()) == 5
+    # Uma única carga: as três análises saíram do mesmo snapshot
+    assert len(gateway.queries) == 1
+
+
+def test_snapshot_requires_pyarrow(tmp_path, monkeypatch):
+    """Sem pyarrow o snapshot falha com erro explícito (não há mais fallback em pickle)."""
+    monkeypatch.setitem(sys.modules, "pyarrow", None)
+    with pytest.raises(ImportError, match="pyarrow"):
+        GiroSnapshotStore(str(tmp_path), lambda codrel: [], lambda codrel, codprods: [])
+
+    service = sankhya_adapter.SankhyaProcurementService(str(project_root / "mcp_server" / "domains" / "procurement"))
+    assert service.config["giro_snapshot"]["enabled"] is False
+    assert service.get_giro_snapshot() is None          # desligado por padrão: nem exige o pyarrow
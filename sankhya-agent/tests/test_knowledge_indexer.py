@@ -0,0 +1,151 @@
+"""
+Testes do indexador da Central de Ajuda (mcp_server/knowledge_indexer.py).
+
+A Zendesk é substituída por respostas gravadas (tests/fixtures/zendesk_help_center.json):
+carga completa com páginas em paralelo e 429 com Retry-After, retomada após
+queda e exportação incremental a partir do cursor.
+"""
+
+import json
+import sqlite3
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+import requests
+
+# Adicionar path do projeto
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from mcp_server import knowledge_indexer as ki
+
+FIXTURE = Path(__file__).parent / "fixtures" / "zendesk_help_center.json"
+START = 1760000000
+
+
+class RecordedResponse:
+    def __init__(self, url, record):
+        self.url = url
+        self.status_code = record["status"]
+        self.headers = record.get("headers", {})
+        self._body = record["body"]
+
+    def json(self):
+        return self._body
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} para {self.url}", response=self)
+
+
+class ReplaySession:
+    """Devolve as respostas gravadas por URL, na ordem (a última se repete)."""
+
+    def __init__(self, fail=()):
+        self.records = json.loads(FIXTURE.read_text(encoding="utf-8"))
+        self.fail = set(fail)
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def get(self, url, timeout=None):
+        with self._lock:
+            self.calls.append(url)
+            if url in self.fail:
+                raise requests.ConnectionError("conexão recusada")
+            queue = self.records[url]
+            record = queue.pop(0) if len(queue) > 1 else queue[0]
+        return RecordedResponse(url, record)
+
+
+class FakeBudget(ki.RateBudget):
+    def __init__(self):
+        self.clock = 0.0
+        self.slept = []
+        super().__init__(per_minute=600, clock=lambda: self.clock, sleep=self._sleep)
+
+    def _sleep(self, seconds):
+        self.slept.append(seconds)
+        self.clock += seconds
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    path = str(tmp_path / "knowledge.db")
+    monkeypatch.setattr(ki, "DB_PATH", path)
+    monkeypatch.setattr(ki, "MAX_ATTEMPTS", 2)
+    monkeypatch.setattr(ki, "INCREMENTAL_PAGE_LIMIT", 2)
+    return path
+
+
+def _rows(path):
+    conn = sqlite3.connect(path)
+    try:
+        articles = {r[0]: r[1:] for r in conn.execute("SELECT id, title, body, updated_at FROM articles")}
+        state = dict(conn.execute("SELECT key, value FROM sync_state"))
+        fts = [r[0] for r in conn.execute("SELECT rowid FROM articles_fts WHERE articles_fts MATCH 'sinônimo'")]
+        return articles, state, fts
+    finally:
+        conn.close()
+
+
+def _sync(session, budget=None, **kwargs):
+    return ki.sync(session=session, budget=budget or FakeBudget(), workers=2, per_page=2,
+                   clock=lambda: START, **kwargs)
+
+
+def test_full_sync_streams_pages_and_honors_retry_after(db):
+    session, budget = ReplaySession(), FakeBudget()
+    stats = _sync(session, budget)
+
+    articles, state, _ = _rows(db)
+    # Rascunho e outro idioma ficam de fora; HTML limpo
+    assert sorted(articles) == [101, 102, 103]
+    assert articles[103][1] == "Parâmetro CUSREP na TGFCUS."
+    assert stats == {"novos": 3, "atualizados": 0, "removidos": 0}
+    # 429 com Retry-After: 7 pausa o orçamento inteiro
+    assert max(budget.slept) >= 7
+    assert sum(1 for url in session.calls if "&page=2" in url) == 2
+    # Cursor do incremental = início da carga; estado da carga completa limpo
+    assert state == {"cursor": str(START)}
+
+
+def test_full_sync_resumes_after_crash(db):
+    page3 = next(url for url in ReplaySession().records if "&page=3" in url)
+    with pytest.raises(ki.SyncError):
+        _sync(ReplaySession(fail={page3}))
+    articles, state, _ = _rows(db)
+    assert sorted(articles) == [101, 102, 103]
+    assert json.loads(state["full_pages_done"]) == [1, 2] and "cursor" not in state
+
+    session = ReplaySession()
+    _sync(session)
+    # Só a primeira página (page_count) e a que faltou são baixadas de novo
+    assert sorted(u.split("&page=")[1][0] for u in session.calls) == ["1", "3"]
+    assert _rows(db)[1] == {"cursor": str(START)}
+
+
+def test_incremental_sync_applies_only_changes(db):
+    _sync(ReplaySession())
+    session = ReplaySession()
+    stats = _sync(session)
+
+    assert all("/incremental/" in url for url in session.calls) and len(session.calls) == 2
+    articles, state, fts = _rows(db)
+    assert sorted(articles) == [102, 103, 106]                # 101 voltou a rascunho
+    assert articles[106][1] == "Remessa CNAB pendente."
+    assert fts == [102]                                         # FTS acompanha o upsert
+    # 103 veio com o mesmo updated_at: não é regravado
+    assert stats == {"novos": 1, "atualizados": 1, "removidos": 1}
+    assert state == {"cursor": "1760007200"}
+
+
+def test_rate_budget_spaces_requests():
+    budget = FakeBudget()
+    for _ in range(3):
+        budget.acquire()
+    assert budget.slept == [pytest.approx(0.1), pytest.approx(0.1)]
+    budget.pause(5)
+    budget.acquire()
+    assert budget.slept[-1] == pytest.approx(5)
@@ -0,0 +1,105 @@
+"""
+Testes do schema compartilhado da knowledge.db (mcp_server/knowledge_schema.py).
+
+Os dois indexadores (Zendesk e seed) criam o mesmo banco; o FTS acompanha
+insert/update/delete pelos triggers, um banco antigo sem triggers é completado
+e o integrity-check aponta divergências que o rebuild corrige.
+"""
+
+import sqlite3
+import sys
+from pathlib import Path
+
+import pytest
+
+# Adicionar path do projeto
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from mcp_server import knowledge_indexer, knowledge_schema
+from mcp_server.knowledge_search import KnowledgeSearch
+from scripts import knowledge_indexer as seed_indexer
+
+# Banco como o script de seed criava antes: FTS preenchido à mão, sem triggers
+LEGACY_SCHEMA = """
+CREATE TABLE articles (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, title TEXT NOT NULL, body TEXT NOT NULL,
+    url TEXT, tags TEXT, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE VIRTUAL TABLE articles_fts USING fts5(title, body, content='articles', content_rowid='id');
+INSERT INTO articles (title, body, url) VALUES ('Erro ORA-00942', 'GRANT de select', 'https://ajuda/1');
+"""
+
+
+def _fts_ids(path, term, table="articles_fts"):
+    conn = sqlite3.connect(path)
+    try:
+        return [r[0] for r in conn.execute(f"SELECT rowid FROM {table} WHERE {table} MATCH ?", (term,))]
+    finally:
+        conn.close()
+
+
+def test_both_indexers_share_trigger_maintained_schema(tmp_path, monkeypatch):
+    path = str(tmp_path / "knowledge.db")
+    monkeypatch.setattr(seed_indexer, "DB_PATH", path)
+    monkeypatch.setattr(knowledge_indexer, "DB_PATH", path)
+
+    seed_indexer.populate_kb()
+    seed_count = len(seed_indexer.INITIAL_ARTICLES)
+    assert len(_fts_ids(path, "ORA")) == 1
+
+    # O indexador da Zendesk grava no mesmo banco, e o update chega ao FTS
+    knowledge_indexer.index_articles([
+        {"id": 9001, "url": "https://ajuda/9001", "title": "Boleto não registrado",
+         "body": "Remessa pendente.", "created_at": "", "updated_at": "1"},
+    ])
+    knowledge_indexer.index_articles([
+        {"id": 9001, "url": "https://ajuda/9001", "title": "Boleto não registrado",
+         "body": "Retorno CNAB rejeitado.", "created_at": "", "updated_at": "2"},
+    ])
+    assert _fts_ids(path, "CNAB") == [9001] and _fts_ids(path, "Remessa") == []
+    assert _fts_ids(path, '"CNAB"', "articles_trigram") == [9001]
+
+    result = knowledge_schema.integrity_check(path)
+    assert result == {"ok": True, "artigos": seed_count + 1, "problemas": []}
+
+
+def test_legacy_database_is_completed_and_searchable(tmp_path):
+    path = str(tmp_path / "knowledge.db")
+    conn = sqlite3.connect(path)
+    conn.executescript(LEGACY_SCHEMA)
+    conn.close()
+
+    before = knowledge_schema.integrity_check(path)
+    assert not before["ok"] and any("triggers ausentes" in p for p in before["problemas"])
+
+    # A primeira busca completa o schema (colunas, triggers, trigram) e repopula os índices
+    searcher = KnowledgeSearch(path)
+    assert [r[2] for r in searcher.search("GRANT select")] == ["https://ajuda/1"]
+    searcher.close()
+    assert knowledge_schema.integrity_check(path)["ok"]
+
+    conn = sqlite3.connect(path)
+    with conn:
+        conn.execute("UPDATE articles SET updated_at = '2', body = 'sinônimo público' WHERE id = 1")
+    conn.close()
+    assert _fts_ids(path, "sinônimo") == [1]
+
+
+def test_integrity_check_and_rebuild(tmp_path):
+    path = str(tmp_path / "knowledge.db")
+    knowledge_schema.ensure_schema(path)
+    conn = sqlite3.connect(path)
+    with conn:
+        conn.execute("INSERT INTO articles (id, title, body) VALUES (1, 'Rejeição 997', 'Série vinculada')")
+        # Escrita direta no índice (o que o seed antigo fazia): FTS diverge de articles
+        conn.execute("INSERT INTO articles_fts (rowid, title, body) VALUES (2, 'fantasma', 'fantasma')")
+    conn.close()
+
+    result = knowledge_schema.integrity_check(path)
+    assert not result["ok"] and result["problemas"][0].startswith("articles_fts")
+
+    assert knowledge_schema.rebuild(path) == ["articles_fts", "articles_trigram"]
+    assert knowledge_schema.integrity_check(path)["ok"]
+    assert _fts_ids(path, "fantasma") == [] and _fts_ids(path, "vinculada") == [1]
+    assert knowledge_schema.optimize(path) == ["articles_fts", "articles_trigram"]
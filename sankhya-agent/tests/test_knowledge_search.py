@@ -0,0 +1,81 @@
+"""
+Testes da busca na base de artigos local (mcp_server/knowledge_search.py).
+
+Cobre as três estratégias (frase, todas as palavras, substring via trigram),
+a conexão somente leitura reaproveitada por thread e o índice trigram
+acompanhando inserções em `articles`.
+"""
+
+import sqlite3
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+# Adicionar path do projeto
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from mcp_server import knowledge_indexer, tools
+from mcp_server.knowledge_search import KnowledgeSearch, _TRIGRAM_SEARCH
+
+ARTICLES = [
+    (1, "Rejeição 997: Série já vinculada a outra inscrição estadual", "Confira a numeração na TGFNUM."),
+    (2, "Erro ORA-00942: a tabela ou view não existe", "Verifique GRANT e o schema da tabela."),
+    (3, "Nenhum provedor foi encontrado para o serviço", "HttpServiceBroker sem provedor para o serviceName."),
+]
+
+
+@pytest.fixture
+def kb_path(tmp_path, monkeypatch):
+    path = str(tmp_path / "knowledge.db")
+    monkeypatch.setattr(knowledge_indexer, "DB_PATH", path)
+    knowledge_indexer.create_database()
+    knowledge_indexer.index_articles([
+        {"id": i, "url": f"https://ajuda/{i}", "title": t, "body": b, "created_at": "", "updated_at": "1"}
+        for i, t, b in ARTICLES
+    ])
+    return path
+
+
+def test_strategies_are_index_backed(kb_path):
+    searcher = KnowledgeSearch(kb_path)
+    assert [r[0] for r in searcher.search("Erro Funcional Sankhya: ORA-00942: a tabela ou view não existe")] == [ARTICLES[1][1]]
+    assert [r[2] for r in searcher.search("provedor serviço encontrado")] == ["https://ajuda/3"]
+    # "vinculad" só aparece como parte de "vinculada": antes era LIKE '%kw%' sem índice
+    assert [r[2] for r in searcher.search("nota vinculad")] == ["https://ajuda/1"]
+    assert searcher.search("ab") == []
+
+    plan = " ".join(str(r) for r in searcher._connection().execute("EXPLAIN QUERY PLAN " + _TRIGRAM_SEARCH, ('"vinc"', 3)))
+    assert "VIRTUAL TABLE INDEX" in plan and "SCAN a" not in plan
+
+
+def test_connection_is_read_only_and_per_thread(kb_path):
+    searcher = KnowledgeSearch(kb_path)
+    searcher.search("tabela")
+    conn = searcher._connection()
+    searcher.search("provedor")
+    assert searcher._connection() is conn
+    with pytest.raises(sqlite3.OperationalError):
+        conn.execute("DELETE FROM articles")
+
+    other = []
+    thread = threading.Thread(target=lambda: other.append(searcher._connection()))
+    thread.start()
+    thread.join()
+    assert other[0] is not conn
+
+
+def test_trigram_index_follows_article_changes(kb_path, monkeypatch):
+    searcher = KnowledgeSearch(kb_path)
+    assert searcher.search("boleto registrado") == []
+
+    knowledge_indexer.index_articles([
+        {"id": 4, "url": "https://ajuda/4", "title": "Boleto não registrado no banco",
+         "body": "Remessa CNAB pendente.", "created_at": "", "updated_at": "1"},
+    ])
+    assert [r[2] for r in searcher.search("registrad")] == ["https://ajuda/4"]
+
+    monkeypatch.setattr(tools, "get_knowledge_search", lambda: searcher)
+    assert "https://ajuda/4" in tools.search_solutions("Boleto registrado")
@@ -0,0 +1,71 @@
+"""
+Testes do cache local de lead time efetivo (services/leadtime_cache.py).
+
+Cobre a validade por par, a carga de todos os pares numa única execução e a
+equivalência do radar (lote e por produto) lendo do cache.
+"""
+
+import sqlite3
+import sys
+from pathlib import Path
+
+# Adicionar path do projeto
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from mcp_server.domains.procurement.services import sankhya_adapter
+from mcp_server.domains.procurement.services.leadtime_cache import LeadtimeCache
+from tests.synthetic_gateway import SyntheticGateway
+
+
+def test_entries_expire_by_pair(tmp_path):
+    cache = LeadtimeCache(str(tmp_path / "lt.db"))
+    cache.put_many({
+        (1, 10): {"leadtime_dias": 12.5, "fonte": "HISTORICO"},
+        (2, 10): {"leadtime_dias": 30.0, "fonte": "DEFAULT"},
+    })
+    assert cache.get(1, 10, max_age_seconds=3600) == {"leadtime_dias": 12.5, "fonte": "HISTORICO", "confiavel": True}
+
+    conn = sqlite3.connect(str(tmp_path / "lt.db"))
+    with conn:
+        conn.execute("UPDATE leadtimes SET UPDATED_AT = UPDATED_AT - 7200 WHERE CODPROD = 2")
+    conn.close()
+
+    found = cache.get_many([(1, 10), (2, 10), (3, 10)], max_age_seconds=3600)
+    assert list(found) == [(1, 10)]
+    assert cache.full_refresh_at == 0.0        # nenhuma carga completa ainda
+
+
+def test_all_pairs_in_one_execution(tmp_path, monkeypatch):
+    gateway = SyntheticGateway(60)
+    monkeypatch.setattr(sankhya_adapter, "sankhya", gateway)
+    service = sankhya_adapter.SankhyaProcurementService(str(project_root / "mcp_server/domains/procurement"))
+    service.config["leadtime_cache"] = {"enabled": True, "path": str(tmp_path / "lt.db"), "max_age_hours": 24}
+
+    assert service.refresh_all_leadtimes() == len(gateway.supplier)
+    assert gateway.queries == 1
+
+    # Unitário e lote respondem do cache, com o mesmo valor da query por par
+    pairs = [(p, s) for p, s in gateway.supplier.items()]
+    for codprod, codparc in pairs[:10]:
+        expected = gateway._leadtime_single(codprod, codparc)
+        cached = service.get_effective_leadtime(codprod, codparc)
+        assert cached["leadtime_dias"] == float(expected["LEADTIME_EFETIVO"])
+        assert cached["fonte"] == expected["FONTE_LEADTIME"]
+    assert service.get_effective_leadtimes(pairs) == service._compute_leadtimes(pairs)
+    assert gateway.queries == 2                # só o _compute_leadtimes de conferência
+
+
+def test_radar_reads_from_cache(tmp_path, run_radar):
+    erp = run_radar(200, batched=True)
+    lt_path = str(tmp_path / "lt.db")
+    idx_path = str(tmp_path / "idx.db")
+
+    first = run_radar(200, batched=True, index_path=idx_path, leadtime_cache_path=lt_path)
+    second = run_radar(200, batched=True, index_path=idx_path, leadtime_cache_path=lt_path)
+    sequential = run_radar(200, batched=False, index_path=idx_path, leadtime_cache_path=lt_path)
+
+    assert first["opportunities"] == second["opportunities"] == sequential["opportunities"] == erp["opportunities"]
+    # Com o cache válido o radar não calcula lead time no ERP (nem por par, nem em lote)
+    assert second["queries"] < first["queries"]
+    assert sequential["queries"] == second["queries"]
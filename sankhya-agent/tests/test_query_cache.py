@@ -0,0 +1,192 @@
+"""
+Testes do cache read-through de queries (mcp_server/query_cache.py).
+
+Cobre normalização da chave, TTL por classe de query, LRU por bytes,
+backend SQLite compartilhado e invalidação após gravações.
+"""
+
+import json
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+# Adicionar path do projeto
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from mcp_server import query_cache as query_cache_module
+from mcp_server.query_cache import QueryCache, normalize_sql, referenced_tables
+from mcp_server.utils import SankhyaGatewayClient
+
+
+class _Loader:
+    """Simula o Gateway contando quantas vezes foi chamado."""
+
+    def __init__(self, rows=None):
+        self.calls = 0
+        self.rows = rows if rows is not None else [{"CODPROD": 1, "ESTOQUE": 10}]
+
+    def __call__(self):
+        self.calls += 1
+        return [dict(r) for r in self.rows]
+
+
+def test_normalized_sql_shares_entry():
+    """Espaços e caixa fora de literais não geram chaves diferentes."""
+    cache = QueryCache()
+    loader = _Loader()
+    cache.get_or_load("select * from tgfpro where descrprod = 'Parafuso'", loader)
+    cache.get_or_load("SELECT *\n  FROM TGFPRO\n WHERE DESCRPROD = 'Parafuso';", loader)
+    assert loader.calls == 1
+
+    # Literais continuam diferenciando a chave
+    cache.get_or_load("SELECT * FROM TGFPRO WHERE DESCRPROD = 'PARAFUSO'", loader)
+    assert loader.calls == 2
+    assert normalize_sql("select 'a  b'  from dual") == "SELECT 'a  b' FROM DUAL"
+
+    # Identificadores entre aspas duplas são sensíveis à caixa: chaves distintas
+    assert normalize_sql('select 1 as "Total"  from dual') == 'SELECT 1 AS "Total" FROM DUAL'
+    assert normalize_sql('select 1 as "Total" from dual') != normalize_sql('select 1 as "TOTAL" from dual')
+    assert normalize_sql('select "a ""x""  b" from dual') == 'SELECT "a ""x""  b" FROM DUAL'
+
+
+def test_ttl_by_query_class():
+    """Dicionário de dados vive horas; estoque, segundos; a tabela mais volátil vence."""
+    cache = QueryCache()
+    assert cache.ttl_for(referenced_tables(normalize_sql("SELECT CAMPO FROM TDICAM"))) == 6 * 3600
+    assert cache.ttl_for(referenced_tables(normalize_sql("SELECT * FROM TGFEST"))) == 15
+    mixed = normalize_sql("SELECT * FROM TGFPRO P JOIN TGFEST E ON E.CODPROD = P.CODPROD")
+    assert cache.ttl_for(referenced_tables(mixed)) == 15
+
+
+def test_expired_entry_is_reloaded():
+    cache = QueryCache(default_ttl=0.05)
+    loader = _Loader()
+    cache.get_or_load("SELECT 1 FROM DUAL", loader)
+    cache.get_or_load("SELECT 1 FROM DUAL", loader)
+    assert loader.calls == 1
+    time.sleep(0.1)
+    cache.get_or_load("SELECT 1 FROM DUAL", loader)
+    assert loader.calls == 2
+
+
+def test_lru_respects_byte_budget():
+    """Ao estourar o orçamento, as entradas menos usadas saem primeiro."""
+    rows = [{"TEXTO": "x" * 100}]
+    cache = QueryCache(max_bytes=300)
+    for i in range(3):
+        cache.get_or_load(f"SELECT {i} FROM DUAL", _Loader(rows))
+    assert cache.stats()["bytes"] <= 300
+
+    recent = _Loader(rows)
+    cache.get_or_load("SELECT 2 FROM DUAL", recent)
+    assert recent.calls == 0
+    evicted = _Loader(rows)
+    cache.get_or_load("SELECT 0 FROM DUAL", evicted)
+    assert evicted.calls == 1
+
+
+def test_byte_budget_counts_utf8_bytes(tmp_path):
+    """Texto acentuado ocupa mais bytes que caracteres: o orçamento é em bytes."""
+    rows = [{"DESCRPROD": "Válvula de retenção ç" * 10}]
+    size = len(json.dumps(rows, ensure_ascii=False).encode("utf-8"))
+    assert size > len(json.dumps(rows, ensure_ascii=False))
+
+    db_path = tmp_path / "query_cache.db"
+    cache = QueryCache(max_bytes=size, db_path=str(db_path))
+    cache.get_or_load("SELECT DESCRPROD FROM TGFPRO", _Loader(rows))
+    assert cache.stats()["bytes"] == size
+    conn = sqlite3.connect(str(db_path))
+    assert conn.execute("SELECT size FROM query_cache").fetchone()[0] == size
+    conn.close()
+
+    cache.get_or_load("SELECT DESCRPROD FROM TGFPRO WHERE CODPROD = 1", _Loader(rows))
+    assert cache.stats()["entries"] == 1 and cache.stats()["bytes"] <= size
+
+
+def test_shared_backend_closes_its_connections(tmp_path, monkeypatch):
+    opened = []
+
+    class _Tracked(sqlite3.Connection):
+        closed = False
+
+        def close(self):
+            self.closed = True
+            super().close()
+
+    def connect(*args, **kwargs):
+        conn = sqlite3.Connection.__new__(_Tracked)
+        conn.__init__(*args, **kwargs)
+        opened.append(conn)
+        return conn
+
+    monkeypatch.setattr(query_cache_module.sqlite3, "connect", connect)
+    cache = QueryCache(db_path=str(tmp_path / "query_cache.db"))
+    cache.get_or_load("SELECT * FROM TGFEST", _Loader())
+    cache.clear()
+    assert cache.lookup("SELECT * FROM TGFEST") is None
+    cache.invalidate(table="TGFEST")
+    cache.invalidate_volatile()
+    assert len(opened) == 7 and all(c.closed for c in opened)   # init, leitura, escrita, clear, leitura, 2 invalidações
+
+
+def test_hits_return_independent_copies():
+    cache = QueryCache()
+    first = cache.get_or_load("SELECT * FROM TGFEST", _Loader())
+    first[0]["ESTOQUE"] = -1
+    again = cache.get_or_load("SELECT * FROM TGFEST", _Loader())
+    assert again[0]["ESTOQUE"] == 10
+
+
+def test_sqlite_backend_is_shared(tmp_path):
+    """Dois processos (aqui, duas instâncias) reaproveitam os resultados um do outro."""
+    db_path = str(tmp_path / "query_cache.db")
+    streamlit = QueryCache(db_path=db_path)
+    worker = QueryCache(db_path=db_path)
+
+    loader = _Loader()
+    streamlit.get_or_load("SELECT CAMPO FROM TDICAM WHERE NOMETAB = 'TGFPRO'", loader)
+    assert worker.get_or_load("SELECT CAMPO FROM TDICAM WHERE NOMETAB = 'TGFPRO'", loader) == loader.rows
+    assert loader.calls == 1
+    assert worker.stats()["shared_hits"] == 1
+
+    worker.invalidate(table="TDICAM")
+    streamlit.clear()
+    streamlit.get_or_load("SELECT CAMPO FROM TDICAM WHERE NOMETAB = 'TGFPRO'", loader)
+    assert loader.calls == 2
+
+
+def test_client_cache_is_opt_in_and_invalidated_on_write():
+    """Sem cache o cliente sempre vai ao Gateway; gravações descartam resultados voláteis."""
+    client = SankhyaGatewayClient()
+    calls = []
+    client._run_query = lambda sql: calls.append(sql) or [{"N": len(calls)}]
+
+    client.query_cache = None
+    client.execute_query("SELECT * FROM TGFEST")
+    client.execute_query("SELECT * FROM TGFEST")
+    assert len(calls) == 2
+
+    client.query_cache = QueryCache()
+    client.execute_query("SELECT * FROM TGFEST")
+    client.execute_query("SELECT CAMPO FROM TDICAM")
+    client.execute_query("SELECT * FROM TGFEST")
+    client.execute_query("SELECT * FROM TGFEST", use_cache=False)
+    assert len(calls) == 5
+
+    client.query_cache.invalidate_volatile()
+    client.execute_query("SELECT * FROM TGFEST")
+    client.execute_query("SELECT CAMPO FROM TDICAM")
+    assert len(calls) == 6
+
+
+def test_volatile_invalidation_survives_broken_shared_cache(tmp_path):
+    """Cache compartilhado corrompido não transforma uma gravação bem-sucedida em erro."""
+    db_path = tmp_path / "query_cache.db"
+    cache = QueryCache(db_path=str(db_path))
+    cache.get_or_load("SELECT * FROM TGFEST", _Loader())
+    db_path.write_bytes(b"isto nao e um banco sqlite" * 100)
+
+    cache.invalidate_volatile()
+    assert cache.stats()["entries"] == 0
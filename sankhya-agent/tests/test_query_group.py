@@ -0,0 +1,104 @@
+"""
+Testes do grupo de queries paralelas (mcp_server/query_group.py).
+
+Cobre o teto de concorrência, o prazo compartilhado com resultado parcial,
+o isolamento de erros por query e o uso no Equilíbrio Financeiro do adapter.
+"""
+
+import sys
+import threading
+import time
+from pathlib import Path
+
+# Adicionar path do projeto
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from mcp_server.query_group import QueryGroup
+from mcp_server.domains.procurement.services import sankhya_adapter
+from mcp_server.sql_binder import bind_params
+
+
+class _SlowQueries:
+    """Executor falso: cada query dorme `delay` e registra o pico de chamadas simultâneas."""
+
+    def __init__(self, delay=0.1):
+        self.delay = delay
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, sql):
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            if "FALHA" in sql:
+                raise RuntimeError("ORA-00942: tabela inexistente")
+            time.sleep(self.delay if "LENTA" not in sql else 5)
+            return [{"SQL": sql}]
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+
+def test_runs_concurrently_within_cap():
+    queries = _SlowQueries(delay=0.2)
+    group = QueryGroup(max_concurrency=3, deadline_seconds=10)
+    for i in range(6):
+        group.add(f"q{i}", queries, f"SELECT {i} FROM DUAL")
+
+    start = time.monotonic()
+    result = group.run()
+    elapsed = time.monotonic() - start
+
+    assert result.ok
+    assert result.rows("q4") == [{"SQL": "SELECT 4 FROM DUAL"}]
+    assert queries.max_in_flight == 3
+    assert elapsed < 1.0          # 2 levas de 0.2s, não 6 x 0.2s
+
+
+def test_partial_results_with_errors_and_deadline():
+    queries = _SlowQueries(delay=0.05)
+    result = (QueryGroup(max_concurrency=4, deadline_seconds=0.5)
+              .add("ok", queries, "SELECT 1 FROM DUAL")
+              .add("quebrada", queries, "SELECT FALHA")
+              .add("lenta", queries, "SELECT LENTA")
+              .run())
+
+    assert result.rows("ok") == [{"SQL": "SELECT 1 FROM DUAL"}]
+    assert result.rows("quebrada") == [] and "ORA-00942" in result.errors["quebrada"]
+    assert "tempo limite" in result.errors["lenta"]
+    assert {e["consulta"] for e in result.error_list()} == {"quebrada", "lenta"}
+
+
+def test_financial_balance_runs_queries_in_parallel(monkeypatch):
+    class _Gateway:
+        def __init__(self):
+            self.slow = _SlowQueries(delay=0.2)
+
+        def execute_bound(self, sql, params):
+            return self.execute_query(bind_params(sql, params))
+
+        def execute_query(self, sql, use_cache=True):
+            self.slow(sql)
+            if "Receber vs Pagar" in sql:
+                return [{"TIPO": "PAGAR (COMPRAS)", "STATUS_VENCIMENTO": "NO_PRAZO", "TOTAL": 50.0},
+                        {"TIPO": "RECEBER (VENDAS)", "STATUS_VENCIMENTO": "NO_PRAZO", "TOTAL": 100.0}]
+            if "Média de Vendas" in sql:
+                raise RuntimeError("Gateway indisponível")
+            return []
+
+    gateway = _Gateway()
+    monkeypatch.setattr(sankhya_adapter, "sankhya", gateway)
+    service = sankhya_adapter.SankhyaProcurementService(str(project_root / "mcp_server/domains/procurement"))
+
+    start = time.monotonic()
+    balance = service.get_financial_procurement_balance(dias_horizonte=30)
+    elapsed = time.monotonic() - start
+
+    assert gateway.slow.max_in_flight == 4
+    assert elapsed < 0.6          # 4 queries de 0.2s em paralelo
+    # A média de vendas falhou: o restante do relatório sai e o erro vem nomeado
+    assert balance["saude_financeira"]["indice_apagar_vs_receber"] == 0.5
+    assert balance["erros_consulta"] == [{"consulta": "media_vendas", "erro": "Gateway indisponível"}]
@@ -0,0 +1,103 @@
+"""
+Testes da paginação de queries grandes (mcp_server/query_pager.py + execute_query_paged).
+
+Um Gateway falso interpreta as janelas ROWNUM/keyset geradas e responde com
+fatias de uma tabela em memória, com latência aleatória para embaralhar a ordem
+de chegada das páginas buscadas em paralelo.
+"""
+
+import re
+import sys
+import time
+import random
+import threading
+from pathlib import Path
+
+import pytest
+
+# Adicionar path do projeto
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from mcp_server.utils import SankhyaGatewayClient
+from mcp_server.row_decoder import QueryResult
+from mcp_server.query_pager import PageCursor, build_window_sql, build_keyset_sql, ROWNUM_COLUMN
+
+TABLE = [{"CODPROD": i, "ESTOQUE": float(i % 13)} for i in range(1, 1236)]
+
+
+class _PagingGateway:
+    def __init__(self):
+        self.queries = []
+        self.lock = threading.Lock()
+
+    def __call__(self, sql, timeout=None):
+        with self.lock:
+            self.queries.append(sql)
+        time.sleep(random.uniform(0, 0.01))
+        window = re.search(r"WHERE ROWNUM <= (\d+)\n\) WHERE SSA_RN > (\d+)", sql)
+        if window:
+            hi, lo = int(window.group(1)), int(window.group(2))
+            rows = [(r["CODPROD"], r["ESTOQUE"], lo + i + 1) for i, r in enumerate(TABLE[lo:hi])]
+            return QueryResult(["CODPROD", "ESTOQUE", ROWNUM_COLUMN], rows)
+        keyset = re.search(r"ROWNUM <= (\d+)$", sql)
+        last = re.search(r"SSA_BASE\.CODPROD > (\d+)", sql)
+        start = int(last.group(1)) if last else 0
+        rows = [(r["CODPROD"], r["ESTOQUE"]) for r in TABLE if r["CODPROD"] > start][:int(keyset.group(1))]
+        return QueryResult(["CODPROD", "ESTOQUE"], rows)
+
+
+def _client():
+    client = SankhyaGatewayClient()
+    client.execute_query_result = _PagingGateway()
+    return client
+
+
+def test_window_sql_shapes():
+    sql = build_window_sql("SELECT * FROM TGFGIR;", "CODPROD", 200, 100)
+    assert "ORDER BY CODPROD" in sql and "ROWNUM <= 300" in sql and "SSA_RN > 200" in sql
+    assert ";" not in sql
+
+    fetch = build_window_sql("SELECT * FROM TGFGIR", "CODPROD", 200, 100, mode="offset")
+    assert fetch.endswith("OFFSET 200 ROWS FETCH NEXT 100 ROWS ONLY")
+
+    keyset = build_keyset_sql("SELECT * FROM TGFPRO", "CODPROD", "A'B", 50)
+    assert "SSA_BASE.CODPROD > 'A''B'" in keyset and keyset.endswith("ROWNUM <= 50")
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_parallel_pages_keep_order(workers):
+    client = _client()
+    rows = list(client.execute_query_paged("SELECT * FROM TGFGIR", order_by="CODPROD", page_size=100, max_workers=workers))
+    assert rows == TABLE
+    assert all(ROWNUM_COLUMN not in r for r in rows)
+    # 13 páginas (12 cheias + 1 curta) + no máximo as buscadas à frente
+    assert 13 <= len(client.execute_query_result.queries) <= 13 + workers - 1
+
+
+def test_cursor_resumes_where_it_stopped():
+    client = _client()
+    pages = client.iter_query_pages("SELECT * FROM TGFGIR", order_by="CODPROD", page_size=200, max_workers=3)
+    first = next(pages)
+    second = next(pages)
+    pages.close()
+    token = second.cursor.to_token()
+
+    rest = list(_client().execute_query_paged(
+        "SELECT * FROM TGFGIR", order_by="CODPROD", cursor=PageCursor.from_token(token)
+    ))
+    assert first.rows + second.rows + rest == TABLE
+
+    finished = PageCursor(offset=len(TABLE), done=True)
+    assert list(_client().execute_query_paged("SELECT * FROM TGFGIR", cursor=finished)) == []
+
+
+def test_keyset_mode():
+    client = _client()
+    pages = list(client.iter_query_pages("SELECT * FROM TGFPRO", mode="keyset", key_column="CODPROD", page_size=500))
+    assert [len(p.rows) for p in pages] == [500, 500, 235]
+    assert pages[-1].cursor.last_key == 1235 and pages[-1].cursor.done
+    assert [r for p in pages for r in p.rows] == TABLE
+
+    with pytest.raises(ValueError):
+        list(client.iter_query_pages("SELECT 1 FROM DUAL", mode="keyset"))
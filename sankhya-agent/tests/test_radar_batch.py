@@ -0,0 +1,37 @@
+"""
+Testes do modo em lote do Radar de Compras.
+
+Usa o Gateway sintético de tests/synthetic_gateway.py para garantir que o modo
+em lote devolve exatamente as mesmas oportunidades do modo por produto, com
+número de queries constante em relação ao tamanho do catálogo.
+"""
+
+import sys
+from pathlib import Path
+
+# Adicionar path do projeto
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+
+def test_batched_matches_sequential(run_radar):
+    """Os dois modos devem produzir a mesma lista, na mesma ordem."""
+    sequential = run_radar(300, batched=False)
+    batched = run_radar(300, batched=True)
+
+    assert sequential["opportunities"], "O cenário sintético deveria gerar oportunidades"
+    assert batched["opportunities"] == sequential["opportunities"]
+
+    fontes = {o["LEADTIME_FONTE"] for o in batched["opportunities"]}
+    assert fontes == {"HISTORICO", "CATEGORIA", "ESTATICO", "DEFAULT"}
+    assert {o["COMPRA_APROVADA"] for o in batched["opportunities"]} == {True, False}
+
+
+def test_batched_query_count_is_constant(run_radar):
+    """N+1 cresce com o catálogo; o modo em lote não."""
+    small = run_radar(200, batched=True)["queries"]
+    large = run_radar(900, batched=True)["queries"]
+    assert small == large
+
+    sequential = run_radar(200, batched=False)["queries"]
+    assert sequential > 200
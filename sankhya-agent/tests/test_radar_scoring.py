@@ -0,0 +1,74 @@
+"""
+Testes do estágio de pontuação vetorizado do radar (workflows/radar_scoring.py).
+
+A equivalência com o loop original em cenário completo está em test_radar_batch.py;
+aqui ficam o HARD CAP sequencial por fornecedor e o catálogo inteiro em lote.
+"""
+
+import sys
+import time
+from pathlib import Path
+
+# Adicionar path do projeto
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from mcp_server.domains.procurement.services.budget_snapshot import BudgetSnapshot
+from mcp_server.domains.procurement.workflows.radar_scoring import score_opportunities
+
+
+def _item(codprod, venda, custo, curva="A", estoque=0.0):
+    return {"CODPROD": codprod, "DESCRPROD": f"P{codprod}", "CURVA": curva, "ESTOQUE": estoque,
+            "VENDA_MENSAL": venda, "PRAZO_PAG_MESES": 1, "CUSTOGER": custo}
+
+
+def _context(codprods, codparc=10, leadtime=0.0):
+    suppliers = {c: {"CODPARC": codparc, "NOMEPARC": f"F{codparc}"} for c in codprods}
+    leadtimes = {(c, codparc): {"leadtime_dias": leadtime, "fonte": "DEFAULT", "confiavel": False} for c in codprods}
+    return suppliers, leadtimes
+
+
+def test_hard_cap_keeps_item_order_after_a_rejection():
+    # Demanda 10 (buffer 0): valores 60, 50, 30, 10 contra saldo de 100
+    abc = [_item(1, 10, 6.0), _item(2, 10, 5.0), _item(3, 10, 3.0), _item(4, 10, 1.0)]
+    suppliers, leadtimes = _context([1, 2, 3, 4])
+    budget = BudgetSnapshot(allocations={10: 120.0}, spend={10: 20.0}, reserva_exploracao=0.0)
+
+    ops = score_opportunities(abc, {}, suppliers, leadtimes, demand_buffer=0.0, budget=budget)
+    by_prod = {o["CODPROD"]: o for o in ops}
+
+    # 60 cabe; 50 estoura (sobram 40); 30 cabe; 10 cabe exatamente no saldo restante
+    assert [by_prod[c]["COMPRA_APROVADA"] for c in (1, 2, 3, 4)] == [True, False, True, True]
+    assert by_prod[2]["ORCAMENTO_DISPONIVEL"] == 40.0
+    assert by_prod[4]["ORCAMENTO_DISPONIVEL"] == 10.0
+    assert budget.spent(10) == 120.0
+
+    # Aprovadas primeiro; dentro da mesma curva, maior valor primeiro
+    assert [o["CODPROD"] for o in ops] == [1, 3, 4, 2]
+
+
+def test_without_budget_everything_is_approved():
+    abc = [_item(1, 10, 6.0, curva="B"), _item(2, 10, 5.0, curva="A"), _item(3, 0, 5.0, estoque=1.0)]
+    suppliers, leadtimes = _context([1, 2, 3])
+    ops = score_opportunities(abc, {3: {"QTD_ORCADA": 4}}, suppliers, leadtimes, demand_buffer=0.2)
+
+    assert [o["CODPROD"] for o in ops] == [2, 3, 1]       # curva A (maior valor primeiro), depois B
+    assert all(o["COMPRA_APROVADA"] and o["STATUS_BUDGET"] == "Budget control desabilitado" for o in ops)
+    assert ops[1]["SUGESTAO_COMPRA"] == 3.0       # só demanda reprimida (4) - estoque (1)
+
+
+def test_full_catalog_scores_fast():
+    n = 100_000
+    abc = [_item(p, float(5 + p % 23), 10.0 + p % 50, curva="ABC"[p % 3], estoque=float(p % 17)) for p in range(1, n + 1)]
+    suppliers = {p: {"CODPARC": 1000 + p % 400, "NOMEPARC": "F"} for p in range(1, n + 1)}
+    leadtimes = {(p, 1000 + p % 400): {"leadtime_dias": 10.0 + p % 9, "fonte": "HISTORICO", "confiavel": True}
+                 for p in range(1, n + 1)}
+    budget = BudgetSnapshot(allocations={s: 5000.0 for s in range(1000, 1400)}, spend={}, reserva_exploracao=0.0)
+
+    start = time.perf_counter()
+    ops = score_opportunities(abc, {}, suppliers, leadtimes, demand_buffer=0.2, budget=budget)
+    elapsed = time.perf_counter() - start
+
+    assert len(ops) > n // 2
+    # Folga generosa para máquinas de CI lentas (localmente ~1s, quase tudo montando os dicts de saída)
+    assert elapsed < 5.0
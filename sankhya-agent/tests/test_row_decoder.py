@@ -0,0 +1,104 @@
+"""
+Testes do decodificador incremental de respostas do DbExplorerSP (mcp_server/row_decoder.py).
+
+Alimenta o parser com pedaços minúsculos (inclusive caracteres UTF-8 e números
+cortados entre chunks) e compara com o json.loads da resposta inteira.
+"""
+
+import sys
+import json
+import random
+from pathlib import Path
+
+import pytest
+
+# Adicionar path do projeto
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from mcp_server.row_decoder import StreamingRowDecoder, QueryResult, RowStreamError, decode_query_response
+
+
+def _payload(rows, fields=("CODPROD", "DESCRPROD", "ESTOQUE"), status="1", rows_first=False):
+    body = {"fieldsMetadata": [{"name": f, "userType": "S"} for f in fields], "rows": rows}
+    if rows_first:
+        body = {"rows": rows, "fieldsMetadata": body["fieldsMetadata"]}
+    return json.dumps({
+        "serviceName": "DbExplorerSP.executeQuery",
+        "status": status,
+        "pendingPrinting": "false",
+        "responseBody": body,
+    }, ensure_ascii=False).encode("utf-8")
+
+
+def _chunks(data: bytes, size: int):
+    return (data[i:i + size] for i in range(0, len(data), size))
+
+
+def _sample_rows(n=500):
+    rng = random.Random(42)
+    return [
+        [i, f"PRODUTO Ç{i} \"ã\" \\ {rng.random()}", None if i % 7 == 0 else rng.uniform(-1e6, 1e6)]
+        for i in range(n)
+    ]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 17, 4096])
+def test_matches_full_json_decode(chunk_size):
+    rows = _sample_rows()
+    result = decode_query_response(_chunks(_payload(rows), chunk_size))
+
+    assert result.columns == ["CODPROD", "DESCRPROD", "ESTOQUE"]
+    assert result.rows == [tuple(r) for r in rows]
+    assert result.to_dicts() == [dict(zip(result.columns, r)) for r in rows]
+
+
+def test_rows_are_yielded_incrementally():
+    """A primeira linha sai antes do stream terminar."""
+    data = _payload(_sample_rows(50))
+    consumed = []
+
+    def tracking_chunks():
+        for chunk in _chunks(data, 64):
+            consumed.append(len(chunk))
+            yield chunk
+
+    decoder = StreamingRowDecoder(tracking_chunks())
+    first = next(iter(decoder))
+    assert first[0] == 0
+    assert decoder.fields == ["CODPROD", "DESCRPROD", "ESTOQUE"]
+    assert sum(consumed) < len(data) / 2
+
+
+def test_rows_before_metadata_and_empty_result():
+    rows = [[1, "A", 2.5], [2, "B", None]]
+    result = decode_query_response(_chunks(_payload(rows, rows_first=True), 5))
+    assert result.to_dicts() == [
+        {"CODPROD": 1, "DESCRPROD": "A", "ESTOQUE": 2.5},
+        {"CODPROD": 2, "DESCRPROD": "B", "ESTOQUE": None},
+    ]
+
+    empty = decode_query_response([_payload([])])
+    assert len(empty) == 0 and not empty and empty.to_dicts() == []
+
+
+def test_error_status_and_truncated_stream():
+    error = json.dumps({"status": "0", "statusMessage": "ORA-00942: tabela ou view não existe"}).encode()
+    with pytest.raises(Exception, match="ORA-00942"):
+        decode_query_response(_chunks(error, 4))
+
+    truncated = _payload(_sample_rows(10))[:-30]
+    with pytest.raises(RowStreamError):
+        decode_query_response(_chunks(truncated, 8))
+
+
+def test_compact_columnar_and_dataframe():
+    result = QueryResult(["CODPROD", "ESTOQUE"], [(1, 10.0), (2, 0.0), (3, 5.5)])
+    assert result.value(2, "ESTOQUE") == 5.5
+    assert result.column_index("ESTOQUE") == 1
+    assert result.columnar() == {"CODPROD": [1, 2, 3], "ESTOQUE": [10.0, 0.0, 5.5]}
+    assert QueryResult(["A"], []).columnar() == {"A": []}
+
+    df = result.to_dataframe()
+    assert list(df.columns) == ["CODPROD", "ESTOQUE"]
+    assert df["ESTOQUE"].sum() == 15.5
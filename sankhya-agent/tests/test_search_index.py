@@ -0,0 +1,139 @@
+"""
+Testes do índice de busca unificado (mcp_server/search_index.py).
+
+Cobre o ranking BM25 com bônus de frase, os trechos retornados, a atualização
+incremental por mtime/assinatura e as ferramentas search_docs/search_solutions
+respondendo do mesmo índice.
+"""
+
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+# Adicionar path do projeto
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from mcp_server import knowledge_indexer, tools
+from mcp_server.knowledge_search import KnowledgeSearch
+from mcp_server.search_index import SearchIndex, tokenize
+
+RULES_MD = """# Regras de Negócio
+
+## Vendas
+
+- Pedidos acima do limite de crédito do parceiro devem ser aprovados pelo gerente comercial.
+
+## Estoque
+
+- O custo de reposição (CUSREP) é calculado pela última entrada no `TGFCUS`.
+- Controle de lote via campo `CONTROLE` na `TGFEST`.
+"""
+
+SCHEMA = {"TGFCAB": "Cabeçalho de Notas/Pedidos", "TGFCUS": "Custos por produto e empresa"}
+
+
+def _touch(path, mtime):
+    os.utime(path, (mtime, mtime))
+
+
+@pytest.fixture
+def kb(tmp_path, monkeypatch):
+    docs = tmp_path / "knowledge"
+    docs.mkdir()
+    (docs / "business_rules.md").write_text(RULES_MD, encoding="utf-8")
+    (docs / "schema_map.json").write_text(json.dumps(SCHEMA, ensure_ascii=False), encoding="utf-8")
+    (docs / "watchers.db").write_bytes(b"\x00SQLite format 3")
+    db = str(tmp_path / "knowledge.db")
+    monkeypatch.setattr(knowledge_indexer, "DB_PATH", db)
+    knowledge_indexer.create_database()
+    knowledge_indexer.index_articles([
+        {"id": 1, "url": "https://ajuda/1", "title": "Erro ORA-00942: a tabela ou view não existe",
+         "body": "Verifique o GRANT de select e o schema da tabela.", "created_at": "", "updated_at": "1"},
+        {"id": 2, "url": "https://ajuda/2", "title": "Rejeição 997: Série já vinculada",
+         "body": "Crie uma nova série exclusiva para a filial.", "created_at": "", "updated_at": "1"},
+    ])
+    index = SearchIndex(str(docs), KnowledgeSearch(db), check_interval=0)
+    return index, docs
+
+
+def test_bm25_ranking_and_snippets(kb):
+    index, _ = kb
+    assert tokenize("Reposição do CUSTO") == ["reposicao", "custo"]
+
+    hits = index.search("custo de reposicao")
+    assert hits[0].title == "business_rules.md › Estoque"
+    assert "CUSREP" in hits[0].snippet and "limite de crédito" not in hits[0].snippet
+
+    # Sem acento, maiúsculas e pontuação diferentes ainda acham o artigo
+    article = index.search("ora 00942 tabela", kinds=["artigo"])[0]
+    assert (article.location, article.kind) == ("https://ajuda/1", "artigo")
+    assert [h.title for h in index.search("TGFCAB", kinds=["schema"])] == ["schema_map.json › TGFCAB"]
+    assert index.search("de a") == []                  # termos curtos demais
+
+
+def test_phrase_match_ranks_first(kb):
+    index, docs = kb
+    (docs / "faq.md").write_text(
+        "# Numeração\n\nVinculada à nota, a série da filial; série e vinculada em outra ordem, série.\n",
+        encoding="utf-8",
+    )
+    # faq.md tem os dois termos mais vezes, mas só o artigo tem a frase
+    hits = index.search("série já vinculada", limit=3)
+    assert hits[0].location == "https://ajuda/2"
+    assert "faq.md" in [h.location for h in hits]
+
+
+def test_incremental_refresh(kb):
+    index, docs = kb
+    index.search("custo")
+    stats = index.stats()
+    assert stats["por_tipo"] == {"regras": 3, "schema": 2, "artigo": 2}    # o .db de knowledge/ fica fora
+
+    # Nada mudou: nenhuma reindexação
+    reindexed = index.reindexed
+    index.search("custo")
+    assert index.reindexed == reindexed
+
+    # Só o arquivo alterado é reindexado
+    path = docs / "schema_map.json"
+    path.write_text(json.dumps({**SCHEMA, "TGFFIN": "Financeiro: títulos a pagar e receber"}), encoding="utf-8")
+    _touch(path, time.time() + 10)
+    assert index.search("titulos pagar")[0].title == "schema_map.json › TGFFIN"
+    assert index.reindexed == reindexed + 3
+
+    # Só o artigo alterado é reindexado; o excluído sai do índice
+    knowledge_indexer.index_articles([
+        {"id": 2, "url": "https://ajuda/2", "title": "Rejeição 997: Série já vinculada",
+         "body": "Inutilize a numeração na TGFNUM.", "created_at": "", "updated_at": "2"},
+    ])
+    _touch(knowledge_indexer.DB_PATH, time.time() + 20)
+    assert index.search("inutilize numeracao")[0].location == "https://ajuda/2"
+    assert index.reindexed == reindexed + 4
+
+    os.remove(docs / "business_rules.md")
+    assert index.search("limite credito") == []
+
+
+def test_tools_answer_from_the_index(kb, monkeypatch):
+    index, _ = kb
+    monkeypatch.setattr(tools, "get_search_index", lambda: index)
+    monkeypatch.setattr(tools, "get_knowledge_search", lambda: index.articles)
+
+    docs = tools.search_docs("controle de lote")
+    assert "business_rules.md › Estoque" in docs and "TGFEST" in docs
+    assert "https://ajuda" not in docs                       # search_docs fica nos arquivos locais
+
+    solutions = tools.search_solutions("Erro Funcional Sankhya: ORA-00942: a tabela ou view não existe")
+    assert solutions.count("[Ler artigo completo](https://ajuda/1)") == 1
+    # Palavra parcial: BM25 não acha, o índice trigram da knowledge.db sim
+    assert "https://ajuda/2" in tools.search_solutions("vinculad")
+
+    t0 = time.perf_counter()
+    for _ in range(200):
+        index.search("custo de reposição do produto")
+    assert (time.perf_counter() - t0) / 200 < 0.005
@@ -0,0 +1,74 @@
+"""
+Testes do binder de parâmetros nominais (mcp_server/sql_binder.py).
+
+Cobre nomes com prefixo comum, marcadores dentro de literais/comentários, o cache
+de templates e o envio de binds pelo cliente do Gateway (texto SQL estável).
+"""
+
+import sys
+from datetime import date
+from pathlib import Path
+
+# Adicionar path do projeto
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from mcp_server.sql_binder import get_template, bind_params
+from mcp_server.utils import SankhyaGatewayClient
+
+
+def test_prefix_names_and_literals():
+    sql = ("SELECT TO_CHAR(DTNEG, 'HH24:MI:SS') FROM TGFCAB -- filtro :CODPROD\n"
+           "WHERE CODPROD = :CODPROD AND CODPRODX = :CODPRODX AND OBS = :OBS /* :FIN */")
+    rendered = bind_params(sql, {"CODPROD": 10, "CODPRODX": 20, "OBS": "D'Água"})
+
+    assert "CODPROD = 10 AND CODPRODX = 20" in rendered
+    assert "OBS = 'D''Água'" in rendered
+    assert "'HH24:MI:SS'" in rendered and "-- filtro :CODPROD" in rendered and "/* :FIN */" in rendered
+    assert get_template(sql).names == ("CODPROD", "CODPRODX", "OBS")
+
+
+def test_values_and_missing_params():
+    sql = "SELECT * FROM T WHERE A = :A AND B = :B AND D = :D AND X = :X"
+    rendered = bind_params(sql, {"A": None, "B": 1.5, "D": date(2026, 3, 1)})
+
+    assert "A = NULL AND B = 1.5" in rendered
+    assert "D = TO_DATE('01/03/2026', 'DD/MM/YYYY')" in rendered
+    assert rendered.endswith("X = :X")         # não informado: fica intacto
+
+
+def test_template_is_parsed_once_and_lists_expand():
+    sql = "SELECT * FROM TGFPRO WHERE CODPROD IN (:LISTA_PRODUTOS) AND ATIVO = :ATIVO"
+    assert get_template(sql) is get_template(sql)
+
+    expanded = get_template(sql).expand({"LISTA_PRODUTOS": "1, 2, 3"})
+    assert expanded.sql == "SELECT * FROM TGFPRO WHERE CODPROD IN (1, 2, 3) AND ATIVO = :ATIVO"
+    assert expanded.names == ("ATIVO",)
+
+
+class _Result:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def to_dicts(self):
+        return self.rows
+
+
+def test_gateway_sends_binds_with_stable_text(monkeypatch):
+    client = SankhyaGatewayClient()
+    client.query_cache = None
+    sent = []
+    monkeypatch.setattr(client, "execute_query_result",
+                        lambda sql, timeout=None, binds=None: sent.append((sql, binds)) or _Result([{"OK": 1}]))
+    sql = "SELECT * FROM TGFPRO WHERE CODPROD = :CODPROD AND DESCRPROD LIKE :DESCR"
+
+    client.supports_binds = True
+    client.execute_bound(sql, {"CODPROD": 1, "DESCR": "TUBO%"})
+    client.execute_bound(sql, {"codprod": 2, "DESCR": "CANO%", "EXTRA": 9})
+    assert [s for s, _ in sent] == [sql, sql]          # mesmo texto: cursor reaproveitado
+    assert sent[1][1] == {"CODPROD": 2, "DESCR": "CANO%"}
+
+    client.supports_binds = False
+    monkeypatch.setattr(client, "execute_query", lambda sql, use_cache=True: sent.append((sql, None)) or [])
+    client.execute_bound(sql, {"CODPROD": 3, "DESCR": "X"})
+    assert sent[-1] == ("SELECT * FROM TGFPRO WHERE CODPROD = 3 AND DESCRPROD LIKE 'X'", None)
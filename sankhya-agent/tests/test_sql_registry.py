@@ -0,0 +1,90 @@
+"""
+Testes do registro de templates SQL (mcp_server/sql_registry.py).
+
+Cobre a pré-carga da pasta, a recarga só quando o mtime muda, a validação de
+parâmetros e o adapter de compras lendo rules/ sem ir ao disco a cada chamada.
+"""
+
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+# Adicionar path do projeto
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from mcp_server.sql_binder import SqlParameterError
+from mcp_server.sql_registry import SqlTemplateRegistry
+from mcp_server.domains.procurement.services import sankhya_adapter
+
+
+def _write(path, text, mtime):
+    path.write_text(text, encoding="utf-8")
+    os.utime(path, (mtime, mtime))
+
+
+def test_preload_and_reload_on_mtime_change(tmp_path):
+    sql_file = tmp_path / "queries_a.sql"
+    _write(sql_file, "SELECT * FROM TGFPRO WHERE CODPROD = :CODPROD", 1_000_000)
+    (tmp_path / "notas.txt").write_text("ignorado")
+
+    registry = SqlTemplateRegistry(str(tmp_path), check_interval=0)
+    assert registry.names() == ["queries_a.sql"]
+    assert registry.parameters("queries_a.sql") == ["CODPROD"]
+
+    for _ in range(5):
+        registry.get("queries_a.sql")
+    assert registry.loads == 1 and registry.reloads == 0      # mtime igual: nada relido
+
+    _write(sql_file, "SELECT * FROM TGFPRO WHERE CODPROD = :CODPROD AND ATIVO = :ATIVO", 1_000_100)
+    assert registry.parameters("queries_a.sql") == ["CODPROD", "ATIVO"]
+    assert registry.reloads == 1
+
+    assert registry.text("inexistente.sql") == ""
+
+
+def test_reload_check_is_throttled(tmp_path):
+    sql_file = tmp_path / "q.sql"
+    _write(sql_file, "SELECT 1 FROM DUAL", 1_000_000)
+    registry = SqlTemplateRegistry(str(tmp_path), check_interval=3600)
+
+    _write(sql_file, "SELECT 2 FROM DUAL", 1_000_100)
+    assert registry.text("q.sql") == "SELECT 1 FROM DUAL"      # dentro do intervalo: nem confere
+
+
+def test_validate_reports_missing_parameters(tmp_path):
+    _write(tmp_path / "q.sql", "SELECT * FROM TGFITE WHERE CODPROD IN (:LISTA_CODPROD) AND CODEMP = :EMPRESA", 1_000_000)
+    registry = SqlTemplateRegistry(str(tmp_path))
+
+    registry.validate("q.sql", {"EMPRESA": None}, raw=["LISTA_CODPROD"])     # None é valor válido
+    # ValueError: com mcp_server/ no sys.path o registro pode importar sql_binder pelo nome curto
+    with pytest.raises(ValueError, match=":EMPRESA"):
+        registry.validate("q.sql", {"EMPRESSA": 1}, raw=["LISTA_CODPROD"])
+
+
+def test_adapter_reads_rules_once_and_fails_fast(monkeypatch):
+    calls = []
+
+    class _Gateway:
+        def execute_bound(self, sql, params):
+            calls.append(sql)
+            return []
+
+    monkeypatch.setattr(sankhya_adapter, "sankhya", _Gateway())
+    service = sankhya_adapter.SankhyaProcurementService(str(project_root / "mcp_server/domains/procurement"))
+    service.config["leadtime_cache"] = {"enabled": False}
+    assert "queries_leadtime_effective.sql" in service.sql_templates.names()
+
+    opened = []
+    real_open = open
+    monkeypatch.setattr("builtins.open", lambda *a, **k: opened.append(a[0]) or real_open(*a, **k))
+    for codprod in range(20):
+        service.get_effective_leadtime(codprod, 10)
+    assert opened == [] and len(calls) == 20
+
+    sql = service._read_sql("queries_leadtime_effective.sql")
+    with pytest.raises(SqlParameterError, match=":CODPARC"):
+        service._execute_with_params(sql, {"CODPROD": 1})
+    assert len(calls) == 20      # não chegou ao Gateway
@@ -0,0 +1,117 @@
+"""
+Testes do índice local de fornecedor principal (services/supplier_index.py).
+
+Cobre a construção completa, a atualização incremental por watermark (pedido novo,
+pedido estornado), as janelas de meses e a equivalência com a regra do ERP no radar.
+"""
+
+import sys
+from datetime import date, timedelta
+from pathlib import Path
+
+# Adicionar path do projeto
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from mcp_server.domains.procurement.services.supplier_index import PrimarySupplierIndex, months_ago
+
+RECENT = (date.today() - timedelta(days=20)).isoformat()
+OLD = (date.today() - timedelta(days=500)).isoformat()
+
+
+def _line(nunota, codprod, codparc, qtd, dtneg=RECENT, dtalter="2026-01-10 08:00:00", status="L"):
+    return {
+        "NUNOTA": nunota, "CODPROD": codprod, "CODPARC": codparc, "NOMEPARC": f"FORN {codparc}",
+        "QTDNEG": qtd, "DTNEG": dtneg, "DTALTER": dtalter, "STATUSNOTA": status,
+    }
+
+
+class _History:
+    """ERP falso: devolve as linhas com DTALTER >= watermark, como a query do índice."""
+
+    def __init__(self, lines):
+        self.lines = lines
+        self.calls = []
+
+    def __call__(self, since):
+        self.calls.append(since)
+        rows = [l for l in self.lines if since is None or l["DTALTER"] >= since]
+        return iter(sorted(rows, key=lambda l: (l["NUNOTA"], l["CODPROD"])))
+
+
+def test_build_and_windows(tmp_path):
+    history = _History([
+        _line(1, 100, 10, 5), _line(1, 200, 10, 1),
+        _line(2, 100, 20, 3), _line(3, 100, 20, 4),       # 20 ganha no total recente (7 x 5)
+        _line(4, 100, 30, 50, dtneg=OLD),                  # 30 só ganha olhando 24 meses
+        _line(5, 200, 40, 9, status="P"),                  # não liberado: ignorado
+    ])
+    index = PrimarySupplierIndex(str(tmp_path / "idx.db"), history)
+    index.rebuild()
+
+    assert index.primary_supplier(100, meses=12)["CODPARC"] == 20
+    assert index.primary_supplier(100, meses=24)["CODPARC"] == 30
+    assert index.primary_supplier(100, meses=None)["CODPARC"] == 30
+    assert index.primary_supplier(200)["NOMEPARC"] == "FORN 10"
+    assert index.primary_supplier(999) is None
+    assert index.products_of(10, meses=12) == [200]
+    assert index.watermark == "2026-01-10 08:00:00"
+
+
+def test_incremental_refresh_applies_new_and_reversed_notes(tmp_path):
+    history = _History([_line(1, 100, 10, 5), _line(2, 100, 20, 3)])
+    index = PrimarySupplierIndex(str(tmp_path / "idx.db"), history)
+    index.rebuild()
+    assert index.primary_supplier(100)["CODPARC"] == 10
+
+    # Novo pedido do fornecedor 20 e estorno do pedido 1 (deixa de estar liberado)
+    history.lines = [
+        _line(1, 100, 10, 5, dtalter="2026-02-01 09:00:00", status="E"),
+        _line(2, 100, 20, 3),
+        _line(6, 100, 20, 1, dtalter="2026-02-01 09:30:00"),
+    ]
+    # Pedido 2 volta porque o watermark é inclusivo (>=); a regravação é idempotente
+    assert index.refresh() == 2
+    assert history.calls[-1] == "2026-01-10 08:00:00"
+    assert index.primary_supplier(100)["CODPARC"] == 20
+    assert index.primary_supplier(100)["VOLUME"] == 4
+    assert index.watermark == "2026-02-01 09:30:00"
+
+    # Reabrir o arquivo (outro processo) enxerga o mesmo estado sem ir ao ERP
+    reopened = PrimarySupplierIndex(str(tmp_path / "idx.db"), history)
+    calls = len(history.calls)
+    reopened.ensure_fresh(refresh_seconds=3600)
+    assert len(history.calls) == calls
+    assert reopened.primary_supplier(100)["CODPARC"] == 20
+
+
+def test_group_by_supplier_matches_opportunities_shape(tmp_path):
+    history = _History([_line(1, 100, 10, 5), _line(2, 200, 10, 5), _line(3, 300, 1, 5)])
+    index = PrimarySupplierIndex(str(tmp_path / "idx.db"), history)
+    index.rebuild()
+
+    groups = index.group_by_supplier({
+        100: {"VLR_SUGESTAO": 50.0, "RUPTURA": 1},
+        200: {"VLR_SUGESTAO": 25.0, "RUPTURA": 0},
+        300: {"VLR_SUGESTAO": 999.0, "RUPTURA": 1},     # fornecedor 1 = Matriz: excluído
+        400: {"VLR_SUGESTAO": 10.0, "RUPTURA": 0},      # sem histórico de compra
+    })
+    assert groups == [{
+        "CODPARCFORN": 10, "FORNECEDOR": "FORN 10",
+        "VLR_TOTAL_SUGESTAO": 75.0, "MIX_PRODUTOS": 2, "ITENS_RUPTURA": 1,
+    }]
+
+
+def test_months_ago_clamps_to_month_end():
+    assert months_ago(1, date(2026, 3, 31)) == "2026-02-28"
+    assert months_ago(12, date(2026, 1, 15)) == "2025-01-15"
+
+
+def test_radar_with_index_matches_erp_rule(tmp_path, run_radar):
+    """O radar com o índice local devolve as mesmas oportunidades da regra no ERP."""
+    erp = run_radar(250, batched=True)
+    indexed = run_radar(250, batched=True, index_path=str(tmp_path / "idx.db"))
+    per_product = run_radar(250, batched=False, index_path=str(tmp_path / "idx.db"))
+
+    assert indexed["opportunities"] == erp["opportunities"]
+    assert per_product["opportunities"] == erp["opportunities"]
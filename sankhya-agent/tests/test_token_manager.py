@@ -0,0 +1,136 @@
+"""
+Testes do gerenciador de token OAuth (mcp_server/token_manager.py).
+
+Verifica o refresh single-flight sob concorrência, a invalidação por comparação
+no 401, o refresh proativo em segundo plano e a persistência entre "processos".
+"""
+
+import sys
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+# Adicionar path do projeto
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from mcp_server.token_manager import TokenManager, TokenStore, TokenRefreshError
+
+
+class _Authenticator:
+    """Simula o /authenticate com latência e contagem de chamadas."""
+
+    def __init__(self, expires_in=3600, latency=0.05, fail=False):
+        self.calls = 0
+        self.expires_in = expires_in
+        self.latency = latency
+        self.fail = fail
+        self.lock = threading.Lock()
+
+    def __call__(self):
+        with self.lock:
+            self.calls += 1
+            n = self.calls
+        time.sleep(self.latency)
+        if self.fail:
+            raise ConnectionError("Gateway fora do ar")
+        return f"tok{n}", self.expires_in
+
+
+def test_concurrent_callers_share_one_refresh():
+    auth = _Authenticator()
+    manager = TokenManager(auth, proactive=False)
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        tokens = list(pool.map(lambda _: manager.get_token(), range(32)))
+    assert auth.calls == 1
+    assert set(tokens) == {"tok1"}
+
+
+def test_failure_is_shared_by_waiters():
+    auth = _Authenticator(fail=True, latency=0.1)
+    manager = TokenManager(auth, proactive=False)
+
+    def attempt(_):
+        try:
+            manager.get_token()
+        except TokenRefreshError as e:
+            return str(e)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        errors = list(pool.map(attempt, range(8)))
+    assert auth.calls == 1
+    assert all("fora do ar" in e for e in errors)
+
+    # A falha não fica "presa": a próxima chamada tenta de novo
+    auth.fail = False
+    assert manager.get_token() == "tok2"
+
+
+def test_invalidate_only_discards_the_stale_token():
+    auth = _Authenticator(latency=0)
+    manager = TokenManager(auth, proactive=False)
+    stale = manager.get_token()
+
+    assert manager.invalidate(stale) is True
+    fresh = manager.get_token()
+    assert fresh == "tok2"
+
+    # Uma segunda thread que também recebeu 401 com o token antigo não derruba o novo
+    assert manager.invalidate(stale) is False
+    assert manager.get_token() == fresh
+    assert auth.calls == 2
+
+
+def test_proactive_refresh_runs_before_expiry():
+    auth = _Authenticator(expires_in=1.6, latency=0)
+    manager = TokenManager(auth, expiry_margin=0.0, refresh_ahead=10.0, proactive=True)
+    try:
+        assert manager.get_token() == "tok1"
+        # Token de vida curta: renova na metade da vida útil, antes de vencer
+        time.sleep(1.3)
+        assert auth.calls == 2
+        assert manager.get_token() == "tok2"
+    finally:
+        manager.close()
+
+
+def test_token_is_persisted_across_restarts(tmp_path):
+    store_path = tmp_path / "token.json"
+    auth = _Authenticator(latency=0)
+
+    first = TokenManager(auth, store=TokenStore(str(store_path)), store_key=lambda: "k", proactive=False)
+    assert first.get_token() == "tok1"
+    assert oct(store_path.stat().st_mode & 0o777) == "0o600"
+
+    # "Reinício": um novo processo reaproveita o token gravado sem ir ao Gateway
+    second = TokenManager(auth, store=TokenStore(str(store_path)), store_key=lambda: "k", proactive=False)
+    assert second.get_token() == "tok1"
+    assert auth.calls == 1
+    assert second.stats()["store_hits"] == 1
+
+    # 401 num processo remove o token do arquivo; o outro não o recarrega
+    second.invalidate("tok1")
+    third = TokenManager(auth, store=TokenStore(str(store_path)), store_key=lambda: "k", proactive=False)
+    assert third.get_token() == "tok2"
+
+
+def test_gateway_client_uses_single_flight(monkeypatch):
+    from mcp_server.utils import SankhyaGatewayClient
+
+    client = SankhyaGatewayClient()
+    auth = _Authenticator()
+    monkeypatch.setattr(client.tokens, "_fetch", auth)
+    client.tokens.proactive = False
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        assert all(pool.map(lambda _: client.authenticate(), range(16)))
+    assert auth.calls == 1
+    assert client.bearer_token == "tok1"
+    assert client.token_expires_at > time.time() + 3000
+
+    auth.fail = True
+    client.tokens.invalidate("tok1")
+    assert client.authenticate() is False
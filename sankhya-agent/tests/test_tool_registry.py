@@ -0,0 +1,77 @@
+"""
+Testes do hot-reload incremental do registro de ferramentas (mcp_server/tools.py).
+
+Usa um diretório de skills temporário para verificar que apenas arquivos
+alterados são recarregados e que o schema Gemini fica em cache entre rodadas.
+"""
+
+import os
+import sys
+from pathlib import Path
+
+# Adicionar path do projeto
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from mcp_server import tools
+
+
+SKILL_V1 = '''
+LOADS = globals().get("LOADS", 0) + 1
+
+def tmp_skill_hello(nome: str) -> str:
+    """Diz olá."""
+    return f"olá {nome}"
+'''
+
+SKILL_V2 = SKILL_V1 + '''
+def tmp_skill_bye(nome: str) -> str:
+    """Diz tchau."""
+    return f"tchau {nome}"
+'''
+
+
+def test_only_changed_skills_are_reloaded(tmp_path):
+    original_path = tools.SKILLS_PATH
+    skill_file = tmp_path / "tmp_skill_registry.py"
+    skill_file.write_text(SKILL_V1, encoding="utf-8")
+    tools.SKILLS_PATH = str(tmp_path)
+    try:
+        assert tools.register_tools() is True
+        assert "tmp_skill_hello" in tools.GLOBAL_TOOL_REGISTRY
+        assert "run_sql_select" in tools.GLOBAL_TOOL_REGISTRY
+        module = sys.modules["tmp_skill_registry"]
+        version = tools.get_registry_version()
+        schema = tools.get_gemini_tools_schema()
+
+        # Nada mudou: nenhuma reimportação, mesma versão, schema reaproveitado
+        assert tools.register_tools() is False
+        assert tools.get_registry_version() == version
+        assert tools.get_gemini_tools_schema() is schema
+        assert module.LOADS == 1
+
+        # mtime mudou mas conteúdo não: hash evita o reload
+        os.utime(skill_file, None)
+        st = skill_file.stat()
+        os.utime(skill_file, ns=(st.st_atime_ns, st.st_mtime_ns + 10_000_000))
+        assert tools.register_tools() is False
+        assert module.LOADS == 1
+
+        # Conteúdo mudou: só este módulo é recarregado e o schema é refeito
+        skill_file.write_text(SKILL_V2, encoding="utf-8")
+        assert tools.register_tools() is True
+        assert module.LOADS == 2
+        assert "tmp_skill_bye" in tools.GLOBAL_TOOL_REGISTRY
+        assert tools.get_registry_version() == version + 1
+        assert any(d["name"] == "tmp_skill_bye" for d in tools.get_gemini_tools_schema())
+
+        # Arquivo removido: ferramentas saem do registro
+        skill_file.unlink()
+        assert tools.register_tools() is True
+        assert "tmp_skill_hello" not in tools.GLOBAL_TOOL_REGISTRY
+    finally:
+        tools.SKILLS_PATH = original_path
+        if str(tmp_path) in sys.path:
+            sys.path.remove(str(tmp_path))
+        sys.modules.pop("tmp_skill_registry", None)
+        tools.register_tools(force=True)
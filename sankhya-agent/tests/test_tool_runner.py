@@ -0,0 +1,99 @@
+"""
+Testes da execução concorrente de ferramentas (mcp_server/tool_runner.py).
+
+Verifica paralelismo real, ordem determinística das respostas, timeout por
+ferramenta e o comportamento de barreira das ferramentas não concorrentes.
+"""
+
+import sys
+import time
+import threading
+from pathlib import Path
+
+# Adicionar path do projeto
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from mcp_server.tool_runner import run_tool_calls
+
+
+def test_calls_run_concurrently_in_request_order():
+    """Três chamadas de 0.3s devem levar bem menos que 0.9s e voltar na ordem pedida."""
+    def get_table_columns(table_name: str) -> str:
+        time.sleep(0.3 if table_name == "TGFCAB" else 0.1)
+        return f"colunas de {table_name}"
+
+    calls = [("get_table_columns", {"table_name": t}) for t in ("TGFCAB", "TGFITE", "TGFPRO")]
+    start = time.perf_counter()
+    results = run_tool_calls(calls, {"get_table_columns": get_table_columns})
+    elapsed = time.perf_counter() - start
+
+    assert elapsed < 0.5
+    assert [r[2] for r in results] == ["colunas de TGFCAB", "colunas de TGFITE", "colunas de TGFPRO"]
+
+
+def test_unknown_tool_and_exceptions():
+    def broken() -> str:
+        raise ValueError("ORA-00942")
+
+    results = run_tool_calls([("nao_existe", {}), ("broken", {})], {"broken": broken})
+    assert results[0] == ("nao_existe", {}, None)
+    assert "ORA-00942" in results[1][2]
+
+
+def test_per_tool_timeout():
+    def slow() -> str:
+        time.sleep(1)
+        return "tarde demais"
+    slow.tool_timeout = 0.1
+
+    def fast() -> str:
+        return "ok"
+
+    start = time.perf_counter()
+    results = run_tool_calls([("slow", {}), ("fast", {})], {"slow": slow, "fast": fast})
+    assert time.perf_counter() - start < 0.8
+    assert "tempo limite" in results[0][2]
+    assert results[1][2] == "ok"
+
+
+def test_non_concurrent_tools_are_never_abandoned():
+    """Uma gravação lenta não vira 'tempo limite' (o modelo a repetiria com a primeira ainda rodando)."""
+    def save_record() -> str:
+        time.sleep(0.3)
+        return "gravado"
+    save_record.concurrent_safe = False
+    save_record.tool_timeout = 0.05
+
+    results = run_tool_calls([("save_record", {})], {"save_record": save_record})
+    assert results[0][2] == "gravado"
+
+
+def test_non_concurrent_tools_act_as_barrier():
+    """save_record não pode sobrepor nenhuma outra chamada da rodada."""
+    active = []
+    overlaps = []
+    lock = threading.Lock()
+
+    def _track(label):
+        with lock:
+            if active and (label == "save" or "save" in active):
+                overlaps.append((label, list(active)))
+            active.append(label)
+        time.sleep(0.1)
+        with lock:
+            active.remove(label)
+        return label
+
+    def read(n: int) -> str:
+        return _track(f"read{n}")
+
+    def save_record() -> str:
+        return _track("save")
+    save_record.concurrent_safe = False
+
+    calls = [("read", {"n": 1}), ("read", {"n": 2}), ("save_record", {}), ("read", {"n": 3})]
+    results = run_tool_calls(calls, {"read": read, "save_record": save_record})
+
+    assert [r[2] for r in results] == ["read1", "read2", "save", "read3"]
+    assert overlaps == []
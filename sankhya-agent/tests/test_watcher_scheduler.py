@@ -0,0 +1,377 @@
+"""
+Testes do agendador de vigias (mcp_server/watcher_scheduler.py).
+
+Cobre a cadência por vigia com jitter, a execução paralela, o timeout, o
+histórico, a detecção de mudança que controla a versão do painel, os vigias
+incrementais (marca d'água, conjunto materializado e diff novas/resolvidas) e a
+carga das definições em rules/watchers.yaml.
+"""
+
+import os
+import random
+import sqlite3
+import sys
+import threading
+import time
+from pathlib import Path
+
+# Adicionar path do projeto
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from mcp_server.watcher_scheduler import AlertStore, WatcherScheduler, render_alerts_markdown
+from mcp_server.skills import watchers as watchers_skill
+
+
+class _FakeWatcher:
+    """Vigia falso: devolve `rows` (ou levanta) após `delay` segundos."""
+
+    def __init__(self, name, rows=None, interval=60, timeout=5, delay=0.0, error=None):
+        self.name = name
+        self.description = f"Vigia {name}"
+        self.severity = "WARNING"
+        self.interval_seconds = interval
+        self.timeout_seconds = timeout
+        self.rows = rows or []
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+
+    def evaluate(self):
+        self.calls += 1
+        if self.delay:
+            time.sleep(self.delay)
+        if self.error:
+            raise RuntimeError(self.error)
+        return list(self.rows)
+
+
+class _Clock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_cadence_and_jitter_per_watcher(tmp_path):
+    clock = _Clock()
+    fast = _FakeWatcher("rapido", interval=60)
+    slow = _FakeWatcher("lento", interval=3600)
+    store = AlertStore(str(tmp_path / "w.db"))
+    scheduler = WatcherScheduler([fast, slow], store, jitter_seconds=10, clock=clock, rng=random.Random(7))
+
+    # Primeira execução espalhada dentro da janela de jitter
+    first = store.next_runs()
+    assert all(clock.now <= t <= clock.now + 10 for t in first.values())
+    assert scheduler.due() == []
+
+    clock.now += 10
+    assert {r.name for r in scheduler.run_due()} == {"rapido", "lento"}
+    for name, interval in (("rapido", 60), ("lento", 3600)):
+        assert clock.now + interval <= store.next_runs()[name] <= clock.now + interval + 10
+
+    clock.now += 75
+    assert [r.name for r in scheduler.run_due()] == ["rapido"]
+    assert (fast.calls, slow.calls) == (2, 1)
+    scheduler.close()
+
+
+def test_due_watchers_run_in_parallel(tmp_path):
+    clock = _Clock()
+    watchers = [_FakeWatcher(f"v{i}", rows=[{"ID": i}], delay=0.2) for i in range(4)]
+    scheduler = WatcherScheduler(watchers, AlertStore(str(tmp_path / "w.db")), max_workers=4,
+                                 jitter_seconds=0, clock=clock)
+    t0 = time.monotonic()
+    results = scheduler.run_due()
+    assert len(results) == 4 and all(r.status == "ok" for r in results)
+    assert time.monotonic() - t0 < 0.6                # em série levaria 0.8s
+    scheduler.close()
+
+
+def test_timeout_does_not_count_time_queued_in_the_pool(tmp_path):
+    """Mais vigias vencidos que threads: a espera na fila não estoura o timeout de ninguém."""
+    clock = _Clock()
+    watchers = [_FakeWatcher(name, rows=[{"ID": 1}], delay=0.3, timeout=0.5) for name in "abc"]
+    scheduler = WatcherScheduler(watchers, AlertStore(str(tmp_path / "w.db")), max_workers=1,
+                                 jitter_seconds=0, clock=clock)
+    statuses = {r.name: r.status for r in scheduler.run_due()}
+    assert statuses == {"a": "ok", "b": "ok", "c": "ok"}
+
+    # Ninguém ficou marcado como preso: todos voltam no próximo ciclo
+    clock.now += 61
+    assert [w.name for w in scheduler.due()] == ["a", "b", "c"]
+    scheduler.close()
+
+
+def test_queued_run_behind_stuck_workers_is_cancelled(tmp_path):
+    """Com todas as threads presas, quem está na fila é cancelado, sem virar timeout."""
+    clock = _Clock()
+    stuck = _FakeWatcher("preso", delay=0.5, timeout=0.1)
+    queued = _FakeWatcher("fila", rows=[{"ID": 1}])
+    store = AlertStore(str(tmp_path / "w.db"))
+    scheduler = WatcherScheduler([stuck, queued], store, max_workers=1, jitter_seconds=0, clock=clock)
+
+    assert [(r.name, r.status) for r in scheduler.run_due()] == [("preso", "timeout")]
+    assert queued.calls == 0 and store.history("fila") == []
+    assert [w.name for w in scheduler.due()] == ["fila"]
+
+    time.sleep(0.5)
+    assert [(r.name, r.status) for r in scheduler.run_due()] == [("fila", "ok")]
+    scheduler.close()
+
+
+def test_timeout_and_error_are_recorded(tmp_path):
+    clock = _Clock()
+    stuck = _FakeWatcher("preso", delay=1.0, timeout=0.1)
+    broken = _FakeWatcher("quebrado", error="ORA-00942: tabela inexistente")
+    store = AlertStore(str(tmp_path / "w.db"))
+    scheduler = WatcherScheduler([stuck, broken], store, jitter_seconds=0, clock=clock)
+
+    statuses = {r.name: r.status for r in scheduler.run_due()}
+    assert statuses == {"preso": "timeout", "quebrado": "erro"}
+
+    # Enquanto a execução presa não termina o vigia não é disparado de novo
+    clock.now += 3600
+    assert [w.name for w in scheduler.due()] == ["quebrado"]
+
+    alerts = {a["name"]: a for a in store.active_alerts()}
+    assert alerts["quebrado"]["error"] == "ORA-00942: tabela inexistente"
+    assert "falha na última execução" in render_alerts_markdown(alerts.values())
+    scheduler.close()
+
+
+def test_change_detection_and_history(tmp_path):
+    clock = _Clock()
+    watcher = _FakeWatcher("estoque", rows=[{"CODPROD": 1, "ESTOQUE": 2}], interval=60)
+    store = AlertStore(str(tmp_path / "w.db"))
+    scheduler = WatcherScheduler([watcher], store, jitter_seconds=0, clock=clock)
+    changes = []
+
+    for rows in ([{"CODPROD": 1, "ESTOQUE": 2}], [{"ESTOQUE": 2, "CODPROD": 1}], [], []):
+        watcher.rows = rows
+        changes.append(scheduler.run_due()[0].changed)
+        clock.now += 61
+
+    # Mesmas linhas (com colunas em outra ordem) não mudam a versão
+    assert changes == [True, False, True, False]
+    assert store.version == 2
+    assert store.active_alerts() == []                 # nada disparando na última execução
+
+    history = store.history("estoque")
+    assert [h["changed"] for h in history] == [False, True, False, True]
+    assert [h["count"] for h in history] == [0, 0, 1, 1]
+    scheduler.close()
+
+
+def test_run_forever_publishes_only_on_change(tmp_path):
+    watcher = _FakeWatcher("notas", rows=[{"NUNOTA": 10}], interval=0.05)
+    store = AlertStore(str(tmp_path / "w.db"))
+    scheduler = WatcherScheduler([watcher], store, jitter_seconds=0)
+    stop = threading.Event()
+    published = []
+
+    def _on_change(results):
+        published.append(store.version)
+
+    thread = threading.Thread(target=scheduler.run_forever, args=(stop, _on_change, 0.05))
+    thread.start()
+    time.sleep(1.5)
+    stop.set()
+    thread.join(timeout=5)
+
+    assert watcher.calls >= 2
+    assert published == [1]
+    scheduler.close()
+
+
+class _FakeIncremental(_FakeWatcher):
+    """Vigia incremental falso: `rows` na varredura completa, `delta` (filtrado pela marca) no delta."""
+
+    incremental = True
+    key_columns = ("NUNOTA",)
+
+    def __init__(self, name, rows, full_refresh=3600, **kwargs):
+        super().__init__(name, rows=rows, **kwargs)
+        self.full_refresh_seconds = full_refresh
+        self.delta = []
+        self.watermarks = []
+
+    def evaluate_delta(self, watermark):
+        self.watermarks.append(watermark)
+        return [r for r in self.delta if r["WATERMARK"] >= watermark]
+
+
+def test_incremental_watcher_applies_deltas(tmp_path):
+    clock = _Clock()
+    watcher = _FakeIncremental("notas", rows=[
+        {"NUNOTA": 1, "VLRNOTA": 10, "WATERMARK": "20261001080000"},
+        {"NUNOTA": 2, "VLRNOTA": 20, "WATERMARK": "20261001090000"},
+    ])
+    store = AlertStore(str(tmp_path / "w.db"))
+    scheduler = WatcherScheduler([watcher], store, jitter_seconds=0, clock=clock)
+
+    first = scheduler.run_due()[0]
+    assert first.mode == "completo" and len(first.added) == 2 and first.resolved == []
+    assert first.rows == [{"NUNOTA": 1, "VLRNOTA": 10}, {"NUNOTA": 2, "VLRNOTA": 20}]
+
+    # Nota 1 confirmada (sai da condição), nota 3 digitada; linha antiga fora da marca não volta
+    watcher.delta = [
+        {"NUNOTA": 9, "VLRNOTA": 90, "WATERMARK": "20260901000000", "DISPARADO": "S"},
+        {"NUNOTA": 1, "VLRNOTA": 10, "WATERMARK": "20261001100000", "DISPARADO": "N"},
+        {"NUNOTA": 3, "VLRNOTA": 30, "WATERMARK": "20261001110000", "DISPARADO": "S"},
+    ]
+    clock.now += 61
+    second = scheduler.run_due()[0]
+    assert second.mode == "delta" and watcher.watermarks == ["20261001090000"]
+    assert second.fetched == 2
+    assert second.added == [{"NUNOTA": 3, "VLRNOTA": 30}]
+    assert second.resolved == [{"NUNOTA": 1, "VLRNOTA": 10}]
+    assert [r["NUNOTA"] for r in second.rows] == [2, 3]
+    assert second.changed
+
+    # Nada alterado desde a última marca: delta vazio, versão parada
+    watcher.delta = []
+    clock.now += 61
+    third = scheduler.run_due()[0]
+    assert watcher.watermarks[-1] == "20261001110000"
+    assert (third.fetched, third.changed, third.count) == (0, False, 2)
+
+    alert = store.active_alerts()[0]
+    assert (alert["count"], alert["added"], alert["resolved"]) == (2, 0, 0)
+    assert [(h["mode"], h["added"], h["resolved"]) for h in store.history("notas")] == [
+        ("delta", 0, 0), ("delta", 1, 1), ("completo", 2, 0),
+    ]
+    scheduler.close()
+
+
+def test_incremental_full_refresh_reconciles(tmp_path):
+    clock = _Clock()
+    watcher = _FakeIncremental("notas", full_refresh=300, rows=[
+        {"NUNOTA": 1, "WATERMARK": "20261001080000"},
+        {"NUNOTA": 2, "WATERMARK": "20261001090000"},
+    ])
+    store = AlertStore(str(tmp_path / "w.db"))
+    scheduler = WatcherScheduler([watcher], store, jitter_seconds=0, clock=clock)
+    scheduler.run_due()
+
+    # Nota 1 saiu da janela de 7 dias sem ser alterada: só a varredura completa percebe
+    watcher.rows = [{"NUNOTA": 2, "WATERMARK": "20261001090000"}]
+    clock.now += 301
+    result = scheduler.run_due()[0]
+    assert result.mode == "completo"
+    assert result.resolved == [{"NUNOTA": 1}] and result.added == []
+    # A marca d'água nunca recua numa varredura completa
+    assert store.incremental_state("notas")[0] == "20261001090000"
+    scheduler.close()
+
+
+def test_empty_full_scan_still_enters_delta_mode(tmp_path):
+    """Sem nenhuma linha disparada, a marca d'água do início da varredura leva o vigia ao delta."""
+    clock = _Clock()
+    watcher = _FakeIncremental("notas", rows=[])
+    watcher.scan_watermark = lambda: "20261001120000"
+    store = AlertStore(str(tmp_path / "w.db"))
+    scheduler = WatcherScheduler([watcher], store, jitter_seconds=0, clock=clock)
+
+    first = scheduler.run_due()[0]
+    assert (first.mode, first.count) == ("completo", 0)
+    assert store.incremental_state("notas")[0] == "20261001120000"
+
+    watcher.delta = [{"NUNOTA": 4, "WATERMARK": "20261001123000", "DISPARADO": "S"}]
+    clock.now += 61
+    second = scheduler.run_due()[0]
+    assert second.mode == "delta" and watcher.watermarks == ["20261001120000"]
+    assert second.added == [{"NUNOTA": 4}]
+    scheduler.close()
+
+
+def test_store_upgrades_previous_schema(tmp_path):
+    db = tmp_path / "w.db"
+    conn = sqlite3.connect(str(db))
+    conn.executescript(
+        "CREATE TABLE watcher_state (name TEXT PRIMARY KEY, severity TEXT, description TEXT, "
+        "next_run REAL NOT NULL DEFAULT 0, last_run REAL, status TEXT, count INTEGER NOT NULL DEFAULT 0, "
+        "fingerprint TEXT, rows_json TEXT, last_change REAL, error TEXT);"
+        "CREATE TABLE watcher_runs (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL, "
+        "started_at REAL NOT NULL, elapsed REAL NOT NULL, status TEXT NOT NULL, count INTEGER NOT NULL, "
+        "changed INTEGER NOT NULL, error TEXT);"
+    )
+    conn.close()
+
+    store = AlertStore(str(db))
+    scheduler = WatcherScheduler([_FakeIncremental("notas", rows=[{"NUNOTA": 1, "WATERMARK": "1"}])],
+                                 store, jitter_seconds=0, clock=_Clock())
+    assert scheduler.run_due()[0].status == "ok"
+    assert store.incremental_state("notas")[0] == "1"
+    scheduler.close()
+
+
+def test_system_watcher_delta_binds_watermark(monkeypatch):
+    sent = []
+
+    class _Gateway:
+        def execute_bound(self, sql, params, use_cache=True):
+            sent.append((sql, params, use_cache))
+            return []
+
+        def execute_query(self, sql, use_cache=True):
+            sent.append((sql, None, use_cache))
+            return [{"WATERMARK": "20261001000000"}]
+
+    monkeypatch.setattr(watchers_skill, "sankhya", _Gateway())
+    incremental = [w for w in watchers_skill.SYSTEM_WATCHERS if w.incremental]
+    assert len(incremental) == len(watchers_skill.SYSTEM_WATCHERS)
+    for watcher in incremental:
+        watcher.evaluate_delta(watcher.scan_watermark())
+    marks, deltas = sent[0::2], sent[1::2]
+    assert all(sql == watchers_skill.DEFAULT_WATERMARK_QUERY and not c for sql, _, c in marks)
+    assert all(p == {"WATERMARK": "20261001000000"} and not c for _, p, c in deltas)
+
+
+_RULES = """
+defaults:
+  interval_minutes: 10
+watchers:
+  - name: "Estoque Empresa {CODEMP}"
+    description: "Saldo abaixo de {LIMITE}"
+    severity: danger
+    params: {LIMITE: 5}
+    for_each: [{CODEMP: 1}, {CODEMP: 2, LIMITE: 8}]
+    key_columns: [codprod]
+    query: "SELECT CODPROD, TO_CHAR(SYSDATE, 'YYYYMMDDHH24MISS') AS WATERMARK FROM TGFEST WHERE CODEMP = :CODEMP AND ESTOQUE < :LIMITE"
+    delta_query: "SELECT CODPROD FROM TGFEST WHERE CODEMP = :CODEMP AND DTALTER >= TO_DATE(:WATERMARK, 'YYYYMMDDHH24MISS')"
+  - name: "Escrita"
+    query: "DELETE FROM TGFEST"
+  - name: "Sem parametro"
+    query: "SELECT 1 FROM TGFCAB WHERE CODEMP = :CODEMP"
+  - name: "Desligado"
+    enabled: false
+    query: "SELECT 1 FROM DUAL"
+"""
+
+
+def test_yaml_watchers_are_validated_and_compiled_once(tmp_path):
+    rules = tmp_path / "watchers.yaml"
+    rules.write_text(_RULES, encoding="utf-8")
+    os.utime(rules, (1_000_000, 1_000_000))
+
+    loaded = watchers_skill._load_watchers(str(rules))
+    assert [w.name for w in loaded] == ["Estoque Empresa 1", "Estoque Empresa 2"]   # inválidos e desligado ficam de fora
+    second = loaded[1]
+    assert second.severity == "DANGER" and second.interval_seconds == 600
+    assert second.description == "Saldo abaixo de 8" and second.key_columns == ("CODPROD",)
+    assert "CODEMP = 2 AND ESTOQUE < 8" in second.query
+    assert "CODEMP = 2" in second.delta_query and ":WATERMARK" in second.delta_query and second.incremental
+
+    # Sem mudança no arquivo a carga devolve os mesmos vigias compilados
+    assert watchers_skill._load_watchers(str(rules)) is loaded
+    rules.write_text(_RULES.replace("LIMITE: 8", "LIMITE: 3"), encoding="utf-8")
+    os.utime(rules, (1_000_100, 1_000_100))
+    assert "ESTOQUE < 3" in watchers_skill._load_watchers(str(rules))[1].query
+
+
+def test_shipped_watchers_file_is_valid():
+    loaded = watchers_skill._load_watchers()
+    assert {w.name for w in loaded} == {"Notas Pendentes", "Estoque Crítico", "Novos Parceiros sem CPF/CNPJ"}
+    assert all(w.incremental for w in loaded)
@@ -0,0 +1,88 @@
+"""
+Testes da busca em camadas da Central de Ajuda (mcp_server/skills/zendesk_connector.py).
+
+FTS local primeiro, depois o cache de buscas remotas (TTL) e só então a rede;
+o que vem da Zendesk é gravado na knowledge.db e a próxima busca é local.
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+# Adicionar path do projeto
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from mcp_server import tools
+from mcp_server.knowledge_search import KnowledgeSearch
+from mcp_server.skills import zendesk_connector as zc
+
+REMOTE = [
+    {"id": 501, "html_url": "https://ajuda/501", "title": "Como cadastrar parceiro", "locale": "pt-br",
+     "body": "<p>Acesse a tela <b>Parceiros</b> e informe o CNPJ.</p>", "snippet": "cadastrar <em>parceiro</em>",
+     "created_at": "2025-01-01T00:00:00Z", "updated_at": "2025-09-01T00:00:00Z", "draft": False},
+    {"id": 502, "html_url": "https://ajuda/502", "title": "Parceiro bloqueado para compras", "locale": "pt-br",
+     "body": "<p>Verifique o campo BLOQUEAR na TGFPAR.</p>", "snippet": "<em>parceiro</em> bloqueado",
+     "created_at": "2025-01-01T00:00:00Z", "updated_at": "2025-09-01T00:00:00Z", "draft": False},
+]
+
+
+class FakeZendesk:
+    """Substitui a chamada HTTP: devolve `response` (ou a levanta, se for exceção) e conta as chamadas."""
+
+    def __init__(self):
+        self.response = REMOTE
+        self.calls = []
+
+    def __call__(self, query, limit):
+        self.calls.append(query)
+        if isinstance(self.response, Exception):
+            raise self.response
+        return self.response[:limit]
+
+
+@pytest.fixture
+def remote(tmp_path, monkeypatch):
+    searcher = KnowledgeSearch(str(tmp_path / "knowledge.db"))    # ainda não existe
+    monkeypatch.setattr(zc, "get_knowledge_search", lambda: searcher)
+    fake = FakeZendesk()
+    monkeypatch.setattr(zc, "_fetch_remote", fake)
+    return fake
+
+
+def test_remote_results_are_written_back_and_reused(remote, monkeypatch):
+    first = zc.search_zendesk_help_center("cadastro de parceiro", limit=2)
+    assert "(online)" in first and "[Ler artigo completo](https://ajuda/501)" in first
+    assert remote.calls == ["cadastro de parceiro"]
+
+    # Mesma busca (outra caixa/espaços): cache local, sem rede
+    again = zc.search_zendesk_help_center("  Cadastro de PARCEIRO ", limit=2)
+    assert "(cache local)" in again and "informe o CNPJ" in again
+    assert len(remote.calls) == 1
+
+    # Os artigos entraram no FTS local: outra busca que bate nos dois não vai à rede
+    local = zc.search_zendesk_help_center("parceiro", limit=2)
+    assert "(base local)" in local and "https://ajuda/502" in local
+    assert len(remote.calls) == 1
+
+    # Vencido o TTL, a rede é consultada de novo
+    monkeypatch.setattr(zc, "REMOTE_CACHE_TTL", 0)
+    zc.search_zendesk_help_center("cadastro de parceiro", limit=2)
+    assert len(remote.calls) == 2
+
+
+def test_offline_falls_back_to_local_data(remote, monkeypatch):
+    zc.search_zendesk_help_center("cadastro de parceiro", limit=2)
+    monkeypatch.setattr(zc, "REMOTE_CACHE_TTL", 0)
+    remote.response = RuntimeError("503 - Service Unavailable")
+
+    stale = zc.search_zendesk_help_center("cadastro de parceiro", limit=2)
+    assert "(offline, base local)" in stale and "https://ajuda/501" in stale and "503" in stale
+
+    assert zc.search_zendesk_help_center("nota fiscal rejeitada").startswith("❌ Erro ao conectar na Zendesk")
+
+
+def test_only_the_search_is_exposed_as_tool():
+    skill_tools = tools._load_skill_tools(zc.__name__)
+    assert list(skill_tools) == ["search_zendesk_help_center"]